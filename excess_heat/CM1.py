@@ -1,7 +1,11 @@
-from geopy.distance import distance
 import numpy as np
 
 
+# capacities in MW and costs in €/m of the available transmission line pipes
+PIPE_CAPACITIES = [0.2, 0.3, 0.6, 1.2, 1.9, 3.6, 6.1, 9.8, 20, 45, 75, 125, 190, 1e19]
+PIPE_COSTS = [195, 206, 220, 240, 261, 288, 323, 357, 426, 564, 701, 839, 976, 976]
+
+
 def temp_check(temp_source, temp_sink, condition):
     """
     function determining if source can provide heat for a sink.
@@ -67,6 +71,7 @@ def orthodrome_distance(coordinate_1, coordinate_2, ellipsoid="WGS-84"):
     :return: orthodrome length in km.
     :rtype: float.
     """
+    from geopy.distance import distance
 
     return distance(coordinate_1, coordinate_2, ellipsoid=ellipsoid).km
 
@@ -161,6 +166,111 @@ def find_neighbours(sites1, sites2, lon1_header, lat1_header, lon2_header, lat2_
     return connections, distances
 
 
+def find_delaunay_neighbours(sources, sinks, lon_header, lat_header, temp_header, max_distance, network_temp,
+                             source_condition, sink_condition, site1_site2_condition, small_angle_approximation=True):
+    """
+    Function generating sparse candidate edges between all sources and sinks from the Delaunay triangulation of their
+    coordinates. For planar distances the Euclidean minimum spanning tree of the radius graph computed by
+    find_neighbours() is a subset of the Delaunay edges, hence the minimum spanning tree stays the same while the number
+    of edges only grows linearly with the number of sites. Edges are filtered by max_distance and the temperature
+    conditions afterwards. The minimum spanning tree is only guaranteed to be unchanged if all temperature conditions
+    are "true" and the small angle approximation is used.
+
+    :param sources: Dataframe containing coordinates of the sources.
+    :type sources: pandas Dataframe
+    :param sinks: Dataframe containing coordinates of the sinks.
+    :type sinks: pandas Dataframe
+    :param lon_header: Column name of the longitude of sources and sinks.
+    :type lon_header: string
+    :param lat_header: Column name of the latitude of sources and sinks.
+    :type lat_header: string
+    :param temp_header: Column name of the temperature of sources and sinks.
+    :type temp_header: string
+    :param max_distance: Maximum distance in km of an edge.
+    :type max_distance: float
+    :param network_temp: Temperature of the network in °C. The source_condition and sink_condition are in reference to
+                         this network temperature.
+    :type network_temp: float
+    :param source_condition: Condition the source temp should fulfill in aspect to the network temp.
+    :type source_condition: str of following list [">", ">=", "=", "<", "<=", "!=", "true", "false"]
+    :param sink_condition: Condition the sink temp should fulfill in aspect to the network temp.
+    :type sink_condition: str of following list [">", ">=", "=", "<", "<=", "!=", "true", "false"]
+    :param site1_site2_condition: Condition the temp of the first site of an edge should fulfill in aspect to the temp
+                                  of the second site. Sources are always the first site of source sink edges.
+    :type site1_site2_condition: str of following list [">", ">=", "=", "<", "<=", "!=", "true", "false"]
+    :param small_angle_approximation: Determines if small angle approximation should be used for the distance
+                                      calculation.
+    :type small_angle_approximation: bool
+    :return: Adjacency lists and distances of the source sink, source source and sink sink edges.
+    :rtype: tuple of six lists. Each adjacency list has the same shape as the following distances.
+    """
+    from scipy.spatial import Delaunay, QhullError
+
+    number_of_sources = len(sources)
+    coordinates = np.concatenate((sources[[lon_header, lat_header]].values.astype(float).reshape(-1, 2),
+                                  sinks[[lon_header, lat_header]].values.astype(float).reshape(-1, 2)))
+    temperatures = np.concatenate((sources[temp_header].values, sinks[temp_header].values))
+    number_of_sites = len(coordinates)
+
+    pairs = np.zeros((0, 2), dtype=int)
+    if number_of_sites == 2:
+        pairs = np.array([[0, 1]])
+    elif number_of_sites > 2:
+        try:
+            triangulation = Delaunay(coordinates)
+            simplices = triangulation.simplices
+            pairs = np.concatenate((simplices[:, [0, 1]], simplices[:, [1, 2]], simplices[:, [2, 0]]))
+            # duplicate coordinates are not part of the triangulation, connect them to their nearest vertex
+            if len(triangulation.coplanar):
+                pairs = np.concatenate((pairs, triangulation.coplanar[:, [0, 2]]))
+        except QhullError:
+            # all sites are collinear, hence the minimum spanning tree connects them in order
+            order = np.lexsort((coordinates[:, 1], coordinates[:, 0]))
+            pairs = np.stack((order[:-1], order[1:]), axis=1)
+    pairs = np.unique(np.sort(pairs, axis=1), axis=0)
+
+    source_sink_connections = [[] for _ in range(number_of_sources)]
+    source_sink_distances = [[] for _ in range(number_of_sources)]
+    source_source_connections = [[] for _ in range(number_of_sources)]
+    source_source_distances = [[] for _ in range(number_of_sources)]
+    sink_sink_connections = [[] for _ in range(number_of_sites - number_of_sources)]
+    sink_sink_distances = [[] for _ in range(number_of_sites - number_of_sources)]
+
+    for site1, site2 in pairs:
+        if small_angle_approximation is False:
+            distance = orthodrome_distance(coordinates[site1], coordinates[site2])
+        else:
+            distance = approximate_distance(coordinates[site1], coordinates[site2])
+        if distance > max_distance:
+            continue
+
+        if site1 < number_of_sources:
+            condition1 = source_condition
+        else:
+            condition1 = sink_condition
+        if site2 < number_of_sources:
+            condition2 = source_condition
+        else:
+            condition2 = sink_condition
+        if not (temp_check(temperatures[site1], network_temp, condition1) and
+                temp_check(temperatures[site2], network_temp, condition2) and
+                temp_check(temperatures[site1], temperatures[site2], site1_site2_condition)):
+            continue
+
+        if site2 < number_of_sources:
+            source_source_connections[site1].append(site2)
+            source_source_distances[site1].append(distance)
+        elif site1 < number_of_sources:
+            source_sink_connections[site1].append(site2 - number_of_sources)
+            source_sink_distances[site1].append(distance)
+        else:
+            sink_sink_connections[site1 - number_of_sources].append(site2 - number_of_sources)
+            sink_sink_distances[site1 - number_of_sources].append(distance)
+
+    return source_sink_connections, source_sink_distances, source_source_connections, source_source_distances, \
+        sink_sink_connections, sink_sink_distances
+
+
 def create_normalized_profiles(profiles, region_header, time_header, value_header):
     """
     function normalizing profiles so that the sum of values over all time stamps of each region is 1
@@ -217,8 +327,8 @@ def cost_of_connection(connection_distance, hourly_heat_flow, order=24):
     :rtype: float.
     """
 
-    pipe_capacities = [0.2, 0.3, 0.6, 1.2, 1.9, 3.6, 6.1, 9.8, 20, 45, 75, 125, 190, 1e19]
-    pipe_costs = [195, 206, 220, 240, 261, 288, 323, 357, 426, 564, 701, 839, 976, 976]
+    pipe_capacities = np.array(PIPE_CAPACITIES)
+    pipe_costs = PIPE_COSTS
     if np.sum(hourly_heat_flow) != 0:
         capacity = np.max(moving_average(hourly_heat_flow, order))
         # create boolean array and np.argmax will return the index of the first True, hence the first pipe capacity
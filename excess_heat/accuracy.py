@@ -0,0 +1,358 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from .excess_heat import create_heat_sink_profiles, create_heat_source_profiles, design_network, \
+    find_radius_neighbours, find_triangulation_neighbours, load_heat_profiles, load_heat_sinks, load_heat_sources, \
+    prune_network
+from .optimisation import LP_MIP_REL_GAP, LP_TIME_LIMIT
+from .read_data import TEMPERATURE_BANDS
+from .warm_start import edge_coordinates, edge_key
+
+
+logger = logging.getLogger(__name__)
+
+# parameters of the exact pipeline, the defaults of excess_heat()
+EXACT_PARAMETERS = {"max_flow_backend": "igraph", "candidate_edges": "radius", "design": "heuristic",
+                    "typical_periods": None, "prescreen_edges": True, "float_dtype": "float64",
+                    "time_limit": LP_TIME_LIMIT, "mip_rel_gap": LP_MIP_REL_GAP}
+# fast modes by name, parameters which differ from the exact pipeline
+FAST_MODES = {"scipy": {"max_flow_backend": "scipy"},
+              "incremental": {"max_flow_backend": "incremental"},
+              "delaunay": {"candidate_edges": "delaunay"},
+              "lp_typical_days": {"design": "lp", "typical_periods": 12, "time_limit": 60},
+              "float32": {"float_dtype": "float32"}}
+# fast modes compared by default. The lp design stops at its time limit of a minute on large fixtures.
+DEFAULT_MODES = ("scipy", "incremental", "delaunay", "lp_typical_days", "float32")
+# default tolerances, maximum relative errors of the totals and minimum jaccard index of the edge sets
+DEFAULT_TOLERANCES = {"total_cost": 0.05, "total_flow": 0.02, "cost_per_flow": 0.05, "edges": 0.8}
+# compared results
+RESULT_NAMES = ("total_cost", "total_flow", "cost_per_flow")
+# center of the synthetic scenarios, longitude and latitude
+SYNTHETIC_CENTER = (10.0, 56.0)
+# area per site of the synthetic scenarios in km², the square of the sites grows with their number
+SYNTHETIC_AREA_PER_SITE = 2.5
+# median annual excess heat of the synthetic sources and heat demand of the synthetic sinks in MWh, about the median
+# sites of DK05. Smaller sites leave no transmission line below the default threshold.
+SYNTHETIC_EXCESS_HEAT = 200000
+SYNTHETIC_HEAT_DEMAND = 40000
+
+
+def region_fixture(sinks, nuts2_id, search_radius=20, investment_period=20, transmission_line_threshold=0.5):
+    """
+    function loading the sources, sinks and profiles of one or several regions as fixture of the comparisons.
+
+    :param sinks: shp file containing the coherent areas of the district heating potential CM.
+    :type sinks: str.
+    :param nuts2_id: NUTS2 id of the region or ids of several regions, as for excess_heat().
+    :type nuts2_id: str or list of str.
+    :param search_radius: maximum length of a single transmission line in km.
+    :type search_radius: float.
+    :param investment_period: investment period of the network in years.
+    :type investment_period: float.
+    :param transmission_line_threshold: maximum cost per flow of a single transmission line in ct/kWh.
+    :type transmission_line_threshold: float.
+    :return: fixture.
+    :rtype: dict.
+    """
+
+    nuts2_ids = [nuts2_id] if isinstance(nuts2_id, str) else list(nuts2_id)
+    nuts0_id = sorted(set(region[:2] for region in nuts2_ids))
+    heat_sources = load_heat_sources(nuts0_id)
+    heat_sinks = load_heat_sinks(sinks, nuts2_id)
+    normalized_heat_profiles = load_heat_profiles(nuts0_id, nuts2_id)
+    heat_sources, heat_source_profiles = create_heat_source_profiles(heat_sources, normalized_heat_profiles)
+    heat_sinks, heat_sink_profiles = create_heat_sink_profiles(heat_sinks, normalized_heat_profiles)
+
+    return {"name": ",".join(nuts2_ids), "heat_sources": heat_sources, "heat_sinks": heat_sinks,
+            "heat_source_profiles": heat_source_profiles, "heat_sink_profiles": heat_sink_profiles,
+            "search_radius": search_radius, "investment_period": investment_period,
+            "transmission_line_threshold": transmission_line_threshold}
+
+
+def synthetic_fixture(name, number_of_sources, number_of_sinks, extent=None, number_of_hours=8760, seed=0,
+                      search_radius=20, investment_period=20, transmission_line_threshold=0.5):
+    """
+    function generating a random scenario as fixture of the comparisons. Sites are spread uniformly over a square
+    around SYNTHETIC_CENTER. The sources have a constant load on weekdays and a reduced one on weekends, the sinks a
+    seasonal heating load with a daily cycle. The annual heat of the sites is log-normally distributed around
+    SYNTHETIC_EXCESS_HEAT and SYNTHETIC_HEAT_DEMAND, which the profiles spread over the given hours.
+
+    :param name: name of the fixture in the report.
+    :type name: str.
+    :param number_of_sources: number of sources.
+    :type number_of_sources: int.
+    :param number_of_sinks: number of sinks.
+    :type number_of_sinks: int.
+    :param extent: edge length of the square in km. Defaults to SYNTHETIC_AREA_PER_SITE for every site.
+    :type extent: float or None.
+    :param number_of_hours: number of hours of the profiles, a multiple of 24.
+    :type number_of_hours: int.
+    :param seed: seed of the random numbers.
+    :type seed: int.
+    :param search_radius: maximum length of a single transmission line in km.
+    :type search_radius: float.
+    :param investment_period: investment period of the network in years.
+    :type investment_period: float.
+    :param transmission_line_threshold: maximum cost per flow of a single transmission line in ct/kWh.
+    :type transmission_line_threshold: float.
+    :return: fixture.
+    :rtype: dict.
+    """
+    import pandas as pd
+
+    if number_of_hours % 24 != 0:
+        raise ValueError("The number of hours must be a multiple of 24")
+    if extent is None:
+        extent = np.sqrt(SYNTHETIC_AREA_PER_SITE * (number_of_sources + number_of_sinks))
+    rng = np.random.default_rng(seed)
+    half_height = extent / 2 / (6371 * np.pi / 180)
+    half_width = half_height / np.cos(np.radians(SYNTHETIC_CENTER[1]))
+
+    def coordinates(number_of_sites):
+        return (SYNTHETIC_CENTER[0] + rng.uniform(-half_width, half_width, number_of_sites),
+                SYNTHETIC_CENTER[1] + rng.uniform(-half_height, half_height, number_of_sites))
+
+    lon, lat = coordinates(number_of_sources)
+    heat_sources = pd.DataFrame({"Lon": lon, "Lat": lat,
+                                 "Temperature": rng.choice(TEMPERATURE_BANDS, number_of_sources),
+                                 "Excess_heat": rng.lognormal(np.log(SYNTHETIC_EXCESS_HEAT), 1,
+                                                              number_of_sources)})
+    lon, lat = coordinates(number_of_sinks)
+    heat_sinks = pd.DataFrame({"Lon": lon, "Lat": lat, "Temperature": np.full(number_of_sinks, 100),
+                               "Heat_demand": rng.lognormal(np.log(SYNTHETIC_HEAT_DEMAND), 1, number_of_sinks),
+                               "id": np.arange(number_of_sinks)})
+
+    hours = np.arange(number_of_hours)
+    weekday = (hours // 24) % 7 < 5
+    source_profile = np.where(weekday, 1, 0.6) * (1 + 0.1 * rng.standard_normal(number_of_hours)).clip(0)
+    sink_profile = (1.2 + np.cos(2 * np.pi * hours / 8760)) * (1 - 0.3 * np.cos(2 * np.pi * hours / 24))
+    heat_source_profiles = np.outer(source_profile / np.sum(source_profile), heat_sources["Excess_heat"])
+    heat_sink_profiles = np.outer(sink_profile / np.sum(sink_profile), heat_sinks["Heat_demand"])
+
+    return {"name": name, "heat_sources": heat_sources, "heat_sinks": heat_sinks,
+            "heat_source_profiles": heat_source_profiles, "heat_sink_profiles": heat_sink_profiles,
+            "search_radius": search_radius, "investment_period": investment_period,
+            "transmission_line_threshold": transmission_line_threshold}
+
+
+def run_fixture(fixture, parameters=None):
+    """
+    function running the candidate edge search, network design and pruning of excess_heat() on a fixture.
+
+    :param fixture: fixture of region_fixture() or synthetic_fixture().
+    :type fixture: dict.
+    :param parameters: parameters which differ from EXACT_PARAMETERS.
+    :type parameters: dict or None.
+    :return: total cost, total flow and cost per flow, the keys of the transmission lines and the run time in s.
+    :rtype: dict.
+    """
+
+    parameters = dict(EXACT_PARAMETERS, **(parameters or {}))
+    unknown = set(parameters) - set(EXACT_PARAMETERS)
+    if unknown:
+        raise ValueError("Unknown parameters " + ", ".join(sorted(unknown)))
+    heat_sources, heat_sinks = fixture["heat_sources"], fixture["heat_sinks"]
+    heat_source_profiles = fixture["heat_source_profiles"].astype(parameters["float_dtype"])
+    heat_sink_profiles = fixture["heat_sink_profiles"].astype(parameters["float_dtype"])
+    search_radius = fixture["search_radius"]
+
+    start = time.perf_counter()
+    if parameters["candidate_edges"] == "delaunay":
+        neighbours = find_triangulation_neighbours(heat_sources, heat_sinks, search_radius)
+        neighbours = (neighbours[0:2], neighbours[2:4], neighbours[4:6])
+    else:
+        neighbours = (find_radius_neighbours(heat_sources, heat_sinks, search_radius),
+                      find_radius_neighbours(heat_sources, heat_sources, search_radius),
+                      find_radius_neighbours(heat_sinks, heat_sinks, search_radius))
+    network = design_network(neighbours[0], neighbours[1], neighbours[2], heat_sinks["id"], heat_source_profiles,
+                             heat_sink_profiles, fixture["investment_period"],
+                             fixture["transmission_line_threshold"], parameters["max_flow_backend"],
+                             parameters["design"], parameters["typical_periods"], parameters["time_limit"],
+                             parameters["mip_rel_gap"])
+    network, results = prune_network(network, heat_source_profiles, heat_sink_profiles,
+                                     fixture["investment_period"], fixture["transmission_line_threshold"],
+                                     parameters["design"], parameters["prescreen_edges"])
+    seconds = time.perf_counter() - start
+
+    total_cost, total_flow, cost_per_flow = (float(value) for value in results[-3:])
+    # as in the csv file of excess_heat()
+    if total_flow == 0:
+        cost_per_flow = 0 if total_cost == 0 else 100000
+
+    return {"total_cost": total_cost, "total_flow": total_flow, "cost_per_flow": cost_per_flow,
+            "edges": set(edge_key(edge) for edge in edge_coordinates(network, heat_sources, heat_sinks)),
+            "seconds": seconds}
+
+
+def relative_error(value, reference):
+    """
+    function returning the relative error of a value. Errors of a reference of 0 are relative to 1.
+
+    :param value: value.
+    :type value: float.
+    :param reference: reference value.
+    :type reference: float.
+    :return: relative error.
+    :rtype: float.
+    """
+
+    return abs(value - reference) / (abs(reference) if reference != 0 else 1)
+
+
+def jaccard_index(edges, reference_edges):
+    """
+    function returning the share of common edges in all edges of two edge sets. Two empty sets are equal.
+
+    :param edges: keys of the edges.
+    :type edges: set.
+    :param reference_edges: keys of the reference edges.
+    :type reference_edges: set.
+    :return: jaccard index between 0 and 1.
+    :rtype: float.
+    """
+
+    union = edges | reference_edges
+    return len(edges & reference_edges) / len(union) if union else 1.0
+
+
+def compare_results(result, reference, tolerances=None):
+    """
+    function comparing the result of a fast mode with the result of the exact pipeline. A reference without
+    transmission lines fails every comparison, equal empty networks do not show the accuracy of a mode.
+
+    :param result: result of run_fixture() of the fast mode.
+    :type result: dict.
+    :param reference: result of run_fixture() of the exact pipeline.
+    :type reference: dict.
+    :param tolerances: tolerances which differ from DEFAULT_TOLERANCES.
+    :type tolerances: dict or None.
+    :return: relative error of every total, jaccard index of the edge sets, number of missing and additional edges
+             and whether all tolerances are met.
+    :rtype: dict.
+    """
+
+    tolerances = dict(DEFAULT_TOLERANCES, **(tolerances or {}))
+    comparison = {}
+    passed = True
+    for name in RESULT_NAMES:
+        comparison[name + "_error"] = relative_error(result[name], reference[name])
+        passed = passed and comparison[name + "_error"] <= tolerances[name]
+    comparison["edges_jaccard"] = jaccard_index(result["edges"], reference["edges"])
+    comparison["missing_edges"] = len(reference["edges"] - result["edges"])
+    comparison["additional_edges"] = len(result["edges"] - reference["edges"])
+    comparison["passed"] = passed and comparison["edges_jaccard"] >= tolerances["edges"] and \
+        len(reference["edges"]) > 0
+
+    return comparison
+
+
+def accuracy_report(fixtures, modes=None, tolerances=None, repeats=1):
+    """
+    function running the exact pipeline and the fast modes on every fixture and comparing their results. The run
+    time of every run is the fastest of its repeats. Fixtures whose exact network has no transmission lines fail.
+
+    :param fixtures: fixtures of region_fixture() or synthetic_fixture().
+    :type fixtures: list of dict.
+    :param modes: parameters of the fast modes by name. Defaults to the DEFAULT_MODES of FAST_MODES.
+    :type modes: dict or None.
+    :param tolerances: tolerances which differ from DEFAULT_TOLERANCES.
+    :type tolerances: dict or None.
+    :param repeats: number of runs of every mode.
+    :type repeats: int.
+    :return: report, one row per fixture and mode, the exact pipeline first.
+    :rtype: pd.DataFrame.
+    """
+    import pandas as pd
+
+    if repeats < 1:
+        raise ValueError("At least one repeat is needed")
+    if modes is None:
+        modes = {mode: FAST_MODES[mode] for mode in DEFAULT_MODES}
+    rows = []
+    for fixture in fixtures:
+        reference = None
+        for mode, parameters in [("exact", {})] + list(modes.items()):
+            result = run_fixture(fixture, parameters)
+            for _ in range(repeats - 1):
+                result["seconds"] = min(result["seconds"], run_fixture(fixture, parameters)["seconds"])
+            if reference is None:
+                reference = result
+                if not reference["edges"]:
+                    logger.warning("the exact network of %s has no transmission lines, its comparisons fail",
+                                   fixture["name"])
+            row = {"fixture": fixture["name"], "mode": mode, "seconds": result["seconds"],
+                   "speedup": reference["seconds"] / result["seconds"] if result["seconds"] > 0 else np.inf}
+            row.update((name, result[name]) for name in RESULT_NAMES)
+            row["edges"] = len(result["edges"])
+            row.update(compare_results(result, reference, tolerances))
+            rows.append(row)
+            logger.info("%s %s: %.2f s, cost per flow %.4f ct/kWh, %s", fixture["name"], mode, result["seconds"],
+                        result["cost_per_flow"], "passed" if row["passed"] else "failed")
+
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    """
+    Entry point of the accuracy report, run with python -m excess_heat.accuracy.
+
+    :param argv: command line arguments without the program name. Defaults to sys.argv[1:].
+    :type argv: list of str or None.
+    :return: exit code, 1 if a fast mode exceeds a tolerance.
+    :rtype: int.
+    """
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(prog="python -m excess_heat.accuracy",
+                                     description="Compares the fast modes of excess_heat() with the exact pipeline.")
+    parser.add_argument("--sinks", default="data/district_heating_shp.shp",
+                        help="shp file of the coherent areas of the region fixture (default: %(default)s)")
+    parser.add_argument("--nuts2-id", default="DK05", help="comma separated NUTS2 ids of the region fixture, empty "
+                                                          "to skip it (default: %(default)s)")
+    parser.add_argument("--synthetic", type=int, nargs="*", default=[20], metavar="SOURCES",
+                        help="number of sources of the synthetic fixtures, each with three times as many sinks "
+                             "(default: %(default)s)")
+    parser.add_argument("--hours", type=int, default=8760, help="number of hours of the synthetic fixtures")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--modes", nargs="*", choices=sorted(FAST_MODES),
+                        help="fast modes (default: " + " ".join(DEFAULT_MODES) + ")")
+    parser.add_argument("--tolerance", action="append", default=[], metavar="NAME=VALUE",
+                        help="tolerance which differs from the default, one of " + ", ".join(DEFAULT_TOLERANCES))
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--output", help="csv file the report is written to")
+    parser.add_argument("-v", "--verbose", action="count", default=0)
+    arguments = parser.parse_args(argv)
+    logging.basicConfig(level=(logging.WARNING, logging.INFO, logging.DEBUG)[min(arguments.verbose, 2)],
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    tolerances = {}
+    for tolerance in arguments.tolerance:
+        name, _, value = tolerance.partition("=")
+        if name not in DEFAULT_TOLERANCES:
+            parser.error("unknown tolerance " + name)
+        tolerances[name] = float(value)
+    fixtures = []
+    if arguments.nuts2_id:
+        nuts2_id = arguments.nuts2_id.split(",") if "," in arguments.nuts2_id else arguments.nuts2_id
+        fixtures.append(region_fixture(arguments.sinks, nuts2_id))
+    for index, number_of_sources in enumerate(arguments.synthetic):
+        fixtures.append(synthetic_fixture("synthetic_" + str(number_of_sources), number_of_sources,
+                                          3 * number_of_sources, number_of_hours=arguments.hours,
+                                          seed=arguments.seed + index))
+    modes = None if arguments.modes is None else {mode: FAST_MODES[mode] for mode in arguments.modes}
+
+    report = accuracy_report(fixtures, modes, tolerances, arguments.repeats)
+    if arguments.output is not None:
+        report.to_csv(arguments.output, index=False)
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(report.drop(columns=["missing_edges", "additional_edges"]).to_string(index=False))
+
+    return 0 if report["passed"].all() else 1
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,265 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+
+# increase whenever a change of the computation or of the cached objects invalidates cached results
+CACHE_VERSION = 4
+# file extensions belonging to a shapefile
+SHAPEFILE_EXTENSIONS = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+
+
+def data_directory():
+    """
+    function returning the directory of the reference data of the package.
+
+    :return: path of the data directory.
+    :rtype: str.
+    """
+
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+def file_fingerprint(path, content=True):
+    """
+    function computing the fingerprint of a file. Shapefiles include their sidecar files.
+
+    :param path: path of the file.
+    :type path: str.
+    :param content: hashes the content of the file. Otherwise only name, size and modification time are used, which is
+                    much faster for large files that are replaced rather than edited.
+    :type content: bool.
+    :return: hexadecimal sha256 digest.
+    :rtype: str.
+    """
+
+    root, extension = os.path.splitext(path)
+    if extension.lower() == ".shp":
+        paths = [root + sidecar for sidecar in SHAPEFILE_EXTENSIONS]
+    else:
+        paths = [path]
+
+    digest = hashlib.sha256()
+    for path in paths:
+        if not os.path.isfile(path):
+            digest.update(b"missing")
+            continue
+        digest.update(os.path.basename(path).encode("utf-8"))
+        if content:
+            with open(path, "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(block)
+        else:
+            status = os.stat(path)
+            digest.update(str((status.st_size, status.st_mtime_ns)).encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+def run_fingerprint(input_files, parameters, reference_files=None):
+    """
+    function computing the content hash of a complete run.
+
+    :param input_files: files which are hashed by content.
+    :type input_files: list of str.
+    :param parameters: parameters of the run. Must be json serializable.
+    :type parameters: dict.
+    :param reference_files: files which are hashed by size and modification time. Defaults to all files in the data
+                            directory of the package.
+    :type reference_files: list of str or None.
+    :return: hexadecimal sha256 digest.
+    :rtype: str.
+    """
+
+    if reference_files is None:
+        reference_files = sorted(glob.glob(os.path.join(data_directory(), "*")))
+
+    digest = hashlib.sha256()
+    digest.update(str(CACHE_VERSION).encode("utf-8"))
+    digest.update(json.dumps(parameters, sort_keys=True, default=str).encode("utf-8"))
+    for path in input_files:
+        digest.update(file_fingerprint(path).encode("utf-8"))
+    for path in reference_files:
+        digest.update(file_fingerprint(path, content=False).encode("utf-8"))
+
+    return digest.hexdigest()
+
+
+def output_paths(output):
+    """
+    function returning all files and directories written for an output name, e.g. results.csv and the shapefile
+    directory results for the output name results.
+
+    :param output: output file name without extension.
+    :type output: str.
+    :return: existing paths belonging to the output.
+    :rtype: list of str.
+    """
+
+    directory, name = os.path.split(os.path.abspath(output))
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, entry) for entry in sorted(os.listdir(directory))
+            if entry == name or entry.startswith(name + ".")]
+
+
+def copy_output(source, target, old_name, new_name):
+    """
+    function copying an output file or directory, replacing an existing target. Files inside a directory, e.g. the
+    files of a shapefile written as directory, are renamed from old_name to new_name as well.
+
+    :param source: path to copy.
+    :type source: str.
+    :param target: destination path.
+    :type target: str.
+    :param old_name: output name used by the source.
+    :type old_name: str.
+    :param new_name: output name used by the target.
+    :type new_name: str.
+    :return:
+    """
+
+    if os.path.isdir(target):
+        shutil.rmtree(target)
+    if not os.path.isdir(source):
+        shutil.copy2(source, target)
+        return
+
+    os.makedirs(target)
+    for entry in os.listdir(source):
+        if entry == old_name or entry.startswith(old_name + "."):
+            renamed = new_name + entry[len(old_name):]
+        else:
+            renamed = entry
+        copy_output(os.path.join(source, entry), os.path.join(target, renamed), old_name, new_name)
+
+
+def path_size(path):
+    """
+    function returning the size of a file or directory in bytes.
+
+    :param path: path of the file or directory.
+    :type path: str.
+    :return: size in bytes.
+    :rtype: int.
+    """
+
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    size = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            size += os.path.getsize(os.path.join(root, file))
+    return size
+
+
+class ResultCache:
+    """
+    Local cache of complete results addressed by the content hash of their inputs. Every entry is a directory
+    containing the output files of one run. The least recently used entries are evicted once the cache exceeds its
+    number of entries or size.
+    """
+
+    def __init__(self, directory, max_entries=64, max_bytes=None):
+        """
+        Constructor of the cache.
+
+        :param directory: directory of the cache. It is created if it does not exist.
+        :type directory: str.
+        :param max_entries: maximum number of cached runs.
+        :type max_entries: int.
+        :param max_bytes: maximum size of the cache in bytes. None disables the limit.
+        :type max_bytes: int or None.
+        """
+
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def entry(self, key):
+        """
+        Method returning the directory of a cache entry.
+
+        :param key: content hash of the run.
+        :type key: str.
+        :return: path of the entry.
+        :rtype: str.
+        """
+
+        return os.path.join(self.directory, key)
+
+    def restore(self, key, output):
+        """
+        Method copying the cached output files of a run to the given output name.
+
+        :param key: content hash of the run.
+        :type key: str.
+        :param output: output file name without extension.
+        :type output: str.
+        :return: True if the run was cached.
+        :rtype: bool.
+        """
+
+        entry = self.entry(key)
+        if not os.path.isdir(entry):
+            return False
+
+        directory, name = os.path.split(os.path.abspath(output))
+        os.makedirs(directory, exist_ok=True)
+        for cached in sorted(os.listdir(entry)):
+            copy_output(os.path.join(entry, cached), os.path.join(directory, name + cached[len("output"):]), "output",
+                        name)
+        # mark entry as recently used
+        now = time.time()
+        os.utime(entry, (now, now))
+
+        return True
+
+    def store(self, key, output):
+        """
+        Method storing the output files of a run and evicting the least recently used entries.
+
+        :param key: content hash of the run.
+        :type key: str.
+        :param output: output file name without extension.
+        :type output: str.
+        :return:
+        """
+
+        name = os.path.basename(os.path.abspath(output))
+        # entries are written to a temporary directory first so concurrent readers never see partial entries
+        temporary = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+        try:
+            for path in output_paths(output):
+                copy_output(path, os.path.join(temporary, "output" + os.path.basename(path)[len(name):]), name,
+                            "output")
+            if os.path.isdir(self.entry(key)):
+                shutil.rmtree(temporary)
+            else:
+                os.rename(temporary, self.entry(key))
+        except OSError:
+            shutil.rmtree(temporary, ignore_errors=True)
+            raise
+
+        self.evict()
+
+    def evict(self):
+        """
+        Method removing the least recently used entries until the cache is within its limits.
+
+        :return:
+        """
+
+        entries = [self.entry(key) for key in os.listdir(self.directory) if not key.startswith(".tmp-")]
+        entries = sorted(entries, key=os.path.getmtime)
+        sizes = [path_size(entry) for entry in entries] if self.max_bytes is not None else [0] * len(entries)
+        total = sum(sizes)
+        while entries and (len(entries) > self.max_entries or
+                           (self.max_bytes is not None and total > self.max_bytes)):
+            shutil.rmtree(entries.pop(0), ignore_errors=True)
+            total -= sizes.pop(0)
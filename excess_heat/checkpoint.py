@@ -0,0 +1,195 @@
+import logging
+import os
+import pickle
+import tempfile
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# seconds between two progress reports within an iteration
+PROGRESS_INTERVAL = 1.0
+
+
+class RunCancelled(RuntimeError):
+    """
+    Exception raised when a run was cancelled. The last state of the run is checkpointed if a checkpoint directory is
+    set, hence the run can be resumed.
+    """
+
+
+class PruningMonitor:
+    """
+    Monitor of the pruning loop. It reports the progress of the hourly max flow computations, checks for cooperative
+    cancellation after every hour and periodically checkpoints the network, the current iteration and the hourly flows
+    computed so far, so an interrupted run can be resumed.
+    """
+
+    def __init__(self, directory=None, key="", interval=300.0, resume=False, progress=None, cancel=None):
+        """
+        Constructor of the monitor.
+
+        :param directory: directory of the checkpoints. It is created if it does not exist. None disables checkpoints.
+        :type directory: str or None.
+        :param key: fingerprint of the run. Checkpoints of other runs are never resumed.
+        :type key: str.
+        :param interval: seconds between two checkpoints within an iteration. Every iteration is checkpointed when it
+                         starts.
+        :type interval: float.
+        :param resume: resumes from the checkpoint of the run if it exists.
+        :type resume: bool.
+        :param progress: called with the iteration, the number of solved hours and the number of hours of the
+                         iteration.
+        :type progress: callable or None.
+        :param cancel: cancels the run once it is set. Either an object with an is_set() method like threading.Event
+                       or a callable returning True.
+        :type cancel: threading.Event, callable or None.
+
+        Attributes:
+            iteration: Current iteration of the pruning loop. Int.
+            network: Network of the current iteration. NetworkGraph.
+            last_flow: Total flow of the previous iteration. Float.
+        """
+
+        self.directory = directory
+        self.key = key
+        self.interval = interval
+        self.resume = resume
+        self.progress = progress
+        self.cancel = cancel
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+        self.iteration = 0
+        self.network = None
+        self.last_flow = 0
+        self.last_checkpoint = time.monotonic()
+        self.last_report = 0
+
+    def path(self):
+        """
+        Method returning the checkpoint file of the run.
+
+        :return: path of the checkpoint.
+        :rtype: str.
+        """
+
+        return os.path.join(self.directory, "checkpoint-" + self.key + ".pkl")
+
+    def load(self):
+        """
+        Method loading the checkpoint of the run if resuming is enabled.
+
+        :return: network, iteration, total flow of the previous iteration and hourly flows of the interrupted iteration
+                 or None if there is no checkpoint.
+        :rtype: dict or None.
+        """
+
+        if not self.resume or self.directory is None or not os.path.isfile(self.path()):
+            return None
+        try:
+            with open(self.path(), "rb") as file:
+                state = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as e:
+            logger.warning("discarding unreadable checkpoint %s: %s", self.path(), e)
+            return None
+        if state.get("key") != self.key:
+            return None
+        logger.info("resuming iteration %d after %d hours", state["iteration"], len(state["flows"][0]))
+        return state
+
+    def save(self, flows):
+        """
+        Method writing the checkpoint of the run.
+
+        :param flows: hourly source, sink and connection flows computed so far in the current iteration.
+        :type flows: tuple of lists.
+        :return:
+        """
+
+        self.last_checkpoint = time.monotonic()
+        if self.directory is None:
+            return
+        state = {"key": self.key, "network": self.network, "iteration": self.iteration, "last_flow": self.last_flow,
+                 "flows": flows}
+        # checkpoints are written to a temporary file first so an interruption never corrupts the last checkpoint
+        handle, temporary = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, self.path())
+        except OSError:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def clear(self):
+        """
+        Method removing the checkpoint of the run after it has finished.
+
+        :return:
+        """
+
+        if self.directory is not None and os.path.isfile(self.path()):
+            os.remove(self.path())
+
+    def cancelled(self):
+        """
+        Method returning whether the run was cancelled.
+
+        :return: True if the run was cancelled.
+        :rtype: bool.
+        """
+
+        if self.cancel is None:
+            return False
+        if hasattr(self.cancel, "is_set"):
+            return self.cancel.is_set()
+        return bool(self.cancel())
+
+    def start_iteration(self, network, iteration, last_flow, flows=None):
+        """
+        Method called at the start of every iteration of the pruning loop. It checkpoints the iteration.
+
+        :param network: network of the iteration.
+        :type network: NetworkGraph.
+        :param iteration: number of the iteration.
+        :type iteration: int.
+        :param last_flow: total flow of the previous iteration.
+        :type last_flow: float.
+        :param flows: hourly flows of a resumed iteration.
+        :type flows: tuple of lists or None.
+        :return:
+        """
+
+        self.network = network
+        self.iteration = iteration
+        self.last_flow = last_flow
+        if flows is None:
+            self.save(([], [], []))
+
+    def hour_solved(self, flows, number_of_hours):
+        """
+        Method called after the flow of every hour was computed. It reports the progress, checkpoints the flows if the
+        checkpoint interval has passed and raises RunCancelled if the run was cancelled.
+
+        :param flows: hourly source, sink and connection flows computed so far in the current iteration.
+        :type flows: tuple of lists.
+        :param number_of_hours: number of hours of the iteration.
+        :type number_of_hours: int.
+        :return:
+        """
+
+        hours = len(flows[0])
+        now = time.monotonic()
+        if hours == number_of_hours or now - self.last_report >= PROGRESS_INTERVAL:
+            self.last_report = now
+            logger.info("iteration %d: %d of %d hours solved", self.iteration, hours, number_of_hours)
+            if self.progress is not None:
+                self.progress(self.iteration, hours, number_of_hours)
+        if self.cancelled():
+            self.save(flows)
+            raise RunCancelled("run cancelled in iteration " + str(self.iteration) + " after " + str(hours) +
+                               " hours")
+        if now - self.last_checkpoint >= self.interval:
+            self.save(flows)
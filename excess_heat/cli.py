@@ -0,0 +1,182 @@
+import argparse
+import logging
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+
+# seconds the import of the main module may take, heavy dependencies are imported by the stages which need them
+IMPORT_TIME_BUDGET = 0.25
+# module measured against the import time budget
+MAIN_MODULE = "excess_heat.excess_heat"
+# exit code of cancelled runs, as for processes stopped by SIGINT
+EXIT_CANCELLED = 130
+
+
+def measure_import_time(module=MAIN_MODULE):
+    """
+    function measuring the import time of a module in a fresh interpreter with python -X importtime.
+
+    :param module: name of the module.
+    :type module: str.
+    :return: import time in seconds and the import time of the modules it imports directly, slowest first.
+    :rtype: tuple. (float, [(str, float), ...])
+    """
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    total = 0
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        level = (len(name) - len(name.lstrip())) // 2
+        if name.strip() == module:
+            total = int(cumulative) / 1e6
+        elif level == 1:
+            imports.append((name.strip(), int(cumulative) / 1e6))
+
+    return total, sorted(imports, key=lambda item: -item[1])
+
+
+def create_parser():
+    """
+    function creating the parser of the command line arguments, which mirror the parameters of excess_heat().
+
+    :return: argument parser.
+    :rtype: argparse.ArgumentParser.
+    """
+
+    parser = argparse.ArgumentParser(
+        prog="python -m excess_heat",
+        description="Computes the transmission network of industrial excess heat to district heating areas and its "
+                    "costs.")
+    parser.add_argument("sinks", nargs="?", help="shp file containing the coherent areas of the district heating "
+                                                 "potential CM")
+    parser.add_argument("nuts2_id", nargs="?", help="NUTS2 id of the region, e.g. DK05, or comma separated ids of "
+                                                    "several regions")
+    parser.add_argument("output", nargs="?", help="output file name without extension of the transmission lines and "
+                                                  "the csv file of the results")
+    parser.add_argument("--search-radius", type=float, default=20, help="maximum length of a single transmission "
+                                                                        "line in km (default: %(default)s)")
+    parser.add_argument("--investment-period", type=float, default=20, help="investment period of the network in "
+                                                                            "years (default: %(default)s)")
+    parser.add_argument("--threshold", type=float, default=0.5, dest="transmission_line_threshold",
+                        help="maximum cost per flow of a single transmission line in ct/kWh (default: %(default)s)")
+
+    parser.add_argument("--load-workers", type=int, help="number of input datasets loaded at the same time "
+                                                         "(default: one per dataset and cpu)")
+
+    parser.add_argument("--float-dtype", choices=("float64", "float32"), default="float64",
+                        help="float type of the heat values and hourly profiles, float32 halves their memory")
+
+    network = parser.add_argument_group("network design")
+    network.add_argument("--candidate-edges", choices=("radius", "delaunay"), default="radius")
+    network.add_argument("--design", choices=("heuristic", "lp"), default="heuristic")
+    network.add_argument("--typical-periods", type=int, help="number of typical days of the lp design")
+    # the defaults of excess_heat() apply if the limits of the lp design are not given
+    network.add_argument("--time-limit", type=float, default=argparse.SUPPRESS,
+                         help="time limit of the lp design in seconds, the best solution found so far is used "
+                              "(default: 120)")
+    network.add_argument("--mip-rel-gap", type=float, default=argparse.SUPPRESS,
+                         help="relative gap at which the lp design stops (default: 0.01)")
+    network.add_argument("--no-prescreen", action="store_false", dest="prescreen_edges",
+                         help="disables the pre-screening of the transmission lines by annual flow bounds")
+    network.add_argument("--warm-start", help="json file of a network state of a previous run")
+    network.add_argument("--save-state", help="json file the converged network state is saved to")
+
+    max_flow = parser.add_argument_group("max flow")
+    max_flow.add_argument("--max-flow-backend", choices=("auto", "igraph", "scipy", "numpy", "incremental"),
+                          default="igraph", help="\"incremental\" repairs the flows of the previous hour, an "
+                                                 "approximation with the same total flow but another split among the "
+                                                 "lines, \"auto\" never chooses it")
+    max_flow.add_argument("--isolate-max-flow", action="store_true",
+                          help="runs the max flow computations in recyclable worker processes")
+    max_flow.add_argument("--worker-max-calls", type=int, default=8760)
+    max_flow.add_argument("--worker-max-rss", type=float, help="resident set size of a worker in MB")
+
+    caching = parser.add_argument_group("caching and checkpoints")
+    caching.add_argument("--cache-dir", help="directory of the cache of complete results")
+    caching.add_argument("--cache-max-entries", type=int, default=64)
+    caching.add_argument("--stage-dir", help="directory of the cached results of the pipeline stages")
+    caching.add_argument("--checkpoint-dir", help="directory of the checkpoints of the pruning loop")
+    caching.add_argument("--checkpoint-interval", type=float, default=300)
+    caching.add_argument("--resume", action="store_true", help="resumes an interrupted run from its checkpoint")
+    caching.add_argument("--store", help="SQLite file the sources and profiles are read from and the results are "
+                                         "added to, a new file is filled with the reference data first")
+
+    output = parser.add_argument_group("output")
+    output.add_argument("--output-format", choices=("shp", "gpkg", "parquet"), default="shp")
+    output.add_argument("--export-flows", action="store_true", help="stores the hourly flows in output.flows")
+    output.add_argument("-v", "--verbose", action="count", default=0, help="logs progress, twice for debug output")
+    output.add_argument("--import-time", action="store_true",
+                        help="measures the import time of " + MAIN_MODULE + " against its budget of " +
+                             str(IMPORT_TIME_BUDGET) + " s and exits")
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Entry point of the command line interface.
+
+    :param argv: command line arguments without the program name. Defaults to sys.argv[1:].
+    :type argv: list of str or None.
+    :return: exit code.
+    :rtype: int.
+    """
+
+    parser = create_parser()
+    arguments = parser.parse_args(argv)
+    logging.basicConfig(level=(logging.WARNING, logging.INFO, logging.DEBUG)[min(arguments.verbose, 2)],
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if arguments.import_time:
+        total, imports = measure_import_time()
+        for name, seconds in imports[:10]:
+            print("{:>8.1f} ms  {}".format(seconds * 1000, name))
+        print("{:>8.1f} ms  {} (budget {:.1f} ms)".format(total * 1000, MAIN_MODULE, IMPORT_TIME_BUDGET * 1000))
+        return 0 if total <= IMPORT_TIME_BUDGET else 1
+    if arguments.sinks is None or arguments.nuts2_id is None or arguments.output is None:
+        parser.error("the arguments sinks, nuts2_id and output are required")
+
+    # the main module is imported after the arguments are checked, so --help and usage errors return immediately
+    from .excess_heat import excess_heat
+    from .checkpoint import RunCancelled
+
+    # the first interrupt cancels the run after its next hour, the second one stops immediately
+    cancel = threading.Event()
+
+    def interrupt(signum, frame):
+        if cancel.is_set():
+            raise KeyboardInterrupt
+        logging.getLogger(__name__).warning("cancelling run, interrupt again to stop immediately")
+        cancel.set()
+
+    previous_handler = None
+    if threading.current_thread() is threading.main_thread():
+        previous_handler = signal.signal(signal.SIGINT, interrupt)
+    parameters = vars(arguments).copy()
+    for name in ("sinks", "nuts2_id", "output", "search_radius", "investment_period", "transmission_line_threshold",
+                 "verbose", "import_time"):
+        del parameters[name]
+    nuts2_id = arguments.nuts2_id.split(",") if "," in arguments.nuts2_id else arguments.nuts2_id
+    start = time.time()
+    try:
+        cached = excess_heat(arguments.sinks, arguments.search_radius, arguments.investment_period,
+                             arguments.transmission_line_threshold, nuts2_id, arguments.output,
+                             cancel=cancel, **parameters)
+    except RunCancelled as e:
+        print(str(e), file=sys.stderr)
+        return EXIT_CANCELLED
+    finally:
+        if previous_handler is not None:
+            signal.signal(signal.SIGINT, previous_handler)
+
+    logging.getLogger(__name__).info("finished in %.1f s%s", time.time() - start, " from cache" if cached else "")
+    return 0
@@ -1,51 +1,272 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import numpy as np
-import pandas as pd
-from .read_data import ad_industrial_database_dict
-from .read_data import ad_TUW23
-from .read_data import ad_industry_profiles_dict
-from .read_data import ad_residential_heating_profile_dict
-from .read_data import ad_entry_points
-from .read_data import ad_industry_profiles_local, ad_residential_heating_profile_local, ad_industrial_database_local
-from .CM1 import find_neighbours, create_normalized_profiles, \
+# pandas, the readers of the input data and igraph are imported by the stages which need them, so short jobs like
+# cache hits do not pay for their import
+from .CM1 import find_neighbours, find_delaunay_neighbours, create_normalized_profiles, \
                 cost_of_connection, cost_of_heat_exchanger_source, cost_of_heat_exchanger_sink
 
-from .visualisation import create_transmission_line_shp
+from .visualisation import create_transmission_line_file
+
+from .isolation import IsolatedMaxFlowSolver
+from .optimisation import design_network_lp, LP_MIP_REL_GAP, LP_TIME_LIMIT
+from .cache import ResultCache, run_fingerprint
+from .pipeline import StageCache, input_fingerprint, reference_data_fingerprint, reference_fingerprint, \
+    stage_fingerprint
+from .checkpoint import PruningMonitor
+from .flow_store import FlowStoreWriter
+from .screening import active_hours, screen_edges
+from .warm_start import edge_coordinates, edge_key, load_network_state, save_network_state, warm_start_network
 
-from .graphs import NetworkGraph
 
+logger = logging.getLogger(__name__)
 
 np.seterr(divide='ignore', invalid='ignore')
 
+INDUSTRIAL_SUBSECTOR_MAP = {"Iron and steel": "iron_and_steel", "Refineries": "chemicals_and_petrochemicals",
+                            "Chemical industry": "chemicals_and_petrochemicals", "Cement": "non_metalic_minerals",
+                            "Glass": "non_metalic_minerals", "Non-metallic mineral products": "non_metalic_minerals",
+                            "Paper and printing": "paper", "Non-ferrous metals": "iron_and_steel",
+                            "Other non-classified": "food_and_tobacco"}
+# temperature of the transmission network in °C
+NETWORK_TEMPERATURE = 100
 
-def excess_heat(sinks, search_radius, investment_period,
-                transmission_line_threshold, nuts2_id, output_transmission_lines):
 
-    industrial_subsector_map = {"Iron and steel": "iron_and_steel", "Refineries": "chemicals_and_petrochemicals",
-                                "Chemical industry": "chemicals_and_petrochemicals", "Cement": "non_metalic_minerals",
-                                "Glass": "non_metalic_minerals",
-                                "Non-metallic mineral products": "non_metalic_minerals", "Paper and printing": "paper",
-                                "Non-ferrous metals": "iron_and_steel", "Other non-classified": "food_and_tobacco"}
+def compute_flow(network, heat_source_profiles, heat_sink_profiles, investment_period, isolated_solver=None,
+                 monitor=None, resume_flows=None, flow_writer=None):
+    """
+    Function computing the max flow of the network for every hour and the resulting costs.
+
+    :param network: network of which the flows are computed.
+    :type network: NetworkGraph.
+    :param heat_source_profiles: capacity of each source, one row per hour.
+    :type heat_source_profiles: np.array.
+    :param heat_sink_profiles: demand of each sink, one row per hour.
+    :type heat_sink_profiles: np.array.
+    :param investment_period: investment period of the network in years.
+    :type investment_period: float.
+    :param isolated_solver: solver running the max flow computations in worker processes. None computes them in this
+                            process.
+    :type isolated_solver: IsolatedMaxFlowSolver or None.
+    :param monitor: monitor reporting the progress, checkpointing the computed hours and checking for cancellation.
+    :type monitor: PruningMonitor or None.
+    :param resume_flows: hourly source, sink and connection flows of the first hours computed before an interruption.
+    :type resume_flows: tuple of lists or None.
+    :param flow_writer: writer storing the hourly flows while they are computed.
+    :type flow_writer: FlowStoreWriter or None.
+    :return: hourly flows of sources, sinks and connections, costs and lengths of the connections, cost per flow of
+             every connection, total cost, total flow and total cost per flow of the network.
+    :rtype: tuple.
+    """
+
+    source_flows, sink_flows, connection_flows = compute_hourly_flows(
+        network, heat_source_profiles, heat_sink_profiles, isolated_solver, monitor, resume_flows, flow_writer)
+
+    return (source_flows, sink_flows, connection_flows) + compute_costs(network, source_flows, sink_flows,
+                                                                        connection_flows, investment_period)
+
+
+def compute_hourly_flows(network, heat_source_profiles, heat_sink_profiles, isolated_solver=None, monitor=None,
+                         resume_flows=None, flow_writer=None):
+    """
+    Function computing the max flow of the network for every hour.
+
+    :param network: network of which the flows are computed.
+    :type network: NetworkGraph.
+    :param heat_source_profiles: capacity of each source, one row per hour.
+    :type heat_source_profiles: np.array.
+    :param heat_sink_profiles: demand of each sink, one row per hour.
+    :type heat_sink_profiles: np.array.
+    :param isolated_solver: solver running the max flow computations in worker processes. None computes them in this
+                            process.
+    :type isolated_solver: IsolatedMaxFlowSolver or None.
+    :param monitor: monitor reporting the progress, checkpointing the computed hours and checking for cancellation.
+    :type monitor: PruningMonitor or None.
+    :param resume_flows: hourly source, sink and connection flows of the first hours computed before an interruption.
+    :type resume_flows: tuple of lists or None.
+    :param flow_writer: writer storing the hourly flows while they are computed.
+    :type flow_writer: FlowStoreWriter or None.
+    :return: absolute flow of every source, sink and connection, one column per hour.
+    :rtype: tuple of np.array.
+    """
+
+    number_of_hours = min(len(heat_source_profiles), len(heat_sink_profiles))
+    active = np.zeros(number_of_hours, dtype=bool)
+    if number_of_hours > 0:
+        active = active_hours(network, heat_source_profiles[:number_of_hours], heat_sink_profiles[:number_of_hours])
+    source_flows = []
+    sink_flows = []
+    connection_flows = []
+    if resume_flows is not None:
+        source_flows, sink_flows, connection_flows = (list(flows) for flows in resume_flows)
+    hours = np.nonzero(active[len(source_flows):])[0] + len(source_flows)
+    if isolated_solver is None:
+        hourly_flows = (network.maximum_flow(heat_source_profiles[hour], heat_sink_profiles[hour]) for hour in hours)
+    else:
+        hourly_flows = isolated_solver.maximum_flows(network, heat_source_profiles[hours], heat_sink_profiles[hours])
+    hourly_flows = iter(hourly_flows)
+    # the maximum flow is zero in hours in which no component has both supply and demand
+    zero_flows = network.split_flow_solution(np.zeros(network.max_flow_graph.ecount()))
+    if flow_writer is not None:
+        flow_writer.start(number_of_hours, *(len(flows) for flows in zero_flows))
+        for flows in zip(source_flows, sink_flows, connection_flows):
+            flow_writer.append(*flows)
+
+    for is_active in active[len(source_flows):]:
+        source_flow, sink_flow, connection_flow = next(hourly_flows) if is_active else zero_flows
+        source_flows.append(source_flow)
+        sink_flows.append(sink_flow)
+        connection_flows.append(connection_flow)
+        if flow_writer is not None:
+            flow_writer.append(source_flow, sink_flow, connection_flow)
+        if monitor is not None:
+            monitor.hour_solved((source_flows, sink_flows, connection_flows), number_of_hours)
+
+    source_flows = np.abs(np.array(source_flows))
+    sink_flows = np.abs(np.array(sink_flows))
+    connection_flows = np.abs(np.array(connection_flows))
+    source_flows = source_flows.transpose()
+    sink_flows = sink_flows.transpose()
+    connection_flows = connection_flows.transpose()
 
-    nuts0_id = [nuts2_id[:2]]
+    return source_flows, sink_flows, connection_flows
+
+
+def compute_costs(network, source_flows, sink_flows, connection_flows, investment_period):
+    """
+    Function computing the costs of the heat exchangers and transmission lines of the network from its hourly flows.
+
+    :param network: network of the flows.
+    :type network: NetworkGraph.
+    :param source_flows: absolute flow of every source, one column per hour.
+    :type source_flows: np.array.
+    :param sink_flows: absolute flow of every sink, one column per hour.
+    :type sink_flows: np.array.
+    :param connection_flows: absolute flow of every connection, one column per hour.
+    :type connection_flows: np.array.
+    :param investment_period: investment period of the network in years.
+    :type investment_period: float.
+    :return: costs and lengths of the connections, cost per flow of every connection, total cost, total flow and
+             total cost per flow of the network.
+    :rtype: tuple.
+    """
+
+    # compute costs of every heat exchanger and transmission line
+    heat_exchanger_source_costs = []
+    for flow in source_flows:
+        heat_exchanger_source_costs.append(cost_of_heat_exchanger_source(flow))
+    heat_exchanger_sink_costs = []
+    for flow in sink_flows:
+        heat_exchanger_sink_costs.append(cost_of_heat_exchanger_sink(flow))
+    connection_lengths = network.get_edge_attribute("distance")
+    connection_costs = []
+    for flow, length in zip(connection_flows, connection_lengths):
+        connection_costs.append(cost_of_connection(length, flow))
+    cost_per_connection = np.array(connection_costs)/np.array(np.sum(connection_flows, axis=1)) / investment_period
+
+    # compute total costs and flow of network
+    heat_exchanger_source_cost_total = np.sum(heat_exchanger_source_costs)
+    heat_exchanger_sink_cost_total = np.sum(heat_exchanger_sink_costs)
+    connection_cost_total = np.sum(connection_costs)
+    # Euro
+    total_cost_scalar = (heat_exchanger_sink_cost_total + heat_exchanger_source_cost_total + connection_cost_total)
+    # GWh
+    total_flow_scalar = np.sum(source_flows)/1000
+
+    # ct/kWh
+    total_cost_per_flow = total_cost_scalar/total_flow_scalar/investment_period/1e6*1e2
+
+    return connection_costs, connection_lengths, cost_per_connection, total_cost_scalar, total_flow_scalar, total_cost_per_flow
+
+
+def load_heat_sources(nuts0_id, reference_data=None, float_dtype="float64"):
+    """
+    Stage loading the industrial heat sources of the countries and dropping all sources with unknown or invalid nuts
+    id.
+
+    :param nuts0_id: NUTS0 ids of the countries.
+    :type nuts0_id: list of str.
+    :param reference_data: resident reference data the sources are taken from instead of reading the csv file.
+    :type reference_data: ReferenceData or None.
+    :param float_dtype: float type of the excess heat.
+    :type float_dtype: str {"float64", "float32"}.
+    :return: heat sources.
+    :rtype: pd.DataFrame.
+    """
+    from .read_data import ad_industrial_database_local, compact_dtypes
 
-    # load heat source and heat sink data
     # heat_sources = ad_industrial_database_dict(sources)
-    heat_sources = ad_industrial_database_local(nuts0_id)
+    if reference_data is not None:
+        heat_sources = compact_dtypes(reference_data.industrial_database(nuts0_id), float_dtype)
+    else:
+        heat_sources = ad_industrial_database_local(nuts0_id, float_dtype)
+    heat_sources = heat_sources[heat_sources.Nuts0_ID != ""]
+    return heat_sources.dropna()
+
 
-    heat_sinks = ad_TUW23(sinks, nuts2_id)
+def load_heat_sinks(sinks, nuts2_id, float_dtype="float64"):
+    """
+    Stage loading the coherent areas of the district heating potential CM and the entry points of the region and
+    dropping all sinks with unknown or invalid nuts id.
+
+    :param sinks: shp file containing the coherent areas of the district heating potential CM.
+    :type sinks: str.
+    :param nuts2_id: NUTS2 id of the region or ids of several regions. Sinks are assigned to the regions by the NUTS
+                     boundary file of the data directory, which several regions require.
+    :type nuts2_id: str or list of str.
+    :param float_dtype: float type of the heat demand.
+    :type float_dtype: str {"float64", "float32"}.
+    :return: heat sinks.
+    :rtype: pd.DataFrame.
+    """
+    import pandas as pd
+    from .read_data import ad_TUW23, ad_entry_points, compact_dtypes
+
+    heat_sinks = ad_TUW23(sinks, nuts2_id, float_dtype)
     # escape main routine if dh_potential cm did not produce shp file
-    entry_points = ad_entry_points(nuts2_id)
+    entry_points = ad_entry_points(nuts2_id, float_dtype)
     if not isinstance(heat_sinks, pd.DataFrame):
         heat_sinks = entry_points
     else:
         heat_sinks = pd.concat([heat_sinks, entry_points], sort=True)
-    # load heating profiles for sources and sinks
+    heat_sinks = heat_sinks[heat_sinks.Nuts2_ID != ""]
+    # the concatenation turns categoricals with different categories and columns with missing values into objects
+    return compact_dtypes(heat_sinks.dropna(), float_dtype)
+
+
+def load_heat_profiles(nuts0_id, nuts2_id, reference_data=None, float_dtype="float64"):
+    """
+    Stage loading and normalizing the industry profiles of the countries and the residential heating profile of the
+    region.
+
+    :param nuts0_id: NUTS0 ids of the countries.
+    :type nuts0_id: list of str.
+    :param nuts2_id: NUTS2 id of the region or ids of several regions.
+    :type nuts2_id: str or list of str.
+    :param reference_data: resident reference data the profiles are taken from instead of reading the csv files.
+    :type reference_data: ReferenceData or None.
+    :param float_dtype: float type of the loads and the normalized profiles.
+    :type float_dtype: str {"float64", "float32"}.
+    :return: normalized profiles by process and nuts id.
+    :rtype: dict.
+    """
+    from .read_data import ad_industry_profiles_local, ad_residential_heating_profile_local, compact_dtypes
+
     # industry_profiles = ad_industry_profiles_dict(source_profiles)
     # residential_heating_profile = ad_residential_heating_profile_dict(sink_profiles)
-    industry_profiles = ad_industry_profiles_local(nuts0_id)
-    residential_heating_profile = ad_residential_heating_profile_local([nuts2_id])
+    nuts2_ids = [nuts2_id] if isinstance(nuts2_id, str) else list(nuts2_id)
+    if reference_data is not None:
+        industry_profiles = [compact_dtypes(profile, float_dtype)
+                             for profile in reference_data.industry_profiles(nuts0_id)]
+        residential_heating_profile = compact_dtypes(reference_data.residential_heating_profile(nuts2_ids),
+                                                     float_dtype)
+    else:
+        industry_profiles = ad_industry_profiles_local(nuts0_id, float_dtype)
+        residential_heating_profile = ad_residential_heating_profile_local(nuts2_ids, float_dtype)
 
-    # normalize loaded profiles
     normalized_heat_profiles = dict()
     normalized_heat_profiles["residential_heating"] = create_normalized_profiles(residential_heating_profile,
                                                                                  "NUTS2_code", "hour", "load")
@@ -53,146 +274,551 @@ def excess_heat(sinks, search_radius, investment_period,
         normalized_heat_profiles[industry_profile.iloc[1]["process"]] = \
             create_normalized_profiles(industry_profile, "NUTS0_code", "hour", "load")
 
-    # drop all sources with unknown or invalid nuts id
-    heat_sources = heat_sources[heat_sources.Nuts0_ID != ""]
-    heat_sources = heat_sources.dropna()
-    for sub_sector in industrial_subsector_map:
-            missing_profiles = list(set(heat_sources[heat_sources.Subsector == sub_sector]["Nuts0_ID"].unique()) -
-                                    set(normalized_heat_profiles[industrial_subsector_map[sub_sector]].keys()))
-            for missing_profile in missing_profiles:
-                heat_sources = heat_sources[((heat_sources.Nuts0_ID != missing_profile) |
-                                             (heat_sources.Subsector != sub_sector))]
-
-    # drop all sinks with unknown or invalid nuts id
-    heat_sinks = heat_sinks[heat_sinks.Nuts2_ID != ""]
-    heat_sinks = heat_sinks.dropna()
-    missing_profiles = list(set(heat_sinks["Nuts2_ID"].unique()) -
-                            set(normalized_heat_profiles["residential_heating"].keys()))
-    for missing_profile in missing_profiles:
-        heat_sinks = heat_sinks[heat_sinks.Nuts2_ID != missing_profile]
+    return normalized_heat_profiles
+
+
+def create_heat_source_profiles(heat_sources, normalized_heat_profiles):
+    """
+    Stage dropping all sources without profile and generating the hourly capacity of the remaining sources.
+
+    :param heat_sources: heat sources.
+    :type heat_sources: pd.DataFrame.
+    :param normalized_heat_profiles: normalized profiles by process and nuts id.
+    :type normalized_heat_profiles: dict.
+    :return: heat sources with profile and their capacity, one row per hour.
+    :rtype: tuple. (pd.DataFrame, np.array)
+    """
+
+    for sub_sector in INDUSTRIAL_SUBSECTOR_MAP:
+        missing_profiles = list(set(heat_sources[heat_sources.Subsector == sub_sector]["Nuts0_ID"].unique()) -
+                                set(normalized_heat_profiles[INDUSTRIAL_SUBSECTOR_MAP[sub_sector]].keys()))
+        for missing_profile in missing_profiles:
+            heat_sources = heat_sources[((heat_sources.Nuts0_ID != missing_profile) |
+                                         (heat_sources.Subsector != sub_sector))]
 
-    # generate profiles for all heat sources and store them in an array
     heat_source_profiles = []
-    heat_source_coordinates = []
     for _, heat_source in heat_sources.iterrows():
-        heat_source_profiles.append(normalized_heat_profiles[industrial_subsector_map[heat_source["Subsector"]]]
+        heat_source_profiles.append(normalized_heat_profiles[INDUSTRIAL_SUBSECTOR_MAP[heat_source["Subsector"]]]
                                     [heat_source["Nuts0_ID"]] * float(heat_source["Excess_heat"]))
-        heat_source_coordinates.append((heat_source["Lon"], heat_source["Lat"]))
     heat_source_profiles = np.array(heat_source_profiles)
-    heat_source_profiles = heat_source_profiles.transpose()
 
-    # generate profiles for all heat sinks and store them in an array
+    return heat_sources, heat_source_profiles.transpose()
+
+
+def create_heat_sink_profiles(heat_sinks, normalized_heat_profiles):
+    """
+    Stage dropping all sinks without profile and generating the hourly demand of the remaining sinks.
+
+    :param heat_sinks: heat sinks.
+    :type heat_sinks: pd.DataFrame.
+    :param normalized_heat_profiles: normalized profiles by process and nuts id.
+    :type normalized_heat_profiles: dict.
+    :return: heat sinks with profile and their demand, one row per hour.
+    :rtype: tuple. (pd.DataFrame, np.array)
+    """
+
+    missing_profiles = list(set(heat_sinks["Nuts2_ID"].unique()) -
+                            set(normalized_heat_profiles["residential_heating"].keys()))
+    for missing_profile in missing_profiles:
+        heat_sinks = heat_sinks[heat_sinks.Nuts2_ID != missing_profile]
+
     heat_sink_profiles = []
-    heat_sink_coordinates = []
     for _, heat_sink in heat_sinks.iterrows():
         heat_sink_profiles.append(normalized_heat_profiles["residential_heating"][heat_sink["Nuts2_ID"]] *
                                   heat_sink["Heat_demand"])
-        heat_sink_coordinates.append((heat_sink["Lon"], heat_sink["Lat"]))
     heat_sink_profiles = np.array(heat_sink_profiles)
-    heat_sink_profiles = heat_sink_profiles.transpose()
 
-    # find sites in search radius to build network graph
-    temperature = 100
-    source_sink_connections, source_sink_distances = find_neighbours(
-        heat_sources, heat_sinks, "Lon", "Lat", "Lon", "Lat", "Temperature", "Temperature", search_radius,
-        temperature, "true", "true", "true", small_angle_approximation=True)
-    source_source_connections, source_source_distances = find_neighbours(
-        heat_sources, heat_sources, "Lon", "Lat", "Lon", "Lat", "Temperature", "Temperature", search_radius,
-        temperature, "true", "true", "true", small_angle_approximation=True)
-    sink_sink_connections, sink_sink_distances = find_neighbours(
-        heat_sinks, heat_sinks, "Lon", "Lat", "Lon", "Lat", "Temperature", "Temperature", search_radius,
-        temperature, "true", "true", "true", small_angle_approximation=True)
+    return heat_sinks, heat_sink_profiles.transpose()
+
+
+def find_radius_neighbours(sites1, sites2, search_radius):
+    """
+    Stage finding all pairs of sites within the search radius.
+
+    :param sites1: first set of sites.
+    :type sites1: pd.DataFrame.
+    :param sites2: second set of sites.
+    :type sites2: pd.DataFrame.
+    :param search_radius: maximum length of a single transmission line in km.
+    :type search_radius: float.
+    :return: adjacency list and distances.
+    :rtype: tuple. ([], [])
+    """
+
+    return find_neighbours(sites1, sites2, "Lon", "Lat", "Lon", "Lat", "Temperature", "Temperature", search_radius,
+                           NETWORK_TEMPERATURE, "true", "true", "true", small_angle_approximation=True)
+
+
+def find_triangulation_neighbours(heat_sources, heat_sinks, search_radius):
+    """
+    Stage finding all edges of the Delaunay triangulation of sources and sinks within the search radius.
+
+    :param heat_sources: heat sources.
+    :type heat_sources: pd.DataFrame.
+    :param heat_sinks: heat sinks.
+    :type heat_sinks: pd.DataFrame.
+    :param search_radius: maximum length of a single transmission line in km.
+    :type search_radius: float.
+    :return: adjacency lists and distances of source sink, source source and sink sink connections.
+    :rtype: tuple. ([], [], [], [], [], [])
+    """
+
+    return find_delaunay_neighbours(heat_sources, heat_sinks, "Lon", "Lat", "Temperature", search_radius,
+                                    NETWORK_TEMPERATURE, "true", "true", "true", small_angle_approximation=True)
+
+
+def design_network(source_sink_neighbours, source_source_neighbours, sink_sink_neighbours, sink_ids,
+                   heat_source_profiles, heat_sink_profiles, investment_period, transmission_line_threshold,
+                   max_flow_backend, design, typical_periods, time_limit=LP_TIME_LIMIT, mip_rel_gap=LP_MIP_REL_GAP):
+    """
+    Stage building the network graph of the candidate edges and selecting the transmission lines, either as minimum
+    spanning tree or by the network design LP.
 
+    :param source_sink_neighbours: adjacency list and distances of the source sink connections.
+    :type source_sink_neighbours: tuple. ([], [])
+    :param source_source_neighbours: adjacency list and distances of the source source connections.
+    :type source_source_neighbours: tuple. ([], [])
+    :param sink_sink_neighbours: adjacency list and distances of the sink sink connections.
+    :type sink_sink_neighbours: tuple. ([], [])
+    :param sink_ids: correspondence of the sinks.
+    :type sink_ids: list.
+    :param heat_source_profiles: capacity of each source, one row per hour. Only used by the "lp" design.
+    :type heat_source_profiles: np.array.
+    :param heat_sink_profiles: demand of each sink, one row per hour. Only used by the "lp" design.
+    :type heat_sink_profiles: np.array.
+    :param investment_period: investment period of the network in years.
+    :type investment_period: float.
+    :param transmission_line_threshold: maximum cost per flow of a single transmission line in ct/kWh.
+    :type transmission_line_threshold: float.
+    :param max_flow_backend: backend of the hourly max flow computations.
+    :type max_flow_backend: str {"auto", "igraph", "scipy", "numpy", "incremental"}.
+    :param design: method selecting the transmission lines.
+    :type design: str {"heuristic", "lp"}.
+    :param typical_periods: number of typical days representing the year in the "lp" design.
+    :type typical_periods: int or None.
+    :param time_limit: time limit of the "lp" design in seconds. None solves without time limit.
+    :type time_limit: float or None.
+    :param mip_rel_gap: relative gap at which the "lp" design stops.
+    :type mip_rel_gap: float or None.
+    :return: network of the selected transmission lines.
+    :rtype: NetworkGraph.
+    """
+    from .graphs import NetworkGraph
+
+    source_sink_connections, source_sink_distances = source_sink_neighbours
+    source_source_connections, source_source_distances = source_source_neighbours
+    sink_sink_connections, sink_sink_distances = sink_sink_neighbours
     network = NetworkGraph(source_sink_connections, source_source_connections, sink_sink_connections,
-                           range(len(source_source_connections)), heat_sinks["id"])
+                           range(len(source_source_connections)), sink_ids, max_flow_backend=max_flow_backend)
     network.add_edge_attribute("distance", source_sink_distances, source_source_distances, sink_sink_distances)
-    # reduce to minimum spanning tree
-    network.reduce_to_minimum_spanning_tree("distance")
-
-    # compute max flow for every hour
-    def compute_flow(network, heat_source_profiles, heat_sink_profiles):
-        source_flows = []
-        sink_flows = []
-        connection_flows = []
-        for heat_source_capacities, heat_sink_capacities in zip(heat_source_profiles, heat_sink_profiles):
-            source_flow, sink_flow, connection_flow = network.maximum_flow(heat_source_capacities, heat_sink_capacities)
-            source_flows.append(source_flow)
-            sink_flows.append(sink_flow)
-            connection_flows.append(connection_flow)
-
-        source_flows = np.abs(np.array(source_flows))
-        sink_flows = np.abs(np.array(sink_flows))
-        connection_flows = np.abs(np.array(connection_flows))
-        source_flows = source_flows.transpose()
-        sink_flows = sink_flows.transpose()
-        connection_flows = connection_flows.transpose()
-
-        # compute costs of every heat exchanger and transmission line
-        heat_exchanger_source_costs = []
-        for flow in source_flows:
-            heat_exchanger_source_costs.append(cost_of_heat_exchanger_source(flow))
-        heat_exchanger_sink_costs = []
-        for flow in sink_flows:
-            heat_exchanger_sink_costs.append(cost_of_heat_exchanger_sink(flow))
-        connection_lengths = network.get_edge_attribute("distance")
-        connection_costs = []
-        for flow, length in zip(connection_flows, connection_lengths):
-            connection_costs.append(cost_of_connection(length, flow))
-        cost_per_connection = np.array(connection_costs)/np.array(np.sum(connection_flows, axis=1)) / investment_period
-
-        # compute total costs and flow of network
-        heat_exchanger_source_cost_total = np.sum(heat_exchanger_source_costs)
-        heat_exchanger_sink_cost_total = np.sum(heat_exchanger_sink_costs)
-        connection_cost_total = np.sum(connection_costs)
-        # Euro
-        total_cost_scalar = (heat_exchanger_sink_cost_total + heat_exchanger_source_cost_total + connection_cost_total)
-        # GWh
-        total_flow_scalar = np.sum(source_flows)/1000
-
-        # ct/kWh
-        total_cost_per_flow = total_cost_scalar/total_flow_scalar/investment_period/1e6*1e2
-
-        return source_flows, sink_flows, connection_flows, connection_costs, connection_lengths, cost_per_connection, total_cost_scalar, total_flow_scalar, total_cost_per_flow
-
-
-    source_flows, sink_flows, connection_flows, connection_costs, connection_lengths, cost_per_connection,\
-    total_cost_scalar, total_flow_scalar, total_cost_per_flow = compute_flow(network, heat_source_profiles, heat_sink_profiles)
-    last_flows = [0]
-    while np.sum(source_flows) != np.sum(last_flows):
-        last_flows = source_flows
+    if design == "lp":
+        # select the transmission lines in a single optimisation instead of pruning the minimum spanning tree
+        network.select_edges(design_network_lp(network, heat_source_profiles, heat_sink_profiles, investment_period,
+                                               transmission_line_threshold, typical_periods, time_limit=time_limit,
+                                               mip_rel_gap=mip_rel_gap))
+    else:
+        # reduce to minimum spanning tree
+        network.reduce_to_minimum_spanning_tree("distance")
+
+    return network
+
+
+def prune_network(network, heat_source_profiles, heat_sink_profiles, investment_period, transmission_line_threshold,
+                  design, prescreen_edges=True, isolated_solver=None, monitor=None, flow_writer=None):
+    """
+    Stage removing transmission lines without flow or above the threshold cost per flow until the flows converge.
+
+    :param network: network of the selected transmission lines. It is pruned in place.
+    :type network: NetworkGraph.
+    :param heat_source_profiles: capacity of each source, one row per hour.
+    :type heat_source_profiles: np.array.
+    :param heat_sink_profiles: demand of each sink, one row per hour.
+    :type heat_sink_profiles: np.array.
+    :param investment_period: investment period of the network in years.
+    :type investment_period: float.
+    :param transmission_line_threshold: maximum cost per flow of a single transmission line in ct/kWh.
+    :type transmission_line_threshold: float.
+    :param design: method which selected the transmission lines. The selection of the "lp" design is only cleared of
+                   lines without flow.
+    :type design: str {"heuristic", "lp"}.
+    :param prescreen_edges: removes the edges which are uneconomic by their annual flow bound before the first max
+                            flow computation. Not applied to the "lp" design.
+    :type prescreen_edges: bool.
+    :param isolated_solver: solver running the max flow computations in worker processes.
+    :type isolated_solver: IsolatedMaxFlowSolver or None.
+    :param monitor: monitor reporting the progress, checkpointing every iteration and checking for cancellation. A
+                    checkpoint of the run is resumed.
+    :type monitor: PruningMonitor or None.
+    :param flow_writer: writer storing the hourly flows of every iteration while they are computed.
+    :type flow_writer: FlowStoreWriter or None.
+    :return: pruned network and the results of compute_flow() for it.
+    :rtype: tuple. (NetworkGraph, tuple)
+    """
+
+    if prescreen_edges and design != "lp":
+        screen_edges(network, heat_source_profiles, heat_sink_profiles, investment_period,
+                     transmission_line_threshold)
+    iteration = 0
+    last_flow = 0
+    resume_flows = None
+    state = monitor.load() if monitor is not None else None
+    if state is not None:
+        network, iteration, last_flow, resume_flows = (state["network"], state["iteration"], state["last_flow"],
+                                                       state["flows"])
+
+    while True:
+        if monitor is not None:
+            monitor.start_iteration(network, iteration, last_flow, resume_flows)
+        results = compute_flow(network, heat_source_profiles, heat_sink_profiles, investment_period, isolated_solver,
+                               monitor, resume_flows, flow_writer)
+        resume_flows = None
+        source_flow, connection_costs, cost_per_connection = np.sum(results[0]), results[3], results[5]
+        if design == "lp":
+            # only drop lines without flow once, the selection of the optimisation is final
+            if iteration > 0 or not np.any(np.array(connection_costs) < 0):
+                break
+            network.select_edges(np.nonzero(np.array(connection_costs) >= 0)[0])
+            iteration += 1
+            continue
+        if source_flow == last_flow:
+            break
+
         # drop egdes with 0 flow and above threshold
-        edges = network.return_edge_source_target_vertices()
-        for costs, edge in zip(cost_per_connection, edges):
-            if costs < 0:
-                network.delete_edges([edge])
-        for costs, edge in zip(cost_per_connection, edges):
-            if costs > transmission_line_threshold:
-                network.delete_edges([edge])
-        source_flows, sink_flows, connection_flows, connection_costs, connection_lengths, cost_per_connection,\
-        total_cost_scalar, total_flow_scalar, total_cost_per_flow = compute_flow(network, heat_source_profiles, heat_sink_profiles)
-
-    coordiantes = []
-    for edge in network.return_edge_source_target_vertices():
-        coordiantes_of_line = []
-        for point in edge:
-            if point[0] == "source":
-                coordiantes_of_line.append((heat_sources.iloc[point[1]]["Lon"], heat_sources.iloc[point[1]]["Lat"]))
-            else:
-                coordiantes_of_line.append((heat_sinks.iloc[point[1]]["Lon"], heat_sinks.iloc[point[1]]["Lat"]))
-
-        coordiantes.append(coordiantes_of_line)
-
-    temp = len(cost_per_connection) * [100]
-
-    create_transmission_line_shp(coordiantes, np.array(np.sum(connection_flows, axis=1)),  temp, connection_costs, connection_lengths,
-                                 output_transmission_lines)
+        cost_per_connection = np.asarray(cost_per_connection)
+        network.select_edges(np.nonzero(~((cost_per_connection < 0) |
+                                          (cost_per_connection > transmission_line_threshold)))[0])
+        last_flow = source_flow
+        iteration += 1
+
+    return network, results
+
+
+def write_results(network, results, heat_sources, heat_sinks, output_transmission_lines, output_format="shp",
+                  flow_writer=None, store=None, run_parameters=None, nuts2_ids=None):
+    """
+    Function writing the transmission lines of a network and the csv file of its total cost and flow, and adding
+    them to a store.
+
+    :param network: pruned network.
+    :type network: NetworkGraph.
+    :param results: results of compute_flow() for the network.
+    :type results: tuple.
+    :param heat_sources: heat sources of the network.
+    :type heat_sources: pd.DataFrame.
+    :param heat_sinks: heat sinks of the network.
+    :type heat_sinks: pd.DataFrame.
+    :param output_transmission_lines: output file name without extension of the transmission lines and csv file.
+    :type output_transmission_lines: str.
+    :param output_format: format of the transmission lines.
+    :type output_format: str {"shp", "gpkg", "parquet"}.
+    :param flow_writer: writer of the hourly flows streamed by prune_network(), which is committed with the
+                        coordinates of the lines.
+    :type flow_writer: FlowStoreWriter or None.
+    :param store: store the results are added to as a new run.
+    :type store: SqliteStore or None.
+    :param run_parameters: parameters of the run stored with its results.
+    :type run_parameters: dict or None.
+    :param nuts2_ids: NUTS2 ids of the regions of the run.
+    :type nuts2_ids: list of str or None.
+    :return:
+    """
+
+    source_flows, sink_flows, connection_flows, connection_costs, connection_lengths, cost_per_connection, \
+        total_cost_scalar, total_flow_scalar, total_cost_per_flow = results
+
+    coordinates = network.return_edge_coordinates(heat_sources[["Lon", "Lat"]].to_numpy(dtype=float),
+                                                  heat_sinks[["Lon", "Lat"]].to_numpy(dtype=float))
+    temp = len(cost_per_connection) * [NETWORK_TEMPERATURE]
+
+    if flow_writer is not None:
+        flow_writer.commit({"lines": coordinates.tolist(), "signed_connection_flows": True})
+
+    create_transmission_line_file(coordinates, np.array(np.sum(connection_flows, axis=1)), temp, connection_costs,
+                                  connection_lengths, output_transmission_lines, output_format)
 
     if total_flow_scalar == 0 and total_cost_scalar == 0:
         total_cost_per_flow = 0
     else:
         if total_flow_scalar == 0:
             total_cost_per_flow = 100000
+    import pandas as pd
     data = np.array([total_cost_scalar, total_flow_scalar, total_cost_per_flow])
     results = pd.DataFrame(columns=["Total cost of network in €", "Total annual flow of network in GWh", "Cost per flow in investment period in ct/kWh"])
     results.loc[data.shape[0]] = data
     results.to_csv(output_transmission_lines + ".csv", index=False)
+
+    if store is not None:
+        store.add_run(run_parameters or {}, nuts2_ids or [], coordinates, np.sum(connection_flows, axis=1), temp,
+                      connection_costs, connection_lengths, *data)
+
+
+def excess_heat(sinks, search_radius, investment_period,
+                transmission_line_threshold, nuts2_id, output_transmission_lines, max_flow_backend="igraph",
+                isolate_max_flow=False, worker_max_calls=8760, worker_max_rss=None, candidate_edges="radius",
+                design="heuristic", typical_periods=None, cache_dir=None, cache_max_entries=64, stage_dir=None,
+                warm_start=None, save_state=None, prescreen_edges=True, checkpoint_dir=None, checkpoint_interval=300,
+                resume=False, progress=None, cancel=None, output_format="shp", export_flows=False,
+                reference_data=None, load_workers=None, float_dtype="float64", store=None, time_limit=LP_TIME_LIMIT,
+                mip_rel_gap=LP_MIP_REL_GAP):
+    """
+    Main routine computing the transmission network of industrial excess heat to district heating areas and its costs.
+
+    :param sinks: shp file containing the coherent areas of the district heating potential CM.
+    :type sinks: str.
+    :param search_radius: maximum length of a single transmission line in km.
+    :type search_radius: float.
+    :param investment_period: investment period of the network in years.
+    :type investment_period: float.
+    :param transmission_line_threshold: maximum cost per flow of a single transmission line in ct/kWh.
+    :type transmission_line_threshold: float.
+    :param nuts2_id: NUTS2 id of the region or ids of several regions, which require the NUTS boundary file
+                     NUTS_RG_01M_2021_4326_LEVL_2.shp in the data directory.
+    :type nuts2_id: str or list of str.
+    :param output_transmission_lines: output file name without extension of the shp and csv file.
+    :type output_transmission_lines: str.
+    :param max_flow_backend: backend of the hourly max flow computations.
+    :type max_flow_backend: str {"auto", "igraph", "scipy", "numpy", "incremental"}.
+    :param isolate_max_flow: runs the max flow computations in recyclable worker processes to bound the memory of
+                             long runs despite the memory leak of igraph's maxflow.
+    :type isolate_max_flow: bool.
+    :param worker_max_calls: number of max flow computations after which a worker process is replaced.
+    :type worker_max_calls: int.
+    :param worker_max_rss: resident set size in MB after which a worker process is replaced.
+    :type worker_max_rss: float or None.
+    :param candidate_edges: edges the minimum spanning tree is selected from. "radius" connects all sites within the
+                            search radius, "delaunay" only the edges of the Delaunay triangulation within the search
+                            radius, which yields the same minimum spanning tree with far less edges.
+    :type candidate_edges: str {"radius", "delaunay"}.
+    :param design: method selecting the transmission lines. "heuristic" prunes the minimum spanning tree by repeated
+                   hourly max flow simulations, "lp" selects them from all candidate edges in a single time coupled
+                   mixed integer linear program.
+    :type design: str {"heuristic", "lp"}.
+    :param typical_periods: number of typical days representing the year in the "lp" design. None uses every hour.
+    :type typical_periods: int or None.
+    :param cache_dir: directory of a cache of complete results. Runs with identical inputs and parameters are copied
+                      from the cache instead of being recomputed. Runs with save_state or store are always computed.
+                      None disables the cache.
+    :type cache_dir: str or None.
+    :param cache_max_entries: number of runs kept in the cache. The least recently used runs are evicted.
+    :type cache_max_entries: int.
+    :param stage_dir: directory of the cached intermediate results of the pipeline stages. Only the stages downstream
+                      of a changed input or parameter are executed again, e.g. a changed sink shapefile reuses the
+                      sources, profiles and source source connections. None executes every stage.
+    :type stage_dir: str or None.
+    :param warm_start: json file of a network state saved by a previous run with the same parameters. The edges pruned
+                       in that run are removed before pruning, so small changes of the inputs converge in a few
+                       iterations. Edges of new sites are kept. A state which does not match the run is ignored.
+    :type warm_start: str or None.
+    :param save_state: json file the converged network state is saved to for warm starts of later runs.
+    :type save_state: str or None.
+    :param prescreen_edges: removes the transmission lines which exceed the threshold even with the cheapest pipe and
+                            the largest annual flow they could carry before the first hourly max flow computation.
+    :type prescreen_edges: bool.
+    :param checkpoint_dir: directory of the checkpoints of the pruning loop. The network, the current iteration and
+                           the hourly flows computed so far are saved at the start of every iteration, every
+                           checkpoint_interval seconds and on cancellation. None disables checkpoints.
+    :type checkpoint_dir: str or None.
+    :param checkpoint_interval: seconds between two checkpoints within an iteration.
+    :type checkpoint_interval: float.
+    :param resume: resumes an interrupted run with the same inputs and parameters from its checkpoint.
+    :type resume: bool.
+    :param progress: called with the iteration of the pruning loop, the number of solved hours and the number of
+                     hours of the iteration. The progress is logged as well.
+    :type progress: callable or None.
+    :param cancel: cancels the run once it is set, either an object with an is_set() method like threading.Event or a
+                   callable returning True. A cancelled run raises RunCancelled after its last checkpoint.
+    :type cancel: threading.Event, callable or None.
+    :param output_format: format of the transmission lines. "shp" writes a shapefile with text fields, "gpkg" a
+                          GeoPackage and "parquet" a GeoParquet file with numeric fields. The GeoParquet output
+                          requires pyarrow.
+    :type output_format: str {"shp", "gpkg", "parquet"}.
+    :param export_flows: streams the hourly flows of sources, sinks and transmission lines to a chunked store in the
+                         directory output_transmission_lines.flows while they are computed. Use FlowStore to read it.
+                         The flows are then always computed, even if the stage cache holds them.
+    :type export_flows: bool.
+    :param reference_data: reference data kept in memory by a long running process, e.g. the worker service. The
+                           industrial database and the profiles are taken from it instead of being read from the data
+                           directory. None reads them for every run.
+    :type reference_data: ReferenceData or None.
+    :param load_workers: number of input datasets loaded at the same time. The sources, the sinks and the profiles
+                         are loaded in separate processes, or in threads if reference_data is given. 1 loads them one
+                         after another. None uses up to one worker per dataset and cpu.
+    :type load_workers: int or None.
+    :param float_dtype: float type of the loaded heat values and profiles and of the hourly capacities and demands
+                        computed from them. "float32" halves their memory at the cost of precision.
+    :type float_dtype: str {"float64", "float32"}.
+    :param store: SQLite store or the path of its file. The heat sources and profiles are read from the store unless
+                  reference_data is given, and the results are added to it as a new run. A new file is filled with
+                  the reference data first.
+    :type store: SqliteStore or str or None.
+    :param time_limit: time limit of the "lp" design in seconds, including the setup of its model. Once it is hit
+                       the best solution found so far is used, or the linear relaxation if there is none, or the
+                       minimum spanning tree if the relaxation is not solved in time either. None solves without time
+                       limit.
+    :type time_limit: float or None.
+    :param mip_rel_gap: relative gap between the objective and its bound at which the "lp" design stops.
+    :type mip_rel_gap: float or None.
+    :return: True if the results were taken from the cache.
+    :rtype: bool.
+    """
+
+    # parameters which do not change the results are not part of the key
+    run_parameters = {"function": "excess_heat", "search_radius": search_radius,
+                      "investment_period": investment_period,
+                      "transmission_line_threshold": transmission_line_threshold, "nuts2_id": nuts2_id,
+                      "max_flow_backend": max_flow_backend, "candidate_edges": candidate_edges, "design": design,
+                      "typical_periods": typical_periods, "prescreen_edges": prescreen_edges,
+                      "output_format": output_format, "export_flows": export_flows, "float_dtype": float_dtype}
+    if design == "lp":
+        run_parameters.update({"time_limit": time_limit, "mip_rel_gap": mip_rel_gap})
+    cache = None
+    if cache_dir is not None and (save_state is not None or store is not None):
+        # a cached run neither saves the network state nor adds the run to the store
+        logger.info("result cache bypassed as the run saves its network state or adds it to a store")
+    elif cache_dir is not None:
+        cache = ResultCache(cache_dir, max_entries=cache_max_entries)
+        input_files = [sinks] + ([warm_start] if warm_start is not None else [])
+        key_parameters = run_parameters
+        if reference_data is not None:
+            # resident reference data may differ from the reference files of the data directory
+            key_parameters = dict(run_parameters, reference_data=reference_data_fingerprint(reference_data))
+        cache_key = run_fingerprint(input_files, key_parameters)
+        if cache.restore(cache_key, output_transmission_lines):
+            return True
+
+    owned_store = None
+    if isinstance(store, str):
+        from .store import SqliteStore
+        store = owned_store = SqliteStore(store)
+    if store is not None and reference_data is None:
+        reference_data = store
+
+    stages = StageCache(stage_dir)
+    nuts2_ids = [nuts2_id] if isinstance(nuts2_id, str) else list(nuts2_id)
+    nuts0_id = sorted(set(region[:2] for region in nuts2_ids))
+
+    # load heat source and heat sink data and the heating profiles for sources and sinks at the same time, in
+    # processes as their parsing is bound by the GIL
+    if load_workers is None:
+        load_workers = min(3, os.cpu_count() or 1)
+    load_executor = None
+    if load_workers > 1 and reference_data is not None:
+        # the resident reference data is shared with threads instead of being copied to processes
+        load_executor = ThreadPoolExecutor(max_workers=load_workers)
+    elif load_workers > 1:
+        # the workers inherit pandas instead of importing it themselves
+        from . import read_data
+        start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        load_executor = ProcessPoolExecutor(max_workers=load_workers,
+                                            mp_context=multiprocessing.get_context(start_method))
+    # reference data kept in memory or in a store may differ from the reference files of the data directory
+    reference_data_keys = [reference_data_fingerprint(reference_data)] if reference_data is not None else []
+    try:
+        (heat_sources, sources_key), (heat_sinks, sinks_key), (normalized_heat_profiles, profiles_key) = \
+            stages.run_concurrently([
+                ("heat_sources", {"nuts0_id": nuts0_id, "float_dtype": float_dtype},
+                 [reference_fingerprint("Industrial_Database.csv")] + reference_data_keys, load_heat_sources,
+                 nuts0_id, reference_data, float_dtype),
+                ("heat_sinks", {"nuts2_id": nuts2_id, "float_dtype": float_dtype},
+                 [input_fingerprint([sinks]), reference_fingerprint("entry_points.csv"),
+                  reference_fingerprint("NUTS_RG_01M_2021_4326_LEVL_2.*")], load_heat_sinks, sinks,
+                 nuts2_id, float_dtype),
+                ("heat_profiles", {"nuts0_id": nuts0_id, "nuts2_id": nuts2_id, "float_dtype": float_dtype},
+                 [reference_fingerprint("hotmaps_task_2.7_load_profile_*.csv")] + reference_data_keys,
+                 load_heat_profiles, nuts0_id, nuts2_id, reference_data, float_dtype)], load_executor)
+    finally:
+        if load_executor is not None:
+            load_executor.shutdown()
+
+    # generate profiles for all heat sources and sinks and store them in an array
+    (heat_sources, heat_source_profiles), sources_key = stages.run(
+        "heat_source_profiles", {}, [sources_key, profiles_key], create_heat_source_profiles, heat_sources,
+        normalized_heat_profiles)
+    (heat_sinks, heat_sink_profiles), sinks_key = stages.run(
+        "heat_sink_profiles", {}, [sinks_key, profiles_key], create_heat_sink_profiles, heat_sinks,
+        normalized_heat_profiles)
+
+    # find sites in search radius to build network graph
+    if candidate_edges == "delaunay":
+        neighbours, neighbours_key = stages.run(
+            "delaunay_neighbours", {"search_radius": search_radius}, [sources_key, sinks_key],
+            find_triangulation_neighbours, heat_sources, heat_sinks, search_radius)
+        neighbours = (neighbours[0:2], neighbours[2:4], neighbours[4:6])
+        neighbours_keys = [neighbours_key]
+    else:
+        # the source source connections do not depend on the sinks and are reused if only the sinks change
+        source_sink_neighbours, source_sink_key = stages.run(
+            "source_sink_neighbours", {"search_radius": search_radius}, [sources_key, sinks_key],
+            find_radius_neighbours, heat_sources, heat_sinks, search_radius)
+        source_source_neighbours, source_source_key = stages.run(
+            "source_source_neighbours", {"search_radius": search_radius}, [sources_key],
+            find_radius_neighbours, heat_sources, heat_sources, search_radius)
+        sink_sink_neighbours, sink_sink_key = stages.run(
+            "sink_sink_neighbours", {"search_radius": search_radius}, [sinks_key],
+            find_radius_neighbours, heat_sinks, heat_sinks, search_radius)
+        neighbours = (source_sink_neighbours, source_source_neighbours, sink_sink_neighbours)
+        neighbours_keys = [source_sink_key, source_source_key, sink_sink_key]
+
+    design_parameters = {"max_flow_backend": max_flow_backend, "design": design}
+    if design == "lp":
+        design_parameters.update({"investment_period": investment_period, "typical_periods": typical_periods,
+                                  "transmission_line_threshold": transmission_line_threshold,
+                                  "time_limit": time_limit, "mip_rel_gap": mip_rel_gap})
+    network, network_key = stages.run(
+        "network", design_parameters, neighbours_keys + [sources_key, sinks_key], design_network,
+        neighbours[0], neighbours[1], neighbours[2], heat_sinks["id"], heat_source_profiles, heat_sink_profiles,
+        investment_period, transmission_line_threshold, max_flow_backend, design, typical_periods, time_limit,
+        mip_rel_gap)
+
+    state_parameters = {"search_radius": search_radius, "investment_period": investment_period,
+                        "transmission_line_threshold": transmission_line_threshold, "nuts2_id": nuts2_id,
+                        "candidate_edges": candidate_edges, "design": design, "typical_periods": typical_periods}
+    candidate_lines = edge_coordinates(network, heat_sources, heat_sinks) if save_state is not None else []
+    warm_start_keys = []
+    if warm_start is not None and warm_start_network(network, load_network_state(warm_start), heat_sources,
+                                                     heat_sinks, state_parameters):
+        warm_start_keys = [input_fingerprint([warm_start])]
+
+    isolated_solver = None
+    if isolate_max_flow:
+        isolated_solver = IsolatedMaxFlowSolver(max_flow_backend, max_calls=worker_max_calls, max_rss=worker_max_rss)
+
+    flows_parameters = {"investment_period": investment_period,
+                        "transmission_line_threshold": transmission_line_threshold, "design": design,
+                        "prescreen_edges": prescreen_edges}
+    flows_inputs = [network_key, sources_key, sinks_key] + warm_start_keys
+    # checkpoints are identified by the fingerprint of the flows stage
+    monitor = PruningMonitor(checkpoint_dir, stage_fingerprint("flows", flows_parameters, flows_inputs),
+                             interval=checkpoint_interval, resume=resume, progress=progress, cancel=cancel)
+    flow_writer = FlowStoreWriter(output_transmission_lines + ".flows") if export_flows else None
+    try:
+        # the hourly flows are streamed to the flow writer while they are computed, a stored result has none
+        (network, results), _ = stages.run(
+            "flows", flows_parameters, flows_inputs, prune_network, network, heat_source_profiles, heat_sink_profiles,
+            investment_period, transmission_line_threshold, design, prescreen_edges, isolated_solver, monitor,
+            flow_writer, reuse=flow_writer is None)
+    except BaseException:
+        if flow_writer is not None:
+            flow_writer.discard()
+        raise
+    finally:
+        if isolated_solver is not None:
+            isolated_solver.close()
+    monitor.clear()
+    source_flows, sink_flows, connection_flows, connection_costs, connection_lengths, cost_per_connection, \
+        total_cost_scalar, total_flow_scalar, total_cost_per_flow = results
+
+    if save_state is not None:
+        lines = set(edge_key(edge) for edge in edge_coordinates(network, heat_sources, heat_sinks))
+        save_network_state(save_state, network, heat_sources, heat_sinks, connection_flows,
+                           [edge for edge in candidate_lines if edge_key(edge) not in lines], state_parameters)
+
+    write_results(network, results, heat_sources, heat_sinks, output_transmission_lines, output_format, flow_writer,
+                  store, run_parameters, nuts2_ids)
+    if owned_store is not None:
+        owned_store.close()
+
+    if cache is not None:
+        cache.store(cache_key, output_transmission_lines)
+
+    return False
@@ -0,0 +1,242 @@
+import json
+import os
+import shutil
+
+import numpy as np
+
+
+# number of hours and of sites or lines per chunk
+CHUNK_HOURS = 168
+CHUNK_ITEMS = 4096
+# kinds of flows in a store
+FLOW_KINDS = ("source", "sink", "connection")
+
+
+def chunk_path(path, kind, hour_chunk, item_chunk):
+    """
+    function returning the file of a chunk of a flow store.
+
+    :param path: directory of the store.
+    :type path: str.
+    :param kind: kind of the flows.
+    :type kind: str {"source", "sink", "connection"}.
+    :param hour_chunk: index of the chunk along the hours.
+    :type hour_chunk: int.
+    :param item_chunk: index of the chunk along the sites or lines.
+    :type item_chunk: int.
+    :return: path of the chunk.
+    :rtype: str.
+    """
+
+    return os.path.join(path, kind + "_" + str(hour_chunk) + "_" + str(item_chunk) + ".npz")
+
+
+class FlowStoreWriter:
+    """
+    Writer streaming the hourly flows of sources, sinks and lines into a directory of compressed chunks while they are
+    computed. Only a chunk of hours is kept in memory. Every max flow run of the pruning loop starts the store anew and
+    commit() publishes the flows of the last run, which are the flows of the final network.
+    """
+
+    def __init__(self, path, dtype="float64"):
+        """
+        Constructor of the writer.
+
+        :param path: directory of the store. An existing store is replaced on commit.
+        :type path: str.
+        :param dtype: data type of the stored flows.
+        :type dtype: str.
+
+        Attributes:
+            number_of_hours: Number of hours of the current run. Int.
+            hours_written: Number of hours received in the current run. Int.
+        """
+
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.temporary = path + ".tmp-" + str(os.getpid())
+        self.number_of_hours = 0
+        self.hours_written = 0
+        self.sizes = {}
+        self.buffer = {}
+
+    def start(self, number_of_hours, number_of_sources, number_of_sinks, number_of_connections):
+        """
+        Method starting the flows of a new max flow run and discarding the flows of the previous run.
+
+        :param number_of_hours: number of hours of the run.
+        :type number_of_hours: int.
+        :param number_of_sources: number of (coherent) sources.
+        :type number_of_sources: int.
+        :param number_of_sinks: number of (coherent) sinks.
+        :type number_of_sinks: int.
+        :param number_of_connections: number of lines.
+        :type number_of_connections: int.
+        :return:
+        """
+
+        if os.path.isdir(self.temporary):
+            shutil.rmtree(self.temporary)
+        os.makedirs(self.temporary)
+        self.number_of_hours = number_of_hours
+        self.hours_written = 0
+        self.sizes = {"source": number_of_sources, "sink": number_of_sinks, "connection": number_of_connections}
+        self.buffer = {kind: [] for kind in FLOW_KINDS}
+
+    def append(self, source_flow, sink_flow, connection_flow):
+        """
+        Method adding the flows of the next hour.
+
+        :param source_flow: flow of every source.
+        :type source_flow: array like.
+        :param sink_flow: flow of every sink.
+        :type sink_flow: array like.
+        :param connection_flow: signed flow of every line, positive from its first to its second point.
+        :type connection_flow: array like.
+        :return:
+        """
+
+        for kind, flow in zip(FLOW_KINDS, (source_flow, sink_flow, connection_flow)):
+            self.buffer[kind].append(np.asarray(flow, dtype=self.dtype).reshape(-1))
+        self.hours_written += 1
+        if len(self.buffer["source"]) == CHUNK_HOURS:
+            self.flush()
+
+    def flush(self):
+        """
+        Method writing the buffered hours as one chunk of hours.
+
+        :return:
+        """
+
+        if not self.buffer["source"]:
+            return
+        hour_chunk = (self.hours_written - 1) // CHUNK_HOURS
+        for kind in FLOW_KINDS:
+            # kinds without items, e.g. the lines of a network pruned completely, have no chunks
+            flows = np.array(self.buffer[kind], dtype=self.dtype).reshape(len(self.buffer[kind]), self.sizes[kind])
+            for item_chunk, start in enumerate(range(0, self.sizes[kind], CHUNK_ITEMS)):
+                np.savez_compressed(chunk_path(self.temporary, kind, hour_chunk, item_chunk),
+                                    flows=flows[:, start:start + CHUNK_ITEMS])
+            self.buffer[kind] = []
+
+    def write(self, source_flows, sink_flows, connection_flows):
+        """
+        Method writing the flows of a complete run, e.g. of a run loaded from the stage cache.
+
+        :param source_flows: hourly flow of every source, one row per source.
+        :type source_flows: np.array.
+        :param sink_flows: hourly flow of every sink, one row per sink.
+        :type sink_flows: np.array.
+        :param connection_flows: hourly flow of every line, one row per line.
+        :type connection_flows: np.array.
+        :return:
+        """
+
+        number_of_hours = np.shape(source_flows)[1] if np.ndim(source_flows) == 2 else 0
+        self.start(number_of_hours, len(source_flows), len(sink_flows), len(connection_flows))
+        for hour in range(number_of_hours):
+            self.append(source_flows[:, hour], sink_flows[:, hour],
+                        connection_flows[:, hour] if len(connection_flows) else [])
+
+    def commit(self, metadata=None):
+        """
+        Method publishing the flows of the current run.
+
+        :param metadata: additional json serializable information stored with the flows, e.g. the coordinates of the
+                         lines.
+        :type metadata: dict or None.
+        :return:
+        """
+
+        if self.hours_written != self.number_of_hours:
+            raise RuntimeError("flow store received " + str(self.hours_written) + " of " +
+                               str(self.number_of_hours) + " hours")
+        self.flush()
+        meta = {"number_of_hours": self.number_of_hours, "sizes": self.sizes, "dtype": self.dtype.str,
+                "chunk_hours": CHUNK_HOURS, "chunk_items": CHUNK_ITEMS, "metadata": metadata or {}}
+        with open(os.path.join(self.temporary, "meta.json"), "w") as file:
+            json.dump(meta, file)
+        if os.path.isdir(self.path):
+            shutil.rmtree(self.path)
+        os.rename(self.temporary, self.path)
+
+    def discard(self):
+        """
+        Method removing the flows of an unfinished run.
+
+        :return:
+        """
+
+        shutil.rmtree(self.temporary, ignore_errors=True)
+
+
+class FlowStore:
+    """
+    Reader of a flow store written by FlowStoreWriter. Only the chunks overlapping the requested hours and sites or
+    lines are loaded.
+    """
+
+    def __init__(self, path):
+        """
+        Constructor of the reader.
+
+        :param path: directory of the store.
+        :type path: str.
+
+        Attributes:
+            number_of_hours: Number of stored hours. Int.
+            sizes: Number of sources, sinks and lines by kind. Dic.
+            metadata: Information stored with the flows. Dic.
+        """
+
+        with open(os.path.join(path, "meta.json"), "r") as file:
+            meta = json.load(file)
+        self.path = path
+        self.number_of_hours = meta["number_of_hours"]
+        self.sizes = meta["sizes"]
+        self.dtype = np.dtype(meta["dtype"])
+        self.chunk_hours = meta["chunk_hours"]
+        self.chunk_items = meta["chunk_items"]
+        self.metadata = meta["metadata"]
+
+    def read(self, kind, start_hour=0, end_hour=None, items=None):
+        """
+        Method reading the flows of a range of hours.
+
+        :param kind: kind of the flows.
+        :type kind: str {"source", "sink", "connection"}.
+        :param start_hour: first hour.
+        :type start_hour: int.
+        :param end_hour: hour after the last hour. None reads until the end of the year.
+        :type end_hour: int or None.
+        :param items: indices of the sources, sinks or lines. None reads all.
+        :type items: list or None.
+        :return: flows, one row per hour and one column per item.
+        :rtype: np.array.
+        """
+
+        if kind not in self.sizes:
+            raise ValueError("Unknown kind of flows " + str(kind) + ", use one of " + ", ".join(FLOW_KINDS))
+        end_hour = self.number_of_hours if end_hour is None else min(end_hour, self.number_of_hours)
+        start_hour = max(0, start_hour)
+        items = np.arange(self.sizes[kind]) if items is None else np.asarray(items, dtype=int).reshape(-1)
+        if np.any((items < 0) | (items >= self.sizes[kind])):
+            raise ValueError("Indices out of range for " + str(self.sizes[kind]) + " " + kind + " flows")
+
+        flows = np.zeros((max(0, end_hour - start_hour), len(items)), dtype=self.dtype)
+        if len(flows) == 0 or len(items) == 0:
+            return flows
+        item_chunks = items // self.chunk_items
+        for hour_chunk in range(start_hour // self.chunk_hours, (end_hour - 1) // self.chunk_hours + 1):
+            chunk_start = hour_chunk * self.chunk_hours
+            first = max(start_hour, chunk_start)
+            last = min(end_hour, chunk_start + self.chunk_hours)
+            for item_chunk in np.unique(item_chunks):
+                columns = np.nonzero(item_chunks == item_chunk)[0]
+                with np.load(chunk_path(self.path, kind, hour_chunk, item_chunk)) as chunk:
+                    values = chunk["flows"]
+                flows[first - start_hour:last - start_hour, columns] = \
+                    values[first - chunk_start:last - chunk_start, items[columns] - item_chunk * self.chunk_items]
+
+        return flows
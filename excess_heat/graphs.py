@@ -1,8 +1,94 @@
-import copy
-
 from igraph import Graph, plot
 import numpy as np
-from collections import Counter
+
+from .max_flow import create_max_flow_solver, select_max_flow_backend
+
+
+# kinds of the vertices of the graph, stored in NetworkGraph.vertex_kind
+SOURCE_VERTEX = 0
+SINK_VERTEX = 1
+# names of the vertex kinds used by the methods returning sites
+VERTEX_KINDS = ("source", "sink")
+
+
+def correspondence_groups(correspondence):
+    """
+    function numbering the groups of sites with the same correspondence in the order of their first site.
+
+    :param correspondence: correspondence of every site.
+    :type correspondence: array like.
+    :return: group of every site and correspondence of every group.
+    :rtype: tuple of np.array.
+    """
+
+    correspondence = np.asarray(correspondence)
+    if len(correspondence) == 0:
+        return np.zeros(0, dtype=np.int64), correspondence
+    values, first_sites, groups = np.unique(correspondence, return_index=True, return_inverse=True)
+    order = np.argsort(first_sites)
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+
+    return rank[groups.reshape(-1)], values[order]
+
+
+def flatten_adjacency_list(adjacency_list, dtype=None):
+    """
+    function concatenating the rows of an adjacency list or of an adjacency list of attributes.
+
+    :param adjacency_list: adjacency list, one row of sites or attribute values per site.
+    :type adjacency_list: list. [[site1, site2], [site1, site4], [], ...]
+    :param dtype: data type of the result. None keeps the data type of the rows.
+    :type dtype: np.dtype or None.
+    :return: values of all rows in the order of the adjacency list.
+    :rtype: np.array.
+    """
+
+    rows = [np.asarray(row, dtype=dtype).reshape(-1) for row in adjacency_list]
+    if not rows:
+        return np.zeros(0, dtype=dtype)
+
+    return np.concatenate(rows)
+
+
+def adjacency_edges(adjacency_list, vertices1, vertices2):
+    """
+    function converting an adjacency list into pairs of vertex IDs.
+
+    :param adjacency_list: adjacency list, the sites adjacent to every site of the first set.
+    :type adjacency_list: list. [[site1, site2], [site1, site4], [], ...]
+    :param vertices1: vertex ID of every site of the first set.
+    :type vertices1: np.array.
+    :param vertices2: vertex ID of every site of the second set.
+    :type vertices2: np.array.
+    :return: pairs of vertex IDs in the order of the adjacency list.
+    :rtype: np.array. [[vertex1, vertex2], ...]
+    """
+
+    lengths = np.fromiter((len(adjacent) for adjacent in adjacency_list), dtype=np.int64, count=len(adjacency_list))
+    sites1 = np.repeat(np.arange(len(adjacency_list)), lengths)
+    sites2 = flatten_adjacency_list(adjacency_list, np.int64)
+
+    return np.column_stack((vertices1[sites1], vertices2[sites2]))
+
+
+def group_adjacency_list(sites1, sites2, number_of_sites):
+    """
+    function converting pairs of sites into an adjacency list.
+
+    :param sites1: first site of every pair.
+    :type sites1: np.array.
+    :param sites2: second site of every pair.
+    :type sites2: np.array.
+    :param number_of_sites: number of sites of the first set.
+    :type number_of_sites: int.
+    :return: adjacency list, the second sites of every first site in ascending order.
+    :rtype: list. [[site1, site2], [site1, site4], [], ...]
+    """
+
+    order = np.lexsort((sites2, sites1))
+    bounds = np.cumsum(np.bincount(sites1, minlength=number_of_sites))[:-1]
+    return [adjacent.tolist() for adjacent in np.split(sites2[order], bounds)]
 
 
 class NetworkGraph:
@@ -13,7 +99,7 @@ class NetworkGraph:
     """
 
     def __init__(self, source_sink_edges, source_source_edges, sink_sink_edges,
-                 source_correspondence, sink_correspondence):
+                 source_correspondence, sink_correspondence, max_flow_backend="igraph"):
         """
         Constructor to initial the NetworkGraph object
 
@@ -34,45 +120,66 @@ class NetworkGraph:
                                       connected internally. The capacity of the coherent set of sinks is equal to the
                                       sum of the individual sinks.
         :type sink_correspondence: list. [correspondence of sink 1, correspondence of sink 2, ...]
-
+        :param max_flow_backend: default backend of the maximum_flow() method. "auto" chooses the backend by the size
+                                 of the max flow graph.
+        :type max_flow_backend: str {"auto", "igraph", "scipy", "numpy", "incremental"}.
 
         Attributes:
             number_of_sources: Number of source vertices. Int.
             number_of_sinks: Number of sink vertices. Int.
-            vertex_to_source: Maps vertex ID to source ID. Dic.
-            vertex_to_sink: Maps vertex ID to sink ID. Dic.
-            source_to_vertex: Maps source ID to vertex ID. Dic.
-            sink_to_vertex: Maps sink ID to vertex ID. Dic.
+            source_vertices: Vertex ID of every source. np.array.
+            sink_vertices: Vertex ID of every sink. np.array.
+            vertex_kind: SOURCE_VERTEX or SINK_VERTEX for every vertex of the graph. np.array.
+            vertex_site: Source or sink ID of every vertex of the graph. np.array.
+            edge_vertices: Vertex IDs of both ends of every edge of the graph. np.array. [[vertex1, vertex2], ...]
+            source_groups: Group of coherent sources of every source, numbered in the order of their first source.
+                np.array.
+            sink_groups: Group of coherent sinks of every sink, numbered in the order of their first sink. np.array.
+            source_group_vertices: Vertex ID of every group of sources in the correspondence_graph, the connecting
+                vertex of coherent sources or the vertex of the single source. np.array.
+            sink_group_vertices: Vertex ID of every group of sinks in the correspondence_graph. np.array.
             graph: Graph containing all vertices and edges. igraph Graph.
             max_flow_graph: slightly altered graph for max_flow calculations. igraph Graph.
             infinite_source_vertex: Vertex ID of the infinte source vertex in the max_flow_graph. Int.
             infinite_sink_vertex: Vertex ID of the infinite sink vertex in the max_flow_graph. Int.
+            max_flow_backend: Default backend of the maximum_flow() method. Str.
+            auto_max_flow_backend: Backend of "auto", chosen once by the size of the max_flow_graph. Deleting edges
+                keeps the vertices of the max_flow_graph, hence the choice holds for the lifetime of the network. Str.
+            max_flow_solvers: Max flow solvers of the current max_flow_graph by backend name. Dic.
         """
 
         self.number_of_sources = len(source_source_edges)
         self.number_of_sinks = len(sink_sink_edges)
 
+        # sources are the first vertices, followed by the sinks
+        self.source_vertices = np.arange(self.number_of_sources)
+        self.sink_vertices = self.number_of_sources + np.arange(self.number_of_sinks)
+        self.vertex_kind = np.repeat(np.array([SOURCE_VERTEX, SINK_VERTEX], dtype=np.int8),
+                                     [self.number_of_sources, self.number_of_sinks])
+        self.vertex_site = np.concatenate((np.arange(self.number_of_sources), np.arange(self.number_of_sinks)))
+
         # specified later by the build_graph() method
-        self.vertex_to_source = {}
-        self.vertex_to_sink = {}
-        self.source_to_vertex = {}
-        self.sink_to_vertex = {}
         self.graph = Graph()
+        self.edge_vertices = np.zeros((0, 2), dtype=np.int64)
 
         # specified later by  the build_correspondence_graph()
         self.correspondence_graph = Graph()
         self.source_correspondence = source_correspondence
         self.sink_correspondence = sink_correspondence
-        # node ids of the nodes connecting correspondence nodes together
-        self.connecting_node_of_source_correspondence = {}
-        self.connecting_node_of_sink_correspondence = {}
-        self.number_of_coherent_sources = 0
-        self.number_of_coherent_sinks = 0
+        self.source_groups, self.source_group_correspondence = correspondence_groups(source_correspondence)
+        self.sink_groups, self.sink_group_correspondence = correspondence_groups(sink_correspondence)
+        self.source_group_vertices = np.zeros(0, dtype=np.int64)
+        self.sink_group_vertices = np.zeros(0, dtype=np.int64)
+        self.number_of_coherent_sources = len(self.source_group_correspondence)
+        self.number_of_coherent_sinks = len(self.sink_group_correspondence)
 
         # specified later by the build_max_flow_graph() method
         self.max_flow_graph = Graph()
         self.infinite_source_vertex = 0
         self.infinite_sink_vertex = 0
+        self.max_flow_backend = max_flow_backend
+        self.auto_max_flow_backend = None
+        self.max_flow_solvers = {}
 
         # build self.graph with given inputs
         self.build_graph(source_sink_edges, source_source_edges, sink_sink_edges)
@@ -80,6 +187,80 @@ class NetworkGraph:
         self.build_correspondence_graph()
         # build self.max_flow_graph based on self.graph
         self.build_max_flow_graph()
+        self.auto_max_flow_backend = select_max_flow_backend(self.max_flow_graph.vcount(),
+                                                             self.max_flow_graph.ecount())
+
+    def __getstate__(self):
+        # max flow solvers are recreated on demand and are not pickled
+        state = self.__dict__.copy()
+        state["max_flow_solvers"] = {}
+        return state
+
+    @property
+    def vertex_to_source(self):
+        """
+        Maps vertex ID to source ID. Dic.
+        """
+
+        return dict(zip(self.source_vertices.tolist(), range(self.number_of_sources)))
+
+    @property
+    def vertex_to_sink(self):
+        """
+        Maps vertex ID to sink ID. Dic.
+        """
+
+        return dict(zip(self.sink_vertices.tolist(), range(self.number_of_sinks)))
+
+    @property
+    def source_to_vertex(self):
+        """
+        Maps source ID to vertex ID. Dic.
+        """
+
+        return dict(zip(range(self.number_of_sources), self.source_vertices.tolist()))
+
+    @property
+    def sink_to_vertex(self):
+        """
+        Maps sink ID to vertex ID. Dic.
+        """
+
+        return dict(zip(range(self.number_of_sinks), self.sink_vertices.tolist()))
+
+    @property
+    def connecting_node_of_source_correspondence(self):
+        """
+        Maps the correspondence of coherent sources to the vertex ID of the vertex connecting them. Dic.
+        """
+
+        coherent = np.nonzero(self.source_group_vertices >= self.number_of_sources + self.number_of_sinks)[0]
+        return dict(zip(self.source_group_correspondence[coherent].tolist(),
+                        self.source_group_vertices[coherent].tolist()))
+
+    @property
+    def connecting_node_of_sink_correspondence(self):
+        """
+        Maps the correspondence of coherent sinks to the vertex ID of the vertex connecting them. Dic.
+        """
+
+        coherent = np.nonzero(self.sink_group_vertices >= self.number_of_sources + self.number_of_sinks)[0]
+        return dict(zip(self.sink_group_correspondence[coherent].tolist(),
+                        self.sink_group_vertices[coherent].tolist()))
+
+    def site_vertices(self, sites):
+        """
+        Method returning the vertex IDs of sources and sinks.
+
+        :param sites: type and index of every site.
+        :type sites: list. [("source", 1), ("sink", 0), ...]
+        :return: vertex ID of every site.
+        :rtype: np.array.
+        """
+
+        vertices = np.array([self.source_vertices[index] if kind == "source" else self.sink_vertices[index]
+                             for kind, index in sites], dtype=np.int64)
+        return vertices
 
     def build_graph(self, source_sink_edges, source_source_edges, sink_sink_edges):
         """
@@ -96,95 +277,49 @@ class NetworkGraph:
         :return:
         """
 
-        # map vertex ID's to source ID's
-        vertex_to_source = {}
-        for source, _ in enumerate(source_source_edges):
-            vertex_to_source[source] = source
-        self.vertex_to_source = vertex_to_source
-
-        # map vertex ID's to sink ID's
-        vertex_to_sink = {}
-        for sink, _ in enumerate(sink_sink_edges):
-            vertex_to_sink[self.number_of_sources + sink] = sink
-        self.vertex_to_sink = vertex_to_sink
-
-        # map source ID's to vertex ID's by reversing injective vertex_to_source dic.
-        source_to_vertex = {v: k for k, v in self.vertex_to_source.items()}
-        self.source_to_vertex = source_to_vertex
-        # map sink ID's to vertex ID's by reversing injective vertex_to_sink dic.
-        sink_to_vertex = {v: k for k, v in self.vertex_to_sink.items()}
-        self.sink_to_vertex = sink_to_vertex
+        # construct pairs of vertex ID's connected by the adjacency lists.
+        edges = np.concatenate((adjacency_edges(source_sink_edges, self.source_vertices, self.sink_vertices),
+                                adjacency_edges(source_source_edges, self.source_vertices, self.source_vertices),
+                                adjacency_edges(sink_sink_edges, self.sink_vertices, self.sink_vertices)))
 
         # build igraph Graph object
-        g = Graph(directed=False)
-        g.add_vertices(self.number_of_sources + self.number_of_sinks)
-
-        # construct pairs of vertex ID's connected by the adjacency lists.
-        for source, sinks in enumerate(source_sink_edges):
-            for sink in sinks:
-                g.add_edge(source_to_vertex[source], sink_to_vertex[sink])
-        for source1, sources in enumerate(source_source_edges):
-            for source2 in sources:
-                g.add_edge(source_to_vertex[source1], source_to_vertex[source2])
-        for sink1, sinks in enumerate(sink_sink_edges):
-            for sink2 in sinks:
-                g.add_edge(sink_to_vertex[sink1], sink_to_vertex[sink2])
-
-        self.graph = g
+        self.graph = Graph(n=self.number_of_sources + self.number_of_sinks, edges=edges.tolist(), directed=False)
 
         # assigning source vertices a red color and sink vertices a blue color attribute
         self.graph.vs["color"] = ["red"] * self.number_of_sources + ["blue"] * self.number_of_sinks
 
     def build_correspondence_graph(self):
         """
-        Method constructing the correspondence graph needed to connect coherent sources or sinks without costs.
+        Method constructing the correspondence graph needed to connect coherent sources or sinks without costs. Every
+        group of two or more coherent sources or sinks gets an additional vertex, which is connected to all of them.
 
         :return:
         """
-        g = copy.deepcopy(self.graph)
-
-        # check for sources with same correspondence. If two or more sources have the same correspondence the
-        # graph will need an additional node connecting them
-        c = Counter(self.source_correspondence)
-        coherent_sources_correspondence = [correspondence for correspondence in c if c[correspondence] > 1]
-        self.number_of_coherent_sources = len(c)
-        # check for sinks with same correspondence. If two or more sinks have the same correspondence the
-        # graph will need an additional node connecting them
-        c = Counter(self.sink_correspondence)
-        coherent_sinks_correspondence = [correspondence for correspondence in c if c[correspondence] > 1]
-        self.number_of_coherent_sinks = len(c)
-
-        # reinitialize the dict containing the node ids of the nodes used to connect each correspondence
-        self.connecting_node_of_source_correspondence = {}
-        # only iterate over correspondences with at least two members
-        for correspondence in coherent_sources_correspondence:
-            for source, source_correspondence in zip(range(self.number_of_sources), self.source_correspondence):
-                if source_correspondence == correspondence:
-                    # check if a node for the correspondence already exists
-                    if correspondence in self.connecting_node_of_source_correspondence:
-                        # connect source with the correspondence node
-                        g.add_edge(self.connecting_node_of_source_correspondence[correspondence],
-                                   self.source_to_vertex[source])
-                    else:
-                        # if new correspondence encountered, adds new correspondence node
-                        g.add_vertices(1)
-                        self.connecting_node_of_source_correspondence[correspondence] = g.vcount() - 1
-                        g.add_edge(self.source_to_vertex[source],
-                                   self.connecting_node_of_source_correspondence[correspondence])
-
-        self.connecting_node_of_sink_correspondence = {}
-        for correspondence in coherent_sinks_correspondence:
-            for sink, sink_correspondence in zip(range(self.number_of_sinks), self.sink_correspondence):
-                if sink_correspondence == correspondence:
-                    if correspondence in self.connecting_node_of_sink_correspondence:
-                        g.add_edge(self.sink_to_vertex[sink],
-                                   self.connecting_node_of_sink_correspondence[correspondence])
-                    else:
-                        g.add_vertices(1)
-                        self.connecting_node_of_sink_correspondence[correspondence] = g.vcount() - 1
-                        g.add_edge(self.sink_to_vertex[sink],
-                                   self.connecting_node_of_sink_correspondence[correspondence])
 
+        self.edge_vertices = np.array(self.graph.get_edgelist(), dtype=np.int64).reshape(-1, 2)
+        number_of_vertices = self.number_of_sources + self.number_of_sinks
+        edges = [self.edge_vertices]
+        group_vertices = []
+        for vertices, groups in ((self.source_vertices, self.source_groups), (self.sink_vertices, self.sink_groups)):
+            group_sizes = np.bincount(groups)
+            coherent = group_sizes > 1
+            # connecting vertices in the order of the groups, single sites are represented by their own vertex
+            first_sites = np.zeros(len(group_sizes), dtype=np.int64)
+            first_sites[groups[::-1]] = np.arange(len(groups))[::-1]
+            vertices_of_groups = vertices[first_sites]
+            vertices_of_groups[coherent] = number_of_vertices + np.arange(np.count_nonzero(coherent))
+            number_of_vertices += np.count_nonzero(coherent)
+            # connect every coherent site with its connecting vertex, group by group
+            members = np.nonzero(coherent[groups])[0]
+            members = members[np.argsort(groups[members], kind="stable")]
+            edges.append(np.column_stack((vertices[members], vertices_of_groups[groups[members]])))
+            group_vertices.append(vertices_of_groups)
+        self.source_group_vertices, self.sink_group_vertices = group_vertices
+
+        g = Graph(n=number_of_vertices, edges=np.concatenate(edges).tolist(), directed=False)
+        # connecting edges have no costs
+        for name in self.graph.es.attribute_names():
+            g.es[name] = self.graph.es[name] + [0] * (g.ecount() - self.graph.ecount())
         self.correspondence_graph = g
 
         self.correspondence_graph.vs["color"] = ["red"] * self.number_of_sources + ["blue"] * self.number_of_sinks +\
@@ -198,35 +333,23 @@ class NetworkGraph:
         :return:
         """
 
-        g = copy.deepcopy(self.correspondence_graph)
-        # add infinite source and sink vertex
-        g.add_vertices(2)
-
-        # assign the new vertices unique vertex ID's
-        self.infinite_source_vertex = g.vcount() - 2
-        self.infinite_sink_vertex = g.vcount() - 1
+        # add infinite source and sink vertex with unique vertex ID's
+        number_of_vertices = self.correspondence_graph.vcount() + 2
+        self.infinite_source_vertex = number_of_vertices - 2
+        self.infinite_sink_vertex = number_of_vertices - 1
 
-        # connect all sources with the infinite source and all sinks with the infinite sink by an edge
-        for source, correspondence in zip(range(self.number_of_sources), self.source_correspondence):
-            if correspondence not in self.connecting_node_of_source_correspondence:
-                g.add_edge(self.infinite_source_vertex, self.source_to_vertex[source])
-            else:
-                if not g.are_connected(self.infinite_source_vertex, self.connecting_node_of_source_correspondence[correspondence]):
-                    g.add_edge(self.infinite_source_vertex, self.connecting_node_of_source_correspondence[correspondence])
+        # connect all groups of sources with the infinite source and all groups of sinks with the infinite sink
+        edges = np.concatenate((np.array(self.correspondence_graph.get_edgelist(), dtype=np.int64).reshape(-1, 2),
+                                np.column_stack((np.full(len(self.source_group_vertices), self.infinite_source_vertex),
+                                                 self.source_group_vertices)),
+                                np.column_stack((np.full(len(self.sink_group_vertices), self.infinite_sink_vertex),
+                                                 self.sink_group_vertices))))
 
-        for sink, correspondence in zip(range(self.number_of_sinks), self.sink_correspondence):
-            if correspondence not in self.connecting_node_of_sink_correspondence:
-                g.add_edge(self.infinite_sink_vertex, self.sink_to_vertex[sink])
-            else:
-                if not g.are_connected(self.infinite_sink_vertex, self.connecting_node_of_sink_correspondence[correspondence]):
-                    g.add_edge(self.infinite_sink_vertex, self.connecting_node_of_sink_correspondence[correspondence])
+        self.max_flow_graph = Graph(n=number_of_vertices, edges=edges.tolist(), directed=False)
+        # solvers are bound to the edges of the max flow graph and need to be recreated
+        self.max_flow_solvers = {}
 
-        self.max_flow_graph = g
-
-        self.max_flow_graph.vs["color"] = ["red"] * self.number_of_sources + ["blue"] * self.number_of_sinks + \
-                                                ["red"] * len(self.connecting_node_of_source_correspondence) + \
-                                                ["blue"] * len(self.connecting_node_of_sink_correspondence) + ["red"] +\
-                                                ["blue"]
+        self.max_flow_graph.vs["color"] = self.correspondence_graph.vs["color"] + ["red"] + ["blue"]
 
     def return_adjacency_lists(self):
         """
@@ -237,38 +360,20 @@ class NetworkGraph:
         :rtype: tuple of lists. ([], [], []).
         """
 
-        source_source_adjacencies = []
-        source_sink_adjacencies = []
-        sink_sink_adjacencies = []
-
-        # iterate through adjacency list of graph
-        for vertex1, vertices in enumerate(self.correspondence_graph.get_adjlist()):
-
-            # determine if vertex1 is a source or sink
-            if vertex1 < self.number_of_sources:
-                source_source_adjacencies .append([])
-                source_sink_adjacencies .append([])
-
-                # iterate though sublist of adjacency list
-                for vertex2 in set(vertices):
-                    # determine if vertex2 is a source or sink
-                    if vertex2 < self.number_of_sources:
-                        if vertex1 < vertex2:
-                            source_source_adjacencies[-1].append(self.vertex_to_source[vertex2])
-                    elif self.number_of_sources + self.number_of_sinks > vertex2 >= self.number_of_sources:
-                        source_sink_adjacencies[-1].append(self.vertex_to_sink[vertex2])
+        # every connection once, sources have lower vertex IDs than sinks
+        edges = np.unique(np.sort(self.edge_vertices, axis=1), axis=0).reshape(-1, 2)
+        edges = edges[edges[:, 0] != edges[:, 1]]
+        kinds = self.vertex_kind[edges]
+        sites = self.vertex_site[edges]
 
-            elif self.number_of_sources + self.number_of_sinks > vertex1 >= self.number_of_sources:
-                sink_sink_adjacencies.append([])
+        adjacency_lists = []
+        for kind1, kind2, number_of_sites in ((SOURCE_VERTEX, SINK_VERTEX, self.number_of_sources),
+                                              (SOURCE_VERTEX, SOURCE_VERTEX, self.number_of_sources),
+                                              (SINK_VERTEX, SINK_VERTEX, self.number_of_sinks)):
+            selected = (kinds[:, 0] == kind1) & (kinds[:, 1] == kind2)
+            adjacency_lists.append(group_adjacency_list(sites[selected, 0], sites[selected, 1], number_of_sites))
 
-                # iterate though sublist of adjacency list
-                for vertex2 in set(vertices):
-                    # determine if vertex2 is a source or sink
-                    if self.number_of_sources + self.number_of_sinks > vertex2 >= self.number_of_sources:
-                        if vertex1 < vertex2:
-                            sink_sink_adjacencies[-1].append(self.vertex_to_sink[vertex2])
-
-        return source_sink_adjacencies, source_source_adjacencies, sink_sink_adjacencies
+        return tuple(adjacency_lists)
 
     def add_edge_attribute(self, name, source_sink_attributes, source_source_attributes, sink_sink_attributes):
         """
@@ -288,21 +393,14 @@ class NetworkGraph:
         :return:
         """
 
-        edge_attributes = []
-        for attributes in source_sink_attributes:
-            for attribute in attributes:
-                edge_attributes.append(attribute)
-        for attributes in source_source_attributes:
-            for attribute in attributes:
-                edge_attributes.append(attribute)
-        for attributes in sink_sink_attributes:
-            for attribute in attributes:
-                edge_attributes.append(attribute)
+        edge_attributes = np.concatenate((flatten_adjacency_list(source_sink_attributes),
+                                          flatten_adjacency_list(source_source_attributes),
+                                          flatten_adjacency_list(sink_sink_attributes)))
 
         if self.graph.ecount() == len(edge_attributes):
-            self.graph.es[name] = edge_attributes
-            self.correspondence_graph.es[name] = edge_attributes + [0] * (self.correspondence_graph.ecount() -
-                                                                          self.graph.ecount())
+            self.graph.es[name] = edge_attributes.tolist()
+            self.correspondence_graph.es[name] = np.concatenate((edge_attributes, np.zeros(
+                self.correspondence_graph.ecount() - self.graph.ecount(), dtype=edge_attributes.dtype))).tolist()
         else:
             raise TypeError("given attributes must have same shape as "
                             "source_sink_adjacencies, source_source_adjacencies, sink_sink_adjacencies")
@@ -329,35 +427,79 @@ class NetworkGraph:
         :return:
         """
 
-        self.correspondence_graph = \
-            self.correspondence_graph.spanning_tree(weights=self.correspondence_graph.es[attribute_name])
+        tree_edges = np.array(self.correspondence_graph.spanning_tree(
+            weights=self.correspondence_graph.es[attribute_name], return_tree=False), dtype=np.int64)
 
-        # get attributes from correspondence graph to update self.graph
-        attributes = []
-        for attribute in self.graph.es.attribute_names():
-            attributes.append((attribute, self.correspondence_graph.es[attribute]))
+        # the edges of self.graph are the first edges of the correspondence graph, the connecting edges follow
+        self.select_edges(np.sort(tree_edges[tree_edges < self.graph.ecount()]))
 
-        # check which edges are relevant for self.graph
-        non_correspondence_edges = []
-        for edge in self.correspondence_graph.es:
-            if (edge.source in self.vertex_to_source or edge.source in self.vertex_to_sink) and \
-                    (edge.target in self.vertex_to_source or edge.target in self.vertex_to_sink):
-                non_correspondence_edges.append((edge.source, edge.target))
+    def get_max_flow_solver(self, backend=None):
+        """
+        Method returning the max flow solver of the max_flow_graph for the given backend. Solvers are created once and
+        reused until the max_flow_graph changes.
 
-        # reset self.graph and rebuild according to the MST
-        self.graph = Graph()
-        self.graph.add_vertices(self.number_of_sources + self.number_of_sinks)
-        # assigning source vertices a red color and sink vertices a blue color attribute
-        self.graph.vs["color"] = ["red"] * self.number_of_sources + ["blue"] * self.number_of_sinks
-        self.graph.add_edges(non_correspondence_edges)
-        for attribute_name, values in attributes:
-            self.graph.es[attribute_name] = values[:len(non_correspondence_edges)]
+        :param backend: name of the backend. Defaults to the max_flow_backend attribute.
+        :type backend: str {"auto", "igraph", "scipy", "numpy", "incremental"}.
+        :return: solver providing a solve(capacities, source_vertex, sink_vertex) method.
+        :rtype: object.
+        """
 
-        # update correspondence graph and max flow graph
-        self.build_correspondence_graph()
-        self.build_max_flow_graph()
+        if backend is None:
+            backend = self.max_flow_backend
+        if backend == "auto":
+            backend = self.auto_max_flow_backend
+        if backend not in self.max_flow_solvers:
+            self.max_flow_solvers[backend] = create_max_flow_solver(backend, self.max_flow_graph.vcount(),
+                                                                    self.max_flow_graph.get_edgelist(),
+                                                                    fallback=self.auto_max_flow_backend)
+        return self.max_flow_solvers[backend]
+
+    def return_flow_capacities(self, source_capacities, sink_capacities):
+        """
+        Method returning the capacity of every edge of the max_flow_graph. Capacities of coherent sources and sinks are
+        summed up and edges between sites are unrestricted, which is indicated by np.inf.
+
+        :param source_capacities: list containing the capacity of each source.
+        :type source_capacities: list.
+        :param sink_capacities: list containing the demand of each sink.
+        :type sink_capacities: list.
+        :return: capacities in the order of the edges of the max_flow_graph.
+        :rtype: np.array.
+        """
+
+        if len(source_capacities) != self.number_of_sources or len(sink_capacities) != self.number_of_sinks:
+            raise TypeError("Source capacites and sink capacities must have same length as the number of sources and "
+                            "number of sinks in the graph")
+
+        # capacities of coherent sources and sinks are summed up by group
+        effective_source_capacities = np.bincount(self.source_groups, weights=source_capacities,
+                                                  minlength=self.number_of_coherent_sources)
+        effective_sink_capacities = np.bincount(self.sink_groups, weights=sink_capacities,
+                                                minlength=self.number_of_coherent_sinks)
+
+        # give real edges unrestricted flow
+        return np.concatenate((np.full(self.correspondence_graph.ecount(), np.inf),
+                               effective_source_capacities, effective_sink_capacities))
 
-    def maximum_flow(self, source_capacities, sink_capacities):
+    def split_flow_solution(self, solution):
+        """
+        Method splitting the flow through the edges of the max_flow_graph into the flow of the sources, sinks and
+        edges of the graph.
+
+        :param solution: flow through every edge of the max_flow_graph.
+        :type solution: np.array.
+        :return: touple of the source flows, sink flows and connection flows.
+        :rtype: tuple. ([], [], [])
+        """
+
+        source_flow = - solution[-self.number_of_coherent_sinks - self.number_of_coherent_sources:-self.number_of_coherent_sinks]
+        sink_flow = solution[-self.number_of_coherent_sinks:]
+        connection_flow = solution[:-self.number_of_coherent_sources - self.number_of_coherent_sinks -
+                                   (self.correspondence_graph.ecount() - self.graph.ecount())]
+
+        return source_flow, sink_flow, connection_flow
+
+    def maximum_flow(self, source_capacities, sink_capacities, backend=None):
         """
         function computing the maximum flow of a given source sink network
 
@@ -365,6 +507,8 @@ class NetworkGraph:
         :type source_capacities: list.
         :param sink_capacities: list containing the demand of each sink.
         :type sink_capacities: list.
+        :param backend: max flow backend used for this call. Defaults to the max_flow_backend attribute.
+        :type backend: str {"auto", "igraph", "scipy", "numpy", "incremental"}.
         :return: returns a touple of three lists. The first one has the same length as source_capacities and contains
                  the actual flow of the sources. The second is indicating the flow of the sinks. The third one
                  indicates the flow though the edges of the graph.
@@ -385,11 +529,9 @@ class NetworkGraph:
         Once again these weights represent the maximum flow through the specific edge.
         All other edges (edges connecting [su] with [si] or [su], or [si] with [si]) do not have weights and therefore 
         unrestricted flow.
-        For numerical reasons those edges are weighted with 1000 which does not introduce further 
-        restrictions.
-        Further the other weights are normalized with the factor 1/max(weights)(hence largest possible weight of 
-        restricted edges is 1)
-        for numerical reasons.
+        How unrestricted edges are represented depends on the backend. The igraph backend weights them with 1000 and
+        normalizes the other weights with the factor 1/max(weights) for numerical reasons (hence largest possible
+        weight of restricted edges is 1). The scipy backend scales all weights to integers.
         
                                            [infinite source]
                                             /      |      \
@@ -405,58 +547,19 @@ class NetworkGraph:
                                             \      |      /
                                             [infinite sink]
         
-        Now the Push-relabel maximum flow algorithm is applied to the graph.
+        Now a maximum flow algorithm is applied to the graph (push-relabel for igraph, Dinic for scipy and
+        Edmonds-Karp for numpy).
         
         Notes: 
         Unlike in the example the number of [su] does not have to be equal to [si].
         Neither does every [su] need an edge to [si] or vice versa.                            
         """
 
-        if len(source_capacities) == self.number_of_sources and len(sink_capacities) == self.number_of_sinks:
-
-            effective_source_capacities = []
-            position = {}
-            for source_capacity, correspondence in zip(source_capacities, self.source_correspondence):
-                if correspondence in position:
-                    effective_source_capacities[position[correspondence]] += source_capacity
-                else:
-                    effective_source_capacities.append(source_capacity)
-                    position[correspondence] = len(effective_source_capacities) - 1
-
-            effective_sink_capacities = []
-            position = {}
-            for sink_capacity, correspondence in zip(sink_capacities, self.sink_correspondence):
-                if correspondence in position:
-                    effective_sink_capacities[position[correspondence]] += sink_capacity
-                else:
-                    effective_sink_capacities.append(sink_capacity)
-                    position[correspondence] = len(effective_sink_capacities) - 1
-
-            # find normalization so that the max capacity is 1
-
-            normalization = 1 / np.max(np.append(effective_source_capacities, effective_sink_capacities))
-            effective_source_capacities = np.array(effective_source_capacities) * normalization
-            effective_sink_capacities = np.array(effective_sink_capacities) * normalization
-            # give real edges unrestricted flow
-            flow_capacities = np.append([1000] * self.correspondence_graph.ecount(),
-                                        np.append(effective_source_capacities, effective_sink_capacities))
-
-            self.max_flow_graph.es["flow_capacity"] = flow_capacities
-            # NOTE igraph maxflow leaks memory including version 0.7.1.post6 (does not free some solution vector,
-            # hence leaks around 8*(number_of_sources + number_of_sinks + number_of_edges) bytes of memory every call)
-            solution = self.max_flow_graph.maxflow(self.infinite_source_vertex, self.infinite_sink_vertex, "flow_capacity")
-
-            # rescale flow to original, after weight normalization
-            solution = np.array(solution.flow) / normalization
-            source_flow = - solution[-self.number_of_coherent_sinks - self.number_of_coherent_sources:-self.number_of_coherent_sinks]
-            sink_flow = solution[-self.number_of_coherent_sinks:]
-            connection_flow = solution[:-self.number_of_coherent_sources - self.number_of_coherent_sinks -
-                                       (self.correspondence_graph.ecount() - self.graph.ecount())]
-
-            return source_flow, sink_flow, connection_flow
-        else:
-            raise TypeError("Source capacites and sink capacities must have same length as the number of sources and "
-                            "number of sinks in the graph")
+        flow_capacities = self.return_flow_capacities(source_capacities, sink_capacities)
+        solution = self.get_max_flow_solver(backend).solve(flow_capacities, self.infinite_source_vertex,
+                                                           self.infinite_sink_vertex)
+
+        return self.split_flow_solution(solution)
 
     def plot(self, source_coordinates, sink_coordinates):
         """
@@ -550,23 +653,32 @@ class NetworkGraph:
         :rtype: list. [(), (), ()]
         """
 
-        edge_source_target = []
+        kinds = self.vertex_kind[self.edge_vertices].tolist()
+        sites = self.vertex_site[self.edge_vertices].tolist()
 
-        for edge in self.graph.es:
-            # determine is source of edge is a source or sink
-            if edge.source < self.number_of_sources:
-                source = ("source", self.vertex_to_source[edge.source])
-            else:
-                source = ("sink", self.vertex_to_sink[edge.source])
-            # determine if target of edge is a source or sink
-            if edge.target < self.number_of_sources:
-                target = ("source", self.vertex_to_source[edge.target])
-            else:
-                target = ("sink", self.vertex_to_sink[edge.target])
+        return [((VERTEX_KINDS[kind1], site1), (VERTEX_KINDS[kind2], site2))
+                for (kind1, kind2), (site1, site2) in zip(kinds, sites)]
 
-            edge_source_target.append((source, target))
+    def return_edge_coordinates(self, source_coordinates, sink_coordinates):
+        """
+        Method returning the coordinates of the source and target vertex of every edge.
+
+        :param source_coordinates: coordinates of every source.
+        :type source_coordinates: np.array. [[x1, y1], [x2, y2], ...]
+        :param sink_coordinates: coordinates of every sink.
+        :type sink_coordinates: np.array. [[x1, y1], [x2, y2], ...]
+        :return: coordinates of the source and target vertex of every edge in the order of
+                 return_edge_source_target_vertices().
+        :rtype: np.array. [[[x_source, y_source], [x_target, y_target]], ...]
+        """
+
+        source_coordinates = np.asarray(source_coordinates, dtype=float).reshape(-1, 2)
+        sink_coordinates = np.asarray(sink_coordinates, dtype=float).reshape(-1, 2)
+        vertex_coordinates = np.zeros((self.graph.vcount(), 2))
+        vertex_coordinates[self.source_vertices] = source_coordinates
+        vertex_coordinates[self.sink_vertices] = sink_coordinates
 
-        return edge_source_target
+        return vertex_coordinates[self.edge_vertices]
 
     def delete_edges(self, edges):
         """
@@ -578,17 +690,8 @@ class NetworkGraph:
         :return:
         """
 
-        edges_to_delete = []
-        for source, target in edges:
-            if source[0] == "source":
-                index_source = self.source_to_vertex[source[1]]
-            else:
-                index_source = self.sink_to_vertex[source[1]]
-            if target[0] == "source":
-                index_target = self.source_to_vertex[target[1]]
-            else:
-                index_target = self.sink_to_vertex[target[1]]
-            edges_to_delete.append((index_source, index_target))
+        vertices = self.site_vertices([site for edge in edges for site in edge]).reshape(-1, 2)
+        edges_to_delete = [(vertex1, vertex2) for vertex1, vertex2 in vertices.tolist()]
 
         self.graph.delete_edges(edges_to_delete)
         # update correspondence graph
@@ -596,6 +699,22 @@ class NetworkGraph:
         # update max_flow graph
         self.build_max_flow_graph()
 
+    def select_edges(self, edge_indices):
+        """
+        Method reducing the graph to the given edges. Edge attributes are kept.
+
+        :param edge_indices: indices of the edges to keep, in the order given by return_edge_source_target_vertices().
+        :type edge_indices: list. [0, 3, 4, ...]
+        :return:
+        """
+
+        self.graph = self.graph.subgraph_edges(np.asarray(edge_indices, dtype=np.int64).tolist(),
+                                               delete_vertices=False)
+        # update correspondence graph
+        self.build_correspondence_graph()
+        # update max_flow graph
+        self.build_max_flow_graph()
+
     def return_number_of_edges(self):
         """
         Method returning the total count of edges of the graph.
@@ -624,11 +743,7 @@ class NetworkGraph:
         :rtype: list. [(), (), ()]
         """
 
-        vertices = []
-        for vertex in self.graph.vs:
-            if vertex.index < self.number_of_sources:
-                vertices.append(("source", self.vertex_to_source[vertex.index]))
-            else:
-                vertices.append(("sink", self.vertex_to_sink[vertex.index]))
+        vertices = [(VERTEX_KINDS[kind], site) for kind, site in zip(self.vertex_kind.tolist(),
+                                                                     self.vertex_site.tolist())]
 
         return vertices
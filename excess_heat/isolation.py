@@ -0,0 +1,308 @@
+import logging
+import multiprocessing
+import os
+
+import numpy as np
+
+from .max_flow import create_max_flow_solver
+from .shared_arrays import SharedArrays, attach_shared_arrays, detach_shared_arrays, start_resource_tracker
+
+
+logger = logging.getLogger(__name__)
+
+# number of hours sent to a worker at once
+BATCH_SIZE = 730
+# seconds between two memory checks of the watchdog while a worker is busy
+WATCHDOG_INTERVAL = 1.0
+
+
+def process_rss(pid):
+    """
+    function returning the resident set size of a process.
+
+    :param pid: process id.
+    :type pid: int.
+    :return: resident set size in MB or None if it can not be determined on this platform.
+    :rtype: float or None.
+    """
+
+    try:
+        with open("/proc/" + str(pid) + "/statm", "r") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (IOError, OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / 1024 ** 2
+    except Exception:
+        return None
+
+
+def max_flow_worker(connection, backend):
+    """
+    function running in a worker process. It receives the max flow graph and batches of capacities and returns the
+    flow of every edge for every set of capacities. A batch is either sent with the message or given as a range of
+    the rows of capacities in shared memory.
+
+    :param connection: end of the pipe to the parent process.
+    :type connection: multiprocessing.connection.Connection.
+    :param backend: max flow backend of the worker.
+    :type backend: str {"auto", "igraph", "scipy", "numpy", "incremental"}.
+    :return:
+    """
+
+    solver = None
+    descriptors = None
+    while True:
+        message = connection.recv()
+        if message[0] == "graph":
+            _, number_of_vertices, edges = message
+            solver = create_max_flow_solver(backend, number_of_vertices, edges)
+        elif message[0] in ("solve", "solve_shared"):
+            if message[0] == "solve":
+                _, capacities, source_vertex, sink_vertex = message
+            else:
+                _, shared, start, end, source_vertex, sink_vertex = message
+                # only the capacities of the current batch stay attached
+                if shared != descriptors and descriptors is not None:
+                    detach_shared_arrays(descriptors)
+                descriptors = shared
+                capacities = attach_shared_arrays(descriptors)["capacities"][start:end]
+            flows = np.array([solver.solve(capacity, source_vertex, sink_vertex) for capacity in capacities])
+            del capacities
+            connection.send((flows, process_rss(os.getpid())))
+        else:
+            break
+    connection.close()
+
+
+class IsolatedMaxFlowSolver:
+    """
+    Solver running max flow computations in recyclable worker processes. It bounds the memory of long runs despite
+    the memory leak of igraph's maxflow. A worker is replaced after max_calls max flow computations or once its
+    resident set size exceeds max_rss. A watchdog checks the memory of busy workers; if a worker has to be killed or
+    dies, the unfinished batch is solved again by a fresh worker so no results are lost.
+    """
+
+    def __init__(self, backend="igraph", max_calls=8760, max_rss=None, max_retries=3, start_method=None):
+        """
+        Constructor of the solver.
+
+        :param backend: max flow backend used by the workers.
+        :type backend: str {"auto", "igraph", "scipy", "numpy", "incremental"}.
+        :param max_calls: number of max flow computations after which a worker is replaced.
+        :type max_calls: int.
+        :param max_rss: resident set size in MB after which a worker is replaced. Forked workers include the memory
+                        shared with the parent process. None disables the limit.
+        :type max_rss: float or None.
+        :param max_retries: number of times a batch is resubmitted after its worker was killed or died.
+        :type max_retries: int.
+        :param start_method: multiprocessing start method of the workers. Defaults to "fork" where available and
+                             "spawn" otherwise. With "spawn" the main module must be import safe.
+        :type start_method: str {"spawn", "fork", "forkserver"} or None.
+
+        Attributes:
+            calls: Number of max flow computations of the current worker. Int.
+            total_calls: Number of max flow computations of all workers. Int.
+            restarts: Number of replaced workers. Int.
+            peak_rss: Largest resident set size of a worker in MB. Float.
+        """
+
+        self.backend = backend
+        self.max_calls = max_calls
+        self.max_rss = max_rss
+        self.max_retries = max_retries
+        if start_method is None:
+            start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        self.context = multiprocessing.get_context(start_method)
+
+        self.process = None
+        self.connection = None
+        self.graph = None
+        self.calls = 0
+        self.total_calls = 0
+        self.restarts = 0
+        self.peak_rss = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start_worker(self):
+        """
+        Method starting a new worker process and sending it the current max flow graph.
+
+        :return:
+        """
+
+        start_resource_tracker()
+        connection, child_connection = self.context.Pipe()
+        process = self.context.Process(target=max_flow_worker, args=(child_connection, self.backend), daemon=True)
+        process.start()
+        child_connection.close()
+        self.process = process
+        self.connection = connection
+        self.calls = 0
+        if self.graph is not None:
+            self.connection.send(("graph",) + self.graph)
+
+    def stop_worker(self, kill=False):
+        """
+        Method stopping the current worker process.
+
+        :param kill: terminates the worker instead of asking it to exit.
+        :type kill: bool.
+        :return:
+        """
+
+        if self.process is None:
+            return
+        if not kill and self.process.is_alive():
+            try:
+                self.connection.send(("exit",))
+            except (IOError, OSError):
+                kill = True
+        if kill:
+            self.process.terminate()
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+        self.process = None
+        self.connection = None
+
+    def restart_worker(self, reason, kill=False):
+        """
+        Method replacing the current worker process by a new one.
+
+        :param reason: reason of the restart, which is logged.
+        :type reason: str.
+        :param kill: terminates the worker instead of asking it to exit.
+        :type kill: bool.
+        :return:
+        """
+
+        logger.info("restarting max flow worker %s after %d calls: %s", self.process.pid, self.calls, reason)
+        self.stop_worker(kill=kill)
+        self.restarts += 1
+        self.start_worker()
+
+    def set_graph(self, number_of_vertices, edges):
+        """
+        Method setting the max flow graph of the following computations.
+
+        :param number_of_vertices: number of vertices of the max flow graph.
+        :type number_of_vertices: int.
+        :param edges: undirected edges of the max flow graph as pairs of vertex IDs.
+        :type edges: list. [(vertex1, vertex2), ...]
+        :return:
+        """
+
+        graph = (number_of_vertices, [tuple(edge) for edge in edges])
+        if graph == self.graph and self.process is not None:
+            return
+        self.graph = graph
+        if self.process is None:
+            self.start_worker()
+        else:
+            self.connection.send(("graph",) + self.graph)
+
+    def solve_batch(self, capacities, source_vertex, sink_vertex):
+        """
+        Method solving a batch of max flow problems of the current graph in the worker process. The worker is watched
+        while it computes and replaced if it exceeds its memory budget or dies. In both cases the batch is solved
+        again.
+
+        :param capacities: capacities of the edges, one row per max flow problem, or the descriptors of SharedArrays
+                           with the array "capacities" and the range of its rows.
+        :type capacities: np.array or tuple. (dict, int, int)
+        :param source_vertex: vertex ID of the source.
+        :type source_vertex: int.
+        :param sink_vertex: vertex ID of the sink.
+        :type sink_vertex: int.
+        :return: flow of every edge, one row per max flow problem.
+        :rtype: np.array.
+        """
+
+        if isinstance(capacities, tuple):
+            message = ("solve_shared",) + capacities + (source_vertex, sink_vertex)
+            number_of_problems = capacities[2] - capacities[1]
+        else:
+            message = ("solve", capacities, source_vertex, sink_vertex)
+            number_of_problems = len(capacities)
+        for attempt in range(self.max_retries + 1):
+            if self.process is None:
+                self.start_worker()
+            try:
+                self.connection.send(message)
+                # watchdog observing the memory of the busy worker
+                while not self.connection.poll(WATCHDOG_INTERVAL):
+                    if not self.process.is_alive():
+                        raise EOFError("worker died")
+                    rss = process_rss(self.process.pid)
+                    if self.max_rss is not None and rss is not None and rss > 2 * self.max_rss:
+                        raise MemoryError("worker exceeded twice its memory budget with " + str(int(rss)) + " MB")
+                flows, rss = self.connection.recv()
+            except (EOFError, IOError, OSError, MemoryError) as e:
+                logger.warning("max flow worker failed on a batch of %d problems (attempt %d): %s",
+                               number_of_problems, attempt + 1, e)
+                self.restart_worker(str(e), kill=True)
+                continue
+
+            self.calls += number_of_problems
+            self.total_calls += number_of_problems
+            if rss is not None:
+                self.peak_rss = max(self.peak_rss, rss)
+            if self.calls >= self.max_calls:
+                self.restart_worker("call budget of " + str(self.max_calls) + " reached")
+            elif self.max_rss is not None and rss is not None and rss > self.max_rss:
+                logger.warning("max flow worker %s uses %d MB", self.process.pid, rss)
+                self.restart_worker("memory budget of " + str(self.max_rss) + " MB exceeded")
+            return flows
+
+        raise RuntimeError("max flow batch failed " + str(self.max_retries + 1) + " times")
+
+    def maximum_flows(self, network, source_capacities, sink_capacities):
+        """
+        Generator computing the maximum flow of a NetworkGraph for every time step in the worker processes. The
+        capacities of a batch are written to shared memory, so neither the batch nor its retries copy them through
+        the pipe to the worker.
+
+        :param network: network of which the maximum flows are computed.
+        :type network: NetworkGraph.
+        :param source_capacities: capacity of each source, one row per time step.
+        :type source_capacities: array like.
+        :param sink_capacities: demand of each sink, one row per time step.
+        :type sink_capacities: array like.
+        :return: yields the same touple as NetworkGraph.maximum_flow() for every time step.
+        :rtype: generator of tuples. ([], [], [])
+        """
+
+        self.set_graph(network.max_flow_graph.vcount(), network.max_flow_graph.get_edgelist())
+        number_of_steps = len(source_capacities)
+        start = 0
+        while start < number_of_steps:
+            # never send more problems than the worker has left in its call budget
+            size = max(1, min(BATCH_SIZE, self.max_calls - self.calls))
+            end = min(start + size, number_of_steps)
+            capacities = np.array([network.return_flow_capacities(source_capacity, sink_capacity) for
+                                   source_capacity, sink_capacity in zip(source_capacities[start:end],
+                                                                         sink_capacities[start:end])], dtype=float)
+            with SharedArrays({"capacities": capacities}) as shared:
+                flows = self.solve_batch((shared.descriptors, 0, end - start), network.infinite_source_vertex,
+                                         network.infinite_sink_vertex)
+            for flow in flows:
+                yield network.split_flow_solution(flow)
+            start = end
+
+    def close(self):
+        """
+        Method stopping the worker process.
+
+        :return:
+        """
+
+        self.stop_worker()
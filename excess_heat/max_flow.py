@@ -0,0 +1,533 @@
+import numpy as np
+
+
+# vertex counts used to choose a backend automatically. Below SCIPY_BACKEND_MIN_VERTICES the per call overhead of
+# scipy outweighs its faster algorithm, the dense NumPy backend is only used for small graphs if igraph is missing.
+# Per call on the minimum spanning trees of synthetic regions igraph and scipy took 0.06 and 1.1 ms at 55 vertices
+# (DK05), 1.0 and 0.8 ms at 300, 11 and 2.7 ms at 1200 and 160 and 14 ms at 4500 vertices. The threshold lies above
+# the break even point, as small gains do not pay for the rounding of the scipy backend.
+SCIPY_BACKEND_MIN_VERTICES = 1000
+NUMPY_BACKEND_MAX_VERTICES = 64
+# integer value of the summed capacity of the source edges in the scipy backend. It stays inside the int32 range used
+# by scipy.sparse.csgraph even if two parallel arcs are merged.
+SCIPY_CAPACITY_LIMIT = 2 ** 29
+# smallest positive float, guards the divisions of the incremental backend
+MIN_POSITIVE_FLOAT = np.finfo(float).tiny
+
+
+class IgraphMaxFlow:
+    """
+    Max flow backend using the push-relabel implementation of igraph. Capacities are normalized so that the largest
+    finite capacity is 1 and unrestricted edges get a capacity of 1000.
+    """
+
+    name = "igraph"
+
+    def __init__(self, number_of_vertices, edges):
+        """
+        Constructor of the backend.
+
+        :param number_of_vertices: number of vertices of the max flow graph.
+        :type number_of_vertices: int.
+        :param edges: undirected edges of the max flow graph as pairs of vertex IDs.
+        :type edges: array like. [(vertex1, vertex2), ...]
+        """
+        from igraph import Graph
+
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.graph = Graph(n=number_of_vertices, edges=[tuple(edge) for edge in edges.tolist()])
+        # igraph stores undirected edges from the smaller to the larger vertex ID and signs the flow accordingly
+        self.signs = np.where(edges[:, 0] > edges[:, 1], -1.0, 1.0)
+
+    def solve(self, capacities, source_vertex, sink_vertex):
+        """
+        Method computing the maximum flow from source_vertex to sink_vertex.
+
+        :param capacities: capacity of every edge. Unrestricted edges are indicated by np.inf.
+        :type capacities: np.array.
+        :param source_vertex: vertex ID of the source.
+        :type source_vertex: int.
+        :param sink_vertex: vertex ID of the sink.
+        :type sink_vertex: int.
+        :return: flow through every edge. Positive if the flow is directed from the first to the second vertex of the
+                 edge.
+        :rtype: np.array.
+        """
+
+        capacities = np.asarray(capacities, dtype=float)
+        finite = np.isfinite(capacities)
+        maximum = np.max(capacities[finite], initial=0)
+        if maximum <= 0:
+            return np.zeros(len(capacities))
+        # find normalization so that the max capacity is 1
+        normalization = 1 / maximum
+        flow_capacities = np.where(finite, capacities * normalization, 1000)
+        self.graph.es["flow_capacity"] = flow_capacities
+        # NOTE igraph maxflow leaks memory including version 0.7.1.post6 (does not free some solution vector,
+        # hence leaks around 8*(number_of_sources + number_of_sinks + number_of_edges) bytes of memory every call)
+        solution = self.graph.maxflow(source_vertex, sink_vertex, "flow_capacity")
+
+        # rescale flow to original, after weight normalization
+        return self.signs * np.array(solution.flow) / normalization
+
+
+class PairedEdges:
+    """
+    Helper merging parallel undirected edges into pairs of directed arcs. The flow computed for an arc pair is split
+    back onto the parallel edges in proportion to their capacity. Self loops never carry flow.
+    """
+
+    def __init__(self, number_of_vertices, edges):
+        """
+        Constructor of the helper.
+
+        :param number_of_vertices: number of vertices of the graph.
+        :type number_of_vertices: int.
+        :param edges: undirected edges of the graph as pairs of vertex IDs.
+        :type edges: array like. [(vertex1, vertex2), ...]
+        """
+
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.number_of_vertices = number_of_vertices
+        self.number_of_edges = len(edges)
+        self.loop = edges[:, 0] == edges[:, 1]
+        self.u = edges[:, 0]
+        self.v = edges[:, 1]
+
+        # every undirected edge is represented by an arc in each direction
+        keys = np.concatenate((self.u * number_of_vertices + self.v, self.v * number_of_vertices + self.u))
+        keys = keys[np.concatenate((~self.loop, ~self.loop))]
+        self.keys, inverse = np.unique(keys, return_inverse=True)
+        self.arc_of_edge = np.full(self.number_of_edges, -1)
+        self.arc_of_edge[~self.loop] = inverse[:np.count_nonzero(~self.loop)]
+        self.reverse_arc_of_edge = np.full(self.number_of_edges, -1)
+        self.reverse_arc_of_edge[~self.loop] = inverse[np.count_nonzero(~self.loop):]
+        # edges between the same vertices in either direction share the arc from the smaller to the larger vertex
+        self.pair_arc_of_edge = np.where(self.u < self.v, self.arc_of_edge, self.reverse_arc_of_edge)
+        self.orientation = np.where(self.u < self.v, 1.0, -1.0)
+        self.arc_rows = self.keys // number_of_vertices
+        self.arc_columns = self.keys % number_of_vertices
+
+    def arc_capacities(self, capacities):
+        """
+        Method summing the capacities of parallel edges for every arc.
+
+        :param capacities: capacity of every edge.
+        :type capacities: np.array.
+        :return: capacity of every arc.
+        :rtype: np.array.
+        """
+
+        capacities = np.asarray(capacities, dtype=float)[~self.loop]
+        arcs = np.concatenate((self.arc_of_edge[~self.loop], self.reverse_arc_of_edge[~self.loop]))
+        return np.bincount(arcs, weights=np.concatenate((capacities, capacities)), minlength=len(self.keys))
+
+    def edge_flows(self, arc_flows, capacities):
+        """
+        Method distributing the net flow between every pair of vertices onto the edges connecting them.
+
+        :param arc_flows: net flow of every arc.
+        :type arc_flows: np.array.
+        :param capacities: capacity of every edge. Unrestricted edges are indicated by np.inf.
+        :type capacities: np.array.
+        :return: flow through every edge. Positive if the flow is directed from the first to the second vertex of the
+                 edge.
+        :rtype: np.array.
+        """
+
+        capacities = np.asarray(capacities, dtype=float)
+        # parallel unrestricted edges share the flow evenly, otherwise the flow is split by capacity
+        infinite = np.isinf(capacities) & ~self.loop
+        arc = self.pair_arc_of_edge
+        weights = np.where(self.loop, 0, capacities)
+        has_infinite = np.bincount(arc[infinite], minlength=len(self.keys)) > 0
+        weights = np.where(has_infinite[arc], infinite.astype(float), weights)
+        weights[self.loop] = 0
+        totals = np.bincount(arc[~self.loop], weights=weights[~self.loop], minlength=len(self.keys))
+
+        flows = np.zeros(self.number_of_edges)
+        valid = ~self.loop
+        share = np.divide(weights[valid], totals[arc[valid]], out=np.zeros(np.count_nonzero(valid)),
+                          where=totals[arc[valid]] > 0)
+        flows[valid] = self.orientation[valid] * arc_flows[arc[valid]] * share
+        return flows
+
+
+class ScipyMaxFlow:
+    """
+    Max flow backend using scipy.sparse.csgraph.maximum_flow on a CSR representation of the graph. The capacities are
+    scaled so that the summed capacity of the source edges is SCIPY_CAPACITY_LIMIT and rounded down to integers. Every
+    restricted edge loses less than one unit, hence the maximum flow is at most number of restricted edges /
+    SCIPY_CAPACITY_LIMIT of the source capacity below the exact one, e.g. 2e-5 for 10000 sources and sinks.
+    """
+
+    name = "scipy"
+
+    def __init__(self, number_of_vertices, edges, method="dinic"):
+        """
+        Constructor of the backend.
+
+        :param number_of_vertices: number of vertices of the max flow graph.
+        :type number_of_vertices: int.
+        :param edges: undirected edges of the max flow graph as pairs of vertex IDs.
+        :type edges: array like. [(vertex1, vertex2), ...]
+        :param method: max flow algorithm of scipy.
+        :type method: str {"dinic", "edmonds_karp"}.
+        """
+
+        self.number_of_vertices = number_of_vertices
+        self.method = method
+        self.pairs = PairedEdges(number_of_vertices, edges)
+        # the sparsity pattern stays the same for every call, only the data changes
+        self.indptr = np.searchsorted(self.pairs.arc_rows, np.arange(number_of_vertices + 1)).astype(np.int32)
+        self.indices = self.pairs.arc_columns.astype(np.int32)
+
+    def solve(self, capacities, source_vertex, sink_vertex):
+        """
+        Method computing the maximum flow from source_vertex to sink_vertex.
+
+        :param capacities: capacity of every edge. Unrestricted edges are indicated by np.inf.
+        :type capacities: np.array.
+        :param source_vertex: vertex ID of the source.
+        :type source_vertex: int.
+        :param sink_vertex: vertex ID of the sink.
+        :type sink_vertex: int.
+        :return: flow through every edge. Positive if the flow is directed from the first to the second vertex of the
+                 edge.
+        :rtype: np.array.
+        """
+        from scipy.sparse import csr_matrix
+        from scipy.sparse.csgraph import maximum_flow
+
+        capacities = np.asarray(capacities, dtype=float)
+        finite = np.isfinite(capacities)
+        maximum = np.max(capacities[finite], initial=0)
+        if maximum <= 0 or len(self.indices) == 0:
+            return np.zeros(len(capacities))
+
+        # the maximum flow can not exceed the summed capacity of the edges of the source vertex
+        source_edges = (self.pairs.u == source_vertex) | (self.pairs.v == source_vertex)
+        bound = np.sum(capacities[source_edges & finite])
+        if bound <= 0:
+            return np.zeros(len(capacities))
+        # no edge can carry more than the bound, hence larger capacities are cut to it
+        scale = SCIPY_CAPACITY_LIMIT / bound
+        scaled = np.where(finite, np.minimum(np.floor(capacities * scale), SCIPY_CAPACITY_LIMIT + 1),
+                          SCIPY_CAPACITY_LIMIT + 1)
+
+        data = np.minimum(self.pairs.arc_capacities(scaled), 2 * SCIPY_CAPACITY_LIMIT).astype(np.int32)
+        graph = csr_matrix((data, self.indices, self.indptr), shape=(self.number_of_vertices,) * 2)
+        flow = maximum_flow(graph, source_vertex, sink_vertex, method=self.method).flow.tocoo()
+
+        # look up the net flow of every arc
+        arc_flows = np.zeros(len(self.pairs.keys))
+        positions = np.searchsorted(self.pairs.keys, flow.row.astype(np.int64) * self.number_of_vertices + flow.col)
+        arc_flows[positions] = flow.data
+
+        return self.pairs.edge_flows(arc_flows, scaled) / scale
+
+
+class NumpyMaxFlow:
+    """
+    Max flow backend implementing the Edmonds-Karp algorithm on a dense residual matrix. It avoids any solver setup
+    costs and is meant for small graphs.
+    """
+
+    name = "numpy"
+
+    def __init__(self, number_of_vertices, edges):
+        """
+        Constructor of the backend.
+
+        :param number_of_vertices: number of vertices of the max flow graph.
+        :type number_of_vertices: int.
+        :param edges: undirected edges of the max flow graph as pairs of vertex IDs.
+        :type edges: array like. [(vertex1, vertex2), ...]
+        """
+
+        self.number_of_vertices = number_of_vertices
+        self.pairs = PairedEdges(number_of_vertices, edges)
+
+    def solve(self, capacities, source_vertex, sink_vertex):
+        """
+        Method computing the maximum flow from source_vertex to sink_vertex.
+
+        :param capacities: capacity of every edge. Unrestricted edges are indicated by np.inf.
+        :type capacities: np.array.
+        :param source_vertex: vertex ID of the source.
+        :type source_vertex: int.
+        :param sink_vertex: vertex ID of the sink.
+        :type sink_vertex: int.
+        :return: flow through every edge. Positive if the flow is directed from the first to the second vertex of the
+                 edge.
+        :rtype: np.array.
+        """
+
+        capacities = np.asarray(capacities, dtype=float)
+        n = self.number_of_vertices
+        capacity = np.zeros((n, n))
+        capacity[self.pairs.arc_rows, self.pairs.arc_columns] = self.pairs.arc_capacities(capacities)
+        flow = np.zeros((n, n))
+        tolerance = 1e-12 * max(np.max(capacities[np.isfinite(capacities)], initial=0), 1)
+
+        while True:
+            # breadth first search for the shortest augmenting path in the residual graph
+            residual = capacity - flow
+            parent = np.full(n, -1)
+            parent[source_vertex] = source_vertex
+            frontier = np.array([source_vertex])
+            while len(frontier) and parent[sink_vertex] == -1:
+                rows, columns = np.nonzero(residual[frontier] > tolerance)
+                new = parent[columns] == -1
+                columns, first = np.unique(columns[new], return_index=True)
+                parent[columns] = frontier[rows[new][first]]
+                frontier = columns
+            if parent[sink_vertex] == -1:
+                break
+
+            path = [sink_vertex]
+            while path[-1] != source_vertex:
+                path.append(parent[path[-1]])
+            path = np.array(path[::-1])
+            bottleneck = np.min(residual[path[:-1], path[1:]])
+            if np.isinf(bottleneck):
+                raise ValueError("Maximum flow is unbounded, an unrestricted path connects source and sink vertex")
+            flow[path[:-1], path[1:]] += bottleneck
+            flow[path[1:], path[:-1]] -= bottleneck
+
+        return self.pairs.edge_flows(flow[self.pairs.arc_rows, self.pairs.arc_columns], capacities)
+
+
+def repair_terminal_flows(flows, capacities, components, targets):
+    """
+    function repairing the flows of the edges of the source and sink vertex for new capacities. Flow above the new
+    capacity of an edge is cancelled, then the flow of every component is raised or lowered to its target. Missing
+    flow is pushed in proportion to the remaining capacity of the edges, surplus flow is cancelled in proportion to
+    their flow.
+
+    :param flows: previous flow of every edge.
+    :type flows: np.array.
+    :param capacities: new capacity of every edge.
+    :type capacities: np.array.
+    :param components: component of every edge.
+    :type components: np.array.
+    :param targets: flow of every component.
+    :type targets: np.array.
+    :return: flow of every edge.
+    :rtype: np.array.
+    """
+
+    flows = np.minimum(flows, capacities)
+    slack = capacities - flows
+    totals = np.bincount(components, weights=flows, minlength=len(targets))
+    slack_totals = np.bincount(components, weights=slack, minlength=len(targets))
+    push = np.maximum(targets - totals, 0) / (slack_totals + MIN_POSITIVE_FLOAT)
+    cancel = np.maximum(totals - targets, 0) / (totals + MIN_POSITIVE_FLOAT)
+    flows = flows + slack * push[components] - flows * cancel[components]
+
+    return np.minimum(np.maximum(flows, 0), capacities)
+
+
+class IncrementalMaxFlow:
+    """
+    Max flow backend repairing the flow of its previous call instead of solving from zero, meant for the consecutive
+    hours of a profile. In the max flow graph of NetworkGraph only the edges of the source and sink vertex are
+    restricted, hence the residual graph of the other edges never changes and the maximum flow of every connected
+    component is the smaller one of its supply and demand. A call cancels the flow above the new capacities, pushes or
+    cancels the difference to the maximum flow of every component and routes the flows of the sites along a spanning
+    forest of the unrestricted edges, whose sparse LU factorization is computed once per graph. Graphs with further
+    restricted edges are solved from zero by the fallback backend.
+
+    The backend is approximate. The flow of every component is its maximum flow, but the maximum flow is not unique
+    and its split among the sites and edges follows the previous call instead of the other backends, hence the edge
+    flows and the pipes sized by them differ. select_max_flow_backend() never chooses it.
+    """
+
+    name = "incremental"
+
+    def __init__(self, number_of_vertices, edges, fallback="auto"):
+        """
+        Constructor of the backend.
+
+        :param number_of_vertices: number of vertices of the max flow graph.
+        :type number_of_vertices: int.
+        :param edges: undirected edges of the max flow graph as pairs of vertex IDs.
+        :type edges: array like. [(vertex1, vertex2), ...]
+        :param fallback: backend solving graphs with restricted edges between other vertices than the source and sink
+                         vertex.
+        :type fallback: str {"auto", "igraph", "scipy", "numpy"}.
+        """
+
+        self.number_of_vertices = number_of_vertices
+        self.edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        self.fallback = fallback
+        self.fallback_solver = None
+        # specified by prepare() for the source and sink vertex of the first call
+        self.terminals = None
+
+    def prepare(self, source_vertex, sink_vertex):
+        """
+        Method finding the edges of the source and sink vertex, the components and the spanning forest of the other
+        edges and factorizing the flow conservation on the spanning forest. The flows are reset to zero.
+
+        :param source_vertex: vertex ID of the source.
+        :type source_vertex: int.
+        :param sink_vertex: vertex ID of the sink.
+        :type sink_vertex: int.
+        :return:
+        """
+        from scipy.sparse import coo_matrix, csc_matrix
+        from scipy.sparse.csgraph import connected_components, minimum_spanning_tree
+        from scipy.sparse.linalg import splu
+
+        n = self.number_of_vertices
+        number_of_edges = len(self.edges)
+        u, v = self.edges[:, 0], self.edges[:, 1]
+        source_edges = np.nonzero((u == source_vertex) | (v == source_vertex))[0]
+        sink_edges = np.nonzero((u == sink_vertex) | (v == sink_vertex))[0]
+        terminal = np.zeros(number_of_edges, dtype=bool)
+        terminal[source_edges] = True
+        terminal[sink_edges] = True
+        self.internal_edges = np.nonzero(~terminal & (u != v))[0]
+
+        # spanning forest of the unrestricted edges. The later edges are preferred, in the max flow graph of
+        # NetworkGraph these connect coherent sites without costs. Of parallel edges only the preferred one is used.
+        weights = (number_of_edges - self.internal_edges).astype(float)
+        pairs = np.sort(self.edges[self.internal_edges], axis=1)
+        _, preferred = np.unique(pairs[::-1, 0] * n + pairs[::-1, 1], return_index=True)
+        preferred = len(pairs) - 1 - preferred
+        graph = coo_matrix((weights[preferred], (pairs[preferred, 0], pairs[preferred, 1])), shape=(n, n)).tocsr()
+        self.number_of_components, components = connected_components(graph, directed=False)
+        self.tree_edges = number_of_edges - minimum_spanning_tree(graph).tocoo().data.astype(np.int64)
+
+        # edges of the source vertex followed by the edges of the sink vertex with the site at their other end, the
+        # sign of a flow towards the sink vertex and the component, components of sink edges are counted separately
+        source_ends = u[source_edges] == source_vertex
+        sink_ends = v[sink_edges] == sink_vertex
+        self.terminal_edges = np.concatenate((source_edges, sink_edges))
+        self.terminal_sites = np.concatenate((np.where(source_ends, v[source_edges], u[source_edges]),
+                                              np.where(sink_ends, u[sink_edges], v[sink_edges])))
+        self.terminal_signs = np.concatenate((np.where(source_ends, 1.0, -1.0), np.where(sink_ends, 1.0, -1.0)))
+        self.terminal_components = components[self.terminal_sites]
+        self.terminal_components[len(source_edges):] += self.number_of_components
+        # outflow minus inflow of the site along the spanning forest per unit of flow
+        self.terminal_balances = np.repeat([1.0, -1.0], [len(source_edges), len(sink_edges)])
+
+        # flow conservation of every vertex but one per component determines the flows of the spanning forest
+        _, roots = np.unique(components, return_index=True)
+        self.rows = np.setdiff1d(np.arange(n), roots)
+        self.lu = None
+        if len(self.tree_edges):
+            row_of_vertex = np.full(n, -1)
+            row_of_vertex[self.rows] = np.arange(len(self.rows))
+            rows = row_of_vertex[self.edges[self.tree_edges].T.reshape(-1)]
+            columns = np.tile(np.arange(len(self.tree_edges)), 2)
+            values = np.repeat([1.0, -1.0], len(self.tree_edges))
+            valid = rows >= 0
+            self.lu = splu(csc_matrix((values[valid], (rows[valid], columns[valid])),
+                                      shape=(len(self.rows), len(self.tree_edges))))
+
+        self.flows = np.zeros(len(self.terminal_edges))
+        self.terminals = (source_vertex, sink_vertex)
+
+    def solve(self, capacities, source_vertex, sink_vertex):
+        """
+        Method computing the maximum flow from source_vertex to sink_vertex, starting from the flow of the previous
+        call.
+
+        :param capacities: capacity of every edge. Unrestricted edges are indicated by np.inf.
+        :type capacities: np.array.
+        :param source_vertex: vertex ID of the source.
+        :type source_vertex: int.
+        :param sink_vertex: vertex ID of the sink.
+        :type sink_vertex: int.
+        :return: flow through every edge. Positive if the flow is directed from the first to the second vertex of the
+                 edge.
+        :rtype: np.array.
+        """
+
+        capacities = np.asarray(capacities, dtype=float)
+        if self.terminals != (source_vertex, sink_vertex):
+            self.prepare(source_vertex, sink_vertex)
+        terminal_capacities = capacities[self.terminal_edges]
+        if not np.isfinite(terminal_capacities).all() or np.isfinite(capacities[self.internal_edges]).any():
+            if self.fallback_solver is None:
+                self.fallback_solver = create_max_flow_solver(self.fallback, self.number_of_vertices, self.edges)
+            return self.fallback_solver.solve(capacities, source_vertex, sink_vertex)
+
+        # the maximum flow of every component is the smaller one of its supply and demand
+        supply, demand = np.bincount(self.terminal_components, weights=terminal_capacities,
+                                     minlength=2 * self.number_of_components).reshape(2, -1)
+        targets = np.minimum(supply, demand)
+        self.flows = repair_terminal_flows(self.flows, terminal_capacities, self.terminal_components,
+                                           np.concatenate((targets, targets)))
+
+        solution = np.zeros(len(self.edges))
+        solution[self.terminal_edges] = self.terminal_signs * self.flows
+        if self.lu is not None:
+            balances = np.bincount(self.terminal_sites, weights=self.terminal_balances * self.flows,
+                                   minlength=self.number_of_vertices)
+            solution[self.tree_edges] = self.lu.solve(balances[self.rows])
+
+        return solution
+
+
+MAX_FLOW_BACKENDS = {"igraph": IgraphMaxFlow, "scipy": ScipyMaxFlow, "numpy": NumpyMaxFlow,
+                     "incremental": IncrementalMaxFlow}
+
+
+def select_max_flow_backend(number_of_vertices, number_of_edges):
+    """
+    function choosing a max flow backend by the size of the graph. The approximate incremental backend is never
+    chosen.
+
+    :param number_of_vertices: number of vertices of the max flow graph.
+    :type number_of_vertices: int.
+    :param number_of_edges: number of edges of the max flow graph.
+    :type number_of_edges: int.
+    :return: name of the backend.
+    :rtype: str {"igraph", "scipy", "numpy"}.
+    """
+
+    available = []
+    for backend, module in (("scipy", "scipy.sparse.csgraph"), ("igraph", "igraph")):
+        try:
+            __import__(module)
+            available.append(backend)
+        except ImportError:
+            pass
+
+    if number_of_vertices >= SCIPY_BACKEND_MIN_VERTICES and "scipy" in available:
+        return "scipy"
+    if "igraph" in available:
+        return "igraph"
+    if number_of_vertices > NUMPY_BACKEND_MAX_VERTICES and "scipy" in available:
+        return "scipy"
+    return "numpy"
+
+
+def create_max_flow_solver(backend, number_of_vertices, edges, fallback="auto"):
+    """
+    function creating a max flow solver for a fixed graph.
+
+    :param backend: name of the backend or "auto" to choose it by the size of the graph.
+    :type backend: str {"auto", "igraph", "scipy", "numpy", "incremental"}.
+    :param number_of_vertices: number of vertices of the max flow graph.
+    :type number_of_vertices: int.
+    :param edges: undirected edges of the max flow graph as pairs of vertex IDs.
+    :type edges: array like. [(vertex1, vertex2), ...]
+    :param fallback: fallback backend of the incremental backend.
+    :type fallback: str {"auto", "igraph", "scipy", "numpy"}.
+    :return: solver providing a solve(capacities, source_vertex, sink_vertex) method.
+    :rtype: IgraphMaxFlow, ScipyMaxFlow, NumpyMaxFlow or IncrementalMaxFlow.
+    """
+
+    if backend == "auto":
+        backend = select_max_flow_backend(number_of_vertices, len(edges))
+    if backend not in MAX_FLOW_BACKENDS:
+        raise ValueError("Unknown max flow backend " + str(backend) + ". Choose one of " +
+                         str(["auto"] + list(MAX_FLOW_BACKENDS)))
+
+    if backend == "incremental":
+        return IncrementalMaxFlow(number_of_vertices, edges, fallback)
+    return MAX_FLOW_BACKENDS[backend](number_of_vertices, edges)
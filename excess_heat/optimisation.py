@@ -0,0 +1,370 @@
+import logging
+import time
+
+import numpy as np
+
+from .CM1 import PIPE_CAPACITIES, PIPE_COSTS
+
+
+logger = logging.getLogger(__name__)
+
+# hours per period of the capacity constraint, equal to the order of the moving average used to size the pipes
+HOURS_PER_PERIOD = 24
+# hours aggregated into one time slice of the network design. The pipes are sized by daily mean flows, hence slices of
+# whole days lose little and solve several times faster than hourly slices.
+LP_HOURS_PER_SLICE = 24
+# number of the shortest candidate lines of every site kept for the network design, besides the minimum spanning tree
+LP_CANDIDATES_PER_SITE = 2
+# default time limit of the network design in seconds, the best solution found so far is used once it is hit
+LP_TIME_LIMIT = 120
+# default relative gap between the objective and its bound at which the network design solver stops
+LP_MIP_REL_GAP = 0.01
+
+
+def linear_pipe_cost(capacity_bounds=None):
+    """
+    function approximating the pipe costs by a fixed cost per meter and a cost per meter and MW of capacity. The line
+    runs through the cheapest pipe and the cheapest pipe covering the capacity bound. The costs of the pipes are
+    concave in their capacity, hence the line never exceeds the cost of a real pipe of a capacity within the bound.
+
+    :param capacity_bounds: upper bound of the capacity of every line in MW. None uses the largest pipe.
+    :type capacity_bounds: np.array or None.
+    :return: fixed cost in €/m, capacity cost in €/m/MW and capacity of the pipe the line runs through in MW, one per
+             capacity bound.
+    :rtype: tuple of floats or np.array.
+    """
+
+    # the last pipe is a sentinel for unlimited capacity
+    capacities = np.array(PIPE_CAPACITIES[:-1], dtype=float)
+    costs = np.array(PIPE_COSTS[:-1], dtype=float)
+    if capacity_bounds is None:
+        pipes = len(capacities) - 1
+    else:
+        pipes = np.minimum(np.searchsorted(capacities, capacity_bounds), len(capacities) - 1)
+    # lines within the cheapest pipe cost the same for any capacity
+    slope = (costs[pipes] - costs[0]) / np.maximum(capacities[pipes] - capacities[0], capacities[0])
+    fixed = costs[0] - slope * capacities[0]
+
+    return fixed, slope, capacities[pipes]
+
+
+def typical_periods(heat_source_profiles, heat_sink_profiles, number_of_periods, seed=0):
+    """
+    function selecting typical days by k-means clustering of the daily profiles of all sources and sinks. Every
+    cluster is represented by the day closest to its centroid.
+
+    :param heat_source_profiles: capacity of each source, one row per hour.
+    :type heat_source_profiles: np.array.
+    :param heat_sink_profiles: demand of each sink, one row per hour.
+    :type heat_sink_profiles: np.array.
+    :param number_of_periods: number of typical days.
+    :type number_of_periods: int.
+    :param seed: seed of the k-means initialization.
+    :type seed: int.
+    :return: hours of the typical days and the number of days each of them represents.
+    :rtype: tuple of np.array (number_of_periods * 24) and np.array (number_of_periods).
+    """
+    from scipy.cluster.vq import kmeans2
+
+    number_of_hours = len(heat_source_profiles)
+    if number_of_hours % HOURS_PER_PERIOD != 0:
+        raise ValueError("Typical periods require profiles of whole days")
+    number_of_days = number_of_hours // HOURS_PER_PERIOD
+    if number_of_periods >= number_of_days:
+        return np.arange(number_of_hours), np.ones(number_of_days)
+
+    profiles = np.concatenate((heat_source_profiles, heat_sink_profiles), axis=1)
+    # scale every site to the same range so large sites do not dominate the clustering
+    scale = np.max(profiles, axis=0)
+    profiles = np.divide(profiles, scale, out=np.zeros_like(profiles, dtype=float), where=scale > 0)
+    days = profiles.reshape(number_of_days, -1)
+
+    centroids, labels = kmeans2(days, number_of_periods, minit="++", seed=seed)
+    representatives = []
+    weights = []
+    for cluster in range(number_of_periods):
+        members = np.nonzero(labels == cluster)[0]
+        if len(members) == 0:
+            continue
+        closest = members[np.argmin(np.sum((days[members] - centroids[cluster]) ** 2, axis=1))]
+        representatives.append(closest)
+        weights.append(len(members))
+
+    hours = (np.array(representatives)[:, None] * HOURS_PER_PERIOD + np.arange(HOURS_PER_PERIOD)).ravel()
+    return hours, np.array(weights, dtype=float)
+
+
+
+
+def time_slices(heat_source_profiles, heat_sink_profiles, day_weights, hours_per_slice=LP_HOURS_PER_SLICE):
+    """
+    function aggregating consecutive hours of every day into time slices of their mean supply and demand.
+
+    :param heat_source_profiles: capacity of each source, one row per hour of whole or partial days.
+    :type heat_source_profiles: np.array.
+    :param heat_sink_profiles: demand of each sink, one row per hour.
+    :type heat_sink_profiles: np.array.
+    :param day_weights: number of days every day represents.
+    :type day_weights: np.array.
+    :param hours_per_slice: number of hours of a time slice.
+    :type hours_per_slice: int.
+    :return: mean supply and demand of every slice, its day, its share of the hours of its day and the number of
+             hours of the year it represents.
+    :rtype: tuple of np.array.
+    """
+
+    day_of_hour = np.arange(len(heat_source_profiles)) // HOURS_PER_PERIOD
+    slice_of_hour = day_of_hour * HOURS_PER_PERIOD + np.arange(len(heat_source_profiles)) % HOURS_PER_PERIOD // \
+        hours_per_slice
+    _, starts, hours = np.unique(slice_of_hour, return_index=True, return_counts=True)
+    slice_day = day_of_hour[starts]
+    source_capacities = np.add.reduceat(heat_source_profiles, starts, axis=0) / hours[:, None]
+    sink_capacities = np.add.reduceat(heat_sink_profiles, starts, axis=0) / hours[:, None]
+    day_share = hours / np.bincount(day_of_hour)[slice_day]
+
+    return source_capacities, sink_capacities, slice_day, day_share, day_weights[slice_day] * hours
+
+
+def candidate_lines(network, number_per_site=LP_CANDIDATES_PER_SITE):
+    """
+    function selecting the candidate lines of the network design, the shortest lines of every site and the lines of
+    the minimum spanning tree. The networks of the pruning heuristic are subsets of the tree, hence they stay
+    feasible designs.
+
+    :param network: network with a "distance" edge attribute.
+    :type network: NetworkGraph.
+    :param number_per_site: number of the shortest lines kept at every site.
+    :type number_per_site: int.
+    :return: indices of the candidate lines in ascending order.
+    :rtype: np.array.
+    """
+
+    number_of_lines = network.graph.ecount()
+    lengths = np.array(network.get_edge_attribute("distance"), dtype=float)
+    # rank the lines of every site by their length, the loops of a site with itself carry no flow
+    by_length = np.argsort(lengths, kind="stable")
+    by_length = by_length[network.edge_vertices[by_length, 0] != network.edge_vertices[by_length, 1]]
+    ends = network.edge_vertices[by_length].ravel()
+    lines = np.repeat(by_length, 2)
+    order = np.argsort(ends, kind="stable")
+    ends, lines = ends[order], lines[order]
+    first = np.searchsorted(ends, ends)
+    shortest = lines[np.arange(len(ends)) - first < number_per_site]
+
+    graph = network.correspondence_graph
+    tree = np.array(graph.spanning_tree(weights=graph.es["distance"], return_tree=False), dtype=np.int64)
+
+    return np.union1d(shortest, tree[tree < number_of_lines])
+
+
+def design_network_lp(network, heat_source_profiles, heat_sink_profiles, investment_period,
+                      transmission_line_threshold, number_of_typical_periods=None, mip=True, time_limit=LP_TIME_LIMIT,
+                      mip_rel_gap=LP_MIP_REL_GAP):
+    r"""
+    Function selecting the transmission lines of a network in one time coupled linear program instead of pruning a
+    minimum spanning tree with repeated max flow simulations.
+
+    Every candidate edge e of the network gets a build variable y_e, a capacity c_e, a build variable z_e of the
+    largest pipe and two flow variables per time slice, one per direction. A slice is the mean of LP_HOURS_PER_SLICE
+    consecutive hours. Sources supply at most their capacity and sinks take at most their demand. Coherent sources
+    and sinks are connected by free edges. The daily mean flow of an edge is limited by its capacity, which mimics
+    the 24 hour moving average used to size the pipes. The costs of the pipes up to the daily flow bound of an edge
+    are approximated by linear_pipe_cost(), the lower the bound the closer. The largest pipe has no capacity limit
+    and its real costs, it is only an option of edges whose bound exceeds the other pipes. The objective is
+
+        min  sum_e length_e * (fixed_e * y_e + slope_e * c_e + largest pipe cost * z_e) / investment_period
+             - transmission_line_threshold * annual delivered heat
+
+    hence an edge is only built if the heat delivered through it pays for the line at the threshold cost per flow.
+    The cost of heat exchangers is not part of the objective, just like in the pruning heuristic.
+
+    The model is kept small before it is solved. Edges which cannot pay for themselves with their largest annual flow
+    are removed by screen_edges() and only the candidate_lines() are kept. Slices without any possible flow are
+    dropped. The capacity and the flows of every edge are bounded by the flow bounds of annual_flow_bounds() for a
+    day and a slice, which tightens the linear relaxation.
+
+    The time limit applies to the whole function. The solver stops at the time limit or the relative gap with the
+    best integer solution found so far. If it has not found one, the linear relaxation is solved in the remaining
+    time. If that fails as well, the lines of the minimum spanning tree are selected.
+
+    :param network: network containing the candidate edges with a "distance" edge attribute. Edges which are not
+                    candidates of the design are removed in place.
+    :type network: NetworkGraph.
+    :param heat_source_profiles: capacity of each source, one row per hour.
+    :type heat_source_profiles: np.array.
+    :param heat_sink_profiles: demand of each sink, one row per hour.
+    :type heat_sink_profiles: np.array.
+    :param investment_period: investment period of the network in years.
+    :type investment_period: float.
+    :param transmission_line_threshold: maximum cost per flow of a transmission line.
+    :type transmission_line_threshold: float.
+    :param number_of_typical_periods: number of typical days representing the year. None uses every day.
+    :type number_of_typical_periods: int or None.
+    :param mip: solves y_e and z_e as binary variables. Otherwise the linear relaxation is solved and every edge with
+                a positive capacity is selected.
+    :type mip: bool.
+    :param time_limit: time limit of the design in seconds. None solves without time limit.
+    :type time_limit: float or None.
+    :param mip_rel_gap: relative gap between the objective and its bound at which the solver stops. None solves to
+                        the default gap of HiGHS.
+    :type mip_rel_gap: float or None.
+    :return: indices of the selected edges of network.graph after the removal of the other candidates.
+    :rtype: np.array.
+    """
+    from scipy.optimize import milp, LinearConstraint, Bounds
+    from scipy.sparse import coo_matrix, identity, kron, hstack, vstack, csr_matrix
+    from .screening import active_hours, annual_flow_bounds, screen_edges
+
+    start = time.perf_counter()
+    heat_source_profiles = np.asarray(heat_source_profiles, dtype=float)
+    heat_sink_profiles = np.asarray(heat_sink_profiles, dtype=float)
+    if number_of_typical_periods is None:
+        hours = np.arange(len(heat_source_profiles))
+        day_weights = np.ones(int(np.ceil(len(hours) / HOURS_PER_PERIOD)))
+    else:
+        hours, day_weights = typical_periods(heat_source_profiles, heat_sink_profiles, number_of_typical_periods)
+    source_capacities, sink_capacities, slice_day, day_share, slice_weights = time_slices(
+        heat_source_profiles[hours], heat_sink_profiles[hours], day_weights)
+
+    # remove the edges which are uneconomic in the model and keep the shortest candidates
+    screen_edges(network, source_capacities * slice_weights[:, None], sink_capacities * slice_weights[:, None],
+                 investment_period, transmission_line_threshold, cost_per_meter=linear_pipe_cost()[0])
+    network.select_edges(candidate_lines(network))
+    number_of_lines = network.graph.ecount()
+    active = active_hours(network, source_capacities, sink_capacities)
+    if number_of_lines == 0 or not np.any(active):
+        return np.zeros(0, dtype=np.int64)
+
+    # bounds of the daily mean flow and of the flow in a slice of every line
+    number_of_days = np.max(slice_day) + 1
+    daily_supply = np.zeros((number_of_days, network.number_of_sources))
+    daily_demand = np.zeros((number_of_days, network.number_of_sinks))
+    np.add.at(daily_supply, slice_day, source_capacities * day_share[:, None])
+    np.add.at(daily_demand, slice_day, sink_capacities * day_share[:, None])
+    daily_bounds = annual_flow_bounds(network, np.max(daily_supply, axis=0), np.max(daily_demand, axis=0))
+    fixed, slope, pipe_capacities = linear_pipe_cost(daily_bounds)
+    big_m = np.minimum(daily_bounds, pipe_capacities)
+    slice_bounds = annual_flow_bounds(network, np.max(source_capacities, axis=0), np.max(sink_capacities, axis=0))
+    source_capacities, sink_capacities = source_capacities[active], sink_capacities[active]
+    slice_day, day_share, slice_weights = slice_day[active], day_share[active], slice_weights[active]
+    number_of_slices = len(slice_day)
+
+    # vertices and edges of the correspondence graph, the first edges are the candidate transmission lines
+    graph = network.correspondence_graph
+    number_of_vertices = graph.vcount()
+    edges = np.array(graph.get_edgelist(), dtype=int).reshape(-1, 2)
+    number_of_edges = len(edges)
+    lengths = np.array(network.get_edge_attribute("distance"), dtype=float)
+    loops = edges[:number_of_lines, 0] == edges[:number_of_lines, 1]
+
+    # incidence matrix, positive flow is directed from the first to the second vertex of an edge
+    incidence = coo_matrix((np.concatenate((np.ones(number_of_edges), -np.ones(number_of_edges))),
+                            (np.concatenate((edges[:, 0], edges[:, 1])), np.tile(np.arange(number_of_edges), 2))),
+                           shape=(number_of_vertices, number_of_edges)).tocsr()
+    supply = coo_matrix((np.ones(network.number_of_sources),
+                         (network.source_vertices, np.arange(network.number_of_sources))),
+                        shape=(number_of_vertices, network.number_of_sources))
+    demand = coo_matrix((np.ones(network.number_of_sinks), (network.sink_vertices, np.arange(network.number_of_sinks))),
+                        shape=(number_of_vertices, network.number_of_sinks))
+
+    # variable order: forward flows, backward flows, supply, demand (each slice major), then y, c and z of every line.
+    # z selects the largest pipe, which has no capacity limit.
+    sliced = identity(number_of_slices, format="csr")
+    flow_columns = number_of_edges * number_of_slices
+    supply_columns = network.number_of_sources * number_of_slices
+    demand_columns = network.number_of_sinks * number_of_slices
+    number_of_variables = 2 * flow_columns + supply_columns + demand_columns + 3 * number_of_lines
+    per_line = identity(number_of_lines, format="csr")
+
+    def line_columns(y, c, z, rows):
+        # columns of the line variables, every other column is empty
+        return hstack((csr_matrix((rows, 2 * flow_columns + supply_columns + demand_columns)), y, c, z))
+
+    # flow balance: outflow - inflow = supply - demand for every vertex and slice
+    balance = hstack((kron(sliced, incidence), -kron(sliced, incidence), -kron(sliced, supply), kron(sliced, demand),
+                      csr_matrix((number_of_vertices * number_of_slices, 3 * number_of_lines)))).tocsr()
+
+    # daily mean flow of every line is limited by its capacity, or its bound with the largest pipe
+    days, day_of_slice = np.unique(slice_day, return_inverse=True)
+    daily_mean = coo_matrix((day_share, (day_of_slice, np.arange(number_of_slices))),
+                            shape=(len(days), number_of_slices))
+    line_selection = coo_matrix((np.ones(number_of_lines), (np.arange(number_of_lines), np.arange(number_of_lines))),
+                                shape=(number_of_lines, number_of_edges))
+    line_flow = kron(daily_mean, line_selection)
+    every_day = np.ones((len(days), 1))
+    capacity_limit = hstack((line_flow, line_flow, csr_matrix((len(days) * number_of_lines,
+                                                               supply_columns + demand_columns + number_of_lines)),
+                             -kron(every_day, per_line), -kron(every_day, per_line.multiply(daily_bounds[:, None]))))
+
+    # capacity and flows of a line require the line to be built with one kind of pipe
+    build_limit = line_columns(-per_line.multiply(big_m[:, None]), per_line, csr_matrix((number_of_lines,
+                                                                                         number_of_lines)),
+                               number_of_lines)
+    one_pipe = line_columns(per_line, csr_matrix((number_of_lines, number_of_lines)), per_line, number_of_lines)
+    slice_flow = kron(sliced, line_selection)
+    slice_limit = -kron(np.ones((number_of_slices, 1)), per_line.multiply(slice_bounds[:, None]))
+    flow_limit = hstack((slice_flow, slice_flow, csr_matrix((number_of_slices * number_of_lines,
+                                                             supply_columns + demand_columns)),
+                         slice_limit, csr_matrix((number_of_slices * number_of_lines, number_of_lines)), slice_limit))
+
+    constraints = [LinearConstraint(balance, 0, 0),
+                   LinearConstraint(vstack((capacity_limit, build_limit, flow_limit)).tocsr(), -np.inf, 0),
+                   LinearConstraint(one_pipe.tocsr(), -np.inf, 1)]
+
+    # objective in € per year, a small cost on flows prevents circulating flows
+    line_costs = lengths * 1000 / investment_period
+    circulation_cost = 1e-3 * transmission_line_threshold
+    objective = np.concatenate((np.full(2 * flow_columns, circulation_cost), np.zeros(supply_columns),
+                                -transmission_line_threshold * np.repeat(slice_weights, network.number_of_sinks),
+                                line_costs * fixed, line_costs * slope, line_costs * max(PIPE_COSTS)))
+
+    lower = np.zeros(number_of_variables)
+    edge_bounds = np.concatenate((slice_bounds, np.full(number_of_edges - number_of_lines, np.inf)))
+    # the largest pipe is only a choice of lines whose flow may exceed the capacity of the other pipes
+    upper = np.concatenate((np.tile(edge_bounds, 2 * number_of_slices), source_capacities.ravel(),
+                            sink_capacities.ravel(), np.where(loops, 0, 1), np.where(loops, 0, big_m),
+                            np.where(loops | (daily_bounds <= big_m), 0, 1)))
+    integrality = np.zeros(number_of_variables)
+    if mip:
+        integrality[-3 * number_of_lines:-2 * number_of_lines] = 1
+        integrality[-number_of_lines:] = 1
+
+    def solve(integrality):
+        options = {}
+        if time_limit is not None:
+            remaining = time_limit - (time.perf_counter() - start)
+            if remaining <= 0:
+                return None
+            options["time_limit"] = remaining
+            # the presolve of HiGHS does not check the time limit
+            options["presolve"] = False
+        if np.any(integrality) and mip_rel_gap is not None:
+            options["mip_rel_gap"] = mip_rel_gap
+        return milp(objective, constraints=constraints, integrality=integrality, bounds=Bounds(lower, upper),
+                    options=options)
+
+    result = solve(integrality)
+    if (result is None or result.x is None) and mip:
+        # no integer solution within the time limit, fall back to the linear relaxation
+        logger.warning("network design MILP found no solution (%s), selecting the edges of the linear relaxation",
+                       "time limit reached" if result is None else result.message)
+        mip = False
+        result = solve(np.zeros(number_of_variables))
+    if result is None or result.x is None:
+        logger.warning("network design found no solution within the time limit, selecting the minimum spanning tree")
+        tree = np.array(graph.spanning_tree(weights=graph.es["distance"], return_tree=False), dtype=np.int64)
+        return np.sort(tree[tree < number_of_lines])
+    if not result.success:
+        logger.warning("network design stopped early with a relative gap of %.3g: %s",
+                       getattr(result, "mip_gap", np.nan), result.message)
+    elif mip:
+        logger.info("network design solved with a relative gap of %.3g", getattr(result, "mip_gap", np.nan))
+
+    built = result.x[-3 * number_of_lines:-2 * number_of_lines] + result.x[-number_of_lines:]
+    capacities = result.x[-2 * number_of_lines:-number_of_lines] + daily_bounds * result.x[-number_of_lines:]
+    if mip:
+        selected = (built > 0.5) & (capacities > 1e-9 * daily_bounds)
+    else:
+        selected = capacities > 1e-9 * daily_bounds
+
+    return np.nonzero(selected)[0]
@@ -0,0 +1,250 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import pickle
+import tempfile
+
+from .cache import CACHE_VERSION, data_directory, file_fingerprint
+
+
+logger = logging.getLogger(__name__)
+
+
+def input_fingerprint(paths, content=True):
+    """
+    function combining the fingerprints of the files an input of the pipeline is read from.
+
+    :param paths: paths of the files.
+    :type paths: list of str.
+    :param content: hashes the content of the files. Otherwise only name, size and modification time are used.
+    :type content: bool.
+    :return: hexadecimal sha256 digest.
+    :rtype: str.
+    """
+
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(file_fingerprint(path, content=content).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def reference_fingerprint(pattern):
+    """
+    function computing the fingerprint of the reference data files of the package matching a glob pattern. The files
+    are hashed by size and modification time.
+
+    :param pattern: glob pattern relative to the data directory.
+    :type pattern: str.
+    :return: hexadecimal sha256 digest.
+    :rtype: str.
+    """
+
+    return input_fingerprint(sorted(glob.glob(os.path.join(data_directory(), pattern))), content=False)
+
+
+def reference_data_fingerprint(reference_data):
+    """
+    function computing the fingerprint of reference data kept in memory or in a store from its version.
+
+    :param reference_data: reference data.
+    :type reference_data: ReferenceData or SqliteStore.
+    :return: hexadecimal sha256 digest.
+    :rtype: str.
+    """
+
+    return hashlib.sha256(json.dumps(reference_data.version(), default=str).encode("utf-8")).hexdigest()
+
+
+def stage_fingerprint(name, parameters, inputs):
+    """
+    function computing the fingerprint of a stage from its name, its parameters and the fingerprints of its inputs.
+
+    :param name: name of the stage.
+    :type name: str.
+    :param parameters: parameters of the stage. Must be json serializable.
+    :type parameters: dict.
+    :param inputs: fingerprints of the upstream stages and input files.
+    :type inputs: list of str.
+    :return: hexadecimal sha256 digest.
+    :rtype: str.
+    """
+
+    digest = hashlib.sha256()
+    digest.update(str(CACHE_VERSION).encode("utf-8"))
+    digest.update(name.encode("utf-8"))
+    digest.update(json.dumps(parameters, sort_keys=True, default=str).encode("utf-8"))
+    for fingerprint in inputs:
+        digest.update(fingerprint.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    Cache of the intermediate results of the pipeline. Every stage is identified by the fingerprint of its name,
+    parameters and inputs, which are the fingerprints of upstream stages or input files. A stage is only executed if
+    no result with the same fingerprint is stored, hence a changed input only re-executes the stages downstream of it.
+    Without directory every stage is executed.
+    """
+
+    def __init__(self, directory=None, max_entries_per_stage=4):
+        """
+        Constructor of the cache.
+
+        :param directory: directory the pickled stage results are stored in. It is created if it does not exist. None
+                          disables the cache.
+        :type directory: str or None.
+        :param max_entries_per_stage: number of results kept per stage. The least recently used results are evicted.
+        :type max_entries_per_stage: int.
+
+        Attributes:
+            executed: Names of the stages executed by this cache. List.
+            reused: Names of the stages loaded from the cache. List.
+        """
+
+        self.directory = directory
+        self.max_entries_per_stage = max_entries_per_stage
+        self.executed = []
+        self.reused = []
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def path(self, name, fingerprint):
+        """
+        Method returning the file of a stage result.
+
+        :param name: name of the stage.
+        :type name: str.
+        :param fingerprint: fingerprint of the stage.
+        :type fingerprint: str.
+        :return: path of the pickled result.
+        :rtype: str.
+        """
+
+        return os.path.join(self.directory, name + "-" + fingerprint + ".pkl")
+
+    def load(self, name, fingerprint):
+        """
+        Method loading a stored stage result.
+
+        :param name: name of the stage.
+        :type name: str.
+        :param fingerprint: fingerprint of the stage.
+        :type fingerprint: str.
+        :return: True and the result if it is stored, False and None otherwise.
+        :rtype: tuple. (bool, object)
+        """
+
+        if self.directory is None or not os.path.isfile(self.path(name, fingerprint)):
+            return False, None
+        try:
+            with open(self.path(name, fingerprint), "rb") as file:
+                result = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError) as e:
+            logger.warning("discarding unreadable result of stage %s: %s", name, e)
+            return False, None
+        # mark result as recently used
+        os.utime(self.path(name, fingerprint), None)
+        return True, result
+
+    def store(self, name, fingerprint, result):
+        """
+        Method storing a stage result and evicting the least recently used results of the stage.
+
+        :param name: name of the stage.
+        :type name: str.
+        :param fingerprint: fingerprint of the stage.
+        :type fingerprint: str.
+        :param result: result of the stage. Must be picklable.
+        :type result: object.
+        :return:
+        """
+
+        if self.directory is None:
+            return
+        # results are written to a temporary file first so concurrent readers never see partial results
+        handle, temporary = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(handle, "wb") as file:
+                pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, self.path(name, fingerprint))
+        except OSError:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+        results = sorted(glob.glob(os.path.join(self.directory, name + "-*.pkl")), key=os.path.getmtime)
+        for path in results[:max(0, len(results) - self.max_entries_per_stage)]:
+            os.remove(path)
+
+    def run(self, name, parameters, inputs, function, *arguments, reuse=True):
+        """
+        Method returning the result of a stage, executing it only if it is not stored or if reuse is disabled.
+
+        :param name: name of the stage.
+        :type name: str.
+        :param parameters: parameters of the stage which change its result. Must be json serializable.
+        :type parameters: dict.
+        :param inputs: fingerprints of the upstream stages and input files.
+        :type inputs: list of str.
+        :param function: function computing the stage.
+        :type function: callable.
+        :param arguments: arguments of the function.
+        :param reuse: loads a stored result. False always executes the stage, whose side effects are needed, and
+                      replaces the stored result.
+        :type reuse: bool.
+        :return: result of the stage and its fingerprint, which is the input of the downstream stages.
+        :rtype: tuple. (object, str)
+        """
+
+        fingerprint = stage_fingerprint(name, parameters, inputs)
+        stored, result = self.load(name, fingerprint) if reuse else (False, None)
+        if stored:
+            logger.info("reusing stage %s", name)
+            self.reused.append(name)
+            return result, fingerprint
+
+        logger.info("executing stage %s", name)
+        result = function(*arguments)
+        self.executed.append(name)
+        self.store(name, fingerprint, result)
+        return result, fingerprint
+
+    def run_concurrently(self, runs, executor=None):
+        """
+        Method returning the results of independent stages. The stages which are not stored are executed at the same
+        time by an executor.
+
+        :param runs: name, parameters, inputs, function and arguments of every stage like the arguments of run().
+        :type runs: list of tuples.
+        :param executor: executor running the stages, e.g. a process pool. The functions and arguments must be
+                         picklable for a process pool. None executes the stages one after another.
+        :type executor: concurrent.futures.Executor or None.
+        :return: result and fingerprint of every stage in the order of runs.
+        :rtype: list of tuples. [(object, str), ...]
+        """
+
+        if executor is None:
+            return [self.run(name, parameters, inputs, function, *arguments)
+                    for name, parameters, inputs, function, *arguments in runs]
+
+        results = []
+        for name, parameters, inputs, function, *arguments in runs:
+            fingerprint = stage_fingerprint(name, parameters, inputs)
+            stored, result = self.load(name, fingerprint)
+            if stored:
+                logger.info("reusing stage %s", name)
+                self.reused.append(name)
+                results.append((name, fingerprint, True, result))
+            else:
+                logger.info("executing stage %s", name)
+                results.append((name, fingerprint, False, executor.submit(function, *arguments)))
+
+        for index, (name, fingerprint, stored, result) in enumerate(results):
+            if not stored:
+                result = result.result()
+                self.executed.append(name)
+                self.store(name, fingerprint, result)
+            results[index] = (result, fingerprint)
+        return results
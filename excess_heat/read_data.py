@@ -1,14 +1,212 @@
 import pandas as pd
 import re
-import fiona
 import os
 import csv
+import logging
+from concurrent.futures import ThreadPoolExecutor
 
-from pyproj import Proj, Transformer
-from shapely.geometry import Point, Polygon, MultiPolygon
-from shapely.wkb import loads
 import numpy as np
 
+
+logger = logging.getLogger(__name__)
+# ids, geometries and search tree of the NUTS2 regions of the last loaded boundary file, by path and modification time
+nuts2_regions_cache = {}
+
+INDUSTRY_PROFILE_FILES = ("hotmaps_task_2.7_load_profile_industry_chemicals_and_petrochemicals_yearlong_2018.csv",
+                          "hotmaps_task_2.7_load_profile_industry_food_and_tobacco_yearlong_2018.csv",
+                          "hotmaps_task_2.7_load_profile_industry_iron_and_steel_yearlong_2018.csv",
+                          "hotmaps_task_2.7_load_profile_industry_non_metalic_minerals_yearlong_2018.csv",
+                          "hotmaps_task_2.7_load_profile_industry_paper_yearlong_2018.csv")
+RESIDENTIAL_HEATING_PROFILE_FILES = ("hotmaps_task_2.7_load_profile_residential_heating_yearlong_2010_part1.csv",
+                                     "hotmaps_task_2.7_load_profile_residential_heating_yearlong_2010_part2.csv")
+# delimiter and column types of the csv files of the data directory, declared so the files are parsed without sniffing
+INDUSTRY_PROFILE_FORMAT = (",", {"NUTS0_code": "category", "process": "category", "hour": "int16",
+                                  "load": "float64"})
+RESIDENTIAL_HEATING_PROFILE_FORMAT = (",", {"NUTS2_code": "category", "process": "category", "hour": "int16",
+                                            "load": "float64"})
+CSV_FORMATS = dict(
+    [("Industrial_Database.csv", (";", {"geom": str, "Subsector": str, "Country": str,
+                                        "Excess_Heat_100-200C": "float64", "Excess_Heat_200-500C": "float64",
+                                        "Excess_Heat_500C": "float64"})),
+     ("entry_points.csv", (",", {"Lon": "float64", "Lat": "float64", "Annual heat demand in Gwh": "float64",
+                                 "id": "int64"}))] +
+    [(file_name, INDUSTRY_PROFILE_FORMAT) for file_name in INDUSTRY_PROFILE_FILES] +
+    [(file_name, RESIDENTIAL_HEATING_PROFILE_FORMAT) for file_name in RESIDENTIAL_HEATING_PROFILE_FILES])
+# NUTS0 id of the country names of the industrial database
+COUNTRY_TO_NUTS0 = {"Austria": "AT", "Belgium": "BE", "Bulgaria": "BG", "Cyprus": "CY", "Czech Republic": "CZ",
+                    "Germany": "DE", "Denmark": "DK", "Estonia": "EE", "Finland": "FI", "France": "FR",
+                    "Greece": "EL", "Hungary": "HU", "Croatia": "HR", "Ireland": "IE", "Italy": "IT",
+                    "Lithuania": "LT", "Luxembourg": "LU", "Latvia": "LV", "Malta": "MT", "Netherland": "Nl",
+                    "Netherlands": "Nl",
+                    "Poland": "PL", "Portugal": "PT", "Romania": "RO", "Spain": "ES", "Sweden": "SE",
+                    "Slovenia": "SI", "Slovakia": "SK", "United Kingdom": "UK", "Albania": "AL", "Montenegro": "ME",
+                    "North Macedonia": "MK", "Serbia": "RS", "Turkey": "TR", "Switzerland": "CH", "Iceland": "IS",
+                    "Liechtenstein": "LI", "Norway": "NO"}
+# temperature in °C of the excess heat bands 100-200 °C, 200-500 °C and above 500 °C
+TEMPERATURE_BANDS = (150, 350, 500)
+# NUTS regions of GISCO in EPSG:4326, the sinks are assigned to the level 2 regions containing them if the file is
+# in the data directory
+NUTS_REGIONS_FILE = "NUTS_RG_01M_2021_4326_LEVL_2.shp"
+# rows converted at once by the loaders of record streams
+RECORD_CHUNK_SIZE = 100000
+# columns of repeated codes and names, which are stored as categoricals
+CATEGORICAL_COLUMNS = ("Nuts0_ID", "Nuts2_ID", "NUTS0_code", "NUTS2_code", "Subsector", "process", "ellipsoid",
+                       "Economic_Activity")
+# columns of small integers
+INTEGER_COLUMNS = ("hour", "Temperature")
+# columns of heat and load values, which are stored with the float type of the loaders
+VALUE_COLUMNS = ("Excess_heat", "Heat_demand", "load")
+
+
+def compact_dtypes(data, float_dtype="float64"):
+    """
+    Function converting the columns of a dataframe of the loaders to memory lean types. Codes and names become
+    categoricals without unused categories, hours and temperatures int16 and heat and load values float_dtype.
+    Coordinates stay float64.
+
+    :param data: dataframe of a loader.
+    :type data: pandas dataframe.
+    :param float_dtype: float type of the heat and load values. "float32" halves their memory and the memory of the
+                        hourly profiles computed from them.
+    :type float_dtype: str {"float64", "float32"}.
+    :return: dataframe with converted columns.
+    :rtype: pandas dataframe.
+    """
+
+    dtypes = {}
+    for column in data.columns:
+        if column in CATEGORICAL_COLUMNS:
+            dtypes[column] = "category"
+        elif column in INTEGER_COLUMNS and data[column].notna().all():
+            dtypes[column] = "int16"
+        elif column in VALUE_COLUMNS:
+            dtypes[column] = float_dtype
+        elif column in ("Lon", "Lat"):
+            dtypes[column] = "float64"
+    dtypes = {column: dtype for column, dtype in dtypes.items() if data[column].dtype != dtype}
+    if dtypes:
+        data = data.astype(dtypes)
+    # categories of filtered rows are kept by pandas, so selections of the same rows have equal categories
+    unused = {column: data[column].cat.remove_unused_categories() for column in data.columns
+              if column in CATEGORICAL_COLUMNS and data[column].nunique() < len(data[column].cat.categories)}
+
+    return data.assign(**unused) if unused else data
+
+
+def data_path(file_name):
+    """
+    Function returning the path of a file of the data directory of the package.
+
+    :param file_name: name of the file.
+    :type file_name: str.
+    :return: path of the file.
+    :rtype: str.
+    """
+
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", file_name)
+
+
+def sniff_delimiter(path):
+    """
+    Function determining the delimiter of a csv file from its first line.
+
+    :param path: path of the csv file.
+    :type path: str.
+    :return: delimiter.
+    :rtype: str.
+    """
+
+    with open(path, 'r', encoding='utf-8') as csv_file:
+        return csv.Sniffer().sniff(csv_file.readline()).delimiter
+
+
+def read_data_csv(file_name, usecols):
+    """
+    Function reading columns of a csv file of the data directory with the delimiter and column types declared in
+    CSV_FORMATS. Files which are not declared or do not match their declaration are read with a sniffed delimiter and
+    inferred types.
+
+    :param file_name: name of the file.
+    :type file_name: str.
+    :param usecols: headers of the columns.
+    :type usecols: tuple of str.
+    :return: dataframe containing the columns.
+    :rtype: pandas dataframe.
+    """
+
+    path = data_path(file_name)
+    if file_name in CSV_FORMATS:
+        delimiter, dtypes = CSV_FORMATS[file_name]
+        try:
+            return pd.read_csv(path, sep=delimiter, usecols=usecols,
+                               dtype={header: dtypes[header] for header in usecols if header in dtypes})
+        except ValueError as e:
+            logger.warning("%s does not match its declared format, sniffing it: %s", file_name, e)
+
+    return pd.read_csv(path, sep=sniff_delimiter(path), usecols=usecols)
+
+
+def read_data_csvs(file_names, usecols, max_workers=None):
+    """
+    Function reading the same columns of several csv files of the data directory concurrently. The parser of pandas
+    releases the GIL, hence the files are read in threads.
+
+    :param file_names: names of the files.
+    :type file_names: tuple of str.
+    :param usecols: headers of the columns.
+    :type usecols: tuple of str.
+    :param max_workers: number of files read at the same time. None reads all files at the same time.
+    :type max_workers: int or None.
+    :return: one dataframe per file in the order of file_names.
+    :rtype: list of pandas dataframes.
+    """
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(file_names)) as executor:
+        return list(executor.map(lambda file_name: read_data_csv(file_name, usecols), file_names))
+
+def wkb_points_coordinates(points):
+    """
+    Function extracting the coordinates of points given as well known byte hexadecimal strings, including the extended
+    WKB of PostGIS with an SRID. Points of the same encoded length are decoded in one array operation.
+
+    :param points: Well known byte hexadecimal strings describing points.
+    :type points: array like of str.
+    :return: x and y coordinate of every point.
+    :rtype: np.array. [[x1, y1], [x2, y2], ...]
+    """
+
+    points = np.asarray(points, dtype=str).reshape(-1)
+    coordinates = np.empty((len(points), 2))
+    lengths = np.char.str_len(points)
+    for length in np.unique(lengths):
+        rows = np.nonzero(lengths == length)[0]
+        try:
+            wkb = np.frombuffer(bytes.fromhex("".join(points[rows])), dtype=np.uint8).reshape(len(rows), -1)
+        except ValueError:
+            raise ValueError("Invalid WKB hexadecimal string " + str(points[rows[0]]))
+        if wkb.shape[1] < 21:
+            raise ValueError("Invalid WKB point " + str(points[rows[0]]))
+        little_endian = wkb[:, 0] == 1
+        header = np.ascontiguousarray(wkb[:, 1:5]).view(np.uint32).reshape(-1)
+        geometry_type = np.where(little_endian, header, header.byteswap())
+        # the flag of an SRID, which precedes the coordinates
+        has_srid = (geometry_type & 0x20000000) != 0
+        # point, also with z or m coordinates in the ISO and the extended notation
+        invalid = ((geometry_type & 0xfffffff) % 1000 != 1) | (wkb.shape[1] < np.where(has_srid, 25, 21))
+        if np.any(invalid):
+            raise ValueError("WKB is not a point " + str(points[rows[np.argmax(invalid)]]))
+        for srid in (False, True):
+            for little in (True, False):
+                selection = (has_srid == srid) & (little_endian == little)
+                if not np.any(selection):
+                    continue
+                offset = 9 if srid else 5
+                values = np.ascontiguousarray(wkb[selection, offset:offset + 16]).view("<f8" if little else ">f8")
+                coordinates[rows[selection]] = values.reshape(-1, 2)
+
+    return coordinates
+
+
 def extract_coordinates_from_wkb_point(point):
     """
     Function extracting the coordinates from a well known byte hexadecimal string.
@@ -18,70 +216,328 @@ def extract_coordinates_from_wkb_point(point):
     :return: x and y coordinate of point.
     :rtype: touple of floats.
     """
-    geometry = loads(point, hex=True)
-    return geometry.x, geometry.y
-
-
-def ad_industrial_database_dict(dict):
-    country_to_nuts0 = {"Austria": "AT", "Belgium": "BE", "Bulgaria": "BG", "Cyprus": "CY", "Czech Republic": "CZ",
-                        "Germany": "DE", "Denmark": "DK", "Estonia": "EE", "Finland": "FI", "France": "FR",
-                        "Greece": "EL", "Hungary": "HU", "Croatia": "HR", "Ireland": "IE", "Italy": "IT",
-                        "Lithuania": "LT", "Luxembourg": "LU", "Latvia": "LV", "Malta": "MT", "Netherland": "Nl",
-                        "Netherlands": "Nl",
-                        "Poland": "PL", "Portugal": "PT", "Romania": "RO", "Spain": "ES", "Sweden": "SE",
-                        "Slovenia": "SI", "Slovakia": "SK", "United Kingdom": "UK", "Albania": "AL", "Montenegro": "ME",
-                        "North Macedonia": "MK", "Serbia": "RS", "Turkey": "TR", "Switzerland": "CH", "Iceland": "IS",
-                        "Liechtenstein": "LI", "Norway": "NO"}
-    raw_data = pd.DataFrame(dict["industrial_database"])
-    raw_data = raw_data.loc[:, ("geom", "subsector",  "country", "excess_heat_100_200c", "excess_heat_200_500c",
-                                "excess_heat_500c")]
-    raw_data["Lon"] = ""
-    raw_data["Lat"] = ""
-    raw_data["Nuts0"] = ""
-    for i, site in raw_data.iterrows():
-        # check if site location is available
-        if not pd.isna(site["geom"]) and site["geom"] != "":
-            lon, lat = extract_coordinates_from_wkb_point(site["geom"])
-            raw_data.loc[i, "Lon"] = lon
-            raw_data.loc[i, "Lat"] = lat
-        if not pd.isna(site["country"]) and site["country"] != "":
-            raw_data.loc[i, "Nuts0"] = country_to_nuts0[site["country"]]
-
-    raw_data = raw_data[raw_data.Lon != ""]
-    raw_data = raw_data[raw_data.Lat != ""]
-
-    data = pd.DataFrame(columns=("Lon", "Lat", "Nuts0_ID", "Subsector", "Excess_heat", "Temperature"))
-    raw_data["excess_heat_100_200c"] = pd.to_numeric(raw_data["excess_heat_100_200c"])
-    raw_data["excess_heat_200_500c"] = pd.to_numeric(raw_data["excess_heat_200_500c"])
-    raw_data["excess_heat_500c"] = pd.to_numeric(raw_data["excess_heat_500c"])
-
-
-    for i, site in raw_data.iterrows():
-        # check if heat at specific temperature range is available
-        # TODO deal with units; hard coded temp ranges?
-        if not pd.isna(site["excess_heat_100_200c"]) and site["excess_heat_100_200c"] != "" and site["excess_heat_100_200c"] != 0:
-            data.loc[data.shape[0]] = (site["Lon"], site["Lat"], site["Nuts0"], site["subsector"],
-                                       1000*site["excess_heat_100_200c"], 150)
-        if not pd.isna(site["excess_heat_200_500c"]) and site["excess_heat_200_500c"] != "" and site["excess_heat_200_500c"] != 0:
-            data.loc[data.shape[0]] = (site["Lon"], site["Lat"], site["Nuts0"],
-                                       site["subsector"], 1000*site["excess_heat_200_500c"], 350)
-        if not pd.isna(site["excess_heat_500c"]) and site["excess_heat_500c"] != "" and site["excess_heat_500c"] != 0:
-            data.loc[data.shape[0]] = (site["Lon"], site["Lat"], site["Nuts0"],
-                                       site["subsector"], 1000*site["excess_heat_500c"], 500)
+
+    x, y = wkb_points_coordinates([point])[0]
+    return float(x), float(y)
+
+
+def melt_temperature_bands(sites, columns):
+    """
+    Function turning the excess heat of every temperature band of a site into one row per site and band. Bands
+    without excess heat are dropped and the rows of a site stay together in the order of the bands.
+
+    :param sites: dataframe with one row per site.
+    :type sites: pandas dataframe.
+    :param columns: column of the excess heat in GWh of every band, in the order of TEMPERATURE_BANDS.
+    :type columns: tuple of str.
+    :return: dataframe with the columns of sites except columns, "Excess_heat" in MWh and "Temperature".
+    :rtype: pandas dataframe.
+    """
+
+    id_columns = [column for column in sites.columns if column not in columns]
+    data = sites.melt(id_vars=id_columns, value_vars=list(columns), var_name="Temperature",
+                      value_name="Excess_heat", ignore_index=False)
+    data = data[data["Excess_heat"].notna() & (data["Excess_heat"] != 0)]
+    # melt stacks the bands, a stable sort by the site restores the order of the rows of a site
+    data = data.sort_index(kind="stable").reset_index(drop=True)
+    data["Temperature"] = data["Temperature"].map(dict(zip(columns, TEMPERATURE_BANDS)))
+    data["Excess_heat"] = data["Excess_heat"] * 1000
+
+    return data[id_columns + ["Excess_heat", "Temperature"]]
+
+
+def country_codes(countries):
+    """
+    Function mapping country names to NUTS0 ids. Missing names become "".
+
+    :param countries: country names.
+    :type countries: pandas series.
+    :return: NUTS0 id of every country.
+    :rtype: pandas series.
+    """
+
+    countries = countries.fillna("")
+    codes = countries.map(COUNTRY_TO_NUTS0)
+    unknown = codes.isna() & (countries != "")
+    if unknown.any():
+        raise ValueError("Unknown countries " + ", ".join(sorted(set(countries[unknown]))))
+
+    return codes.fillna("")
+
+
+def record_chunks(records, columns, chunk_size=RECORD_CHUNK_SIZE):
+    """
+    Generator reading records chunk by chunk, so only one chunk of the records exists as python objects at a time.
+    Only the given columns are kept from each chunk.
+
+    :param records: records as list or iterable of row dicts, as pyarrow Table, RecordBatch, RecordBatchReader or
+                    iterable of RecordBatches, or as NDJSON file given by its path or a file object.
+    :type records: list of dict, pyarrow.Table, pyarrow.RecordBatch, pyarrow.RecordBatchReader, str or file object.
+    :param columns: columns to keep.
+    :type columns: tuple of str.
+    :param chunk_size: maximum number of rows of a chunk of row dicts or NDJSON lines.
+    :type chunk_size: int.
+    :return: dataframe of every chunk with the given columns.
+    :rtype: generator of pandas dataframes.
+    """
+
+    columns = list(columns)
+    if isinstance(records, (str, os.PathLike)) or hasattr(records, "read"):
+        with pd.read_json(records, lines=True, chunksize=chunk_size, dtype=False) as reader:
+            for chunk in reader:
+                yield chunk.loc[:, columns]
+        return
+    if type(records).__module__.split(".")[0] == "pyarrow":
+        if hasattr(records, "to_batches"):
+            records = records.to_batches(max_chunksize=chunk_size)
+        elif hasattr(records, "num_rows"):
+            records = [records]
+
+    rows = []
+    for record in records:
+        if isinstance(record, dict):
+            rows.append(record)
+            if len(rows) == chunk_size:
+                yield pd.DataFrame.from_records(rows, columns=columns)
+                rows = []
+            continue
+        # record batch, codes are dictionary encoded by arrow and arrive as categoricals
+        yield pd.DataFrame(dict((column, (record.column(column).dictionary_encode() if column in CATEGORICAL_COLUMNS
+                                          else record.column(column)).to_pandas()) for column in columns))
+    if rows:
+        yield pd.DataFrame.from_records(rows, columns=columns)
+
+
+def concat_chunks(chunks, columns):
+    """
+    Function concatenating the dataframes of chunks. Categorical columns stay categorical with the sorted union of
+    the categories of the chunks.
+
+    :param chunks: dataframes of the chunks.
+    :type chunks: list of pandas dataframes.
+    :param columns: columns of the dataframe returned if there are no chunks.
+    :type columns: tuple of str.
+    :return: concatenated dataframe.
+    :rtype: pandas dataframe.
+    """
+
+    if not chunks:
+        return pd.DataFrame(columns=list(columns))
+    # sorted categories as by astype("category"), the categories of arrow dictionaries are in order of appearance
+    categories = dict((column, pd.api.types.union_categoricals([chunk[column] for chunk in chunks],
+                                                               sort_categories=True).categories)
+                      for column in chunks[0].columns if isinstance(chunks[0][column].dtype, pd.CategoricalDtype))
+    chunks = [chunk.assign(**dict((column, chunk[column].cat.set_categories(column_categories))
+                                  for column, column_categories in categories.items())) for chunk in chunks]
+
+    return pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+
+
+def ad_records(records, columns, convert, chunk_size=RECORD_CHUNK_SIZE):
+    """
+    Function loading records chunk by chunk. Every chunk is converted before the next one is read, so the peak memory
+    stays close to the memory of the converted data.
+
+    :param records: records in a format of record_chunks().
+    :type records: list of dict, pyarrow.Table, pyarrow.RecordBatch, pyarrow.RecordBatchReader, str or file object.
+    :param columns: columns read from the records.
+    :type columns: tuple of str.
+    :param convert: function converting the dataframe of a chunk.
+    :type convert: callable.
+    :param chunk_size: maximum number of rows of a chunk.
+    :type chunk_size: int.
+    :return: converted data.
+    :rtype: pandas dataframe.
+    """
+
+    chunks = [convert(chunk) for chunk in record_chunks(records, columns, chunk_size)]
+    data = concat_chunks([chunk for chunk in chunks if len(chunk)] or chunks[:1], columns)
 
     return data
 
 
-def ad_TUW23(out_shp_label, nuts2_id):
+def convert_profile_chunk(chunk, float_dtype="float64"):
+    """
+    Function converting a chunk of the records of a load profile.
+
+    :param chunk: records with the columns "hour" and "load".
+    :type chunk: pandas dataframe.
+    :param float_dtype: float type of the load.
+    :type float_dtype: str {"float64", "float32"}.
+    :return: converted chunk.
+    :rtype: pandas dataframe.
+    """
+
+    chunk = chunk.assign(load=pd.to_numeric(chunk["load"]), hour=pd.to_numeric(chunk["hour"]))
+    return compact_dtypes(chunk, float_dtype)
+
+
+def convert_industrial_database_chunk(raw_data, float_dtype="float64"):
+    """
+    Function converting a chunk of the records of the industrial database into one row per site and temperature band.
+
+    :param raw_data: records of sites with the location as WKB hexadecimal string.
+    :type raw_data: pandas dataframe.
+    :param float_dtype: float type of the excess heat.
+    :type float_dtype: str {"float64", "float32"}.
+    :return: converted chunk.
+    :rtype: pandas dataframe.
+    """
+
+    # check if site location is available
+    raw_data = raw_data[raw_data["geom"].notna() & (raw_data["geom"] != "")]
+    coordinates = wkb_points_coordinates(raw_data["geom"])
+
+    sites = pd.DataFrame({"Lon": coordinates[:, 0], "Lat": coordinates[:, 1],
+                          "Nuts0_ID": country_codes(raw_data["country"].astype(object)).values,
+                          "Subsector": raw_data["subsector"].values})
+    for column in ("excess_heat_100_200c", "excess_heat_200_500c", "excess_heat_500c"):
+        sites[column] = pd.to_numeric(raw_data[column]).values
+    # TODO deal with units; hard coded temp ranges?
+    data = melt_temperature_bands(sites, ("excess_heat_100_200c", "excess_heat_200_500c", "excess_heat_500c"))
+
+    return compact_dtypes(data, float_dtype)
+
+
+def ad_industrial_database_dict(dict, float_dtype="float64"):
+    """
+    loads data of heat sources given by the platform.
+
+    :param dict: dict with the records of the sites under "industrial_database" in a format of record_chunks().
+    :type dict: dict.
+    :param float_dtype: float type of the excess heat.
+    :type float_dtype: str {"float64", "float32"}.
+    :return: dataframe containing one row per site and temperature band.
+    :rtype: pandas dataframe.
+    """
+
+    return ad_records(dict["industrial_database"], ("geom", "subsector", "country", "excess_heat_100_200c",
+                                                    "excess_heat_200_500c", "excess_heat_500c"),
+                      lambda chunk: convert_industrial_database_chunk(chunk, float_dtype))
+
+
+def load_nuts2_regions(regions_file=None):
+    """
+    Function loading the NUTS2 regions of a boundary file. The regions of the last file are kept in memory.
+
+    :param regions_file: shp file of the NUTS regions in EPSG:4326 with the field "NUTS_ID". Only regions with a
+                         "LEVL_CODE" of 2 are used if the field exists. Defaults to NUTS_REGIONS_FILE of the data
+                         directory.
+    :type regions_file: str or None.
+    :return: ids and geometries of the regions and a STRtree of the geometries, which is None for shapely < 2.
+    :rtype: tuple. ([str, ...], [shapely geometry, ...], shapely.strtree.STRtree or None)
+    """
+    import fiona
+    import shapely
+    from shapely.geometry import shape
+    from shapely.strtree import STRtree
+
+    path = data_path(NUTS_REGIONS_FILE) if regions_file is None else regions_file
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    if key not in nuts2_regions_cache:
+        ids = []
+        geometries = []
+        with fiona.open(path) as regions:
+            for region in regions:
+                properties = region["properties"]
+                if "LEVL_CODE" in properties and int(properties["LEVL_CODE"]) != 2:
+                    continue
+                ids.append(properties["NUTS_ID"])
+                geometries.append(shape(region["geometry"]))
+        # the bulk queries of the tree need shapely 2
+        tree = STRtree(geometries) if hasattr(shapely, "points") and geometries else None
+        nuts2_regions_cache.clear()
+        nuts2_regions_cache[key] = (ids, geometries, tree)
+
+    return nuts2_regions_cache[key]
+
+
+def assign_nuts2_regions(lon, lat, regions_file=None):
+    """
+    Function assigning points to the NUTS2 regions containing them in one bulk query of the STRtree of the regions.
+    Points on the border of two regions are assigned to one of them.
+
+    :param lon: longitude of every point.
+    :type lon: array like.
+    :param lat: latitude of every point.
+    :type lat: array like.
+    :param regions_file: shp file of the NUTS regions, see load_nuts2_regions().
+    :type regions_file: str or None.
+    :return: NUTS2 id of every point, "" for points outside of all regions.
+    :rtype: np.array of str.
+    """
+
+    ids, geometries, tree = load_nuts2_regions(regions_file)
+    lon = np.asarray(lon, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    regions = np.full(len(lon), "", dtype=object)
+    if tree is not None:
+        import shapely
+        point_indices, region_indices = tree.query(shapely.points(lon, lat), predicate="within")
+        points, first = np.unique(point_indices, return_index=True)
+        regions[points] = np.array(ids, dtype=object)[region_indices[first]]
+    else:
+        # shapely < 2 tests the points within the bounding box of every region in one vectorized call
+        from shapely.vectorized import contains
+        for region_id, geometry in zip(ids, geometries):
+            minx, miny, maxx, maxy = geometry.bounds
+            candidates = np.nonzero((regions == "") & (lon >= minx) & (lon <= maxx) & (lat >= miny) &
+                                    (lat <= maxy))[0]
+            if len(candidates) > 0:
+                regions[candidates[contains(geometry, lon[candidates], lat[candidates])]] = region_id
+
+    return regions.astype(str)
+
+
+def set_nuts2_regions(data, nuts2_id):
+    """
+    Function setting the NUTS2 region of sinks. If the boundary file NUTS_REGIONS_FILE is in the data directory,
+    every sink gets the region containing it and sinks outside of the regions of nuts2_id get "". Otherwise all sinks
+    get the single region of nuts2_id.
+
+    :param data: sinks with the columns "Lon" and "Lat".
+    :type data: pandas dataframe.
+    :param nuts2_id: NUTS2 ids of the regions.
+    :type nuts2_id: str or list of str.
+    :return: sinks with the column "Nuts2_ID".
+    :rtype: pandas dataframe.
+    """
+
+    nuts2_ids = [nuts2_id] if isinstance(nuts2_id, str) else list(nuts2_id)
+    if not os.path.exists(data_path(NUTS_REGIONS_FILE)):
+        if len(nuts2_ids) != 1:
+            raise ValueError("Sinks of several regions are assigned by the NUTS boundary file " + NUTS_REGIONS_FILE +
+                             ", which is not in the data directory")
+        return data.assign(Nuts2_ID=nuts2_ids[0])
+
+    regions = assign_nuts2_regions(data["Lon"], data["Lat"])
+    outside = ~np.isin(regions, nuts2_ids)
+    if np.any(outside):
+        logger.warning("dropping %d of %d sinks outside of the regions %s", np.sum(outside), len(regions),
+                       ", ".join(nuts2_ids))
+        regions[outside] = ""
+
+    return data.assign(Nuts2_ID=regions)
+
+
+def ad_TUW23(out_shp_label, nuts2_id, float_dtype="float64"):
     """
     Function extracting potential heat sinks computed by the TUW23 CM. It creates a grid of points of constant density
     inside coherent areas.
 
     :param out_shp_label: File name of shp file containing the coherent areas of TUW23 CM.
     :type out_shp_label: sting
+    :param nuts2_id: NUTS2 ids of the regions, see set_nuts2_regions().
+    :type nuts2_id: str or list of str.
+    :param float_dtype: float type of the heat demand.
+    :type float_dtype: str {"float64", "float32"}.
     :return: Dataframe containing the potential heat sinks and a correspondence id for each coherent aera.
     :rtype: pandas Dataframe
     """
+    import fiona
+    from pyproj import Proj, Transformer
+    from shapely.geometry import Point, Polygon, MultiPolygon
+
     try:
         coherent_areas = fiona.open(out_shp_label)
     except IOError:
@@ -128,177 +584,146 @@ def ad_TUW23(out_shp_label, nuts2_id):
             data.append([*entry_point, induvidual_heat_demand, -i])
 
     data = pd.DataFrame(data, columns=["Lon", "Lat", "Heat_demand", "id"])
-    data["Nuts2_ID"] = nuts2_id
+    data = set_nuts2_regions(data, nuts2_id)
 
     data["ellipsoid"] = "SRID=4326"
     data["Economic_Activity"] = "Steam and air conditioning supply"
     data["Temperature"] = 100
 
-    return data
+    return compact_dtypes(data, float_dtype)
+
 
+def ad_industry_profiles_dict(dicts, float_dtype="float64"):
+    """
+    loads the load profiles of the industry sectors given by the platform.
+
+    :param dicts: one dict per sector with the records of its profile in a format of record_chunks().
+    :type dicts: list of dict.
+    :param float_dtype: float type of the load.
+    :type float_dtype: str {"float64", "float32"}.
+    :return: one dataframe per sector.
+    :rtype: list of pandas dataframes.
+    """
 
-def ad_industry_profiles_dict(dicts):
     dict_names = ["load_profile_industry_chemicals_and_petrochemicals_yearlong_2018", "load_profile_industry_food_and_tobacco_yearlong_2018",
                   "load_profile_industry_iron_and_steel_yearlong_2018", "load_profile_industry_non_metalic_minerals_yearlong_2018",
                   "load_profile_industry_paper_yearlong_2018"]
     data = []
     for name, dict in zip(dict_names, dicts):
-        raw_data = pd.DataFrame(dict[name])
-        raw_data = raw_data.loc[:, ("NUTS0_code", "process", "hour", "load")]
-        raw_data["load"] = pd.to_numeric(raw_data["load"])
-        raw_data["hour"] = pd.to_numeric(raw_data["hour"])
-        data.append(raw_data)
+        data.append(ad_records(dict[name], ("NUTS0_code", "process", "hour", "load"),
+                               lambda chunk: convert_profile_chunk(chunk, float_dtype)))
 
     return data
 
 
-def ad_residential_heating_profile_dict(dict):
+def ad_residential_heating_profile_dict(dict, float_dtype="float64"):
+    """
+    loads the load profile of residential heating given by the platform.
 
-    data = pd.DataFrame(dict["load_profile_residential_heating_yearlong_2010"])
-    data = data.loc[:, ("NUTS2_code", "process", "hour", "load")]
-    data["load"] = pd.to_numeric(data["load"])
-    data["hour"] = pd.to_numeric(data["hour"])
-    return data
+    :param dict: dict with the records of the profile in a format of record_chunks().
+    :type dict: dict.
+    :param float_dtype: float type of the load.
+    :type float_dtype: str {"float64", "float32"}.
+    :return: dataframe containing the profile.
+    :rtype: pandas dataframe.
+    """
+
+    return ad_records(dict["load_profile_residential_heating_yearlong_2010"], ("NUTS2_code", "process", "hour", "load"),
+                      lambda chunk: convert_profile_chunk(chunk, float_dtype))
 
 
-def ad_industry_profiles_local(nuts0_ids):
+def ad_industry_profiles_local(nuts0_ids, float_dtype="float64"):
     """
     Loads industry profiles of different subcategories from different csv files.
 
+    :param nuts0_ids: NUTS0 ids of the countries. None loads the profiles of all countries.
+    :type nuts0_ids: list of str or None.
+    :param float_dtype: float type of the loads.
+    :type float_dtype: str {"float64", "float32"}.
     :return: List of dataframes containing the csv files data.
     :rtype: list [pd.Dataframe, pd.Dataframe, ...].
     """
 
-    file_names = ("hotmaps_task_2.7_load_profile_industry_chemicals_and_petrochemicals_yearlong_2018.csv",
-                  "hotmaps_task_2.7_load_profile_industry_food_and_tobacco_yearlong_2018.csv",
-                  "hotmaps_task_2.7_load_profile_industry_iron_and_steel_yearlong_2018.csv",
-                  "hotmaps_task_2.7_load_profile_industry_non_metalic_minerals_yearlong_2018.csv",
-                  "hotmaps_task_2.7_load_profile_industry_paper_yearlong_2018.csv")
-
-    path = os.path.dirname(
-           os.path.dirname(os.path.abspath(__file__)))
-    path = os.path.join(path, "data")
-
     data = []
-    for file_name in file_names:
-        sub_path = os.path.join(path, file_name)
-        # determine delimiter of csv file
-        with open(sub_path, 'r', encoding='utf-8') as csv_file:
-            delimiter = csv.Sniffer().sniff(csv_file.readline()).delimiter
-
-        raw_data = pd.read_csv(sub_path, sep=delimiter, usecols=("NUTS0_code", "process", "hour", "load"))
-        raw_data = raw_data[raw_data["NUTS0_code"].isin(nuts0_ids)]
-        data.append(raw_data)
+    for raw_data in read_data_csvs(INDUSTRY_PROFILE_FILES, ("NUTS0_code", "process", "hour", "load")):
+        if nuts0_ids is not None:
+            raw_data = raw_data[raw_data["NUTS0_code"].isin(nuts0_ids)]
+        data.append(compact_dtypes(raw_data, float_dtype))
 
     return data
 
 
-def ad_residential_heating_profile_local(nuts2_ids):
+def ad_residential_heating_profile_local(nuts2_ids, float_dtype="float64"):
     """
     Loads residential heating profiles from csv file.
 
+    :param nuts2_ids: NUTS2 ids of the regions. None loads the profiles of all regions.
+    :type nuts2_ids: list of str or None.
+    :param float_dtype: float type of the loads.
+    :type float_dtype: str {"float64", "float32"}.
     :return: Dataframe containing the data of the csv file.
     :rtype: pandas dataframe.
     """
 
-    path = os.path.dirname(
-        os.path.dirname(os.path.abspath(__file__)))
-    path = os.path.join(path, "data")
-    path1 = os.path.join(path, "hotmaps_task_2.7_load_profile_residential_heating_yearlong_2010_part1.csv")
-    path2 = os.path.join(path, "hotmaps_task_2.7_load_profile_residential_heating_yearlong_2010_part2.csv")
-
-    # determine delimiter of csv file
-    with open(path1, 'r', encoding='utf-8') as csv_file:
-        delimiter = csv.Sniffer().sniff(csv_file.readline()).delimiter
-    data = pd.read_csv(path1, sep=delimiter, usecols=("NUTS2_code", "process", "hour", "load"))
-    with open(path2, 'r', encoding='utf-8') as csv_file:
-        delimiter = csv.Sniffer().sniff(csv_file.readline()).delimiter
-    data2 = pd.read_csv(path2, sep=delimiter, usecols=("NUTS2_code", "process", "hour", "load"))
+    data, data2 = read_data_csvs(RESIDENTIAL_HEATING_PROFILE_FILES, ("NUTS2_code", "process", "hour", "load"))
 
     data = data.append(data2)
-    data = data[data["NUTS2_code"].isin(nuts2_ids)]
+    if nuts2_ids is not None:
+        data = data[data["NUTS2_code"].isin(nuts2_ids)]
 
-    return data
+    # the categories of the two parts differ, which makes their codes object columns again
+    return compact_dtypes(data, float_dtype)
 
 
-def ad_industrial_database_local(nuts0_ids):
+def ad_industrial_database_local(nuts0_ids, float_dtype="float64"):
     """
     loads data of heat sources given by a csv file.
 
+    :param nuts0_ids: NUTS0 ids of the countries. None loads the sources of all countries.
+    :type nuts0_ids: list of str or None.
+    :param float_dtype: float type of the excess heat.
+    :type float_dtype: str {"float64", "float32"}.
     :return: dataframe containing the data of the csv file.
     :rtype: pandas dataframe.
     """
 
-    country_to_nuts0 = {"Austria": "AT", "Belgium": "BE", "Bulgaria": "BG", "Cyprus": "CY", "Czech Republic": "CZ",
-                    "Germany": "DE", "Denmark": "DK", "Estonia": "EE", "Finland": "FI", "France": "FR",
-                    "Greece": "EL", "Hungary": "HU", "Croatia": "HR", "Ireland": "IE", "Italy": "IT",
-                    "Lithuania": "LT", "Luxembourg": "LU", "Latvia": "LV", "Malta": "MT", "Netherland": "Nl",
-                    "Netherlands": "Nl",
-                    "Poland": "PL", "Portugal": "PT", "Romania": "RO", "Spain": "ES", "Sweden": "SE",
-                    "Slovenia": "SI", "Slovakia": "SK", "United Kingdom": "UK", "Albania": "AL", "Montenegro": "ME",
-                    "North Macedonia": "MK", "Serbia": "RS", "Turkey": "TR", "Switzerland": "CH", "Iceland": "IS",
-                    "Liechtenstein": "LI", "Norway": "NO"}
-    path = os.path.dirname(
-           os.path.dirname(os.path.abspath(__file__)))
-    path = os.path.join(os.path.join(path, "data"), "Industrial_Database.csv")
-
-    # determine delimiter of csv file
-    with open(path, 'r', encoding='utf-8') as csv_file:
-        delimiter = csv.Sniffer().sniff(csv_file.readline()).delimiter
-
-    raw_data = pd.read_csv(path, sep=delimiter, usecols=("geom", "Subsector", "Excess_Heat_100-200C",
+    raw_data = read_data_csv("Industrial_Database.csv", ("geom", "Subsector", "Excess_Heat_100-200C",
                                                          "Excess_Heat_200-500C", "Excess_Heat_500C", "Country"))
+    # check if site location is available
+    raw_data = raw_data[raw_data["geom"].notna()]
 
-    # dataframe for processed data
-    data = pd.DataFrame(columns=("ellipsoid", "Lon", "Lat", "Nuts0_ID", "Subsector", "Excess_heat", "Temperature"))
-    for i, site in raw_data.iterrows():
-        # check if site location is available
-        if not pd.isna(site["geom"]):
-            # extract ellipsoid model and (lon, lat) from the "geom" column
-            ellipsoid, coordinate = site["geom"].split(";")
-            m = re.search("[-+]?[0-9]*\.?[0-9]+.[-+]?[0-9]*\.?[0-9]+", coordinate)
-            m = m.group(0)
-            lon, lat = m.split(" ")
-            lon = float(lon)
-            lat = float(lat)
-
-            nuts0 = country_to_nuts0[site["Country"]]
-
-            # check if heat at specific temperature range is available
-            # TODO deal with units; hard coded temp ranges?
-            if not pd.isna(site["Excess_Heat_100-200C"]) and site["Excess_Heat_100-200C"] != "" and site["Excess_Heat_100-200C"] != 0:
-                data.loc[data.shape[0]] = (ellipsoid, lon, lat, nuts0, site["Subsector"],
-                                           site["Excess_Heat_100-200C"] * 1000, 150)
-            if not pd.isna(site["Excess_Heat_200-500C"]) and site["Excess_Heat_200-500C"] != "" and site["Excess_Heat_200-500C"] != 0:
-                data.loc[data.shape[0]] = (ellipsoid, lon, lat, nuts0,
-                                           site["Subsector"], site["Excess_Heat_200-500C"] * 1000, 350)
-            if not pd.isna(site["Excess_Heat_500C"]) and site["Excess_Heat_500C"] != "" and site["Excess_Heat_500C"] != 0:
-                data.loc[data.shape[0]] = (ellipsoid, lon, lat, nuts0,
-                                           site["Subsector"], site["Excess_Heat_500C"] * 1000, 500)
-
-    data = data[data["Nuts0_ID"].isin(nuts0_ids)]
+    # extract ellipsoid model and (lon, lat) from the "geom" column
+    geometry = raw_data["geom"].str.split(";", n=1, expand=True)
+    coordinates = geometry[1].str.extract(r"([-+]?[0-9]*\.?[0-9]+) ([-+]?[0-9]*\.?[0-9]+)").astype(float)
+    sites = pd.DataFrame({"ellipsoid": geometry[0].values, "Lon": coordinates[0].values, "Lat": coordinates[1].values,
+                          "Nuts0_ID": country_codes(raw_data["Country"]).values,
+                          "Subsector": raw_data["Subsector"].values})
+    for column in ("Excess_Heat_100-200C", "Excess_Heat_200-500C", "Excess_Heat_500C"):
+        sites[column] = raw_data[column].values
+    # TODO deal with units; hard coded temp ranges?
+    data = melt_temperature_bands(sites, ("Excess_Heat_100-200C", "Excess_Heat_200-500C", "Excess_Heat_500C"))
 
-    return data
+    if nuts0_ids is not None:
+        data = data[data["Nuts0_ID"].isin(nuts0_ids)]
 
+    return compact_dtypes(data, float_dtype)
 
-def ad_entry_points(nuts2_id):
+
+def ad_entry_points(nuts2_id, float_dtype="float64"):
     """
     loads data of heat sources given by a csv file.
 
+    :param nuts2_id: NUTS2 ids of the regions, see set_nuts2_regions().
+    :type nuts2_id: str or list of str.
+    :param float_dtype: float type of the heat demand.
+    :type float_dtype: str {"float64", "float32"}.
     :return: dataframe containing the data of the csv file.
     :rtype: pandas dataframe.
     """
 
-    path = os.path.dirname(
-           os.path.dirname(os.path.abspath(__file__)))
-    path = os.path.join(os.path.join(path, "data"), "entry_points.csv")
-
-    # determine delimiter of csv file
-    with open(path, 'r', encoding='utf-8') as csv_file:
-        delimiter = csv.Sniffer().sniff(csv_file.readline()).delimiter
-    raw_data = pd.read_csv(path, sep=delimiter, usecols=("Lon", "Lat", "Annual heat demand in Gwh", "id"))
+    raw_data = read_data_csv("entry_points.csv", ("Lon", "Lat", "Annual heat demand in Gwh", "id"))
     data = pd.DataFrame(raw_data, columns=("Lon", "Lat", "Heat_demand", "id"))
     data["Heat_demand"] = 1000 * data["Heat_demand"]
-    data["Nuts2_ID"] = nuts2_id
+    data = set_nuts2_regions(data, nuts2_id)
 
-    return data
+    return compact_dtypes(data, float_dtype)
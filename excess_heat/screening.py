@@ -0,0 +1,195 @@
+import logging
+
+import numpy as np
+
+from .CM1 import PIPE_COSTS
+
+
+logger = logging.getLogger(__name__)
+
+
+def vertex_supply_and_demand(network, source_values, sink_values):
+    """
+    function assigning values of the sources and sinks to the vertices of the correspondence graph of a network.
+
+    :param network: network.
+    :type network: NetworkGraph.
+    :param source_values: value of every source, optionally one row per hour.
+    :type source_values: np.array.
+    :param sink_values: value of every sink, optionally one row per hour.
+    :type sink_values: np.array.
+    :return: supply and demand of every vertex, one column per vertex.
+    :rtype: tuple of np.array.
+    """
+
+    number_of_vertices = network.correspondence_graph.vcount()
+    source_values = np.asarray(source_values, dtype=float)
+    sink_values = np.asarray(sink_values, dtype=float)
+    supply = np.zeros(source_values.shape[:-1] + (number_of_vertices,))
+    demand = np.zeros(sink_values.shape[:-1] + (number_of_vertices,))
+    supply[..., network.source_vertices] = source_values
+    demand[..., network.sink_vertices] = sink_values
+
+    return supply, demand
+
+
+def component_totals(values, components):
+    """
+    function summing the columns of values by component. The columns are sorted by component and summed with
+    np.add.reduceat, hence the cost is linear in the size of values.
+
+    :param values: value of every site, optionally one row per hour.
+    :type values: np.array.
+    :param components: component of every site.
+    :type components: np.array.
+    :return: components with at least one site and their totals, one column per component.
+    :rtype: tuple of np.array.
+    """
+
+    values = np.asarray(values, dtype=float)
+    order = np.argsort(components, kind="stable")
+    present, starts = np.unique(components[order], return_index=True)
+    if len(order) == 0:
+        return present, np.zeros(values.shape[:-1] + (0,))
+
+    return present, np.add.reduceat(values[..., order], starts, axis=-1)
+
+
+def active_hours(network, heat_source_profiles, heat_sink_profiles):
+    """
+    function returning the hours in which any component of the network has both supply and demand. In all other
+    hours the maximum flow is zero and does not need to be computed.
+
+    :param network: network.
+    :type network: NetworkGraph.
+    :param heat_source_profiles: capacity of each source, one row per hour.
+    :type heat_source_profiles: np.array.
+    :param heat_sink_profiles: demand of each sink, one row per hour.
+    :type heat_sink_profiles: np.array.
+    :return: True for every hour with a possible flow.
+    :rtype: np.array of bool.
+    """
+
+    membership = np.array(network.correspondence_graph.connected_components().membership, dtype=int)
+    source_components, component_supply = component_totals(heat_source_profiles, membership[network.source_vertices])
+    sink_components, component_demand = component_totals(heat_sink_profiles, membership[network.sink_vertices])
+    # only components with sources and sinks can have a flow
+    _, source_columns, sink_columns = np.intersect1d(source_components, sink_components, return_indices=True)
+
+    return np.any((component_supply[:, source_columns] > 0) & (component_demand[:, sink_columns] > 0), axis=1)
+
+
+def annual_flow_bounds(network, annual_source_supply, annual_sink_demand):
+    """
+    function computing an upper bound of the annual flow through every edge of a network. The flow through an edge
+    which is a bridge of the correspondence graph is limited by the supply on one side and the demand on the other
+    side in both directions. The flow through every other edge is limited by the supply and the demand of its
+    component.
+
+    :param network: network.
+    :type network: NetworkGraph.
+    :param annual_source_supply: annual supply of every source.
+    :type annual_source_supply: np.array.
+    :param annual_sink_demand: annual demand of every sink.
+    :type annual_sink_demand: np.array.
+    :return: upper bound of the annual flow of every edge in the order of return_edge_source_target_vertices().
+    :rtype: np.array.
+    """
+    from igraph import Graph
+
+    graph = network.correspondence_graph
+    supply, demand = vertex_supply_and_demand(network, annual_source_supply, annual_sink_demand)
+
+    # bound of edges within a cycle
+    membership = np.array(graph.connected_components().membership, dtype=int)
+    component_supply = np.bincount(membership, weights=supply)
+    component_demand = np.bincount(membership, weights=demand)
+    bounds = np.minimum(component_supply, component_demand)[membership[
+        np.array(graph.get_edgelist(), dtype=int).reshape(-1, 2)[:network.graph.ecount(), 0]]]
+
+    # contract the two edge connected blocks, which turns the bridges into a forest
+    bridges = graph.bridges()
+    if not bridges:
+        return bounds
+    blocks = graph.copy()
+    blocks.delete_edges(bridges)
+    block_of_vertex = np.array(blocks.connected_components().membership, dtype=int)
+    number_of_blocks = np.max(block_of_vertex) + 1
+    block_supply = np.bincount(block_of_vertex, weights=supply, minlength=number_of_blocks)
+    block_demand = np.bincount(block_of_vertex, weights=demand, minlength=number_of_blocks)
+    bridge_blocks = [(block_of_vertex[graph.es[bridge].source], block_of_vertex[graph.es[bridge].target])
+                     for bridge in bridges]
+    forest = Graph(n=number_of_blocks, edges=bridge_blocks)
+
+    # supply and demand of the subtree below every block
+    subtree_supply = block_supply.copy()
+    subtree_demand = block_demand.copy()
+    parent = np.full(number_of_blocks, -1)
+    tree_of_block = np.array(forest.connected_components().membership, dtype=int)
+    visited = np.zeros(number_of_blocks, dtype=bool)
+    for root in range(number_of_blocks):
+        if visited[root]:
+            continue
+        order, _, parents = forest.bfs(root)
+        visited[order] = True
+        for block in reversed(order[1:]):
+            parent[block] = parents[block]
+            subtree_supply[parents[block]] += subtree_supply[block]
+            subtree_demand[parents[block]] += subtree_demand[block]
+    tree_supply = np.bincount(tree_of_block, weights=block_supply)
+    tree_demand = np.bincount(tree_of_block, weights=block_demand)
+
+    for bridge, (block1, block2) in zip(bridges, bridge_blocks):
+        if bridge >= network.graph.ecount():
+            continue
+        child = block1 if parent[block1] == block2 else block2
+        tree = tree_of_block[child]
+        # flow from the subtree to the rest of the tree and back
+        bounds[bridge] = (min(subtree_supply[child], tree_demand[tree] - subtree_demand[child]) +
+                          min(tree_supply[tree] - subtree_supply[child], subtree_demand[child]))
+
+    return bounds
+
+
+def screen_edges(network, heat_source_profiles, heat_sink_profiles, investment_period, transmission_line_threshold,
+                 cost_per_meter=None):
+    """
+    function removing the edges of a network which exceed the threshold cost per flow even with the cheapest pipe
+    and the largest annual flow they could carry. The removal tightens the bounds of the remaining edges, hence it is
+    repeated until no edge is removed. Edges which are not proven to be uneconomic are kept for the evaluation by the
+    hourly max flow.
+
+    :param network: network. It is changed in place.
+    :type network: NetworkGraph.
+    :param heat_source_profiles: capacity of each source, one row per hour.
+    :type heat_source_profiles: np.array.
+    :param heat_sink_profiles: demand of each sink, one row per hour.
+    :type heat_sink_profiles: np.array.
+    :param investment_period: investment period of the network in years.
+    :type investment_period: float.
+    :param transmission_line_threshold: maximum cost per flow of a single transmission line.
+    :type transmission_line_threshold: float.
+    :param cost_per_meter: lowest cost of a transmission line per meter. Defaults to the cheapest pipe.
+    :type cost_per_meter: float or None.
+    :return: number of removed edges.
+    :rtype: int.
+    """
+
+    if cost_per_meter is None:
+        cost_per_meter = min(PIPE_COSTS)
+    annual_source_supply = np.sum(heat_source_profiles, axis=0)
+    annual_sink_demand = np.sum(heat_sink_profiles, axis=0)
+    removed = 0
+    while network.graph.ecount() > 0:
+        bounds = annual_flow_bounds(network, annual_source_supply, annual_sink_demand)
+        lengths = np.array(network.get_edge_attribute("distance"), dtype=float)
+        # same cost per flow as in compute_flow() with the cheapest pipe
+        lowest_cost_per_flow = cost_per_meter * lengths * 1000 / bounds / investment_period
+        uneconomic = np.nonzero((lowest_cost_per_flow > transmission_line_threshold) | (bounds <= 0))[0]
+        if len(uneconomic) == 0:
+            break
+        network.select_edges(np.setdiff1d(np.arange(network.graph.ecount()), uneconomic))
+        removed += len(uneconomic)
+
+    logger.info("pre-screening removed %d edges", removed)
+    return removed
@@ -0,0 +1,657 @@
+import argparse
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from .pipeline import reference_fingerprint
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# number of queued jobs after which new jobs are rejected
+MAX_QUEUE = 64
+# number of finished jobs whose status is kept
+MAX_FINISHED_JOBS = 1000
+# number of finished jobs the latency metrics are computed from
+LATENCY_WINDOW = 1000
+# parameters of excess_heat() which are set by the service and not by the job payload
+SERVICE_PARAMETERS = ("progress", "cancel", "reference_data")
+# directories of excess_heat() which only the defaults of the service set, never a job payload
+SERVICE_DIRECTORIES = ("cache_dir", "stage_dir", "checkpoint_dir")
+# files of excess_heat() which a job payload names relative to the output root of the service
+JOB_FILES = ("output_transmission_lines", "save_state", "store", "warm_start")
+# reference data files, a change of any of them reloads the reference data before the next job
+REFERENCE_FILES = ("Industrial_Database.csv", "hotmaps_task_2.7_load_profile_*.csv")
+
+
+class QueueFull(RuntimeError):
+    """
+    Exception raised when a job is submitted while the queue of the service is full.
+    """
+
+
+class ReferenceData:
+    """
+    Industrial database and Hotmaps profiles of all countries and regions, loaded once and indexed by nuts id. Jobs
+    select the rows of their region instead of reading and parsing the csv files again.
+    """
+
+    def __init__(self):
+        """
+        Constructor loading the reference data.
+
+        Attributes:
+            fingerprint: Fingerprints of the loaded reference files. Tuple.
+            loaded: Time the reference data was loaded. Float.
+        """
+
+        self.lock = threading.Lock()
+        self.fingerprint = None
+        self.loaded = None
+        self.tables = None
+        self.load()
+
+    @staticmethod
+    def index(table, header):
+        """
+        Method indexing the rows of a table by the value of a column.
+
+        :param table: table.
+        :type table: pd.DataFrame.
+        :param header: header of the column.
+        :type header: str.
+        :return: positions of the rows by value.
+        :rtype: dict {value: np.array}.
+        """
+
+        values = table[header].to_numpy()
+        return {value: np.nonzero(values == value)[0] for value in table[header].unique()}
+
+    def load(self):
+        """
+        Method reading the reference files and indexing them.
+
+        :return:
+        """
+        from .read_data import ad_industrial_database_local, ad_industry_profiles_local, \
+            ad_residential_heating_profile_local
+
+        start = time.monotonic()
+        fingerprint = tuple(reference_fingerprint(pattern) for pattern in REFERENCE_FILES)
+        industrial_database = ad_industrial_database_local(None)
+        industry_profiles = ad_industry_profiles_local(None)
+        residential_heating_profile = ad_residential_heating_profile_local(None)
+        # the tables are replaced at once, so concurrent jobs never see a partially loaded state
+        self.tables = {
+            "industrial_database": (industrial_database, self.index(industrial_database, "Nuts0_ID")),
+            "industry_profiles": [(profile, self.index(profile, "NUTS0_code")) for profile in industry_profiles],
+            "residential_heating_profile": (residential_heating_profile,
+                                            self.index(residential_heating_profile, "NUTS2_code"))
+        }
+        self.fingerprint = fingerprint
+        self.loaded = time.time()
+        logger.info("loaded reference data in %.1f s", time.monotonic() - start)
+
+    def refresh(self):
+        """
+        Method reloading the reference data if a reference file has changed since it was loaded.
+
+        :return: True if the reference data was reloaded.
+        :rtype: bool.
+        """
+
+        with self.lock:
+            if tuple(reference_fingerprint(pattern) for pattern in REFERENCE_FILES) == self.fingerprint:
+                return False
+            self.load()
+            return True
+
+    def version(self):
+        """
+        Method returning the version of the loaded reference data, which changes whenever it is reloaded.
+
+        :return: fingerprints of the reference files and the time they were loaded.
+        :rtype: tuple.
+        """
+
+        return self.fingerprint, self.loaded
+
+    @staticmethod
+    def select(table, index, ids):
+        """
+        Method selecting the rows of a table with the given ids in their original order.
+
+        :param table: table.
+        :type table: pd.DataFrame.
+        :param index: positions of the rows by id.
+        :type index: dict.
+        :param ids: ids.
+        :type ids: list.
+        :return: rows with the given ids.
+        :rtype: pd.DataFrame.
+        """
+
+        positions = [index[value] for value in set(ids) if value in index]
+        positions = np.sort(np.concatenate(positions)) if positions else np.zeros(0, dtype=int)
+        return table.iloc[positions]
+
+    def industrial_database(self, nuts0_ids):
+        """
+        Method returning the heat sources of the countries like ad_industrial_database_local().
+
+        :param nuts0_ids: NUTS0 ids of the countries.
+        :type nuts0_ids: list of str.
+        :return: heat sources.
+        :rtype: pd.DataFrame.
+        """
+
+        return self.select(*self.tables["industrial_database"], nuts0_ids)
+
+    def industry_profiles(self, nuts0_ids):
+        """
+        Method returning the industry profiles of the countries like ad_industry_profiles_local().
+
+        :param nuts0_ids: NUTS0 ids of the countries.
+        :type nuts0_ids: list of str.
+        :return: one dataframe per subsector.
+        :rtype: list of pd.DataFrame.
+        """
+
+        return [self.select(profile, index, nuts0_ids) for profile, index in self.tables["industry_profiles"]]
+
+    def residential_heating_profile(self, nuts2_ids):
+        """
+        Method returning the residential heating profiles of the regions like ad_residential_heating_profile_local().
+
+        :param nuts2_ids: NUTS2 ids of the regions.
+        :type nuts2_ids: list of str.
+        :return: residential heating profiles.
+        :rtype: pd.DataFrame.
+        """
+
+        return self.select(*self.tables["residential_heating_profile"], nuts2_ids)
+
+
+def latency_summary(latencies):
+    """
+    function summarizing latencies.
+
+    :param latencies: latencies in seconds.
+    :type latencies: iterable of float.
+    :return: number, mean, median, 95th percentile and maximum of the latencies.
+    :rtype: dict.
+    """
+
+    latencies = np.array(list(latencies), dtype=float)
+    if len(latencies) == 0:
+        return {"count": 0, "mean": None, "p50": None, "p95": None, "max": None}
+    return {"count": len(latencies), "mean": float(np.mean(latencies)),
+            "p50": float(np.percentile(latencies, 50)), "p95": float(np.percentile(latencies, 95)),
+            "max": float(np.max(latencies))}
+
+
+class Job:
+    """
+    Calculation submitted to the service.
+    """
+
+    def __init__(self, parameters):
+        """
+        Constructor of the job.
+
+        :param parameters: parameters of excess_heat().
+        :type parameters: dict.
+
+        Attributes:
+            id: Id of the job. Str.
+            status: One of "queued", "running", "finished", "failed" and "cancelled". Str.
+            cancel: Cancels the job once it is set. threading.Event.
+        """
+
+        self.id = uuid.uuid4().hex
+        self.parameters = parameters
+        self.status = "queued"
+        self.cancel = threading.Event()
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.cached = None
+        self.error = None
+        self.progress = None
+
+    def report_progress(self, iteration, hours, number_of_hours):
+        """
+        Method receiving the progress of the pruning loop of the job.
+
+        :param iteration: iteration of the pruning loop.
+        :type iteration: int.
+        :param hours: number of solved hours.
+        :type hours: int.
+        :param number_of_hours: number of hours of the iteration.
+        :type number_of_hours: int.
+        :return:
+        """
+
+        self.progress = {"iteration": iteration, "hours": hours, "number_of_hours": number_of_hours}
+
+    def to_dict(self):
+        """
+        Method returning the state of the job.
+
+        :return: json serializable state.
+        :rtype: dict.
+        """
+
+        return {"id": self.id, "status": self.status, "parameters": self.parameters, "submitted": self.submitted,
+                "started": self.started, "finished": self.finished, "cached": self.cached, "error": self.error,
+                "progress": self.progress}
+
+
+class ExcessHeatService:
+    """
+    Service running excess_heat() jobs in a bounded pool of threads of a long running process. The reference data is
+    loaded once and shared by all jobs. The max flow computations of concurrent jobs only run in parallel if the jobs
+    set isolate_max_flow.
+    """
+
+    def __init__(self, workers=2, max_queue=MAX_QUEUE, defaults=None, reference_data=None, output_root=None):
+        """
+        Constructor of the service.
+
+        :param workers: number of jobs running at the same time.
+        :type workers: int.
+        :param max_queue: number of queued jobs after which new jobs are rejected.
+        :type max_queue: int.
+        :param defaults: parameters of excess_heat() applied to every job unless the job sets them, e.g. cache_dir.
+        :type defaults: dict or None.
+        :param reference_data: reference data shared by the jobs. None loads it.
+        :type reference_data: ReferenceData or None.
+        :param output_root: directory the files of the jobs are resolved in. Files outside of it are rejected.
+                            Defaults to the working directory.
+        :type output_root: str or None.
+        """
+        from .excess_heat import excess_heat
+
+        if workers < 1:
+            raise ValueError("The service needs at least one worker")
+        self.function = excess_heat
+        signature = inspect.signature(excess_heat).parameters
+        self.required = [name for name, parameter in signature.items() if parameter.default is parameter.empty]
+        self.allowed = set(signature) - set(SERVICE_PARAMETERS)
+        self.defaults = dict(defaults or {})
+        self.validate(self.defaults, complete=False)
+        self.output_root = os.path.realpath(output_root if output_root is not None else os.getcwd())
+
+        self.workers = workers
+        self.max_queue = max_queue
+        self.reference_data = reference_data if reference_data is not None else ReferenceData()
+        # numpy error handling is thread local, the workers ignore divisions by zero like the main thread
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="excess-heat-job",
+                                           initializer=np.seterr, initargs=("ignore", None, None, "ignore"))
+        self.lock = threading.Lock()
+        self.jobs = OrderedDict()
+        self.started = time.time()
+        self.counts = {"submitted": 0, "rejected": 0, "finished": 0, "failed": 0, "cancelled": 0, "cached": 0}
+        self.wait_times = deque(maxlen=LATENCY_WINDOW)
+        self.run_times = deque(maxlen=LATENCY_WINDOW)
+
+    def validate(self, parameters, complete=True):
+        """
+        Method checking the parameters of a job.
+
+        :param parameters: parameters of excess_heat().
+        :type parameters: dict.
+        :param complete: requires all parameters without default value.
+        :type complete: bool.
+        :return:
+        """
+
+        if not isinstance(parameters, dict):
+            raise TypeError("The parameters of a job must be a json object")
+        unknown = sorted(set(parameters) - self.allowed)
+        if unknown:
+            raise ValueError("Unknown parameters " + ", ".join(unknown))
+        missing = [name for name in self.required if name not in parameters]
+        if complete and missing:
+            raise ValueError("Missing parameters " + ", ".join(missing))
+
+    def resolve_files(self, parameters):
+        """
+        Method resolving the files of a job payload in the output root. Payloads must not set the directories of the
+        service.
+
+        :param parameters: parameters of excess_heat() set by the job payload.
+        :type parameters: dict.
+        :return: parameters with the absolute paths of the files.
+        :rtype: dict.
+        """
+
+        directories = sorted(set(parameters) & set(SERVICE_DIRECTORIES))
+        if directories:
+            raise ValueError("Parameters " + ", ".join(directories) + " are set by the service only")
+        resolved = dict(parameters)
+        for name in JOB_FILES:
+            if parameters.get(name) is None:
+                continue
+            if not isinstance(parameters[name], str):
+                raise TypeError("Parameter " + name + " must be a path")
+            path = os.path.realpath(os.path.join(self.output_root, parameters[name]))
+            if os.path.commonpath((path, self.output_root)) != self.output_root:
+                raise ValueError("Parameter " + name + " is outside the output root " + self.output_root)
+            resolved[name] = path
+        return resolved
+
+    def queue_depth(self):
+        """
+        Method returning the number of jobs waiting for a worker.
+
+        :return: number of queued jobs.
+        :rtype: int.
+        """
+
+        with self.lock:
+            return sum(job.status == "queued" for job in self.jobs.values())
+
+    def submit(self, parameters):
+        """
+        Method queueing a job.
+
+        :param parameters: parameters of excess_heat(). Missing parameters are taken from the defaults of the service.
+                           Files are relative to the output root, directories are set by the service only.
+        :type parameters: dict.
+        :return: queued job.
+        :rtype: Job.
+        """
+
+        self.validate(parameters, complete=False)
+        job = Job(dict(self.defaults, **self.resolve_files(parameters)))
+        self.validate(job.parameters)
+        with self.lock:
+            if sum(queued.status == "queued" for queued in self.jobs.values()) >= self.max_queue:
+                self.counts["rejected"] += 1
+                raise QueueFull("The queue of the service is full with " + str(self.max_queue) + " jobs")
+            self.jobs[job.id] = job
+            self.counts["submitted"] += 1
+            self.forget_finished_jobs()
+        self.executor.submit(self.run, job)
+        return job
+
+    def forget_finished_jobs(self):
+        """
+        Method removing the oldest finished jobs above MAX_FINISHED_JOBS. Must be called with the lock held.
+
+        :return:
+        """
+
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished is not None]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def run(self, job):
+        """
+        Method running a job in a worker thread.
+
+        :param job: job.
+        :type job: Job.
+        :return:
+        """
+        from .checkpoint import RunCancelled
+
+        job.started = time.time()
+        if job.cancel.is_set():
+            self.finish(job, "cancelled")
+            return
+        job.status = "running"
+        try:
+            self.reference_data.refresh()
+            job.cached = bool(self.function(**job.parameters, progress=job.report_progress, cancel=job.cancel,
+                                            reference_data=self.reference_data))
+        except RunCancelled as e:
+            job.error = str(e)
+            self.finish(job, "cancelled")
+        except Exception as e:
+            logger.exception("job %s failed", job.id)
+            job.error = type(e).__name__ + ": " + str(e)
+            self.finish(job, "failed")
+        else:
+            self.finish(job, "finished")
+
+    def finish(self, job, status):
+        """
+        Method recording the end of a job.
+
+        :param job: job.
+        :type job: Job.
+        :param status: final status.
+        :type status: str {"finished", "failed", "cancelled"}.
+        :return:
+        """
+
+        with self.lock:
+            job.finished = time.time()
+            job.status = status
+            self.counts[status] += 1
+            if job.cached:
+                self.counts["cached"] += 1
+            self.wait_times.append(job.started - job.submitted)
+            if status == "finished":
+                self.run_times.append(job.finished - job.started)
+
+    def job(self, job_id):
+        """
+        Method returning a job.
+
+        :param job_id: id of the job.
+        :type job_id: str.
+        :return: job or None if the job is unknown.
+        :rtype: Job or None.
+        """
+
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """
+        Method cancelling a job. A queued job is not started, a running job stops after the hour being computed.
+
+        :param job_id: id of the job.
+        :type job_id: str.
+        :return: job or None if the job is unknown.
+        :rtype: Job or None.
+        """
+
+        job = self.job(job_id)
+        if job is not None:
+            job.cancel.set()
+        return job
+
+    def metrics(self):
+        """
+        Method returning the metrics of the service.
+
+        :return: queue depth, number of running jobs, job counts and latencies in seconds of the last LATENCY_WINDOW
+                 jobs.
+        :rtype: dict.
+        """
+
+        with self.lock:
+            statuses = [job.status for job in self.jobs.values()]
+            wait_times = list(self.wait_times)
+            run_times = list(self.run_times)
+            counts = dict(self.counts)
+        return {"queue_depth": statuses.count("queued"), "running": statuses.count("running"),
+                "workers": self.workers, "max_queue": self.max_queue, "uptime": time.time() - self.started,
+                "reference_data_loaded": self.reference_data.loaded, "jobs": counts,
+                "wait_time": latency_summary(wait_times), "run_time": latency_summary(run_times)}
+
+    def close(self, cancel=False):
+        """
+        Method stopping the service after the running jobs.
+
+        :param cancel: cancels the queued and running jobs.
+        :type cancel: bool.
+        :return:
+        """
+
+        if cancel:
+            with self.lock:
+                for job in self.jobs.values():
+                    job.cancel.set()
+        self.executor.shutdown(wait=True)
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handler of the http interface of the service:
+
+        POST /jobs           submits a job, the body is a json object of parameters of excess_heat()
+        GET /jobs/<id>       returns the state of a job
+        DELETE /jobs/<id>    cancels a job
+        GET /metrics         returns the metrics of the service
+        GET /health          returns 200 while the service is running
+    """
+
+    def send_json(self, status, body):
+        """
+        Method sending a json response.
+
+        :param status: http status code.
+        :type status: int.
+        :param body: json serializable body.
+        :type body: dict.
+        :return:
+        """
+
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def job_id(self):
+        """
+        Method returning the job id of a /jobs/<id> path.
+
+        :return: job id or None for other paths.
+        :rtype: str or None.
+        """
+
+        parts = self.path.rstrip("/").split("/")
+        return parts[2] if len(parts) == 3 and parts[1] == "jobs" else None
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self.send_json(200, service.metrics())
+        elif self.job_id() is not None:
+            job = service.job(self.job_id())
+            if job is None:
+                self.send_json(404, {"error": "Unknown job " + self.job_id()})
+            else:
+                self.send_json(200, job.to_dict())
+        else:
+            self.send_json(404, {"error": "Unknown path " + self.path})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self.send_json(404, {"error": "Unknown path " + self.path})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            job = self.server.service.submit(json.loads(self.rfile.read(length).decode("utf-8")))
+        except QueueFull as e:
+            self.send_json(503, {"error": str(e)})
+        except (TypeError, ValueError) as e:
+            self.send_json(400, {"error": str(e)})
+        else:
+            self.send_json(202, job.to_dict())
+
+    def do_DELETE(self):
+        job = self.server.service.cancel(self.job_id()) if self.job_id() is not None else None
+        if job is None:
+            self.send_json(404, {"error": "Unknown job " + str(self.job_id())})
+        else:
+            self.send_json(202, job.to_dict())
+
+    def log_message(self, format, *args):
+        logger.debug("%s %s", self.address_string(), format % args)
+
+
+def create_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """
+    function creating the http server of a service.
+
+    :param service: service running the jobs.
+    :type service: ExcessHeatService.
+    :param host: address the server listens on.
+    :type host: str.
+    :param port: port the server listens on. 0 selects a free port.
+    :type port: int.
+    :return: server. Call serve_forever() to start it.
+    :rtype: ThreadingHTTPServer.
+    """
+
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def main(argv=None):
+    """
+    Entry point of the service, run with python -m excess_heat.service.
+
+    :param argv: command line arguments without the program name. Defaults to sys.argv[1:].
+    :type argv: list of str or None.
+    :return: exit code.
+    :rtype: int.
+    """
+
+    parser = argparse.ArgumentParser(prog="python -m excess_heat.service",
+                                     description="Runs excess heat calculations submitted over http.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=2, help="number of jobs running at the same time")
+    parser.add_argument("--max-queue", type=int, default=MAX_QUEUE, help="number of queued jobs after which new "
+                                                                         "jobs are rejected")
+    parser.add_argument("--cache-dir", help="default directory of the cache of complete results")
+    parser.add_argument("--stage-dir", help="default directory of the cached results of the pipeline stages")
+    parser.add_argument("--checkpoint-dir", help="directory of the checkpoints of the pruning loops")
+    parser.add_argument("--output-root", help="directory the output files of the jobs are written to (default: the "
+                                              "working directory)")
+    parser.add_argument("-v", "--verbose", action="count", default=0)
+    arguments = parser.parse_args(argv)
+    logging.basicConfig(level=(logging.WARNING, logging.INFO, logging.DEBUG)[min(arguments.verbose, 2)],
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    defaults = {name: getattr(arguments, name) for name in SERVICE_DIRECTORIES if getattr(arguments, name) is not None}
+    service = ExcessHeatService(arguments.workers, arguments.max_queue, defaults, output_root=arguments.output_root)
+    server = create_server(service, arguments.host, arguments.port)
+    logger.warning("serving on http://%s:%d", *server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close(cancel=True)
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import logging
+import os
+import uuid
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+# prefix of the names of the shared memory blocks, followed by the process id of the owner
+BLOCK_PREFIX = "excess_heat_"
+# shared memory blocks attached by this process, by block name
+attached_blocks = {}
+
+
+def release_blocks(blocks):
+    """
+    function closing and removing shared memory blocks. Blocks which are already removed are skipped.
+
+    :param blocks: shared memory blocks.
+    :type blocks: list of multiprocessing.shared_memory.SharedMemory.
+    :return:
+    """
+
+    for block in blocks:
+        try:
+            block.close()
+            block.unlink()
+        except FileNotFoundError:
+            pass
+        except BufferError:
+            # an array of this process still uses the block, it is removed and freed once the array is gone
+            block.unlink()
+    del blocks[:]
+
+
+def start_resource_tracker():
+    """
+    function starting the resource tracker of multiprocessing, which removes the shared memory blocks of killed
+    processes. Worker processes started afterwards report the blocks they attach to the same tracker, otherwise
+    every worker would start its own tracker, which removes the blocks of its owner once the worker exits.
+
+    :return:
+    """
+
+    if os.name == "posix":
+        from multiprocessing import resource_tracker
+        resource_tracker.ensure_running()
+
+
+class SharedArrays:
+    """
+    Numpy arrays in named shared memory blocks, which worker processes attach to without copying them. The owner
+    writes the arrays once and passes descriptors to the workers, which are small enough to be sent with every task.
+    The blocks are removed by close(), when the object is garbage collected or the interpreter exits. If the owner
+    is killed, the resource tracker of multiprocessing removes them.
+    """
+
+    def __init__(self, arrays=None):
+        """
+        Constructor of the shared arrays.
+
+        :param arrays: arrays to share by name.
+        :type arrays: dict of np.array or None.
+
+        Attributes:
+            arrays: Arrays of the owner, which are views of the blocks. Dict of np.array.
+            descriptors: Block name, shape and dtype of every array by name, the argument of attach_shared_arrays().
+                Dict.
+        """
+
+        self.arrays = {}
+        self.descriptors = {}
+        self.blocks = []
+        self.finalizer = weakref.finalize(self, release_blocks, self.blocks)
+        for name, array in (arrays or {}).items():
+            self.add(name, array)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def add(self, name, array):
+        """
+        Method copying an array into a new shared memory block.
+
+        :param name: name of the array.
+        :type name: str.
+        :param array: array.
+        :type array: array like.
+        :return: the shared array, a writable view of the block.
+        :rtype: np.array.
+        """
+
+        if not self.finalizer.alive:
+            raise RuntimeError("The shared arrays are closed")
+        if name in self.arrays:
+            raise ValueError("An array " + str(name) + " is already shared")
+        array = np.asarray(array)
+        if array.dtype.hasobject:
+            raise TypeError("Arrays of python objects can not be shared")
+        block = shared_memory.SharedMemory(name=BLOCK_PREFIX + str(os.getpid()) + "_" + uuid.uuid4().hex[:12],
+                                           create=True, size=max(array.nbytes, 1))
+        self.blocks.append(block)
+        shared = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+        shared[...] = array
+        self.arrays[name] = shared
+        self.descriptors[name] = (block.name, array.shape, array.dtype.str)
+
+        return shared
+
+    def close(self):
+        """
+        Method removing the shared memory blocks. Workers which are still attached keep their mapping until they
+        detach.
+
+        :return:
+        """
+
+        self.arrays = {}
+        self.finalizer()
+
+
+def attach_shared_arrays(descriptors):
+    """
+    function attaching to shared arrays in a worker process. The arrays are read-only views of the blocks, blocks
+    which this process is already attached to are reused. The worker must be started after start_resource_tracker()
+    or the creation of the SharedArrays.
+
+    :param descriptors: descriptors of SharedArrays.
+    :type descriptors: dict.
+    :return: the arrays by name.
+    :rtype: dict of np.array.
+    """
+
+    arrays = {}
+    for name, (block_name, shape, dtype) in descriptors.items():
+        if block_name not in attached_blocks:
+            attached_blocks[block_name] = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=dtype, buffer=attached_blocks[block_name].buf)
+        array.flags.writeable = False
+        arrays[name] = array
+
+    return arrays
+
+
+def detach_shared_arrays(descriptors=None):
+    """
+    function detaching this process from shared memory blocks. Arrays of the blocks must not be used afterwards.
+
+    :param descriptors: descriptors of the arrays to detach from. None detaches from all blocks.
+    :type descriptors: dict or None.
+    :return:
+    """
+
+    block_names = list(attached_blocks) if descriptors is None else \
+        [block_name for block_name, _, _ in descriptors.values()]
+    for block_name in block_names:
+        block = attached_blocks.pop(block_name, None)
+        if block is None:
+            continue
+        try:
+            block.close()
+        except BufferError:
+            logger.warning("shared memory block %s is still used by an array of process %d", block_name, os.getpid())
@@ -0,0 +1,434 @@
+import contextlib
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from .pipeline import reference_fingerprint
+
+
+logger = logging.getLogger(__name__)
+
+# reference data files the store is filled from, a change of any of them refills the store on refresh()
+REFERENCE_FILES = ("Industrial_Database.csv", "hotmaps_task_2.7_load_profile_*.csv")
+# number of idle connections kept open by a store
+POOL_SIZE = 4
+# rows inserted per statement batch by the bulk inserts
+INSERT_BATCH_SIZE = 100000
+# tables and indices of the store. The locations of sources and transmission lines are indexed by R*Tree tables
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+    "CREATE TABLE IF NOT EXISTS heat_sources (id INTEGER PRIMARY KEY, ellipsoid TEXT, Lon REAL, Lat REAL, "
+    "Nuts0_ID TEXT, Subsector TEXT, Excess_heat REAL, Temperature INTEGER)",
+    "CREATE INDEX IF NOT EXISTS heat_sources_nuts0 ON heat_sources (Nuts0_ID)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS heat_sources_location USING rtree(id, min_lon, max_lon, min_lat, max_lat)",
+    "CREATE TABLE IF NOT EXISTS industry_profiles (id INTEGER PRIMARY KEY, sector INTEGER, NUTS0_code TEXT, "
+    "process TEXT, hour INTEGER, load REAL)",
+    "CREATE INDEX IF NOT EXISTS industry_profiles_nuts0 ON industry_profiles (NUTS0_code, sector)",
+    "CREATE TABLE IF NOT EXISTS residential_heating_profiles (id INTEGER PRIMARY KEY, NUTS2_code TEXT, "
+    "process TEXT, hour INTEGER, load REAL)",
+    "CREATE INDEX IF NOT EXISTS residential_heating_profiles_nuts2 ON residential_heating_profiles (NUTS2_code)",
+    "CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, created REAL, parameters TEXT, total_cost REAL, "
+    "total_flow REAL, cost_per_flow REAL)",
+    "CREATE TABLE IF NOT EXISTS run_regions (run_id INTEGER REFERENCES runs (id), nuts2_id TEXT)",
+    "CREATE INDEX IF NOT EXISTS run_regions_nuts2 ON run_regions (nuts2_id, run_id)",
+    "CREATE TABLE IF NOT EXISTS transmission_lines (id INTEGER PRIMARY KEY, run_id INTEGER REFERENCES runs (id), "
+    "Lon1 REAL, Lat1 REAL, Lon2 REAL, Lat2 REAL, flow REAL, temperature REAL, cost REAL, length REAL)",
+    "CREATE INDEX IF NOT EXISTS transmission_lines_run ON transmission_lines (run_id)",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS transmission_lines_location USING rtree(id, min_lon, max_lon, min_lat, "
+    "max_lat)",
+)
+# columns of the tables in the order of the loaders of read_data
+HEAT_SOURCE_COLUMNS = ("ellipsoid", "Lon", "Lat", "Nuts0_ID", "Subsector", "Excess_heat", "Temperature")
+INDUSTRY_PROFILE_COLUMNS = ("NUTS0_code", "process", "hour", "load")
+RESIDENTIAL_HEATING_PROFILE_COLUMNS = ("NUTS2_code", "process", "hour", "load")
+
+
+def id_condition(column, ids):
+    """
+    function returning the condition of a query selecting the rows with the given ids.
+
+    :param column: column of the ids.
+    :type column: str.
+    :param ids: ids. None selects all rows.
+    :type ids: list of str or None.
+    :return: condition and its parameters.
+    :rtype: tuple. (str, list)
+    """
+
+    if ids is None:
+        return "1", []
+    ids = sorted(set(ids))
+    return column + " IN (" + ", ".join("?" * len(ids)) + ")", ids
+
+
+class SqliteStore:
+    """
+    Store of the heat sources, the profiles and the results of runs in a local SQLite file. The reference data is
+    inserted once in bulk, runs query the rows of their countries and regions by indexed columns. It provides the
+    methods of ReferenceData, so it can be passed as reference_data to excess_heat(). Connections are pooled and
+    each is used by one thread at a time.
+    """
+
+    def __init__(self, path, pool_size=POOL_SIZE):
+        """
+        Constructor of the store. The tables are created if they do not exist, the reference data is inserted if the
+        store is empty.
+
+        :param path: path of the SQLite file.
+        :type path: str.
+        :param pool_size: number of idle connections kept open.
+        :type pool_size: int.
+
+        Attributes:
+            fingerprint: Fingerprints of the reference files the store was filled from. Tuple.
+            loaded: Time the reference data was inserted. Float.
+        """
+
+        self.path = path
+        self.pool = queue.LifoQueue(maxsize=pool_size)
+        self.lock = threading.Lock()
+        self.fingerprint = None
+        self.loaded = None
+        with self.connection() as connection:
+            # readers do not block the writer of the results of other runs
+            connection.execute("PRAGMA journal_mode=WAL")
+            with connection:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+            meta = dict(connection.execute("SELECT key, value FROM meta").fetchall())
+        if "fingerprint" in meta:
+            self.fingerprint = tuple(json.loads(meta["fingerprint"]))
+            self.loaded = float(meta["loaded"])
+        else:
+            self.import_reference_data()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def connect(self):
+        """
+        Method opening a new connection to the store.
+
+        :return: connection.
+        :rtype: sqlite3.Connection.
+        """
+
+        connection = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+        connection.execute("PRAGMA foreign_keys=ON")
+        return connection
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Method lending a connection of the pool, a new one is opened if all are in use.
+
+        :return: connection, which must not be used after the with block.
+        :rtype: sqlite3.Connection.
+        """
+
+        try:
+            connection = self.pool.get_nowait()
+        except queue.Empty:
+            connection = self.connect()
+        try:
+            yield connection
+        finally:
+            try:
+                self.pool.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+
+    def close(self):
+        """
+        Method closing the idle connections.
+
+        :return:
+        """
+
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    @staticmethod
+    def insert(connection, table, columns, rows):
+        """
+        Method inserting rows into a table in batches of prepared statements.
+
+        :param connection: connection within a transaction.
+        :type connection: sqlite3.Connection.
+        :param table: name of the table.
+        :type table: str.
+        :param columns: columns of the rows.
+        :type columns: tuple of str.
+        :param rows: rows.
+        :type rows: iterable of tuples.
+        :return:
+        """
+
+        statement = "INSERT INTO " + table + " (" + ", ".join(columns) + ") VALUES (" + \
+                    ", ".join("?" * len(columns)) + ")"
+        rows = iter(rows)
+        while True:
+            batch = [row for _, row in zip(range(INSERT_BATCH_SIZE), rows)]
+            if not batch:
+                break
+            connection.executemany(statement, batch)
+
+    @staticmethod
+    def rows(data, columns):
+        """
+        Method returning the rows of a dataframe as tuples of python values.
+
+        :param data: dataframe.
+        :type data: pd.DataFrame.
+        :param columns: columns of the rows.
+        :type columns: tuple of str.
+        :return: rows.
+        :rtype: iterable of tuples.
+        """
+
+        return zip(*(data[column].astype(object).tolist() if str(data[column].dtype) == "category" else
+                     data[column].tolist() for column in columns))
+
+    def import_reference_data(self):
+        """
+        Method replacing the heat sources and profiles of the store by the reference files of the data directory.
+
+        :return:
+        """
+        from .read_data import ad_industrial_database_local, ad_industry_profiles_local, \
+            ad_residential_heating_profile_local
+
+        start = time.monotonic()
+        fingerprint = tuple(reference_fingerprint(pattern) for pattern in REFERENCE_FILES)
+        heat_sources = ad_industrial_database_local(None)
+        industry_profiles = ad_industry_profiles_local(None)
+        residential_heating_profile = ad_residential_heating_profile_local(None)
+        loaded = time.time()
+        with self.lock, self.connection() as connection:
+            # one transaction, so concurrent readers never see a partially filled store
+            with connection:
+                for table in ("heat_sources", "heat_sources_location", "industry_profiles",
+                              "residential_heating_profiles"):
+                    connection.execute("DELETE FROM " + table)
+                # the ids keep the order of the loaders
+                ids = range(1, len(heat_sources) + 1)
+                self.insert(connection, "heat_sources", ("id",) + HEAT_SOURCE_COLUMNS,
+                            ((source_id,) + row for source_id, row in
+                             zip(ids, self.rows(heat_sources, HEAT_SOURCE_COLUMNS))))
+                self.insert(connection, "heat_sources_location", ("id", "min_lon", "max_lon", "min_lat", "max_lat"),
+                            zip(ids, heat_sources["Lon"].tolist(), heat_sources["Lon"].tolist(),
+                                heat_sources["Lat"].tolist(), heat_sources["Lat"].tolist()))
+                for sector, profile in enumerate(industry_profiles):
+                    self.insert(connection, "industry_profiles", ("sector",) + INDUSTRY_PROFILE_COLUMNS,
+                                ((sector,) + row for row in self.rows(profile, INDUSTRY_PROFILE_COLUMNS)))
+                self.insert(connection, "residential_heating_profiles", RESIDENTIAL_HEATING_PROFILE_COLUMNS,
+                            self.rows(residential_heating_profile, RESIDENTIAL_HEATING_PROFILE_COLUMNS))
+                connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                       [("fingerprint", json.dumps(fingerprint)), ("loaded", repr(loaded)),
+                                        ("sectors", str(len(industry_profiles)))])
+            connection.execute("ANALYZE")
+        self.fingerprint = fingerprint
+        self.loaded = loaded
+        logger.info("filled store %s in %.1f s", self.path, time.monotonic() - start)
+
+    def refresh(self):
+        """
+        Method refilling the store if a reference file has changed since the store was filled.
+
+        :return: True if the store was refilled.
+        :rtype: bool.
+        """
+
+        if tuple(reference_fingerprint(pattern) for pattern in REFERENCE_FILES) == self.fingerprint:
+            return False
+        self.import_reference_data()
+        return True
+
+    def version(self):
+        """
+        Method returning the version of the heat sources and profiles of the store, which changes whenever the store
+        is refilled, also by another process.
+
+        :return: fingerprints of the reference files and the time the store was filled from them.
+        :rtype: tuple.
+        """
+
+        with self.connection() as connection:
+            meta = dict(connection.execute("SELECT key, value FROM meta WHERE key IN ('fingerprint', 'loaded')")
+                        .fetchall())
+        return tuple(json.loads(meta.get("fingerprint", "[]"))), float(meta.get("loaded", "nan"))
+
+    def query(self, statement, parameters=()):
+        """
+        Method running a query on a connection of the pool.
+
+        :param statement: SQL query.
+        :type statement: str.
+        :param parameters: parameters of the query.
+        :type parameters: list.
+        :return: result of the query.
+        :rtype: pd.DataFrame.
+        """
+        import pandas as pd
+
+        with self.connection() as connection:
+            return pd.read_sql_query(statement, connection, params=list(parameters))
+
+    def industrial_database(self, nuts0_ids):
+        """
+        Method returning the heat sources of the countries like ad_industrial_database_local().
+
+        :param nuts0_ids: NUTS0 ids of the countries. None returns all sources.
+        :type nuts0_ids: list of str or None.
+        :return: heat sources.
+        :rtype: pd.DataFrame.
+        """
+        from .read_data import compact_dtypes
+
+        condition, parameters = id_condition("Nuts0_ID", nuts0_ids)
+        return compact_dtypes(self.query("SELECT " + ", ".join(HEAT_SOURCE_COLUMNS) + " FROM heat_sources WHERE " +
+                                         condition + " ORDER BY id", parameters))
+
+    def heat_sources_within(self, bounds):
+        """
+        Method returning the heat sources within a bounding box by the spatial index.
+
+        :param bounds: minimum longitude, minimum latitude, maximum longitude and maximum latitude.
+        :type bounds: tuple of float.
+        :return: heat sources.
+        :rtype: pd.DataFrame.
+        """
+        from .read_data import compact_dtypes
+
+        min_lon, min_lat, max_lon, max_lat = bounds
+        return compact_dtypes(self.query(
+            "SELECT " + ", ".join("s." + column for column in HEAT_SOURCE_COLUMNS) + " FROM heat_sources s JOIN "
+            "heat_sources_location l ON s.id = l.id WHERE l.min_lon >= ? AND l.max_lon <= ? AND l.min_lat >= ? AND "
+            "l.max_lat <= ? ORDER BY s.id", [min_lon, max_lon, min_lat, max_lat]))
+
+    def industry_profiles(self, nuts0_ids):
+        """
+        Method returning the industry profiles of the countries like ad_industry_profiles_local().
+
+        :param nuts0_ids: NUTS0 ids of the countries. None returns the profiles of all countries.
+        :type nuts0_ids: list of str or None.
+        :return: one dataframe per subsector.
+        :rtype: list of pd.DataFrame.
+        """
+        from .read_data import compact_dtypes
+
+        condition, parameters = id_condition("NUTS0_code", nuts0_ids)
+        profiles = self.query("SELECT sector, " + ", ".join(INDUSTRY_PROFILE_COLUMNS) + " FROM industry_profiles "
+                              "WHERE " + condition + " ORDER BY id", parameters)
+        with self.connection() as connection:
+            sectors = int(connection.execute("SELECT value FROM meta WHERE key = 'sectors'").fetchone()[0])
+        return [compact_dtypes(profiles[profiles["sector"] == sector].loc[:, INDUSTRY_PROFILE_COLUMNS]
+                               .reset_index(drop=True)) for sector in range(sectors)]
+
+    def residential_heating_profile(self, nuts2_ids):
+        """
+        Method returning the residential heating profiles of the regions like ad_residential_heating_profile_local().
+
+        :param nuts2_ids: NUTS2 ids of the regions. None returns the profiles of all regions.
+        :type nuts2_ids: list of str or None.
+        :return: residential heating profiles.
+        :rtype: pd.DataFrame.
+        """
+        from .read_data import compact_dtypes
+
+        condition, parameters = id_condition("NUTS2_code", nuts2_ids)
+        return compact_dtypes(self.query("SELECT " + ", ".join(RESIDENTIAL_HEATING_PROFILE_COLUMNS) +
+                                         " FROM residential_heating_profiles WHERE " + condition + " ORDER BY id",
+                                         parameters))
+
+    def add_run(self, parameters, nuts2_ids, transmission_lines, flows, temperatures, costs, lengths, total_cost,
+                total_flow, cost_per_flow):
+        """
+        Method storing the results of a run.
+
+        :param parameters: parameters of the run. Must be json serializable.
+        :type parameters: dict.
+        :param nuts2_ids: NUTS2 ids of the regions of the run.
+        :type nuts2_ids: list of str.
+        :param transmission_lines: coordinates of the start and end point of every line.
+        :type transmission_lines: np.array. [[[lon1, lat1], [lon2, lat2]], ...]
+        :param flows: annual flow of every line in MWh.
+        :type flows: array like.
+        :param temperatures: temperature of every line in °C.
+        :type temperatures: array like.
+        :param costs: cost of every line in €.
+        :type costs: array like.
+        :param lengths: length of every line in km.
+        :type lengths: array like.
+        :param total_cost: total cost of the network in €.
+        :type total_cost: float.
+        :param total_flow: total annual flow of the network in GWh.
+        :type total_flow: float.
+        :param cost_per_flow: cost per flow in the investment period in ct/kWh.
+        :type cost_per_flow: float.
+        :return: id of the run.
+        :rtype: int.
+        """
+        from .visualisation import line_properties
+
+        lines = np.asarray(transmission_lines, dtype=float).reshape(-1, 4)
+        properties = line_properties(flows, temperatures, costs, lengths)
+        with self.connection() as connection, connection:
+            run_id = connection.execute(
+                "INSERT INTO runs (created, parameters, total_cost, total_flow, cost_per_flow) VALUES (?, ?, ?, ?, ?)",
+                (time.time(), json.dumps(parameters, sort_keys=True, default=str), float(total_cost),
+                 float(total_flow), float(cost_per_flow))).lastrowid
+            connection.executemany("INSERT INTO run_regions (run_id, nuts2_id) VALUES (?, ?)",
+                                   [(run_id, nuts2_id) for nuts2_id in nuts2_ids])
+            first_id = connection.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM transmission_lines").fetchone()[0]
+            ids = list(range(first_id, first_id + len(lines)))
+            self.insert(connection, "transmission_lines", ("id", "run_id", "Lon1", "Lat1", "Lon2", "Lat2", "flow",
+                                                           "temperature", "cost", "length"),
+                        zip(ids, [run_id] * len(lines), *np.column_stack([lines, properties]).T.tolist()))
+            self.insert(connection, "transmission_lines_location", ("id", "min_lon", "max_lon", "min_lat",
+                                                                    "max_lat"),
+                        zip(ids, np.minimum(lines[:, 0], lines[:, 2]).tolist(),
+                            np.maximum(lines[:, 0], lines[:, 2]).tolist(),
+                            np.minimum(lines[:, 1], lines[:, 3]).tolist(),
+                            np.maximum(lines[:, 1], lines[:, 3]).tolist()))
+
+        return run_id
+
+    def runs(self, nuts2_id=None):
+        """
+        Method returning the stored runs.
+
+        :param nuts2_id: NUTS2 id of a region. None returns the runs of all regions.
+        :type nuts2_id: str or None.
+        :return: id, time, parameters and totals of every run.
+        :rtype: pd.DataFrame.
+        """
+
+        if nuts2_id is None:
+            return self.query("SELECT * FROM runs ORDER BY id")
+        return self.query("SELECT runs.* FROM runs JOIN run_regions ON runs.id = run_regions.run_id WHERE "
+                          "run_regions.nuts2_id = ? ORDER BY runs.id", [nuts2_id])
+
+    def transmission_lines(self, run_id):
+        """
+        Method returning the transmission lines of a run.
+
+        :param run_id: id of the run.
+        :type run_id: int.
+        :return: coordinates and properties of every line.
+        :rtype: pd.DataFrame.
+        """
+
+        return self.query("SELECT Lon1, Lat1, Lon2, Lat2, flow, temperature, cost, length FROM transmission_lines "
+                          "WHERE run_id = ? ORDER BY id", [int(run_id)])
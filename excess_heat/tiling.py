@@ -0,0 +1,321 @@
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .excess_heat import create_heat_sink_profiles, create_heat_source_profiles, \
+    design_network, find_radius_neighbours, find_triangulation_neighbours, load_heat_profiles, load_heat_sinks, \
+    load_heat_sources, prune_network, write_results
+from .shared_arrays import SharedArrays, attach_shared_arrays
+
+
+logger = logging.getLogger(__name__)
+
+# length of a degree of latitude in km on the sphere used by the distance computations
+KM_PER_DEGREE = 6371 * np.pi / 180
+# relative safety margin of the halo width
+HALO_MARGIN = 1.01
+# default tile size in multiples of the search radius
+TILE_SIZE_FACTOR = 10
+# columns of the sites used by the design of a tile
+SITE_COLUMNS = ("Lon", "Lat", "Temperature")
+
+
+def tile_sites(source_coordinates, sink_coordinates, sink_ids, tile_size, search_radius):
+    """
+    function partitioning sources and sinks into tiles of a longitude latitude grid. Every site belongs to the core of
+    exactly one tile. The sites of a tile are its core sites and all sites within the halo of search_radius around the
+    core, hence every edge with an end in the core of a tile is a candidate edge of the tile. Coherent sinks are
+    always assigned to a tile as a whole.
+
+    :param source_coordinates: longitude and latitude of every source.
+    :type source_coordinates: np.array. [[lon1, lat1], [lon2, lat2], ...]
+    :param sink_coordinates: longitude and latitude of every sink.
+    :type sink_coordinates: np.array. [[lon1, lat1], [lon2, lat2], ...]
+    :param sink_ids: correspondence of the sinks.
+    :type sink_ids: np.array.
+    :param tile_size: edge length of the tile cores in km.
+    :type tile_size: float.
+    :param search_radius: maximum length of a single transmission line in km.
+    :type search_radius: float.
+    :return: cell of the core of every tile with its sources and sinks, cell of every source and cell of every sink.
+    :rtype: tuple. ([{"cell": (int, int), "sources": np.array, "sinks": np.array}, ...], np.array, np.array)
+    """
+
+    source_coordinates = np.asarray(source_coordinates, dtype=float).reshape(-1, 2)
+    sink_coordinates = np.asarray(sink_coordinates, dtype=float).reshape(-1, 2)
+    sink_ids = np.asarray(sink_ids)
+    coordinates = np.vstack([source_coordinates, sink_coordinates])
+    if len(coordinates) == 0:
+        return [], np.zeros((0, 2), dtype=int), np.zeros((0, 2), dtype=int)
+
+    tile_height = tile_size / KM_PER_DEGREE
+    tile_width = tile_height / np.cos(np.radians(np.clip(np.mean(coordinates[:, 1]), -80, 80)))
+    cells = np.floor(coordinates / [tile_width, tile_height]).astype(int)
+    source_cells = cells[:len(source_coordinates)]
+    sink_cells = cells[len(source_coordinates):]
+
+    halo_height = search_radius / KM_PER_DEGREE * HALO_MARGIN
+    tiles = []
+    for cell in np.unique(cells, axis=0):
+        south = cell[1] * tile_height - halo_height
+        north = (cell[1] + 1) * tile_height + halo_height
+        # the halo is widest in longitude where the tile is closest to a pole
+        halo_width = halo_height / np.cos(np.radians(min(89.0, max(abs(south), abs(north)))))
+        west = cell[0] * tile_width - halo_width
+        east = (cell[0] + 1) * tile_width + halo_width
+
+        def inside(points):
+            return ((points[:, 0] >= west) & (points[:, 0] <= east) & (points[:, 1] >= south) &
+                    (points[:, 1] <= north))
+
+        sources = np.nonzero(inside(source_coordinates))[0]
+        sinks = inside(sink_coordinates)
+        sinks = np.nonzero(np.isin(sink_ids, sink_ids[sinks]))[0]
+        tiles.append({"cell": tuple(int(value) for value in cell), "sources": sources, "sinks": sinks})
+
+    return tiles, source_cells, sink_cells
+
+
+def solve_tile(heat_sources, heat_sinks, heat_source_profiles, heat_sink_profiles, search_radius, investment_period,
+               transmission_line_threshold, candidate_edges, design, typical_periods, max_flow_backend,
+               prescreen_edges):
+    """
+    function designing and pruning the network of a single tile. It runs in a worker process.
+
+    :param heat_sources: heat sources of the tile.
+    :type heat_sources: pd.DataFrame.
+    :param heat_sinks: heat sinks of the tile.
+    :type heat_sinks: pd.DataFrame.
+    :param heat_source_profiles: capacity of each source of the tile, one row per hour.
+    :type heat_source_profiles: np.array.
+    :param heat_sink_profiles: demand of each sink of the tile, one row per hour.
+    :type heat_sink_profiles: np.array.
+    :param search_radius: maximum length of a single transmission line in km.
+    :type search_radius: float.
+    :param investment_period: investment period of the network in years.
+    :type investment_period: float.
+    :param transmission_line_threshold: maximum cost per flow of a single transmission line in ct/kWh.
+    :type transmission_line_threshold: float.
+    :param candidate_edges: edges the transmission lines are selected from.
+    :type candidate_edges: str {"radius", "delaunay"}.
+    :param design: method selecting the transmission lines.
+    :type design: str {"heuristic", "lp"}.
+    :param typical_periods: number of typical days of the "lp" design.
+    :type typical_periods: int or None.
+    :param max_flow_backend: backend of the hourly max flow computations.
+    :type max_flow_backend: str {"auto", "igraph", "scipy", "numpy", "incremental"}.
+    :param prescreen_edges: removes the edges which are uneconomic by their annual flow bound first.
+    :type prescreen_edges: bool.
+    :return: source and target of every transmission line of the tile and its length.
+    :rtype: tuple. ([(("source", 1), ("sink", 0)), ...], [float, ...])
+    """
+
+    np.seterr(divide='ignore', invalid='ignore')
+    if candidate_edges == "delaunay":
+        neighbours = find_triangulation_neighbours(heat_sources, heat_sinks, search_radius)
+        neighbours = (neighbours[0:2], neighbours[2:4], neighbours[4:6])
+    else:
+        neighbours = (find_radius_neighbours(heat_sources, heat_sinks, search_radius),
+                      find_radius_neighbours(heat_sources, heat_sources, search_radius),
+                      find_radius_neighbours(heat_sinks, heat_sinks, search_radius))
+    network = design_network(neighbours[0], neighbours[1], neighbours[2], heat_sinks["id"], heat_source_profiles,
+                             heat_sink_profiles, investment_period, transmission_line_threshold, max_flow_backend,
+                             design, typical_periods)
+    network, _ = prune_network(network, heat_source_profiles, heat_sink_profiles, investment_period,
+                               transmission_line_threshold, design, prescreen_edges)
+
+    return network.return_edge_source_target_vertices(), list(network.get_edge_attribute("distance"))
+
+
+def solve_shared_tile(descriptors, sources, sinks, *parameters):
+    """
+    function designing and pruning the network of a single tile from the sites and profiles of all tiles in shared
+    memory. It runs in a worker process, which only receives the indices of the sites of its tile.
+
+    :param descriptors: descriptors of the shared arrays "source_sites", "sink_sites", "sink_ids",
+                        "heat_source_profiles" and "heat_sink_profiles".
+    :type descriptors: dict.
+    :param sources: indices of the sources of the tile.
+    :type sources: np.array.
+    :param sinks: indices of the sinks of the tile.
+    :type sinks: np.array.
+    :param parameters: parameters of solve_tile() following the profiles.
+    :return: result of solve_tile().
+    :rtype: tuple. ([(("source", 1), ("sink", 0)), ...], [float, ...])
+    """
+    import pandas as pd
+
+    arrays = attach_shared_arrays(descriptors)
+    heat_sources = pd.DataFrame(arrays["source_sites"][sources], columns=SITE_COLUMNS)
+    heat_sinks = pd.DataFrame(arrays["sink_sites"][sinks], columns=SITE_COLUMNS).assign(id=arrays["sink_ids"][sinks])
+
+    return solve_tile(heat_sources, heat_sinks, arrays["heat_source_profiles"][:, sources],
+                      arrays["heat_sink_profiles"][:, sinks], *parameters)
+
+
+def merge_tile_edges(edges, number_of_sources, number_of_sinks, sink_ids, max_flow_backend):
+    """
+    function building the network of the transmission lines of all tiles.
+
+    :param edges: length of every transmission line by its source and target in global indices.
+    :type edges: dict {(("source", 1), ("sink", 0)): float, ...}
+    :param number_of_sources: number of sources.
+    :type number_of_sources: int.
+    :param number_of_sinks: number of sinks.
+    :type number_of_sinks: int.
+    :param sink_ids: correspondence of the sinks.
+    :type sink_ids: list.
+    :param max_flow_backend: backend of the hourly max flow computations.
+    :type max_flow_backend: str {"auto", "igraph", "scipy", "numpy", "incremental"}.
+    :return: network.
+    :rtype: NetworkGraph.
+    """
+    from .graphs import NetworkGraph
+
+    source_sink = [[] for _ in range(number_of_sources)]
+    source_sink_distances = [[] for _ in range(number_of_sources)]
+    source_source = [[] for _ in range(number_of_sources)]
+    source_source_distances = [[] for _ in range(number_of_sources)]
+    sink_sink = [[] for _ in range(number_of_sinks)]
+    sink_sink_distances = [[] for _ in range(number_of_sinks)]
+    for (site1, site2), distance in sorted(edges.items()):
+        if site1[0] != site2[0]:
+            source, sink = (site1, site2) if site1[0] == "source" else (site2, site1)
+            source_sink[source[1]].append(sink[1])
+            source_sink_distances[source[1]].append(distance)
+        elif site1[0] == "source":
+            source_source[site1[1]].append(site2[1])
+            source_source_distances[site1[1]].append(distance)
+        else:
+            sink_sink[site1[1]].append(site2[1])
+            sink_sink_distances[site1[1]].append(distance)
+
+    network = NetworkGraph(source_sink, source_source, sink_sink, range(number_of_sources), sink_ids,
+                           max_flow_backend=max_flow_backend)
+    network.add_edge_attribute("distance", source_sink_distances, source_source_distances, sink_sink_distances)
+    return network
+
+
+def excess_heat_tiled(regions, search_radius, investment_period, transmission_line_threshold,
+                      output_transmission_lines, tile_size=None, workers=None, max_flow_backend="igraph",
+                      candidate_edges="radius", design="heuristic", typical_periods=None, prescreen_edges=True,
+                      output_format="shp", float_dtype="float64"):
+    """
+    Main routine computing the transmission network of several NUTS2 regions in tiles. The sources and sinks of all
+    regions are partitioned into tiles with a halo of search_radius around their cores. The networks of the tiles are
+    designed and pruned independently and in parallel, every transmission line is taken from the tile whose core
+    contains its first site and the merged network is pruned once more, which reconciles the flows across the tile
+    and country borders. The tiles approximate a single network of all regions, the lines near the tile borders may
+    differ from it.
+
+    :param regions: shp file containing the coherent areas of the district heating potential CM and NUTS2 id of
+                    every region.
+    :type regions: list of tuples. [(shp file, nuts2 id), ...]
+    :param search_radius: maximum length of a single transmission line in km.
+    :type search_radius: float.
+    :param investment_period: investment period of the network in years.
+    :type investment_period: float.
+    :param transmission_line_threshold: maximum cost per flow of a single transmission line in ct/kWh.
+    :type transmission_line_threshold: float.
+    :param output_transmission_lines: output file name without extension of the transmission lines and csv file.
+    :type output_transmission_lines: str.
+    :param tile_size: edge length of the tile cores in km. None uses TILE_SIZE_FACTOR times the search radius.
+    :type tile_size: float or None.
+    :param workers: number of tiles solved at the same time in worker processes. None uses one per cpu, 1 solves
+                    the tiles one after another in this process.
+    :type workers: int or None.
+    :param max_flow_backend: backend of the hourly max flow computations.
+    :type max_flow_backend: str {"auto", "igraph", "scipy", "numpy", "incremental"}.
+    :param candidate_edges: edges the transmission lines of a tile are selected from.
+    :type candidate_edges: str {"radius", "delaunay"}.
+    :param design: method selecting the transmission lines of a tile. The merged network of the "heuristic" design
+                   is reduced to a minimum spanning tree again, as lines of neighbouring tiles may form cycles.
+    :type design: str {"heuristic", "lp"}.
+    :param typical_periods: number of typical days of the "lp" design.
+    :type typical_periods: int or None.
+    :param prescreen_edges: removes the edges of a tile which are uneconomic by their annual flow bound first.
+    :type prescreen_edges: bool.
+    :param output_format: format of the transmission lines.
+    :type output_format: str {"shp", "gpkg", "parquet"}.
+    :param float_dtype: float type of the loaded heat values and profiles.
+    :type float_dtype: str {"float64", "float32"}.
+    :return: number of tiles.
+    :rtype: int.
+    """
+    import pandas as pd
+    from .read_data import compact_dtypes
+
+    if not regions:
+        raise ValueError("At least one region is needed")
+    if tile_size is None:
+        tile_size = TILE_SIZE_FACTOR * search_radius
+    if tile_size <= 0:
+        raise ValueError("The tile size must be positive")
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    nuts2_ids = [nuts2_id for _, nuts2_id in regions]
+    nuts0_ids = sorted(set(nuts2_id[:2] for nuts2_id in nuts2_ids))
+    heat_sources = load_heat_sources(nuts0_ids, float_dtype=float_dtype)
+    heat_sinks = []
+    for sinks, nuts2_id in regions:
+        region_sinks = load_heat_sinks(sinks, nuts2_id, float_dtype)
+        # the correspondence ids of the coherent areas start at 0 in every region
+        offset = sum(len(np.unique(previous["id"])) for previous in heat_sinks)
+        heat_sinks.append(region_sinks.assign(id=pd.factorize(region_sinks["id"])[0] + offset))
+    heat_sinks = compact_dtypes(pd.concat(heat_sinks, sort=True), float_dtype)
+    normalized_heat_profiles = load_heat_profiles(nuts0_ids, nuts2_ids, float_dtype=float_dtype)
+    heat_sources, heat_source_profiles = create_heat_source_profiles(heat_sources, normalized_heat_profiles)
+    heat_sinks, heat_sink_profiles = create_heat_sink_profiles(heat_sinks, normalized_heat_profiles)
+    if len(heat_sources) == 0 or len(heat_sinks) == 0:
+        raise ValueError("The regions contain no heat sources or no heat sinks with profiles")
+
+    source_coordinates = heat_sources[["Lon", "Lat"]].to_numpy(dtype=float)
+    sink_coordinates = heat_sinks[["Lon", "Lat"]].to_numpy(dtype=float)
+    sink_ids = heat_sinks["id"].to_numpy()
+    tiles, source_cells, sink_cells = tile_sites(source_coordinates, sink_coordinates, sink_ids, tile_size,
+                                                 search_radius)
+    # tiles without sources or sinks have no flow
+    tiles = [tile for tile in tiles if len(tile["sources"]) > 0 and len(tile["sinks"]) > 0]
+    logger.info("solving %d tiles of %d sources and %d sinks", len(tiles), len(heat_sources), len(heat_sinks))
+
+    parameters = (search_radius, investment_period, transmission_line_threshold, candidate_edges, design,
+                  typical_periods, max_flow_backend, prescreen_edges)
+    if workers > 1 and len(tiles) > 1:
+        # the workers read the sites and profiles of their tiles from shared memory instead of receiving copies
+        start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        with SharedArrays({"source_sites": heat_sources.loc[:, SITE_COLUMNS].to_numpy(dtype=float),
+                           "sink_sites": heat_sinks.loc[:, SITE_COLUMNS].to_numpy(dtype=float),
+                           "sink_ids": sink_ids, "heat_source_profiles": heat_source_profiles,
+                           "heat_sink_profiles": heat_sink_profiles}) as shared, \
+                ProcessPoolExecutor(max_workers=min(workers, len(tiles)),
+                                    mp_context=multiprocessing.get_context(start_method)) as executor:
+            solutions = list(executor.map(solve_shared_tile, *zip(*[(shared.descriptors, tile["sources"],
+                                                                      tile["sinks"]) + parameters
+                                                                     for tile in tiles])))
+    else:
+        solutions = [solve_tile(heat_sources.iloc[tile["sources"]], heat_sinks.iloc[tile["sinks"]],
+                                heat_source_profiles[:, tile["sources"]], heat_sink_profiles[:, tile["sinks"]],
+                                *parameters) for tile in tiles]
+
+    # every line is taken from the tile whose core contains its first site, lines between halo sites are dropped
+    edges = {}
+    for tile, (tile_edges, distances) in zip(tiles, solutions):
+        indices = {"source": tile["sources"], "sink": tile["sinks"]}
+        cells = {"source": source_cells, "sink": sink_cells}
+        for edge, distance in zip(tile_edges, distances):
+            edge = tuple(sorted((kind, int(indices[kind][index])) for kind, index in edge))
+            if tuple(cells[edge[0][0]][edge[0][1]]) == tile["cell"]:
+                edges[edge] = distance
+
+    network = merge_tile_edges(edges, len(heat_sources), len(heat_sinks), list(sink_ids), max_flow_backend)
+    if design != "lp":
+        network.reduce_to_minimum_spanning_tree("distance")
+    network, results = prune_network(network, heat_source_profiles, heat_sink_profiles, investment_period,
+                                     transmission_line_threshold, design, prescreen_edges)
+    write_results(network, results, heat_sources, heat_sinks, output_transmission_lines, output_format)
+
+    return len(tiles)
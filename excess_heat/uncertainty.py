@@ -0,0 +1,227 @@
+import logging
+
+import numpy as np
+
+from .excess_heat import compute_costs, compute_hourly_flows, create_heat_sink_profiles, \
+    create_heat_source_profiles, design_network, find_radius_neighbours, find_triangulation_neighbours, \
+    load_heat_profiles, load_heat_sinks, load_heat_sources, prune_network
+from .isolation import IsolatedMaxFlowSolver
+
+
+logger = logging.getLogger(__name__)
+
+# columns of the results, as in the csv file of excess_heat()
+RESULT_COLUMNS = ("Total cost of network in €", "Total annual flow of network in GWh",
+                  "Cost per flow in investment period in ct/kWh")
+# default number of samples whose hours are solved as one batch
+SAMPLE_BATCH_SIZE = 8
+
+
+def sample_factors(number_of_samples, number_of_sites, relative_deviation, rng, groups=None):
+    """
+    function sampling multiplicative factors of the heat of sites from a normal distribution with mean 1, cut off at
+    0.
+
+    :param number_of_samples: number of samples.
+    :type number_of_samples: int.
+    :param number_of_sites: number of sites.
+    :type number_of_sites: int.
+    :param relative_deviation: standard deviation of the factors.
+    :type relative_deviation: float.
+    :param rng: random number generator.
+    :type rng: np.random.Generator.
+    :param groups: group of every site, sites of a group share their factor. None samples every site independently.
+    :type groups: array like of int or None.
+    :return: factor of every site, one row per sample.
+    :rtype: np.array.
+    """
+
+    if relative_deviation < 0:
+        raise ValueError("The relative deviation must not be negative")
+    if groups is None:
+        groups = np.arange(number_of_sites)
+    groups = np.asarray(groups, dtype=int)
+    number_of_groups = np.max(groups, initial=-1) + 1
+    factors = np.maximum(1 + relative_deviation * rng.standard_normal((number_of_samples, number_of_groups)), 0)
+
+    return factors[:, groups]
+
+
+def sample_results(network, heat_source_profiles, heat_sink_profiles, source_factors, sink_factors,
+                   investment_period, batch_size=SAMPLE_BATCH_SIZE, isolated_solver=None):
+    """
+    function computing total cost, total flow and cost per flow of a network with fixed transmission lines for
+    samples of scaled profiles. The hours of a batch of samples are stacked and solved in one pass of the hourly max
+    flow, the costs are computed per sample.
+
+    :param network: network of the transmission lines.
+    :type network: NetworkGraph.
+    :param heat_source_profiles: capacity of each source, one row per hour.
+    :type heat_source_profiles: np.array.
+    :param heat_sink_profiles: demand of each sink, one row per hour.
+    :type heat_sink_profiles: np.array.
+    :param source_factors: factor of the profile of every source, one row per sample.
+    :type source_factors: np.array.
+    :param sink_factors: factor of the profile of every sink, one row per sample.
+    :type sink_factors: np.array.
+    :param investment_period: investment period of the network in years.
+    :type investment_period: float.
+    :param batch_size: number of samples solved as one batch.
+    :type batch_size: int.
+    :param isolated_solver: solver running the max flow computations in worker processes.
+    :type isolated_solver: IsolatedMaxFlowSolver or None.
+    :return: total cost, total flow and cost per flow of every sample, one row per sample.
+    :rtype: np.array.
+    """
+
+    number_of_hours = min(len(heat_source_profiles), len(heat_sink_profiles))
+    heat_source_profiles = heat_source_profiles[:number_of_hours]
+    heat_sink_profiles = heat_sink_profiles[:number_of_hours]
+    results = np.zeros((len(source_factors), len(RESULT_COLUMNS)))
+    for start in range(0, len(source_factors), batch_size):
+        end = min(start + batch_size, len(source_factors))
+        # one block of hours per sample
+        source_capacities = (source_factors[start:end, None, :] * heat_source_profiles).reshape(
+            -1, heat_source_profiles.shape[1])
+        sink_capacities = (sink_factors[start:end, None, :] * heat_sink_profiles).reshape(
+            -1, heat_sink_profiles.shape[1])
+        flows = compute_hourly_flows(network, source_capacities, sink_capacities, isolated_solver)
+        for sample in range(end - start):
+            hours = slice(sample * number_of_hours, (sample + 1) * number_of_hours)
+            connection_costs, _, _, total_cost, total_flow, total_cost_per_flow = compute_costs(
+                network, flows[0][:, hours], flows[1][:, hours], flows[2][:, hours], investment_period)
+            # lines without flow in a sample are marked by a cost of -1, they are not part of its total cost
+            total_cost -= np.sum(np.minimum(connection_costs, 0))
+            if total_flow == 0:
+                total_cost_per_flow = 0 if total_cost == 0 else 100000
+            results[start + sample] = total_cost, total_flow, total_cost_per_flow
+        logger.info("solved %d of %d samples", end, len(source_factors))
+
+    return results
+
+
+def result_statistics(nominal, samples, confidence=0.9):
+    """
+    function summarising the results of the samples by their mean, standard deviation, median and the bounds of the
+    central confidence interval.
+
+    :param nominal: total cost, total flow and cost per flow of the nominal profiles.
+    :type nominal: array like.
+    :param samples: total cost, total flow and cost per flow of every sample, one row per sample.
+    :type samples: np.array.
+    :param confidence: probability of the confidence interval.
+    :type confidence: float.
+    :return: statistics, one row per statistic and one column per result.
+    :rtype: pd.DataFrame.
+    """
+    import pandas as pd
+
+    if not 0 < confidence < 1:
+        raise ValueError("The confidence must be between 0 and 1")
+    lower, median, upper = np.quantile(samples, [(1 - confidence) / 2, 0.5, (1 + confidence) / 2], axis=0)
+    statistics = pd.DataFrame([nominal, np.mean(samples, axis=0), np.std(samples, axis=0, ddof=1), lower, median,
+                               upper], columns=list(RESULT_COLUMNS),
+                              index=["nominal", "mean", "standard deviation", "lower " + str(confidence),
+                                     "median", "upper " + str(confidence)])
+    statistics.index.name = "statistic"
+
+    return statistics
+
+
+def excess_heat_uncertainty(sinks, search_radius, investment_period, transmission_line_threshold, nuts2_id,
+                            output, samples=100, source_uncertainty=0.2, sink_uncertainty=0.1, confidence=0.9,
+                            seed=None, batch_size=SAMPLE_BATCH_SIZE, max_flow_backend="igraph",
+                            candidate_edges="radius", design="heuristic", typical_periods=None, prescreen_edges=True,
+                            isolate_max_flow=False, float_dtype="float64"):
+    """
+    Routine estimating the uncertainty of the total cost, total flow and cost per flow of the network of
+    excess_heat() caused by the uncertain excess heat of the sources and heat demand of the sinks. The network is
+    designed and pruned once for the nominal values, the samples are evaluated on its transmission lines. The
+    excess heat of every source and the demand of every coherent area are scaled by independent factors.
+
+    :param sinks: shp file containing the coherent areas of the district heating potential CM.
+    :type sinks: str.
+    :param search_radius: maximum length of a single transmission line in km.
+    :type search_radius: float.
+    :param investment_period: investment period of the network in years.
+    :type investment_period: float.
+    :param transmission_line_threshold: maximum cost per flow of a single transmission line in ct/kWh.
+    :type transmission_line_threshold: float.
+    :param nuts2_id: NUTS2 id of the region or ids of several regions, as for excess_heat().
+    :type nuts2_id: str or list of str.
+    :param output: file name without extension. The statistics are written to output.csv and the results of every
+                   sample to output_samples.csv.
+    :type output: str.
+    :param samples: number of samples.
+    :type samples: int.
+    :param source_uncertainty: relative standard deviation of the excess heat of the sources.
+    :type source_uncertainty: float.
+    :param sink_uncertainty: relative standard deviation of the heat demand of the coherent areas.
+    :type sink_uncertainty: float.
+    :param confidence: probability of the reported confidence interval.
+    :type confidence: float.
+    :param seed: seed of the random numbers, runs with the same seed sample the same factors.
+    :type seed: int or None.
+    :param batch_size: number of samples whose hours are solved as one batch.
+    :type batch_size: int.
+    :param max_flow_backend: backend of the hourly max flow computations.
+    :type max_flow_backend: str {"auto", "igraph", "scipy", "numpy", "incremental"}.
+    :param candidate_edges: edges the transmission lines are selected from.
+    :type candidate_edges: str {"radius", "delaunay"}.
+    :param design: method selecting the transmission lines.
+    :type design: str {"heuristic", "lp"}.
+    :param typical_periods: number of typical days of the "lp" design.
+    :type typical_periods: int or None.
+    :param prescreen_edges: removes the edges which are uneconomic by their annual flow bound first.
+    :type prescreen_edges: bool.
+    :param isolate_max_flow: runs the max flow computations in recyclable worker processes.
+    :type isolate_max_flow: bool.
+    :param float_dtype: float type of the loaded heat values and profiles.
+    :type float_dtype: str {"float64", "float32"}.
+    :return: statistics of the results.
+    :rtype: pd.DataFrame.
+    """
+    import pandas as pd
+
+    if samples < 2:
+        raise ValueError("At least two samples are needed")
+    nuts2_ids = [nuts2_id] if isinstance(nuts2_id, str) else list(nuts2_id)
+    nuts0_id = sorted(set(region[:2] for region in nuts2_ids))
+    heat_sources = load_heat_sources(nuts0_id, float_dtype=float_dtype)
+    heat_sinks = load_heat_sinks(sinks, nuts2_id, float_dtype)
+    normalized_heat_profiles = load_heat_profiles(nuts0_id, nuts2_id, float_dtype=float_dtype)
+    heat_sources, heat_source_profiles = create_heat_source_profiles(heat_sources, normalized_heat_profiles)
+    heat_sinks, heat_sink_profiles = create_heat_sink_profiles(heat_sinks, normalized_heat_profiles)
+
+    if candidate_edges == "delaunay":
+        neighbours = find_triangulation_neighbours(heat_sources, heat_sinks, search_radius)
+        neighbours = (neighbours[0:2], neighbours[2:4], neighbours[4:6])
+    else:
+        neighbours = (find_radius_neighbours(heat_sources, heat_sinks, search_radius),
+                      find_radius_neighbours(heat_sources, heat_sources, search_radius),
+                      find_radius_neighbours(heat_sinks, heat_sinks, search_radius))
+    network = design_network(neighbours[0], neighbours[1], neighbours[2], heat_sinks["id"], heat_source_profiles,
+                             heat_sink_profiles, investment_period, transmission_line_threshold, max_flow_backend,
+                             design, typical_periods)
+    network, results = prune_network(network, heat_source_profiles, heat_sink_profiles, investment_period,
+                                     transmission_line_threshold, design, prescreen_edges)
+    nominal = results[-3:]
+    logger.info("sampling %d profiles on %d transmission lines", samples, network.graph.ecount())
+
+    rng = np.random.default_rng(seed)
+    source_factors = sample_factors(samples, len(heat_sources), source_uncertainty, rng)
+    sink_factors = sample_factors(samples, len(heat_sinks), sink_uncertainty, rng,
+                                  pd.factorize(heat_sinks["id"])[0])
+    isolated_solver = IsolatedMaxFlowSolver(max_flow_backend) if isolate_max_flow else None
+    try:
+        sampled = sample_results(network, heat_source_profiles, heat_sink_profiles, source_factors, sink_factors,
+                                 investment_period, batch_size, isolated_solver)
+    finally:
+        if isolated_solver is not None:
+            isolated_solver.close()
+
+    statistics = result_statistics(nominal, sampled, confidence)
+    statistics.to_csv(output + ".csv")
+    pd.DataFrame(sampled, columns=list(RESULT_COLUMNS)).to_csv(output + "_samples.csv", index_label="sample")
+
+    return statistics
@@ -1,5 +1,7 @@
-import fiona
-from fiona.crs import from_epsg
+import json
+import os
+
+import numpy as np
 from collections import OrderedDict
 
 output_driver = "ESRI Shapefile"
@@ -12,24 +14,187 @@ schema = {
                     ("Length", "str")
                 ])
                 }
+# numeric fields of the typed output formats, the units are part of the field names
+typed_fields = OrderedDict([
+    ("Flow_MWh_a", "float"),
+    ("Temp_C", "float"),
+    ("Cost_Euro", "float"),
+    ("Length_km", "float")
+])
+typed_schema = {"geometry": "LineString", "properties": typed_fields}
+# file extension of every output format
+output_extensions = {"shp": "", "gpkg": ".gpkg", "parquet": ".parquet"}
 
 
 def create_transmission_line_shp(transmission_lines, flows, temperatures, costs, lengths, file):
+    import fiona
+    from fiona.crs import from_epsg
+
+    records = ({
+        "geometry": {
+            "type": "LineString",
+            "coordinates": transmission_line
+        },
+        "properties": OrderedDict([
+            ("Flow", str(flow) + " MWh/a"),
+            ("Temp", str(temperature) + " C"),
+            ("Cost", str(cost) + " Euro"),
+            ("Length", str(length) + " km")
+        ])
+    } for transmission_line, flow, temperature, cost, length in zip(transmission_lines, flows, temperatures, costs,
+                                                                    lengths))
     with fiona.open(file,  "w", crs=from_epsg(4326), driver=output_driver, schema=schema) as shp:
-        for transmission_line, flow, temperature, cost, length in zip(transmission_lines, flows, temperatures, costs, lengths):
-            line = {
-                "geometry": {
-                    "type": "LineString",
-                    "coordinates": transmission_line
-                },
-                "properties": OrderedDict([
-                    ("Flow", str(flow) + " MWh/a"),
-                    ("Temp", str(temperature) + " C"),
-                    ("Cost", str(cost) + " Euro"),
-                    ("Length", str(length) + " km")
-                ])
-            }
-            shp.write(line)
+        shp.writerecords(records)
+
+
+def line_properties(flows, temperatures, costs, lengths):
+    """
+    function stacking the properties of the transmission lines into one float array.
+
+    :param flows: annual flow of every line in MWh.
+    :type flows: array like.
+    :param temperatures: temperature of every line in °C.
+    :type temperatures: array like.
+    :param costs: cost of every line in €.
+    :type costs: array like.
+    :param lengths: length of every line in km.
+    :type lengths: array like.
+    :return: one row per line and one column per field of typed_fields.
+    :rtype: np.array.
+    """
+
+    return np.column_stack([np.asarray(values, dtype=float).reshape(-1) for values in
+                            (flows, temperatures, costs, lengths)]).reshape(-1, len(typed_fields))
+
+
+def create_transmission_line_gpkg(transmission_lines, flows, temperatures, costs, lengths, file):
+    """
+    function writing the transmission lines with numeric fields to a GeoPackage in one batch.
+
+    :param transmission_lines: coordinates of the start and end point of every line.
+    :type transmission_lines: np.array. [[[lon1, lat1], [lon2, lat2]], ...]
+    :param flows: annual flow of every line in MWh.
+    :type flows: array like.
+    :param temperatures: temperature of every line in °C.
+    :type temperatures: array like.
+    :param costs: cost of every line in €.
+    :type costs: array like.
+    :param lengths: length of every line in km.
+    :type lengths: array like.
+    :param file: path of the GeoPackage. An existing file is replaced.
+    :type file: str.
+    :return:
+    """
+    import fiona
+    from fiona.crs import from_epsg
+
+    coordinates = np.asarray(transmission_lines, dtype=float).reshape(-1, 2, 2).tolist()
+    properties = line_properties(flows, temperatures, costs, lengths).tolist()
+    names = list(typed_fields)
+    if os.path.exists(file):
+        os.remove(file)
+    records = ({"geometry": {"type": "LineString", "coordinates": line},
+                "properties": OrderedDict(zip(names, values))} for line, values in zip(coordinates, properties))
+    with fiona.open(file, "w", crs=from_epsg(4326), driver="GPKG", schema=typed_schema,
+                    layer="transmission_lines") as gpkg:
+        gpkg.writerecords(records)
+
+
+def line_wkb(transmission_lines):
+    """
+    function encoding lines of two points as little endian WKB without a loop over the lines.
+
+    :param transmission_lines: coordinates of the start and end point of every line.
+    :type transmission_lines: np.array. [[[x1, y1], [x2, y2]], ...]
+    :return: WKB of every line.
+    :rtype: np.array of bytes.
+    """
+
+    coordinates = np.asarray(transmission_lines, dtype=float).reshape(-1, 4)
+    wkb_dtype = np.dtype([("byte_order", "u1"), ("geometry_type", "<u4"), ("number_of_points", "<u4"),
+                          ("coordinates", "<f8", (4,))])
+    wkb = np.zeros(len(coordinates), dtype=wkb_dtype)
+    wkb["byte_order"] = 1
+    wkb["geometry_type"] = 2
+    wkb["number_of_points"] = 2
+    wkb["coordinates"] = coordinates
+
+    return wkb.view("S" + str(wkb_dtype.itemsize)).reshape(-1)
+
+
+def create_transmission_line_parquet(transmission_lines, flows, temperatures, costs, lengths, file):
+    """
+    function writing the transmission lines with numeric fields to a GeoParquet file. Requires pyarrow.
+
+    :param transmission_lines: coordinates of the start and end point of every line.
+    :type transmission_lines: np.array. [[[lon1, lat1], [lon2, lat2]], ...]
+    :param flows: annual flow of every line in MWh.
+    :type flows: array like.
+    :param temperatures: temperature of every line in °C.
+    :type temperatures: array like.
+    :param costs: cost of every line in €.
+    :type costs: array like.
+    :param lengths: length of every line in km.
+    :type lengths: array like.
+    :param file: path of the GeoParquet file. An existing file is replaced.
+    :type file: str.
+    :return:
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    coordinates = np.asarray(transmission_lines, dtype=float).reshape(-1, 2, 2)
+    properties = line_properties(flows, temperatures, costs, lengths)
+    columns = [pa.array(properties[:, column]) for column in range(properties.shape[1])]
+    columns.append(pa.array(line_wkb(coordinates).tolist(), type=pa.binary()))
+    # geometries are longitude and latitude, the default crs OGC:CRS84 of GeoParquet
+    bbox = [float(np.min(coordinates[..., 0])), float(np.min(coordinates[..., 1])),
+            float(np.max(coordinates[..., 0])), float(np.max(coordinates[..., 1]))] if len(coordinates) else []
+    geo = {"version": "1.0.0", "primary_column": "geometry",
+           "columns": {"geometry": {"encoding": "WKB", "geometry_types": ["LineString"]}}}
+    if bbox:
+        geo["columns"]["geometry"]["bbox"] = bbox
+    table = pa.Table.from_arrays(columns, names=list(typed_fields) + ["geometry"])
+    table = table.replace_schema_metadata({"geo": json.dumps(geo)})
+    pq.write_table(table, file)
+
+
+def create_transmission_line_file(transmission_lines, flows, temperatures, costs, lengths, file, output_format="shp"):
+    """
+    function writing the transmission lines in the given format.
+
+    :param transmission_lines: coordinates of the start and end point of every line.
+    :type transmission_lines: np.array. [[[lon1, lat1], [lon2, lat2]], ...]
+    :param flows: annual flow of every line in MWh.
+    :type flows: array like.
+    :param temperatures: temperature of every line in °C.
+    :type temperatures: array like.
+    :param costs: cost of every line in €.
+    :type costs: array like.
+    :param lengths: length of every line in km.
+    :type lengths: array like.
+    :param file: output file name without extension.
+    :type file: str.
+    :param output_format: "shp" writes a shapefile with the values as text including their units, "gpkg" a GeoPackage
+                          and "parquet" a GeoParquet file with numeric fields.
+    :type output_format: str {"shp", "gpkg", "parquet"}.
+    :return: path of the written file.
+    :rtype: str.
+    """
+
+    if output_format not in output_extensions:
+        raise ValueError("Unknown output format " + str(output_format) + ", use one of " +
+                         ", ".join(output_extensions))
+    path = file + output_extensions[output_format]
+    if output_format == "shp":
+        create_transmission_line_shp(np.asarray(transmission_lines, dtype=float).reshape(-1, 2, 2).tolist(), flows,
+                                     temperatures, costs, lengths, path)
+    elif output_format == "gpkg":
+        create_transmission_line_gpkg(transmission_lines, flows, temperatures, costs, lengths, path)
+    else:
+        create_transmission_line_parquet(transmission_lines, flows, temperatures, costs, lengths, path)
+
+    return path
 
 
 if __name__ == "__main__":
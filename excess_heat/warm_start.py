@@ -0,0 +1,170 @@
+import json
+import logging
+import os
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+# increase whenever the format of saved network states changes
+STATE_VERSION = 1
+# decimals of the coordinates identifying a site across runs
+COORDINATE_DECIMALS = 6
+# minimum share of the saved transmission lines which must be candidates of the new run
+WARM_START_MIN_MATCH = 0.9
+
+
+def site_coordinates(sites):
+    """
+    function returning the rounded coordinates of sources or sinks, which identify them across runs.
+
+    :param sites: heat sources or heat sinks.
+    :type sites: pd.DataFrame.
+    :return: longitude and latitude of every site.
+    :rtype: np.array. [[lon1, lat1], [lon2, lat2], ...]
+    """
+
+    # rounded by python like the coordinates of saved states, np.round may differ in the last digit
+    return np.array([[round(lon, COORDINATE_DECIMALS), round(lat, COORDINATE_DECIMALS)] for lon, lat in
+                     sites[["Lon", "Lat"]].to_numpy(dtype=float).tolist()], dtype=float).reshape(-1, 2)
+
+
+def edge_coordinates(network, heat_sources, heat_sinks):
+    """
+    function returning the coordinates of both ends of every edge of a network.
+
+    :param network: network.
+    :type network: NetworkGraph.
+    :param heat_sources: heat sources of the network.
+    :type heat_sources: pd.DataFrame.
+    :param heat_sinks: heat sinks of the network.
+    :type heat_sinks: pd.DataFrame.
+    :return: coordinates of every edge in the order of return_edge_source_target_vertices().
+    :rtype: list. [((lon1, lat1), (lon2, lat2)), ...]
+    """
+
+    coordinates = network.return_edge_coordinates(site_coordinates(heat_sources), site_coordinates(heat_sinks))
+    return [(tuple(point1), tuple(point2)) for point1, point2 in coordinates.tolist()]
+
+
+def edge_key(coordinates):
+    """
+    function returning a key of an edge which does not depend on its direction.
+
+    :param coordinates: coordinates of both ends of the edge.
+    :type coordinates: tuple. ((lon1, lat1), (lon2, lat2))
+    :return: key of the edge.
+    :rtype: tuple.
+    """
+
+    return tuple(sorted(tuple(point) for point in coordinates))
+
+
+def save_network_state(path, network, heat_sources, heat_sinks, connection_flows, pruned_edges, parameters):
+    """
+    function saving the converged network of a run as json file, which can warm start later runs.
+
+    :param path: path of the state file.
+    :type path: str.
+    :param network: converged network.
+    :type network: NetworkGraph.
+    :param heat_sources: heat sources of the network.
+    :type heat_sources: pd.DataFrame.
+    :param heat_sinks: heat sinks of the network.
+    :type heat_sinks: pd.DataFrame.
+    :param connection_flows: hourly flow of every edge, one row per edge.
+    :type connection_flows: np.array.
+    :param pruned_edges: coordinates of the edges removed by the pruning.
+    :type pruned_edges: list. [((lon1, lat1), (lon2, lat2)), ...]
+    :param parameters: parameters of the run. Must be json serializable.
+    :type parameters: dict.
+    :return:
+    """
+
+    annual_flows = np.sum(np.abs(np.array(connection_flows)), axis=1) if len(connection_flows) > 0 else []
+    state = {"version": STATE_VERSION, "parameters": parameters,
+             "edges": [[list(point) for point in edge] for edge in edge_coordinates(network, heat_sources, heat_sinks)],
+             "flows": [float(flow) for flow in annual_flows],
+             "pruned_edges": [[list(point) for point in edge] for edge in pruned_edges]}
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temporary = path + ".tmp"
+    with open(temporary, "w") as file:
+        json.dump(state, file)
+    os.replace(temporary, path)
+
+
+def load_network_state(path):
+    """
+    function loading a network state saved by save_network_state().
+
+    :param path: path of the state file.
+    :type path: str.
+    :return: network state or None if the file is missing or invalid.
+    :rtype: dict or None.
+    """
+
+    try:
+        with open(path, "r") as file:
+            state = json.load(file)
+    except (IOError, OSError, ValueError) as e:
+        logger.warning("cannot read network state %s: %s", path, e)
+        return None
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        logger.warning("network state %s has an unsupported version", path)
+        return None
+    if not all(key in state for key in ("parameters", "edges", "flows", "pruned_edges")) or \
+            len(state["edges"]) != len(state["flows"]):
+        logger.warning("network state %s is incomplete", path)
+        return None
+    return state
+
+
+def warm_start_network(network, state, heat_sources, heat_sinks, parameters, min_match=WARM_START_MIN_MATCH):
+    """
+    function removing the edges pruned in a previous run from the candidate network of the current run, so pruning
+    starts close to the converged network. Edges of new sites and edges which were not candidates of the previous run
+    are kept. Nothing is changed if the state does not match the current run, which results in a cold start.
+
+    :param network: candidate network of the current run. It is changed in place.
+    :type network: NetworkGraph.
+    :param state: network state of the previous run.
+    :type state: dict.
+    :param heat_sources: heat sources of the network.
+    :type heat_sources: pd.DataFrame.
+    :param heat_sinks: heat sinks of the network.
+    :type heat_sinks: pd.DataFrame.
+    :param parameters: parameters of the current run, which must equal the parameters of the previous run.
+    :type parameters: dict.
+    :param min_match: minimum share of the transmission lines of the previous run with flow which must be candidates
+                      of the current run.
+    :type min_match: float.
+    :return: True if the network was warm started.
+    :rtype: bool.
+    """
+
+    if state is None:
+        return False
+    if state["parameters"] != json.loads(json.dumps(parameters)):
+        logger.warning("network state was computed with different parameters, starting cold")
+        return False
+
+    coordinates = edge_coordinates(network, heat_sources, heat_sinks)
+    keys = [edge_key(edge) for edge in coordinates]
+    candidates = set(keys)
+    used_edges = [edge_key(edge) for edge, flow in zip(state["edges"], state["flows"]) if flow > 0]
+    if used_edges:
+        match = np.mean([edge in candidates for edge in used_edges])
+        if match < min_match:
+            logger.warning("only %.0f%% of the lines of the network state are candidates, starting cold", match * 100)
+            return False
+
+    pruned_edges = set(edge_key(edge) for edge in state["pruned_edges"])
+    edges = network.return_edge_source_target_vertices()
+    network.delete_edges([edge for edge, key in zip(edges, keys) if key in pruned_edges])
+    logger.info("warm start removed %d of %d candidate edges", len(edges) - network.return_number_of_edges(),
+                len(edges))
+
+    return True
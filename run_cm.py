@@ -12,4 +12,6 @@ nuts2_id = "DK05"
 district_heating_shp_file = "./data/district_heating_shp.shp"
 output = "./results/results"
 
-excess_heat(district_heating_shp_file, search_radius, investment_period, transmission_line_threshold, nuts2_id, output)
+if __name__ == "__main__":
+    excess_heat(district_heating_shp_file, search_radius, investment_period, transmission_line_threshold, nuts2_id,
+                output)
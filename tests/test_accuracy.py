@@ -0,0 +1,28 @@
+import pytest
+
+from excess_heat.accuracy import accuracy_report, compare_results, run_fixture, synthetic_fixture
+
+
+def test_synthetic_fixtures_have_transmission_lines():
+    for seed in range(3):
+        result = run_fixture(synthetic_fixture("calibrated", 8, 24, number_of_hours=24 * 14, seed=seed))
+
+        assert len(result["edges"]) > 0
+        assert result["total_flow"] > 0
+        assert 0 < result["cost_per_flow"] < 100000
+
+
+def test_empty_reference_fails():
+    empty = {"total_cost": 0.0, "total_flow": 0.0, "cost_per_flow": 0.0, "edges": set()}
+
+    assert not compare_results(empty, empty)["passed"]
+
+
+def test_accuracy_report_compares_modes_with_the_exact_network():
+    fixture = synthetic_fixture("report", 8, 24, number_of_hours=24 * 14, seed=1)
+    report = accuracy_report([fixture], {"scipy": {"max_flow_backend": "scipy"}})
+
+    assert list(report["mode"]) == ["exact", "scipy"]
+    assert report["edges"].iloc[0] > 0
+    assert report["passed"].all()
+    assert report["total_flow_error"].iloc[1] == pytest.approx(0, abs=1e-4)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from excess_heat.accuracy import synthetic_fixture
+from excess_heat.excess_heat import design_network, find_radius_neighbours, find_triangulation_neighbours
+from excess_heat.warm_start import edge_coordinates, edge_key
+
+
+def minimum_spanning_tree(fixture, candidate_edges):
+    heat_sources, heat_sinks = fixture["heat_sources"], fixture["heat_sinks"]
+    search_radius = fixture["search_radius"]
+    if candidate_edges == "delaunay":
+        neighbours = find_triangulation_neighbours(heat_sources, heat_sinks, search_radius)
+        neighbours = (neighbours[0:2], neighbours[2:4], neighbours[4:6])
+    else:
+        neighbours = (find_radius_neighbours(heat_sources, heat_sinks, search_radius),
+                      find_radius_neighbours(heat_sources, heat_sources, search_radius),
+                      find_radius_neighbours(heat_sinks, heat_sinks, search_radius))
+    network = design_network(neighbours[0], neighbours[1], neighbours[2], heat_sinks["id"], None, None,
+                             fixture["investment_period"], fixture["transmission_line_threshold"], "igraph",
+                             "heuristic", None)
+    return network, sum(len(adjacent) for connections, _ in neighbours for adjacent in connections)
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("extent, search_radius", [(20, 20), (60, 10)])
+def test_delaunay_candidates_yield_the_minimum_spanning_tree_of_the_radius_candidates(seed, extent, search_radius):
+    fixture = synthetic_fixture("candidates", 25, 60, extent=extent, number_of_hours=24, seed=seed,
+                                search_radius=search_radius)
+    # coherent sinks are connected without costs in both networks
+    fixture["heat_sinks"]["id"] = np.where(np.arange(60) % 4 == 0, np.arange(60) // 8, 1000 + np.arange(60))
+
+    radius, radius_candidates = minimum_spanning_tree(fixture, "radius")
+    delaunay, delaunay_candidates = minimum_spanning_tree(fixture, "delaunay")
+
+    assert delaunay_candidates < radius_candidates
+    assert np.sum(delaunay.get_edge_attribute("distance")) == pytest.approx(
+        np.sum(radius.get_edge_attribute("distance")), rel=1e-12)
+    assert set(edge_key(edge) for edge in edge_coordinates(delaunay, fixture["heat_sources"], fixture["heat_sinks"])) \
+        == set(edge_key(edge) for edge in edge_coordinates(radius, fixture["heat_sources"], fixture["heat_sinks"]))
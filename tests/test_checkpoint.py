@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pytest
+
+from excess_heat import checkpoint
+from excess_heat.accuracy import synthetic_fixture
+from excess_heat.checkpoint import PruningMonitor, RunCancelled
+from excess_heat.excess_heat import design_network, find_radius_neighbours, prune_network
+
+
+FIXTURE = synthetic_fixture("checkpoint", 8, 24, number_of_hours=24 * 14, seed=0)
+
+
+def prune(monitor=None):
+    heat_sources, heat_sinks = FIXTURE["heat_sources"], FIXTURE["heat_sinks"]
+    search_radius = FIXTURE["search_radius"]
+    neighbours = (find_radius_neighbours(heat_sources, heat_sinks, search_radius),
+                  find_radius_neighbours(heat_sources, heat_sources, search_radius),
+                  find_radius_neighbours(heat_sinks, heat_sinks, search_radius))
+    network = design_network(neighbours[0], neighbours[1], neighbours[2], heat_sinks["id"],
+                             FIXTURE["heat_source_profiles"], FIXTURE["heat_sink_profiles"],
+                             FIXTURE["investment_period"], FIXTURE["transmission_line_threshold"], "igraph",
+                             "heuristic", None)
+    return prune_network(network, FIXTURE["heat_source_profiles"], FIXTURE["heat_sink_profiles"],
+                         FIXTURE["investment_period"], FIXTURE["transmission_line_threshold"], "heuristic",
+                         monitor=monitor)
+
+
+class CancelAfter:
+    # cancels the run after a number of solved hours
+    def __init__(self, hours):
+        self.hours = hours
+
+    def __call__(self):
+        self.hours -= 1
+        return self.hours < 0
+
+
+def test_resumed_runs_give_the_network_of_uninterrupted_runs(tmp_path, monkeypatch):
+    # report every hour
+    monkeypatch.setattr(checkpoint, "PROGRESS_INTERVAL", 0)
+    expected_network, expected_results = prune()
+
+    reports = []
+    monitor = PruningMonitor(str(tmp_path), "run", interval=0, progress=lambda *report: reports.append(report),
+                             cancel=CancelAfter(len(FIXTURE["heat_source_profiles"]) + 100))
+    with pytest.raises(RunCancelled):
+        prune(monitor)
+    # cancelled in the second iteration after its first 101 hours
+    assert reports[-1][:2] == (1, 101)
+    state = PruningMonitor(str(tmp_path), "run", resume=True).load()
+    assert state["iteration"] == 1 and len(state["flows"][0]) == 101
+
+    reports = []
+    monitor = PruningMonitor(str(tmp_path), "run", resume=True, progress=lambda *report: reports.append(report))
+    network, results = prune(monitor)
+
+    assert reports[0][:2] == (1, 102)
+    assert network.return_edge_source_target_vertices() == expected_network.return_edge_source_target_vertices()
+    for result, expected in zip(results, expected_results):
+        np.testing.assert_allclose(result, expected, rtol=1e-12)
+    monitor.clear()
+    assert not os.path.isfile(monitor.path())
+
+
+def test_checkpoints_of_other_runs_are_not_resumed(tmp_path):
+    monitor = PruningMonitor(str(tmp_path), "run", cancel=CancelAfter(10))
+    with pytest.raises(RunCancelled):
+        prune(monitor)
+
+    assert PruningMonitor(str(tmp_path), "other run", resume=True).load() is None
+    assert PruningMonitor(str(tmp_path), "run").load() is None
+    assert PruningMonitor(str(tmp_path), "run", resume=True).load()["iteration"] == 0
@@ -0,0 +1,85 @@
+import logging
+import os
+
+import pytest
+
+from excess_heat.cache import data_directory
+from excess_heat.excess_heat import excess_heat
+
+
+SINKS = os.path.join(data_directory(), "district_heating_shp.shp")
+
+pytestmark = pytest.mark.skipif(not os.path.isfile(SINKS), reason="sink shapefile of the data directory is missing")
+
+
+def test_cached_runs_save_their_network_state(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    for run in ("first", "second"):
+        cached = excess_heat(SINKS, 20, 20, 0.5, "DK05", str(tmp_path / run), cache_dir=cache_dir,
+                             save_state=str(tmp_path / (run + ".json")))
+
+        assert not cached
+        assert os.path.isfile(str(tmp_path / (run + ".json")))
+
+    assert excess_heat(SINKS, 20, 20, 0.5, "DK05", str(tmp_path / "third"), cache_dir=cache_dir) is False
+    assert excess_heat(SINKS, 20, 20, 0.5, "DK05", str(tmp_path / "fourth"), cache_dir=cache_dir) is True
+
+
+def test_result_cache_key_changes_with_the_reference_data(tmp_path):
+    from excess_heat.service import ReferenceData
+
+    cache_dir = str(tmp_path / "cache")
+    reference_data = ReferenceData()
+    runs = []
+    for run in ("first", "second", "reloaded"):
+        if run == "reloaded":
+            reference_data.load()
+        runs.append(excess_heat(SINKS, 20, 20, 0.5, "DK05", str(tmp_path / run), cache_dir=cache_dir,
+                                reference_data=reference_data))
+
+    assert runs == [False, True, False]
+
+
+def test_stages_reload_sources_and_profiles_of_changed_reference_data(tmp_path, caplog):
+    from excess_heat.service import ReferenceData
+
+    stage_dir = str(tmp_path / "stages")
+    reference_data = ReferenceData()
+    executed = []
+    for run in ("first", "second", "reloaded"):
+        if run == "reloaded":
+            reference_data.load()
+        caplog.clear()
+        with caplog.at_level(logging.INFO, logger="excess_heat.pipeline"):
+            excess_heat(SINKS, 20, 20, 0.5, "DK05", str(tmp_path / run), stage_dir=stage_dir,
+                        reference_data=reference_data, load_workers=1)
+        executed.append(set(record.getMessage()[len("executing stage "):] for record in caplog.records
+                            if record.getMessage().startswith("executing stage ")))
+
+    assert {"heat_sources", "heat_profiles"} <= executed[0]
+    assert executed[1] == set()
+    assert {"heat_sources", "heat_profiles"} <= executed[2]
+    assert "heat_sinks" not in executed[2]
+
+
+def test_exported_flows_do_not_depend_on_the_stage_cache(tmp_path, caplog):
+    import numpy as np
+
+    from excess_heat.flow_store import FlowStore
+
+    stage_dir = str(tmp_path / "stages")
+    stores = []
+    executed = []
+    for run in ("first", "second"):
+        caplog.clear()
+        with caplog.at_level(logging.INFO, logger="excess_heat.pipeline"):
+            excess_heat(SINKS, 20, 20, 0.5, "DK05", str(tmp_path / run), stage_dir=stage_dir, export_flows=True)
+        executed.append(set(record.getMessage()[len("executing stage "):] for record in caplog.records
+                            if record.getMessage().startswith("executing stage ")))
+        stores.append(FlowStore(str(tmp_path / run) + ".flows"))
+
+    # the flows are streamed while they are computed, the stored flows stage is not loaded
+    assert executed[1] == {"flows"}
+    assert stores[0].metadata == stores[1].metadata
+    for kind in ("source", "sink", "connection"):
+        np.testing.assert_array_equal(stores[0].read(kind), stores[1].read(kind))
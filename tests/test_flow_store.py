@@ -0,0 +1,55 @@
+import numpy as np
+
+from excess_heat import flow_store
+from excess_heat.flow_store import FlowStore, FlowStoreWriter
+
+
+def write_store(path, source_flows, sink_flows, connection_flows, metadata=None):
+    writer = FlowStoreWriter(str(path))
+    writer.write(source_flows, sink_flows, connection_flows)
+    writer.commit(metadata)
+    return FlowStore(str(path))
+
+
+def test_round_trip(tmp_path, monkeypatch):
+    # small chunks to read across chunk borders
+    monkeypatch.setattr(flow_store, "CHUNK_HOURS", 24)
+    monkeypatch.setattr(flow_store, "CHUNK_ITEMS", 3)
+    rng = np.random.default_rng(0)
+    source_flows = rng.random((5, 100))
+    sink_flows = rng.random((7, 100))
+    connection_flows = rng.standard_normal((4, 100))
+
+    store = write_store(tmp_path / "flows", source_flows, sink_flows, connection_flows, {"lines": [1, 2]})
+
+    assert store.number_of_hours == 100
+    assert store.sizes == {"source": 5, "sink": 7, "connection": 4}
+    assert store.metadata == {"lines": [1, 2]}
+    np.testing.assert_array_equal(store.read("source"), source_flows.T)
+    np.testing.assert_array_equal(store.read("sink"), sink_flows.T)
+    np.testing.assert_array_equal(store.read("connection"), connection_flows.T)
+    np.testing.assert_array_equal(store.read("sink", 20, 50, [6, 0, 4]), sink_flows[[6, 0, 4], 20:50].T)
+
+
+def test_round_trip_of_empty_kinds(tmp_path):
+    source_flows = np.ones((2, 30))
+    sink_flows = np.full((3, 30), 2 / 3)
+
+    store = write_store(tmp_path / "flows", source_flows, sink_flows, np.zeros((0, 30)))
+
+    assert store.sizes["connection"] == 0
+    assert store.read("connection").shape == (30, 0)
+    assert store.read("connection", 10, 20).shape == (10, 0)
+    np.testing.assert_array_equal(store.read("source"), source_flows.T)
+
+
+def test_streamed_hours_of_a_pruned_network(tmp_path):
+    writer = FlowStoreWriter(str(tmp_path / "flows"))
+    writer.start(flow_store.CHUNK_HOURS + 2, 1, 1, 0)
+    for hour in range(flow_store.CHUNK_HOURS + 2):
+        writer.append([hour], [hour], [])
+    writer.commit()
+
+    store = FlowStore(str(tmp_path / "flows"))
+    assert store.read("connection").shape == (flow_store.CHUNK_HOURS + 2, 0)
+    np.testing.assert_array_equal(store.read("source")[:, 0], np.arange(flow_store.CHUNK_HOURS + 2))
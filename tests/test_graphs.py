@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from excess_heat.graphs import NetworkGraph
+
+
+# sources 0 and 1 as well as sinks 1, 2 and sinks 3, 4 are coherent. The expected values are the output of the
+# NetworkGraph implementation based on dict maps, before it was backed by index arrays.
+SOURCE_SINK_EDGES = [[0, 2], [1], [3, 4], []]
+SOURCE_SOURCE_EDGES = [[1], [0], [], []]
+SINK_SINK_EDGES = [[1], [0, 2], [1], [], []]
+SOURCE_CORRESPONDENCE = [0, 0, 1, 2]
+SINK_CORRESPONDENCE = [5, 6, 6, 7, 7]
+SOURCE_CAPACITIES = [1.0, 2.0, 4.0, 8.0]
+SINK_CAPACITIES = [0.5, 1.5, 2.5, 3.5, 4.5]
+DISTANCES = ([[1.0, 3.0], [2.0], [1.5, 0.5], []], [[0.7], [0.7], [], []], [[0.2], [0.2, 0.9], [0.9], [], []])
+
+EXPECTED_MAX_FLOW_EDGES = [(0, 4), (0, 6), (1, 5), (2, 7), (2, 8), (0, 1), (0, 1), (4, 5), (4, 5), (5, 6), (5, 6),
+                           (0, 9), (1, 9), (5, 10), (6, 10), (7, 11), (8, 11), (9, 12), (2, 12), (3, 12), (4, 13),
+                           (10, 13), (11, 13)]
+EXPECTED_EDGES = [(("source", 0), ("sink", 0)), (("source", 0), ("sink", 2)), (("source", 1), ("sink", 1)),
+                  (("source", 2), ("sink", 3)), (("source", 2), ("sink", 4)), (("source", 0), ("source", 1)),
+                  (("source", 0), ("source", 1)), (("sink", 0), ("sink", 1)), (("sink", 0), ("sink", 1)),
+                  (("sink", 1), ("sink", 2)), (("sink", 1), ("sink", 2))]
+EXPECTED_MINIMUM_SPANNING_TREE = [(("source", 0), ("sink", 0)), (("source", 2), ("sink", 4)),
+                                  (("sink", 0), ("sink", 1))]
+
+
+def network_graph():
+    return NetworkGraph(SOURCE_SINK_EDGES, SOURCE_SOURCE_EDGES, SINK_SINK_EDGES, SOURCE_CORRESPONDENCE,
+                        SINK_CORRESPONDENCE)
+
+
+def test_graphs_and_flow_capacities():
+    network = network_graph()
+
+    assert network.max_flow_graph.get_edgelist() == EXPECTED_MAX_FLOW_EDGES
+    assert (network.infinite_source_vertex, network.infinite_sink_vertex) == (12, 13)
+    assert (network.number_of_coherent_sources, network.number_of_coherent_sinks) == (3, 3)
+    assert network.return_edge_source_target_vertices() == EXPECTED_EDGES
+    np.testing.assert_array_equal(network.return_flow_capacities(SOURCE_CAPACITIES, SINK_CAPACITIES),
+                                  [np.inf] * 17 + [3.0, 4.0, 8.0, 0.5, 4.0, 8.0])
+    with pytest.raises(TypeError):
+        network.return_flow_capacities(SOURCE_CAPACITIES[:-1], SINK_CAPACITIES)
+
+
+def test_split_flow_solution():
+    source_flow, sink_flow, connection_flow = network_graph().split_flow_solution(np.arange(23) + 1.0)
+
+    np.testing.assert_array_equal(source_flow, [-18.0, -19.0, -20.0])
+    np.testing.assert_array_equal(sink_flow, [21.0, 22.0, 23.0])
+    np.testing.assert_array_equal(connection_flow, np.arange(11) + 1.0)
+
+
+def test_maximum_flow():
+    source_flow, sink_flow, connection_flow = network_graph().maximum_flow(SOURCE_CAPACITIES, SINK_CAPACITIES)[:3]
+
+    np.testing.assert_allclose(source_flow, [3.0, 4.0, 0.0], atol=1e-12)
+    np.testing.assert_allclose(sink_flow, [0.5, 2.5, 4.0], atol=1e-12)
+    np.testing.assert_allclose(connection_flow, [0.5, 2.5, 0, 0, 4.0, 0, 0, 0, 0, 0, 0], atol=1e-12)
+
+
+def test_adjacency_lists_and_edge_attributes():
+    network = network_graph()
+    network.add_edge_attribute("distance", *DISTANCES)
+
+    assert network.get_edge_attribute("distance") == [1.0, 3.0, 2.0, 1.5, 0.5, 0.7, 0.7, 0.2, 0.2, 0.9, 0.9]
+    # the edges connecting coherent sites in the correspondence graph have no length
+    assert network.correspondence_graph.es["distance"][network.graph.ecount():] == \
+        [0] * (network.correspondence_graph.ecount() - network.graph.ecount())
+    network.add_edge_attribute("length", *([np.array(row) for row in rows] for rows in DISTANCES))
+    assert network.get_edge_attribute("length") == network.get_edge_attribute("distance")
+    # the order within an adjacency list is not specified
+    assert [[sorted(adjacent) for adjacent in adjacency_list] for adjacency_list in network.return_adjacency_lists()] \
+        == [[[0, 2], [1], [3, 4], []], [[1], [], [], []], [[1], [2], [], [], []]]
+
+
+def test_minimum_spanning_tree_and_edge_selection():
+    network = network_graph()
+    network.add_edge_attribute("distance", *DISTANCES)
+    network.reduce_to_minimum_spanning_tree("distance")
+
+    assert network.return_edge_source_target_vertices() == EXPECTED_MINIMUM_SPANNING_TREE
+    assert network.get_edge_attribute("distance") == [1.0, 0.5, 0.2]
+    np.testing.assert_array_equal(network.return_flow_capacities(SOURCE_CAPACITIES, SINK_CAPACITIES),
+                                  [np.inf] * 9 + [3.0, 4.0, 8.0, 0.5, 4.0, 8.0])
+
+    network.select_edges([0, 2])
+    assert network.return_edge_source_target_vertices() == [EXPECTED_MINIMUM_SPANNING_TREE[0],
+                                                            EXPECTED_MINIMUM_SPANNING_TREE[2]]
+    source_flow, sink_flow, connection_flow = network.maximum_flow(SOURCE_CAPACITIES, SINK_CAPACITIES)[:3]
+    np.testing.assert_allclose(source_flow, [3.0, 0.0, 0.0], atol=1e-12)
+    np.testing.assert_allclose(sink_flow, [0.5, 2.5, 0.0], atol=1e-12)
+    np.testing.assert_allclose(connection_flow, [3.0, 2.5], atol=1e-12)
+
+    network.delete_edges([EXPECTED_MINIMUM_SPANNING_TREE[2]])
+    assert network.return_edge_source_target_vertices() == [EXPECTED_MINIMUM_SPANNING_TREE[0]]
+
+
+def test_auto_backend_is_chosen_once_per_network(monkeypatch):
+    import excess_heat.graphs
+
+    choices = []
+
+    def select_max_flow_backend(number_of_vertices, number_of_edges):
+        choices.append(number_of_vertices)
+        return "numpy"
+
+    monkeypatch.setattr(excess_heat.graphs, "select_max_flow_backend", select_max_flow_backend)
+    network = NetworkGraph(SOURCE_SINK_EDGES, SOURCE_SOURCE_EDGES, SINK_SINK_EDGES, SOURCE_CORRESPONDENCE,
+                           SINK_CORRESPONDENCE, max_flow_backend="auto")
+    for _ in range(3):
+        network.maximum_flow(SOURCE_CAPACITIES, SINK_CAPACITIES)
+    network.select_edges([0, 2, 3])
+    network.maximum_flow(SOURCE_CAPACITIES, SINK_CAPACITIES)
+
+    assert choices == [network.max_flow_graph.vcount()]
+    assert type(network.get_max_flow_solver()).name == "numpy"
+    assert network.get_max_flow_solver("incremental").fallback == "numpy"
@@ -0,0 +1,86 @@
+import time
+
+import numpy as np
+import pytest
+
+from excess_heat import isolation
+from excess_heat.accuracy import synthetic_fixture
+from excess_heat.excess_heat import design_network, find_radius_neighbours
+from excess_heat.isolation import IsolatedMaxFlowSolver
+
+
+def tree_network():
+    fixture = synthetic_fixture("isolation", 6, 12, number_of_hours=48, seed=4)
+    heat_sources, heat_sinks = fixture["heat_sources"], fixture["heat_sinks"]
+    neighbours = (find_radius_neighbours(heat_sources, heat_sinks, 20),
+                  find_radius_neighbours(heat_sources, heat_sources, 20),
+                  find_radius_neighbours(heat_sinks, heat_sinks, 20))
+    network = design_network(neighbours[0], neighbours[1], neighbours[2], heat_sinks["id"], None, None, 20, 0.5,
+                             "igraph", "heuristic", None)
+    return network, fixture["heat_source_profiles"], fixture["heat_sink_profiles"]
+
+
+def assert_same_flows(isolated_flows, network, source_profiles, sink_profiles):
+    isolated_flows = list(isolated_flows)
+    assert len(isolated_flows) == len(source_profiles)
+    for flows, source_capacities, sink_capacities in zip(isolated_flows, source_profiles, sink_profiles):
+        for isolated, expected in zip(flows, network.maximum_flow(source_capacities, sink_capacities)):
+            np.testing.assert_allclose(isolated, expected, rtol=1e-12, atol=1e-12)
+
+
+def sleeping_worker(connection, backend):
+    # worker which never answers a batch
+    while connection.recv()[0] != "exit":
+        time.sleep(0.01)
+    connection.close()
+
+
+def test_workers_are_replaced_after_their_call_budget():
+    network, source_profiles, sink_profiles = tree_network()
+    with IsolatedMaxFlowSolver(max_calls=10) as solver:
+        assert_same_flows(solver.maximum_flows(network, source_profiles, sink_profiles), network, source_profiles,
+                          sink_profiles)
+
+        # batches never exceed the budget, 10, 10, 10, 10 and 8 hours
+        assert solver.total_calls == 48
+        assert solver.restarts == 4
+        assert solver.calls == 8
+
+
+def test_workers_are_replaced_above_their_memory_budget(monkeypatch):
+    # above the budget of 100 MB, but below the limit of the watchdog
+    monkeypatch.setattr(isolation, "process_rss", lambda pid: 150.0)
+    monkeypatch.setattr(isolation, "BATCH_SIZE", 16)
+    network, source_profiles, sink_profiles = tree_network()
+    with IsolatedMaxFlowSolver(max_rss=100) as solver:
+        assert_same_flows(solver.maximum_flows(network, source_profiles, sink_profiles), network, source_profiles,
+                          sink_profiles)
+
+        assert solver.restarts == 3
+        assert solver.peak_rss == 150.0
+
+
+def test_batches_of_dead_workers_are_solved_again():
+    network, source_profiles, sink_profiles = tree_network()
+    with IsolatedMaxFlowSolver() as solver:
+        solver.set_graph(network.max_flow_graph.vcount(), network.max_flow_graph.get_edgelist())
+        solver.process.kill()
+        solver.process.join()
+
+        assert_same_flows(solver.maximum_flows(network, source_profiles, sink_profiles), network, source_profiles,
+                          sink_profiles)
+        assert solver.restarts == 1
+
+
+def test_watchdog_kills_workers_above_twice_their_memory_budget(monkeypatch):
+    monkeypatch.setattr(isolation, "max_flow_worker", sleeping_worker)
+    monkeypatch.setattr(isolation, "process_rss", lambda pid: 1000.0)
+    monkeypatch.setattr(isolation, "WATCHDOG_INTERVAL", 0.01)
+    network, source_profiles, sink_profiles = tree_network()
+    with IsolatedMaxFlowSolver(max_rss=100, max_retries=1) as solver:
+        with pytest.raises(RuntimeError):
+            list(solver.maximum_flows(network, source_profiles, sink_profiles))
+
+        # every attempt killed its worker
+        assert solver.restarts == 2
+        assert solver.total_calls == 0
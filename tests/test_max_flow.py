@@ -0,0 +1,152 @@
+import numpy as np
+import pytest
+
+from excess_heat.accuracy import synthetic_fixture
+from excess_heat.excess_heat import design_network, find_radius_neighbours
+from excess_heat.graphs import NetworkGraph
+from excess_heat.max_flow import MAX_FLOW_BACKENDS, create_max_flow_solver, repair_terminal_flows, \
+    select_max_flow_backend
+
+
+BACKENDS = sorted(MAX_FLOW_BACKENDS)
+# relative tolerance of the flow value, the scipy backend rounds the capacities to integers
+RELATIVE_TOLERANCE = 1e-5
+
+
+def flow_value(edges, flows, source_vertex):
+    return np.sum(flows[edges[:, 0] == source_vertex]) - np.sum(flows[edges[:, 1] == source_vertex])
+
+
+def assert_feasible(number_of_vertices, edges, flows, capacities, source_vertex, sink_vertex):
+    scale = np.max(capacities[np.isfinite(capacities)])
+    assert np.all(np.abs(flows) <= capacities + 1e-9 * scale)
+    balance = np.bincount(edges[:, 0], weights=flows, minlength=number_of_vertices) - \
+        np.bincount(edges[:, 1], weights=flows, minlength=number_of_vertices)
+    balance[[source_vertex, sink_vertex]] = 0
+    np.testing.assert_allclose(balance, 0, atol=1e-7 * scale)
+
+
+def random_graph(seed, number_of_vertices=12, number_of_edges=30):
+    rng = np.random.default_rng(seed)
+    edges = rng.integers(0, number_of_vertices, (number_of_edges, 2))
+    capacities = rng.uniform(0, 10, number_of_edges)
+    capacities[rng.random(number_of_edges) < 0.2] = np.inf
+    # parallel edges and self loops occur in the max flow graphs of NetworkGraph
+    edges = np.concatenate((edges, edges[:2], [[3, 3]]))
+    capacities = np.concatenate((capacities, [1.5, np.inf, 4]))
+    return number_of_vertices, edges, capacities
+
+
+def network_graphs():
+    fixture = synthetic_fixture("max_flow", 8, 14, number_of_hours=24 * 7, seed=6)
+    heat_sources, heat_sinks = fixture["heat_sources"], fixture["heat_sinks"]
+    # coherent sinks share connecting nodes
+    heat_sinks["id"] = np.arange(len(heat_sinks)) // 3
+    neighbours = (find_radius_neighbours(heat_sources, heat_sinks, 20),
+                  find_radius_neighbours(heat_sources, heat_sources, 20),
+                  find_radius_neighbours(heat_sinks, heat_sinks, 20))
+    full = NetworkGraph(neighbours[0][0], neighbours[1][0], neighbours[2][0], range(len(heat_sources)),
+                        heat_sinks["id"])
+    tree = design_network(neighbours[0], neighbours[1], neighbours[2], heat_sinks["id"], None, None, 20, 0.5,
+                          "igraph", "heuristic", None)
+    return fixture, (full, tree)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("seed", range(5))
+def test_backends_return_the_igraph_flow_value_on_random_graphs(backend, seed):
+    number_of_vertices, edges, capacities = random_graph(seed)
+    # the source and sink have restricted edges only, so the maximum flow is finite
+    capacities[np.isin(edges, [0, 1]).any(axis=1) & np.isinf(capacities)] = 2
+
+    expected = create_max_flow_solver("igraph", number_of_vertices, edges).solve(capacities, 0, 1)
+    flows = create_max_flow_solver(backend, number_of_vertices, edges).solve(capacities, 0, 1)
+
+    assert_feasible(number_of_vertices, edges, flows, capacities, 0, 1)
+    assert flow_value(edges, flows, 0) == pytest.approx(flow_value(edges, expected, 0), rel=RELATIVE_TOLERANCE)
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_backends_return_the_igraph_flow_value_on_network_graphs(backend):
+    fixture, networks = network_graphs()
+    for network in networks:
+        graph = network.max_flow_graph
+        edges = np.array(graph.get_edgelist()).reshape(-1, 2)
+        source_vertex, sink_vertex = network.infinite_source_vertex, network.infinite_sink_vertex
+        reference = create_max_flow_solver("igraph", graph.vcount(), edges)
+        solver = create_max_flow_solver(backend, graph.vcount(), edges)
+        total_flow = 0
+        # consecutive hours, as computed by compute_flow()
+        for hour in range(0, 24 * 7, 5):
+            capacities = network.return_flow_capacities(fixture["heat_source_profiles"][hour],
+                                                        fixture["heat_sink_profiles"][hour])
+            expected = reference.solve(capacities, source_vertex, sink_vertex)
+            flows = solver.solve(capacities, source_vertex, sink_vertex)
+
+            assert_feasible(graph.vcount(), edges, flows, capacities, source_vertex, sink_vertex)
+            assert flow_value(edges, flows, source_vertex) == pytest.approx(
+                flow_value(edges, expected, source_vertex), rel=RELATIVE_TOLERANCE)
+            total_flow += flow_value(edges, expected, source_vertex)
+        assert total_flow > 0
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_max_flow_solver("unknown", 2, [(0, 1)])
+
+
+def test_incremental_backend_repairs_flows_of_unordered_hours():
+    fixture, networks = network_graphs()
+    network = networks[1]
+    graph = network.max_flow_graph
+    edges = np.array(graph.get_edgelist()).reshape(-1, 2)
+    source_vertex, sink_vertex = network.infinite_source_vertex, network.infinite_sink_vertex
+    reference = create_max_flow_solver("igraph", graph.vcount(), edges)
+    solver = create_max_flow_solver("incremental", graph.vcount(), edges)
+    rng = np.random.default_rng(7)
+    for hour in rng.permutation(24 * 7)[:40]:
+        # switch sources and sinks off at random, so flows are cancelled as well as pushed
+        source_capacities = fixture["heat_source_profiles"][hour] * (rng.random(8) < 0.7)
+        sink_capacities = fixture["heat_sink_profiles"][hour] * (rng.random(14) < 0.7)
+        capacities = network.return_flow_capacities(source_capacities, sink_capacities)
+        expected = reference.solve(capacities, source_vertex, sink_vertex)
+        flows = solver.solve(capacities, source_vertex, sink_vertex)
+
+        assert solver.fallback_solver is None
+        assert_feasible(graph.vcount(), edges, flows, capacities, source_vertex, sink_vertex)
+        assert flow_value(edges, flows, source_vertex) == pytest.approx(flow_value(edges, expected, source_vertex),
+                                                                        rel=1e-12, abs=1e-12)
+
+    # flows from the sink to the source vertex use the other terminals
+    capacities = network.return_flow_capacities(fixture["heat_source_profiles"][0], fixture["heat_sink_profiles"][0])
+    flows = solver.solve(capacities, sink_vertex, source_vertex)
+    expected = reference.solve(capacities, sink_vertex, source_vertex)
+    assert flow_value(edges, flows, sink_vertex) == pytest.approx(flow_value(edges, expected, sink_vertex), rel=1e-12)
+
+
+def test_auto_never_chooses_the_approximate_incremental_backend():
+    for number_of_vertices in (2, 64, 65, 999, 1000, 100000):
+        assert select_max_flow_backend(number_of_vertices, 3 * number_of_vertices) in ("igraph", "scipy", "numpy")
+
+
+def test_incremental_backend_falls_back_for_restricted_internal_edges():
+    number_of_vertices, edges, capacities = random_graph(0)
+    capacities[np.isin(edges, [0, 1]).any(axis=1) & np.isinf(capacities)] = 2
+    solver = create_max_flow_solver("incremental", number_of_vertices, edges)
+
+    flows = solver.solve(capacities, 0, 1)
+
+    assert solver.fallback_solver is not None
+    expected = create_max_flow_solver("igraph", number_of_vertices, edges).solve(capacities, 0, 1)
+    assert flow_value(edges, flows, 0) == pytest.approx(flow_value(edges, expected, 0), rel=RELATIVE_TOLERANCE)
+
+
+def test_repair_terminal_flows():
+    components = np.array([0, 0, 1, 1, 1])
+    capacities = np.array([1.0, 3.0, 2.0, 2.0, 0.0])
+    flows = repair_terminal_flows(np.array([1.0, 0.0, 2.0, 2.0, 1.0]), capacities, components, np.array([2.0, 1.0]))
+
+    np.testing.assert_allclose(np.bincount(components, weights=flows), [2.0, 1.0])
+    assert np.all((flows >= 0) & (flows <= capacities))
+    # missing flow is pushed by the remaining capacity, surplus flow cancelled by the flow
+    np.testing.assert_allclose(flows, [1.0, 1.0, 0.5, 0.5, 0.0])
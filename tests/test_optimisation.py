@@ -0,0 +1,189 @@
+import time
+
+import numpy as np
+import pytest
+import scipy.optimize
+
+from excess_heat.CM1 import PIPE_CAPACITIES, PIPE_COSTS
+from excess_heat.accuracy import run_fixture, synthetic_fixture
+from excess_heat.excess_heat import compute_flow, design_network, find_radius_neighbours, prune_network
+from excess_heat.graphs import NetworkGraph
+from excess_heat.optimisation import candidate_lines, design_network_lp, linear_pipe_cost, time_slices
+
+
+def fixture_neighbours(fixture):
+    heat_sources, heat_sinks = fixture["heat_sources"], fixture["heat_sinks"]
+    search_radius = fixture["search_radius"]
+    return (find_radius_neighbours(heat_sources, heat_sinks, search_radius),
+            find_radius_neighbours(heat_sources, heat_sources, search_radius),
+            find_radius_neighbours(heat_sinks, heat_sinks, search_radius))
+
+
+def candidate_network(fixture):
+    neighbours = fixture_neighbours(fixture)
+    network = NetworkGraph(neighbours[0][0], neighbours[1][0], neighbours[2][0],
+                           range(len(fixture["heat_sources"])), fixture["heat_sinks"]["id"])
+    network.add_edge_attribute("distance", neighbours[0][1], neighbours[1][1], neighbours[2][1])
+    return network
+
+
+def designed_network(fixture, design, **parameters):
+    neighbours = fixture_neighbours(fixture)
+    network = design_network(neighbours[0], neighbours[1], neighbours[2], fixture["heat_sinks"]["id"],
+                             fixture["heat_source_profiles"], fixture["heat_sink_profiles"],
+                             fixture["investment_period"], fixture["transmission_line_threshold"], "igraph", design,
+                             None, **parameters)
+    network, _ = prune_network(network, fixture["heat_source_profiles"], fixture["heat_sink_profiles"],
+                               fixture["investment_period"], fixture["transmission_line_threshold"], design)
+    return network
+
+
+def net_benefit(network, fixture):
+    # objective of the design, the delivered heat at the threshold cost per flow less the annual line costs
+    results = compute_flow(network, fixture["heat_source_profiles"], fixture["heat_sink_profiles"],
+                           fixture["investment_period"])
+    line_costs = np.sum(np.clip(results[3], 0, None)) / fixture["investment_period"]
+    return fixture["transmission_line_threshold"] * np.sum(results[1]) - line_costs
+
+
+def design_lp(fixture, **parameters):
+    network = candidate_network(fixture)
+    selected = design_network_lp(network, fixture["heat_source_profiles"], fixture["heat_sink_profiles"],
+                                 fixture["investment_period"], fixture["transmission_line_threshold"], **parameters)
+    return network, selected
+
+
+def test_lp_design_finishes_on_small_fixture():
+    results = run_fixture(synthetic_fixture("small", 4, 6, number_of_hours=48, seed=1),
+                          {"design": "lp", "typical_periods": 1, "time_limit": 20})
+
+    assert results["seconds"] < 60
+    assert np.isfinite(results["total_cost"])
+    assert results["total_flow"] >= 0
+
+
+def test_lp_design_stops_at_time_limit():
+    fixture = synthetic_fixture("limited", 15, 25, number_of_hours=24 * 7, seed=2)
+    neighbours = fixture_neighbours(fixture)
+
+    start = time.perf_counter()
+    network = design_network(neighbours[0], neighbours[1], neighbours[2], fixture["heat_sinks"]["id"],
+                             fixture["heat_source_profiles"], fixture["heat_sink_profiles"],
+                             fixture["investment_period"], fixture["transmission_line_threshold"], "igraph", "lp",
+                             None, time_limit=2)
+
+    # the time limit covers the model, the MILP and the linear relaxation of the fallback
+    assert time.perf_counter() - start < 10
+    assert np.all(np.asarray(network.get_edge_attribute("distance")) <= fixture["search_radius"])
+
+
+MILP = scipy.optimize.milp
+
+
+class RecordingMilp:
+    # records the options and start of every solve and replaces the results of the first failed solves
+    def __init__(self, failures=0):
+        self.calls = []
+        self.failures = failures
+
+    def __call__(self, *args, **kwargs):
+        self.calls.append((time.perf_counter(), kwargs))
+        if len(self.calls) <= self.failures:
+            return scipy.optimize.OptimizeResult(x=None, success=False, message="no solution")
+        return MILP(*args, **kwargs)
+
+
+@pytest.mark.parametrize("seed", [0, 2])
+def test_lp_design_is_no_worse_than_the_heuristic(seed):
+    fixture = synthetic_fixture("design", 8, 24, number_of_hours=24 * 14, seed=seed)
+
+    heuristic = designed_network(fixture, "heuristic")
+    lp = designed_network(fixture, "lp", time_limit=60)
+
+    assert heuristic.graph.ecount() > 0 and lp.graph.ecount() > 0
+    assert net_benefit(lp, fixture) >= net_benefit(heuristic, fixture)
+
+
+def test_lp_design_solves_within_the_remaining_time(monkeypatch):
+    fixture = synthetic_fixture("limited", 30, 90, number_of_hours=24 * 28, seed=2)
+    milp = RecordingMilp()
+    monkeypatch.setattr(scipy.optimize, "milp", milp)
+
+    network = candidate_network(fixture)
+    start = time.perf_counter()
+    selected = design_network_lp(network, fixture["heat_source_profiles"], fixture["heat_sink_profiles"],
+                                 fixture["investment_period"], fixture["transmission_line_threshold"], time_limit=2)
+    seconds = time.perf_counter() - start
+
+    assert len(milp.calls) == 1
+    called, options = milp.calls[0]
+    # the presolve of HiGHS ignores the time limit, the solver gets the time left after building the model
+    assert options["options"]["presolve"] is False
+    assert called + options["options"]["time_limit"] <= start + 2 + 0.01
+    assert seconds < 20
+    assert np.all(np.asarray(network.get_edge_attribute("distance"))[selected] <= fixture["search_radius"])
+
+
+def test_lp_design_falls_back_to_the_relaxation_and_the_tree(monkeypatch):
+    fixture = synthetic_fixture("fallback", 6, 18, number_of_hours=24 * 14, seed=1)
+    _, expected = design_lp(fixture, mip=False, time_limit=60)
+
+    milp = RecordingMilp(failures=1)
+    monkeypatch.setattr(scipy.optimize, "milp", milp)
+    start = time.perf_counter()
+    _, selected = design_lp(fixture, time_limit=60)
+
+    assert len(milp.calls) == 2
+    assert np.any(milp.calls[0][1]["integrality"]) and not np.any(milp.calls[1][1]["integrality"])
+    # the relaxation gets the time left over
+    assert milp.calls[1][0] + milp.calls[1][1]["options"]["time_limit"] <= start + 60 + 0.01
+    np.testing.assert_array_equal(selected, expected)
+
+    milp.calls, milp.failures = [], 2
+    network, selected = design_lp(fixture, time_limit=60)
+    graph = network.correspondence_graph
+    tree = np.array(graph.spanning_tree(weights=graph.es["distance"], return_tree=False))
+    np.testing.assert_array_equal(selected, np.sort(tree[tree < network.graph.ecount()]))
+
+
+def test_linear_pipe_cost_does_not_exceed_the_pipes_within_the_bound():
+    capacities = np.array(PIPE_CAPACITIES[:-1])
+    fixed, slope, pipe_capacities = linear_pipe_cost(np.array([0.1, 5.0, 1000.0]))
+
+    np.testing.assert_array_equal(pipe_capacities, [0.2, 6.1, 190])
+    for line_fixed, line_slope, bound in zip(fixed, slope, pipe_capacities):
+        within = capacities <= bound
+        assert np.all(line_fixed + line_slope * capacities[within] <= np.array(PIPE_COSTS[:-1])[within] + 1e-9)
+    # lower bounds give closer approximations
+    assert slope[0] == 0 and slope[1] > slope[2]
+
+
+def test_time_slices_keep_the_daily_means():
+    rng = np.random.default_rng(0)
+    source_profiles, sink_profiles = rng.random((60, 2)), rng.random((60, 3))
+    source_capacities, sink_capacities, slice_day, day_share, weights = time_slices(
+        source_profiles, sink_profiles, np.array([2.0, 1.0, 1.0]), hours_per_slice=6)
+
+    # two whole days of four slices and a partial day of two slices
+    np.testing.assert_array_equal(slice_day, [0, 0, 0, 0, 1, 1, 1, 1, 2, 2])
+    np.testing.assert_allclose(day_share, [0.25] * 8 + [0.5] * 2)
+    np.testing.assert_allclose(weights, [12] * 4 + [6] * 6)
+    np.testing.assert_allclose(np.sum(sink_capacities * weights[:, None], axis=0),
+                               np.sum(sink_profiles * np.repeat([2.0, 1.0, 1.0], 24)[:60, None], axis=0))
+    np.testing.assert_allclose(source_capacities[8], np.mean(source_profiles[48:54], axis=0))
+
+
+def test_candidate_lines_keep_the_tree_and_the_shortest_lines():
+    network = candidate_network(synthetic_fixture("candidates", 10, 30, number_of_hours=24, seed=3))
+    lines = candidate_lines(network, 2)
+    lengths = np.array(network.get_edge_attribute("distance"))
+
+    graph = network.correspondence_graph
+    tree = np.array(graph.spanning_tree(weights=graph.es["distance"], return_tree=False))
+    assert set(tree[tree < network.graph.ecount()]) <= set(lines)
+    assert len(lines) < network.graph.ecount()
+    for vertex in range(network.number_of_sources + network.number_of_sinks):
+        adjacent = np.nonzero(np.any(network.edge_vertices == vertex, axis=1)
+                              & (network.edge_vertices[:, 0] != network.edge_vertices[:, 1]))[0]
+        shortest = adjacent[np.argsort(lengths[adjacent], kind="stable")[:2]]
+        assert set(shortest) <= set(lines)
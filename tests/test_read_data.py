@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from excess_heat.read_data import extract_coordinates_from_wkb_point, wkb_points_coordinates
+
+
+shapely_wkb = pytest.importorskip("shapely.wkb")
+
+
+def encoded_points(seed=0):
+    from shapely.geometry import Point
+
+    rng = np.random.default_rng(seed)
+    points = []
+    for index, (x, y) in enumerate(zip(rng.uniform(-30, 40, 40), rng.uniform(35, 70, 40))):
+        point = Point(x, y, rng.uniform(0, 100)) if index % 5 == 4 else Point(x, y)
+        options = {"big_endian": index % 2 == 1}
+        if index % 3 == 0:
+            # extended WKB of PostGIS
+            options["srid"] = 4326
+        points.append(shapely_wkb.dumps(point, hex=True, **options))
+    return points
+
+
+def test_wkb_points_coordinates_match_shapely():
+    points = encoded_points()
+    expected = np.array([shapely_wkb.loads(point, hex=True).coords[0][:2] for point in points])
+
+    # plain and extended, 2d and 3d points of both byte orders have different encoded lengths
+    assert len(set(len(point) for point in points)) > 1
+    np.testing.assert_array_equal(wkb_points_coordinates(points), expected)
+    assert extract_coordinates_from_wkb_point(points[3]) == tuple(expected[3])
+
+
+def test_wkb_points_coordinates_reject_other_geometries():
+    from shapely.geometry import LineString
+
+    with pytest.raises(ValueError):
+        wkb_points_coordinates([shapely_wkb.dumps(LineString([(0, 0), (1, 1)]), hex=True)])
+    with pytest.raises(ValueError):
+        wkb_points_coordinates(["0101"])
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from excess_heat.accuracy import synthetic_fixture
+from excess_heat.excess_heat import design_network, find_radius_neighbours, prune_network
+from excess_heat.screening import active_hours, screen_edges
+from excess_heat.warm_start import edge_coordinates, edge_key
+
+
+def candidate_network(fixture, design="heuristic"):
+    heat_sources, heat_sinks = fixture["heat_sources"], fixture["heat_sinks"]
+    search_radius = fixture["search_radius"]
+    neighbours = (find_radius_neighbours(heat_sources, heat_sinks, search_radius),
+                  find_radius_neighbours(heat_sources, heat_sources, search_radius),
+                  find_radius_neighbours(heat_sinks, heat_sinks, search_radius))
+    return design_network(neighbours[0], neighbours[1], neighbours[2], heat_sinks["id"],
+                          fixture["heat_source_profiles"], fixture["heat_sink_profiles"],
+                          fixture["investment_period"], fixture["transmission_line_threshold"], "igraph", design, None)
+
+
+def line_keys(network, fixture):
+    return set(edge_key(edge) for edge in edge_coordinates(network, fixture["heat_sources"], fixture["heat_sinks"]))
+
+
+def test_active_hours_match_dense_component_sums():
+    fixture = synthetic_fixture("sparse", 12, 20, extent=80, number_of_hours=240, seed=4)
+    network = candidate_network(fixture)
+    rng = np.random.default_rng(0)
+    source_profiles = fixture["heat_source_profiles"] * (rng.random(fixture["heat_source_profiles"].shape) < 0.05)
+    sink_profiles = fixture["heat_sink_profiles"] * (rng.random(fixture["heat_sink_profiles"].shape) < 0.3)
+
+    membership = np.array(network.correspondence_graph.connected_components().membership)
+    supply = np.zeros((240, membership.max() + 1))
+    demand = np.zeros((240, membership.max() + 1))
+    np.add.at(supply.T, membership[network.source_vertices], source_profiles.T)
+    np.add.at(demand.T, membership[network.sink_vertices], sink_profiles.T)
+    expected = np.any((supply > 0) & (demand > 0), axis=1)
+
+    active = active_hours(network, source_profiles, sink_profiles)
+    assert 0 < np.sum(active) < 240
+    np.testing.assert_array_equal(active, expected)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_screening_keeps_every_line_of_the_exact_pruning(seed):
+    fixture = synthetic_fixture("screened", 20, 30, number_of_hours=24 * 7 * 8, seed=seed)
+    screened = candidate_network(fixture)
+    removed = screen_edges(screened, fixture["heat_source_profiles"], fixture["heat_sink_profiles"],
+                           fixture["investment_period"], fixture["transmission_line_threshold"])
+    exact, _ = prune_network(candidate_network(fixture), fixture["heat_source_profiles"],
+                             fixture["heat_sink_profiles"], fixture["investment_period"],
+                             fixture["transmission_line_threshold"], "heuristic", False)
+
+    assert removed > 0 and exact.graph.ecount() > 0
+    assert line_keys(exact, fixture) <= line_keys(screened, fixture)
@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from excess_heat.checkpoint import RunCancelled
+from excess_heat.service import ExcessHeatService, QueueFull, create_server
+
+
+PARAMETERS = {"sinks": "sinks.shp", "search_radius": 20, "investment_period": 20, "transmission_line_threshold": 0.5,
+              "nuts2_id": "DK05", "output_transmission_lines": "results/lines"}
+
+
+class StaticReferenceData:
+    # reference data which is never reloaded
+    loaded = 0.0
+
+    def refresh(self):
+        pass
+
+
+def create_service(tmp_path, function, **parameters):
+    service = ExcessHeatService(reference_data=StaticReferenceData(), output_root=str(tmp_path), **parameters)
+    service.function = function
+    return service
+
+
+class BlockingRun:
+    # run of excess_heat() which waits until it is released or cancelled
+    def __init__(self):
+        self.started = threading.Semaphore(0)
+        self.release = threading.Event()
+
+    def __call__(self, progress, cancel, reference_data, **parameters):
+        self.started.release()
+        progress(0, 1, 2)
+        while not self.release.wait(0.01):
+            if cancel.is_set():
+                raise RunCancelled("run cancelled")
+        if parameters.get("nuts2_id") == "failing":
+            raise ValueError("no sinks")
+        return parameters.get("nuts2_id") == "cached"
+
+
+def wait_for(job, statuses=("finished", "failed", "cancelled")):
+    for _ in range(1000):
+        if job.status in statuses:
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job " + job.id + " is still " + job.status)
+
+
+def request(server, method, path, body=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    url = "http://%s:%d%s" % (server.server_address[:2] + (path,))
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, method=method)) as response:
+            return response.status, json.loads(response.read().decode("utf-8"))
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read().decode("utf-8"))
+
+
+def test_job_lifecycle(tmp_path):
+    run = BlockingRun()
+    service = create_service(tmp_path, run, workers=1)
+    try:
+        running = service.submit(PARAMETERS)
+        run.started.acquire()
+        queued = service.submit(dict(PARAMETERS, nuts2_id="cached"))
+        failing = service.submit(dict(PARAMETERS, nuts2_id="failing"))
+
+        assert (running.status, queued.status) == ("running", "queued")
+        assert running.to_dict()["progress"] == {"iteration": 0, "hours": 1, "number_of_hours": 2}
+        metrics = service.metrics()
+        assert (metrics["running"], metrics["queue_depth"]) == (1, 2)
+        run.release.set()
+        for job in (running, queued, failing):
+            wait_for(job)
+    finally:
+        service.close()
+
+    assert (running.status, running.cached) == ("finished", False)
+    assert (queued.status, queued.cached) == ("finished", True)
+    assert failing.status == "failed" and failing.error == "ValueError: no sinks"
+    assert service.metrics()["jobs"] == {"submitted": 3, "rejected": 0, "finished": 2, "failed": 1,
+                                         "cancelled": 0, "cached": 1}
+    assert service.metrics()["run_time"]["count"] == 2
+
+
+def test_cancelled_jobs(tmp_path):
+    run = BlockingRun()
+    service = create_service(tmp_path, run, workers=1)
+    try:
+        running = service.submit(PARAMETERS)
+        run.started.acquire()
+        queued = service.submit(PARAMETERS)
+
+        assert service.cancel(queued.id) is queued
+        assert service.cancel(running.id) is running
+        wait_for(running)
+        wait_for(queued)
+        assert service.cancel("unknown") is None
+    finally:
+        service.close()
+
+    assert running.status == "cancelled" and running.error == "run cancelled"
+    # the queued job never started a run
+    assert queued.status == "cancelled" and queued.error is None
+    assert not run.started.acquire(blocking=False)
+    assert service.metrics()["jobs"]["cancelled"] == 2
+
+
+def test_http_interface_rejects_jobs_of_a_full_queue(tmp_path):
+    run = BlockingRun()
+    service = create_service(tmp_path, run, workers=1, max_queue=1)
+    server = create_server(service, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        status, running = request(server, "POST", "/jobs", PARAMETERS)
+        assert status == 202
+        run.started.acquire()
+        assert request(server, "POST", "/jobs", PARAMETERS)[0] == 202
+        status, body = request(server, "POST", "/jobs", PARAMETERS)
+        assert status == 503 and "queue" in body["error"]
+        with pytest.raises(QueueFull):
+            service.submit(PARAMETERS)
+        assert request(server, "POST", "/jobs", {"unknown": 1})[0] == 400
+
+        assert request(server, "GET", "/jobs/" + running["id"])[1]["status"] == "running"
+        assert request(server, "GET", "/metrics")[1]["jobs"]["rejected"] == 2
+        assert request(server, "GET", "/health") == (200, {"status": "ok"})
+        assert request(server, "GET", "/jobs/unknown")[0] == 404
+        status, body = request(server, "DELETE", "/jobs/" + running["id"])
+        assert status == 202
+        assert wait_for(service.job(running["id"])).status == "cancelled"
+        assert request(server, "DELETE", "/jobs/unknown")[0] == 404
+    finally:
+        run.release.set()
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+
+def test_job_files_are_resolved_in_the_output_root(tmp_path):
+    runs = []
+    service = create_service(tmp_path, lambda **parameters: runs.append(parameters),
+                             defaults={"stage_dir": str(tmp_path / "stages")})
+    try:
+        job = service.submit(dict(PARAMETERS, save_state="states/../state.json"))
+    finally:
+        service.close()
+
+    assert job.status == "finished"
+    root = os.path.realpath(str(tmp_path))
+    assert runs[0]["output_transmission_lines"] == os.path.join(root, "results", "lines")
+    assert runs[0]["save_state"] == os.path.join(root, "state.json")
+    assert runs[0]["stage_dir"] == str(tmp_path / "stages")
+
+
+@pytest.mark.parametrize("parameters", [{"output_transmission_lines": "../lines"},
+                                        {"output_transmission_lines": "/tmp/lines"},
+                                        {"store": "results/../../store.sqlite"},
+                                        {"cache_dir": "cache"},
+                                        {"checkpoint_dir": "checkpoints"}])
+def test_jobs_do_not_write_outside_the_output_root(tmp_path, parameters):
+    runs = []
+    service = create_service(tmp_path / "root", lambda **parameters: runs.append(parameters))
+    try:
+        with pytest.raises(ValueError):
+            service.submit(dict(PARAMETERS, **parameters))
+        with pytest.raises(TypeError):
+            service.submit(dict(PARAMETERS, store={"path": "store.sqlite"}))
+    finally:
+        service.close()
+
+    assert runs == []
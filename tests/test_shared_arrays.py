@@ -0,0 +1,82 @@
+import gc
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from excess_heat import shared_arrays
+from excess_heat.shared_arrays import SharedArrays, attach_shared_arrays, detach_shared_arrays
+
+
+def block_exists(block_name):
+    try:
+        block = shared_memory.SharedMemory(name=block_name)
+    except FileNotFoundError:
+        return False
+    block.close()
+    return True
+
+
+def sum_in_worker(descriptors):
+    arrays = attach_shared_arrays(descriptors)
+    writeable = arrays["profiles"].flags.writeable
+    total = float(np.sum(arrays["profiles"])) + float(np.sum(arrays["ids"]))
+    del arrays
+    detach_shared_arrays(descriptors)
+    return total, writeable, len(shared_arrays.attached_blocks)
+
+
+def test_workers_attach_to_the_arrays_without_copies():
+    profiles = np.arange(12, dtype=float).reshape(3, 4)
+    ids = np.array([3, 1, 2])
+    context = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    with SharedArrays({"profiles": profiles, "ids": ids}) as shared:
+        np.testing.assert_array_equal(shared["profiles"], profiles)
+        with context.Pool(1) as pool:
+            total, writeable, attached = pool.apply(sum_in_worker, (shared.descriptors,))
+
+    assert total == np.sum(profiles) + np.sum(ids)
+    assert not writeable
+    assert attached == 0
+
+
+def test_attached_blocks_are_reused_and_detached():
+    with SharedArrays({"profiles": np.ones((2, 3)), "empty": np.zeros(0)}) as shared:
+        first = attach_shared_arrays(shared.descriptors)
+        second = attach_shared_arrays(shared.descriptors)
+        assert len(shared_arrays.attached_blocks) == 2
+        assert first["empty"].shape == (0,)
+        np.testing.assert_array_equal(second["profiles"], np.ones((2, 3)))
+        with pytest.raises(ValueError):
+            first["profiles"][0, 0] = 2
+
+        del first, second
+        detach_shared_arrays({"profiles": shared.descriptors["profiles"]})
+        assert list(shared_arrays.attached_blocks) == [shared.descriptors["empty"][0]]
+        detach_shared_arrays()
+        assert shared_arrays.attached_blocks == {}
+
+
+def test_blocks_are_unlinked_on_close_and_garbage_collection():
+    shared = SharedArrays({"profiles": np.ones(4)})
+    block_name = shared.descriptors["profiles"][0]
+    assert block_exists(block_name)
+    shared.close()
+    assert not block_exists(block_name)
+    with pytest.raises(RuntimeError):
+        shared.add("ids", np.ones(2))
+
+    shared = SharedArrays({"profiles": np.ones(4)})
+    block_name = shared.descriptors["profiles"][0]
+    del shared
+    gc.collect()
+    assert not block_exists(block_name)
+
+
+def test_invalid_arrays_are_not_shared():
+    with SharedArrays({"profiles": np.ones(4)}) as shared:
+        with pytest.raises(ValueError):
+            shared.add("profiles", np.ones(2))
+        with pytest.raises(TypeError):
+            shared.add("names", np.array(["a", None], dtype=object))
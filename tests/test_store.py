@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pytest
+
+from excess_heat.cache import data_directory
+from excess_heat.read_data import ad_industrial_database_local, ad_industry_profiles_local, \
+    ad_residential_heating_profile_local
+from excess_heat.store import SqliteStore
+
+
+pytestmark = pytest.mark.skipif(not os.path.isfile(os.path.join(data_directory(), "Industrial_Database.csv")),
+                                reason="reference files of the data directory are missing")
+
+
+@pytest.fixture(scope="module")
+def store(tmp_path_factory):
+    with SqliteStore(str(tmp_path_factory.mktemp("store") / "store.sqlite")) as store:
+        yield store
+
+
+def test_reference_data_matches_the_local_files(store):
+    assert store.industrial_database(["DK"]).equals(ad_industrial_database_local(["DK"]).reset_index(drop=True))
+    assert store.residential_heating_profile(["DK05"]).equals(
+        ad_residential_heating_profile_local(["DK05"]).reset_index(drop=True))
+    profiles = store.industry_profiles(["DK"])
+    expected = ad_industry_profiles_local(["DK"])
+    assert len(profiles) == len(expected)
+    for profile, expected_profile in zip(profiles, expected):
+        assert profile.equals(expected_profile.reset_index(drop=True))
+
+    heat_sources = store.industrial_database(None)
+    source = heat_sources.iloc[0]
+    within = store.heat_sources_within((source["Lon"] - 0.01, source["Lat"] - 0.01, source["Lon"] + 0.01,
+                                        source["Lat"] + 0.01))
+    assert len(within) >= 1 and np.any((within["Lon"] == source["Lon"]) & (within["Lat"] == source["Lat"]))
+
+
+def test_runs_are_read_back(store):
+    lines = np.array([[[9.5, 55.1], [9.7, 55.3]], [[10.2, 56.0], [10.1, 55.9]]])
+    run_id = store.add_run({"search_radius": 20, "nuts2_id": "DK05"}, ["DK05"], lines, [10, 20], [100, 90],
+                           [1000, 2000], [1.5, 2.5], 3000, 0.03, 1.2)
+    other_run_id = store.add_run({"search_radius": 20, "nuts2_id": "DK04"}, ["DK04"], lines[:1], [5], [80], [500],
+                                 [1.5], 500, 0.005, 0.8)
+
+    runs = store.runs("DK05")
+    assert runs["id"].tolist() == [run_id]
+    assert runs.loc[0, ["total_cost", "total_flow", "cost_per_flow"]].tolist() == [3000, 0.03, 1.2]
+    assert runs.loc[0, "parameters"] == '{"nuts2_id": "DK05", "search_radius": 20}'
+    assert store.runs()["id"].tolist() == [run_id, other_run_id]
+
+    transmission_lines = store.transmission_lines(run_id)
+    np.testing.assert_array_equal(transmission_lines[["Lon1", "Lat1", "Lon2", "Lat2"]].to_numpy(),
+                                  lines.reshape(-1, 4))
+    np.testing.assert_array_equal(transmission_lines[["flow", "temperature", "cost", "length"]].to_numpy(),
+                                  [[10, 100, 1000, 1.5], [20, 90, 2000, 2.5]])
+    assert len(store.transmission_lines(other_run_id)) == 1
+    # the bounding boxes of the lines are indexed
+    located = store.query("SELECT id FROM transmission_lines_location WHERE min_lon >= 10 ORDER BY id")
+    assert located["id"].tolist() == store.query("SELECT id FROM transmission_lines WHERE run_id = ? AND "
+                                                 "Lon1 > 10", [run_id])["id"].tolist()
+
+
+def test_refresh_keeps_an_unchanged_store(store):
+    version = store.version()
+    assert version[0] == store.fingerprint and version[1] == store.loaded
+    assert not store.refresh()
+    assert store.version() == version
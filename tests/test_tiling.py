@@ -0,0 +1,60 @@
+import os
+
+import numpy as np
+import pytest
+
+from excess_heat.accuracy import synthetic_fixture
+from excess_heat.cache import data_directory
+from excess_heat.excess_heat import excess_heat, find_radius_neighbours
+from excess_heat.tiling import excess_heat_tiled, tile_sites
+
+
+SINKS = os.path.join(data_directory(), "district_heating_shp.shp")
+
+
+def test_tiles_contain_every_candidate_edge_of_their_core():
+    fixture = synthetic_fixture("tiles", 60, 180, number_of_hours=24, seed=5, extent=60)
+    heat_sources, heat_sinks = fixture["heat_sources"], fixture["heat_sinks"]
+    # coherent sinks in pairs
+    heat_sinks["id"] = np.arange(len(heat_sinks)) // 2
+    search_radius = 8
+    tiles, source_cells, sink_cells = tile_sites(heat_sources[["Lon", "Lat"]].to_numpy(),
+                                                 heat_sinks[["Lon", "Lat"]].to_numpy(), heat_sinks["id"].to_numpy(),
+                                                 2 * search_radius, search_radius)
+    cells = {"source": [tuple(cell) for cell in source_cells], "sink": [tuple(cell) for cell in sink_cells]}
+    sites = {tile["cell"]: {"source": set(tile["sources"]), "sink": set(tile["sinks"])} for tile in tiles}
+
+    # every site is in the core of exactly one tile, which contains it
+    assert len(tiles) > 4 and len(sites) == len(tiles)
+    for kind, kind_cells in cells.items():
+        for site, cell in enumerate(kind_cells):
+            assert site in sites[cell][kind]
+    # coherent sinks are in a tile as a whole
+    sink_ids = heat_sinks["id"].to_numpy()
+    for tile in tiles:
+        np.testing.assert_array_equal(tile["sinks"], np.nonzero(np.isin(sink_ids, sink_ids[tile["sinks"]]))[0])
+    # both ends of every candidate edge are sites of the tiles of their cores
+    number_of_edges = 0
+    for kind1, sites1, kind2, sites2 in (("source", heat_sources, "sink", heat_sinks),
+                                         ("source", heat_sources, "source", heat_sources),
+                                         ("sink", heat_sinks, "sink", heat_sinks)):
+        for site1, adjacent in enumerate(find_radius_neighbours(sites1, sites2, search_radius)[0]):
+            for site2 in adjacent:
+                number_of_edges += 1
+                for cell in (cells[kind1][site1], cells[kind2][site2]):
+                    assert site1 in sites[cell][kind1] and site2 in sites[cell][kind2]
+    assert number_of_edges > 100
+
+
+@pytest.mark.skipif(not os.path.isfile(SINKS), reason="sink shapefile of the data directory is missing")
+def test_tiled_runs_match_the_untiled_run(tmp_path):
+    excess_heat(SINKS, 20, 20, 0.5, "DK05", str(tmp_path / "untiled"))
+    number_of_tiles = excess_heat_tiled([(SINKS, "DK05")], 20, 20, 0.5, str(tmp_path / "tiled"), tile_size=30,
+                                        workers=2)
+
+    assert number_of_tiles > 1
+    with open(str(tmp_path / "untiled.csv")) as untiled, open(str(tmp_path / "tiled.csv")) as tiled:
+        expected = [float(value) for value in untiled.read().splitlines()[-1].split(",")]
+        result = [float(value) for value in tiled.read().splitlines()[-1].split(",")]
+    assert expected[1] > 0
+    np.testing.assert_allclose(result, expected, rtol=1e-9)
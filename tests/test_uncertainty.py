@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from excess_heat.accuracy import synthetic_fixture
+from excess_heat.excess_heat import compute_flow, design_network, find_radius_neighbours, prune_network
+from excess_heat.isolation import IsolatedMaxFlowSolver
+from excess_heat.uncertainty import result_statistics, sample_factors, sample_results
+
+
+def pruned_network():
+    fixture = synthetic_fixture("uncertainty", 8, 24, number_of_hours=24 * 7, seed=0)
+    heat_sources, heat_sinks = fixture["heat_sources"], fixture["heat_sinks"]
+    search_radius = fixture["search_radius"]
+    neighbours = (find_radius_neighbours(heat_sources, heat_sinks, search_radius),
+                  find_radius_neighbours(heat_sources, heat_sources, search_radius),
+                  find_radius_neighbours(heat_sinks, heat_sinks, search_radius))
+    network = design_network(neighbours[0], neighbours[1], neighbours[2], heat_sinks["id"],
+                             fixture["heat_source_profiles"], fixture["heat_sink_profiles"],
+                             fixture["investment_period"], fixture["transmission_line_threshold"], "igraph",
+                             "heuristic", None)
+    network, _ = prune_network(network, fixture["heat_source_profiles"], fixture["heat_sink_profiles"],
+                               fixture["investment_period"], fixture["transmission_line_threshold"], "heuristic")
+    return network, fixture
+
+
+def test_batched_samples_match_the_runs_of_every_sample():
+    network, fixture = pruned_network()
+    rng = np.random.default_rng(3)
+    source_factors = sample_factors(7, network.number_of_sources, 0.3, rng)
+    sink_factors = sample_factors(7, network.number_of_sinks, 0.3, rng)
+    source_profiles, sink_profiles = fixture["heat_source_profiles"], fixture["heat_sink_profiles"]
+
+    expected = []
+    for source_factor, sink_factor in zip(source_factors, sink_factors):
+        results = compute_flow(network, source_profiles * source_factor, sink_profiles * sink_factor,
+                               fixture["investment_period"])
+        # lines without flow are not part of the total cost
+        expected.append((results[6] - np.sum(np.minimum(results[3], 0)), results[7], results[8]))
+    expected = np.array(expected)
+
+    assert network.graph.ecount() > 0 and np.all(expected[:, 1] > 0)
+    for batch_size in (1, 3, 8):
+        np.testing.assert_allclose(sample_results(network, source_profiles, sink_profiles, source_factors,
+                                                  sink_factors, fixture["investment_period"], batch_size),
+                                   expected, rtol=1e-9)
+    with IsolatedMaxFlowSolver() as solver:
+        np.testing.assert_allclose(sample_results(network, source_profiles, sink_profiles, source_factors,
+                                                  sink_factors, fixture["investment_period"], 4, solver),
+                                   expected, rtol=1e-9)
+
+
+def test_sample_factors_of_groups():
+    factors = sample_factors(1000, 5, 0.8, np.random.default_rng(0), groups=[0, 1, 1, 2, 0])
+
+    np.testing.assert_array_equal(factors[:, 0], factors[:, 4])
+    np.testing.assert_array_equal(factors[:, 1], factors[:, 2])
+    assert np.all(factors >= 0) and np.any(factors == 0)
+    assert np.mean(factors[:, 3]) == pytest.approx(1, abs=0.1)
+    with pytest.raises(ValueError):
+        sample_factors(2, 2, -0.1, np.random.default_rng(0))
+
+
+def test_result_statistics():
+    samples = np.column_stack((np.arange(101.0), np.arange(101.0) * 2, np.ones(101)))
+    statistics = result_statistics([50, 100, 1], samples, confidence=0.9)
+
+    np.testing.assert_allclose(statistics.loc["mean"], [50, 100, 1])
+    np.testing.assert_allclose(statistics.loc["lower 0.9"], [5, 10, 1])
+    np.testing.assert_allclose(statistics.loc["upper 0.9"], [95, 190, 1])
+    assert statistics.loc["standard deviation"].iloc[2] == 0
@@ -0,0 +1,21 @@
+from excess_heat.accuracy import synthetic_fixture
+from excess_heat.excess_heat import find_radius_neighbours
+from excess_heat.graphs import NetworkGraph
+from excess_heat.warm_start import COORDINATE_DECIMALS, edge_coordinates
+
+
+def test_edge_coordinates_match_the_sites_of_every_edge():
+    fixture = synthetic_fixture("coordinates", 8, 12, number_of_hours=24, seed=5)
+    heat_sources, heat_sinks = fixture["heat_sources"], fixture["heat_sinks"]
+    neighbours = [find_radius_neighbours(sites1, sites2, 20)[0] for sites1, sites2 in
+                  ((heat_sources, heat_sinks), (heat_sources, heat_sources), (heat_sinks, heat_sinks))]
+    network = NetworkGraph(neighbours[0], neighbours[1], neighbours[2], range(len(neighbours[1])), heat_sinks["id"])
+
+    def coordinates(site):
+        sites = heat_sources if site[0] == "source" else heat_sinks
+        return (round(float(sites.iloc[site[1]]["Lon"]), COORDINATE_DECIMALS),
+                round(float(sites.iloc[site[1]]["Lat"]), COORDINATE_DECIMALS))
+
+    expected = [tuple(coordinates(site) for site in edge) for edge in network.return_edge_source_target_vertices()]
+    assert len(expected) > 0
+    assert edge_coordinates(network, heat_sources, heat_sinks) == expected